@@ -15,7 +15,9 @@ from typing import Any
 
 from .addon_config import load_config
 from .ble_session import BleSession
+from .command_envelope import decode_message
 from .logging_setup import logger
+from .mqtt_router import router_for
 
 
 class B1ProbeHandler:
@@ -41,18 +43,18 @@ class B1ProbeHandler:
 
         def handle_power_cmd(_client, _userdata, msg):
             try:
-                payload = (msg.payload or b"").decode("utf-8").strip()
-                if payload.startswith("{"):
-                    data = json.loads(payload)
+                env = decode_message(msg, command="power")
+                if env.error == "invalid_json":
+                    raise ValueError(f"invalid power payload: {env.preview()}")
+                if env.args:
+                    action = str(env.get("action", "")).lower()
                 else:
-                    data = {"action": payload}
-
-                action = data.get("action", "").lower()
+                    action = env.raw.strip().lower()
                 logger.info(
                     {
                         "event": "b1_power_cmd_received",
                         "action": action,
-                        "payload": payload,
+                        "payload": env.preview(),
                     }
                 )
 
@@ -71,8 +73,8 @@ class B1ProbeHandler:
             except Exception as e:
                 logger.error({"event": "b1_power_cmd_error", "error": str(e)})
 
-        client.message_callback_add(power_topic, handle_power_cmd)
-        client.subscribe(power_topic, qos=1)
+        # Takes over cmd/power, as its message_callback_add used to
+        router_for(client).add(power_topic, handle_power_cmd, 1, name="b1/power")
 
         logger.info(
             {
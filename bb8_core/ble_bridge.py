@@ -4,7 +4,6 @@ import asyncio
 import importlib.metadata
 import json
 import os
-import threading
 import time
 from typing import TYPE_CHECKING, Any
 
@@ -20,6 +19,7 @@ from .addon_config import load_config
 from .ble_utils import resolve_services
 from .core import Core
 from .logging_setup import logger
+from .timer_wheel import get_timer_wheel
 
 CFG, SRC = load_config()
 # Use config for device name and MAC
@@ -324,12 +324,15 @@ class BLEBridge:
                 base = self._mqtt["base"]
                 client.publish(f"{base}/stop/state", "pressed", qos=1, retain=False)
                 logger.info({"event": "ble_cmd_stop_state_echo", "state": "pressed"})
-
-            def _reset():
-                # ...existing code...
-                pass
-
-            threading.Thread(target=_reset, daemon=True).start()
+                get_timer_wheel().call_later(
+                    0.5,
+                    client.publish,
+                    f"{base}/stop/state",
+                    "idle",
+                    1,
+                    False,
+                    name="ble_stop_reset",
+                )
         except Exception as e:
             logger.error({"event": "ble_cmd_stop_handler_error", "error": repr(e)})
 
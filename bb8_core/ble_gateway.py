@@ -5,6 +5,9 @@ Handles BLE adapter selection, device scanning, and connection status for BB-8
 device management.
 """
 
+import logging
+
+from .log_events import EventLog
 from .logging_setup import logger
 
 try:
@@ -13,6 +16,7 @@ except Exception:  # pragma: no cover
     BleakScanner = None  # type: ignore
 
 _initialized = False
+_DEVICE_DETAIL_LOG = EventLog(logger, "ble_scan_device_detail", logging.DEBUG)
 
 
 def init():
@@ -70,9 +74,8 @@ class BleGateway:
         )
         result = []
         for d in devices:
-            logger.debug(
-                {
-                    "event": "ble_scan_device_detail",
+            _DEVICE_DETAIL_LOG(
+                lambda d=d: {
                     "name": getattr(d, "name", None),
                     "address": getattr(d, "address", None),
                     "rssi": getattr(d, "rssi", None),
@@ -0,0 +1,206 @@
+"""
+ble_lane.py
+
+Priority lane for BLE writes.
+
+Every ``BleSession`` write goes through ``BleLane.submit``. Ordinary writes
+(LED, roll, battery reads, animations) run as their own task so the lane can
+cancel them; safety writes (``stop``) run with ``priority=True`` and:
+
+* preempt first: every in-flight non-safety write is cancelled (including
+  one sleeping between retry attempts) and every write still waiting behind
+  an earlier safety write is flushed. Both callers get ``PreemptedError``.
+* go out immediately, without waiting for anything queued before them.
+* hold the lane until they finish, so writes submitted meanwhile wait and
+  then run in order.
+
+``preempt(reason)`` can also be called up front (the facade does it first
+thing on estop), so the time from the estop to the stop write includes the
+facade's own work. That latency is recorded per preempt reason and reported
+by ``stats`` with the configured p99 target.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+from .logging_setup import logger
+from .util import percentile
+
+T = TypeVar("T")
+
+DEFAULT_TARGET_MS = 50.0
+_SAMPLES = 256
+
+
+class PreemptedError(Exception):
+    """A non-safety BLE write was flushed by a stop/estop."""
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(f"preempted by {reason}")
+        self.reason = reason
+
+
+class BleLane:
+    """Single BLE write path with a preempting priority lane."""
+
+    def __init__(
+        self,
+        target_ms: float = DEFAULT_TARGET_MS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.target_ms = float(target_ms)
+        self._clock = clock
+        self._inflight: dict[asyncio.Task, bool] = {}  # task -> preempted
+        self._priority = 0
+        self._waiters: list[asyncio.Future] = []
+        self._generation = 0
+        self._reason = ""
+        self._preempt_at: float | None = None
+        self._latency: dict[str, collections.deque[float]] = {}
+        self.preempts = 0
+        self.cancelled = 0
+        self.flushed = 0
+        self.priority_writes = 0
+        self.over_target = 0
+
+    async def submit(
+        self, call: Callable[[], Awaitable[T]], *, priority: bool = False
+    ) -> T:
+        """Run one BLE write; ``priority`` for safety writes (stop)."""
+        if priority:
+            return await self._run_priority(call)
+        generation = self._generation
+        while self._priority:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            await waiter
+        if generation != self._generation:
+            self.flushed += 1
+            raise PreemptedError(self._reason)
+        task = asyncio.get_running_loop().create_task(call())
+        self._inflight[task] = False
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if not self._inflight.get(task) or _cancelling(asyncio.current_task()):
+                raise  # the caller itself was cancelled
+            raise PreemptedError(self._reason) from None
+        finally:
+            self._inflight.pop(task, None)
+
+    def preempt(self, reason: str) -> int:
+        """Cancel in-flight and flush queued non-safety writes.
+
+        Returns how many in-flight writes were cancelled. The first preempt
+        before a priority write starts its latency clock.
+        """
+        if self._preempt_at is None:
+            self._preempt_at = self._clock()
+            self._reason = reason
+            self.preempts += 1
+        self._generation += 1
+        self._wake_waiters()  # queued writes see the new generation and drop
+        cancelled = 0
+        for task, preempted in list(self._inflight.items()):
+            if not preempted and not task.done():
+                self._inflight[task] = True
+                task.cancel()
+                cancelled += 1
+        self.cancelled += cancelled
+        if cancelled:
+            logger.info(
+                {
+                    "event": "ble_lane_preempted",
+                    "reason": reason,
+                    "cancelled": cancelled,
+                }
+            )
+        return cancelled
+
+    def settle(self) -> None:
+        """Forget a preempt that no priority write followed (device offline)."""
+        self._preempt_at = None
+
+    def stats(self) -> dict[str, Any]:
+        latency = {}
+        for reason, samples in self._latency.items():
+            ordered = sorted(samples)
+            latency[reason] = {
+                "p50": percentile(ordered, 0.50),
+                "p99": percentile(ordered, 0.99),
+                "max": round(ordered[-1], 2),
+                "samples": len(ordered),
+            }
+        return {
+            "inflight": len(self._inflight),
+            "priority_active": self._priority > 0,
+            "preempts": self.preempts,
+            "cancelled": self.cancelled,
+            "flushed": self.flushed,
+            "priority_writes": self.priority_writes,
+            "stop_write_ms": latency,
+            "target_p99_ms": self.target_ms,
+            "over_target": self.over_target,
+        }
+
+    async def _run_priority(self, call: Callable[[], Awaitable[T]]) -> T:
+        self.preempt("stop")
+        reason, started = self._reason, self._preempt_at
+        self._preempt_at = None
+        self._priority += 1
+        self.priority_writes += 1
+        if started is not None:
+            self._record(reason, (self._clock() - started) * 1000.0)
+        try:
+            return await call()
+        finally:
+            self._priority -= 1
+            if not self._priority:
+                self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _record(self, reason: str, ms: float) -> None:
+        samples = self._latency.get(reason)
+        if samples is None:
+            samples = self._latency[reason] = collections.deque(maxlen=_SAMPLES)
+        samples.append(ms)
+        if ms > self.target_ms:
+            self.over_target += 1
+            logger.warning(
+                {
+                    "event": "ble_lane_stop_latency_over_target",
+                    "reason": reason,
+                    "latency_ms": round(ms, 2),
+                    "target_ms": self.target_ms,
+                }
+            )
+
+
+def _cancelling(task: asyncio.Task | None) -> bool:
+    # Task.cancelling() is 3.11+; on 3.10 a preempted write is assumed
+    cancelling = getattr(task, "cancelling", None)
+    return bool(cancelling()) if cancelling is not None else False
+
+
+_lane: BleLane | None = None
+
+
+def get_ble_lane() -> BleLane:
+    """Process-wide lane shared by every BleSession (survives reconnects)."""
+    global _lane
+    if _lane is None:
+        _lane = BleLane()
+    return _lane
+
+
+__all__ = ["BleLane", "PreemptedError", "get_ble_lane"]
@@ -14,11 +14,16 @@ while avoiding complex spherov2 API variations across versions.
 from __future__ import annotations
 
 import asyncio
+import logging
 import random
 import time
 from typing import Any
 
+from . import command_trace
 from .auto_detect import _pick_best_bb8_candidate
+from .ble_lane import BleLane, PreemptedError, get_ble_lane
+from .led_output import LedOutput, get_led_output
+from .log_events import EventLog
 
 try:  # pragma: no cover - import surface varies in CI/dev
     from bleak import BleakScanner as _BleakScanner
@@ -44,6 +49,9 @@ BleakScanner = _BleakScanner  # type: ignore[assignment]
 
 from .logging_setup import logger
 
+_LED_SET_LOG = EventLog(logger, "ble_session_led_set", logging.DEBUG)
+_LED_SUCCESS_LOG = EventLog(logger, "ble_session_led_success", logging.DEBUG)
+
 
 class BleSessionError(Exception):
     """Base exception for BLE session operations."""
@@ -77,13 +85,23 @@ class BleSession:
     and movement primitives with built-in retry logic and validation.
     """
 
-    def __init__(self, target_mac: str | None = None):
+    def __init__(
+        self,
+        target_mac: str | None = None,
+        lane: BleLane | None = None,
+        led_output: LedOutput | None = None,
+    ):
         """Initialize BLE session.
 
         Args:
             target_mac: BB-8 MAC address. If None, auto-discovery will be used.
+            lane: Write lane; defaults to the process-wide one so stop/estop
+                preempt writes from every session.
+            led_output: LED dedup stage; defaults to the process-wide one.
         """
         self._target_mac = target_mac
+        self._lane = lane or get_ble_lane()
+        self._led_output = led_output or get_led_output()
         # Use Any here to avoid importing spherov2 in environments without it
         from typing import Any as _Any
 
@@ -200,6 +218,7 @@ class BleSession:
                         timeout=self._connect_timeout,
                     )
                     self._connected = True
+                    self._led_output.invalidate()  # the first write goes out
                     self._connect_attempts = attempt
                     connect_end = time.time()
                     self._last_connect_time = connect_end - self._connect_start_time
@@ -320,6 +339,7 @@ class BleSession:
         logger.warning(payload)
         self._connected = False
         self._toy = None
+        self._led_output.invalidate()
 
     async def wake(self) -> None:
         """Wake up the BB-8 device.
@@ -346,9 +366,9 @@ class BleSession:
             raise DeviceNotConnectedError("Toy not available")
 
         # Set a brief LED flash to confirm device is awake
-        self._toy.set_main_led(255, 255, 255, None)
+        self._write_led(255, 255, 255)
         await asyncio.sleep(0.1)
-        self._toy.set_main_led(0, 0, 0, None)
+        self._write_led(0, 0, 0)
 
     async def sleep(self) -> None:
         """Put BB-8 device to sleep.
@@ -378,7 +398,7 @@ class BleSession:
 
         # Fade LED to indicate sleep
         for brightness in [200, 100, 50, 0]:
-            self._toy.set_main_led(brightness, 0, brightness, None)
+            self._write_led(brightness, 0, brightness)
             await asyncio.sleep(0.1)
 
         # Use simplified sleep - just disconnect, the toy will auto-sleep
@@ -442,13 +462,17 @@ class BleSession:
         except asyncio.TimeoutError as exc:
             raise BleSessionError("Battery read timed out after 5.0s") from exc
 
-    async def set_led(self, r: int, g: int, b: int) -> None:
+    async def set_led(self, r: int, g: int, b: int, *, force: bool = False) -> None:
         """Set BB-8 LED color.
 
+        A colour the device already shows (or, with ``led_dedup_delta_e``,
+        one perceptually indistinguishable from it) is not written again.
+
         Args:
             r: Red component (0-255)
             g: Green component (0-255)
             b: Blue component (0-255)
+            force: Write even if the device already shows this colour
 
         Raises:
             DeviceNotConnectedError: If not connected to device.
@@ -465,27 +489,25 @@ class BleSession:
         if not self.is_connected():
             raise DeviceNotConnectedError("Device not connected")
 
-        try:
+        if not self._led_output.should_write((r, g, b), self._toy, force=force):
             logger.debug(
                 {
-                    "event": "ble_session_led_set",
-                    "r": r,
-                    "g": g,
-                    "b": b,
+                    "event": "ble_session_led_deduped",
+                    "rgb": [r, g, b],
+                    "confirmed": list(self._led_output.confirmed or ()),
                 }
             )
+            return
+
+        try:
+            _LED_SET_LOG(r=r, g=g, b=b)
 
             await self._execute_with_retry(self._set_led_impl, r, g, b)
 
-            logger.debug(
-                {
-                    "event": "ble_session_led_success",
-                    "r": r,
-                    "g": g,
-                    "b": b,
-                }
-            )
+            _LED_SUCCESS_LOG(r=r, g=g, b=b)
 
+        except PreemptedError:
+            raise
         except Exception as e:
             self._invalidate_connection("led_error", error=str(e))
             logger.error(
@@ -504,7 +526,17 @@ class BleSession:
         if not self._toy:
             raise DeviceNotConnectedError("Toy not available")
 
-        self._toy.set_main_led(r, g, b, None)
+        self._write_led(r, g, b)
+
+    def _write_led(self, r: int, g: int, b: int) -> None:
+        """Write the LED and record the colour as confirmed on this device."""
+        toy = self._toy
+        try:
+            toy.set_main_led(r, g, b, None)
+        except Exception:
+            self._led_output.invalidate()  # the LED may or may not have changed
+            raise
+        self._led_output.confirm((r, g, b), toy)
 
     async def roll(self, speed: int, heading: int, ms: int | None = None) -> None:
         """Command BB-8 to roll.
@@ -551,6 +583,8 @@ class BleSession:
                 }
             )
 
+        except PreemptedError:
+            raise
         except Exception as e:
             logger.error(
                 {
@@ -571,7 +605,7 @@ class BleSession:
         # Use LED indication for movement since roll API is complex
         # Set green LED to indicate movement direction
         led_intensity = min(255, max(50, speed))
-        self._toy.set_main_led(0, led_intensity, 0, None)
+        self._write_led(0, led_intensity, 0)
 
         logger.info(
             {
@@ -594,7 +628,8 @@ class BleSession:
 
         try:
             logger.info({"event": "ble_session_stop"})
-            await self._execute_with_retry(self._stop_impl)
+            # Priority lane: flush queued LED/motion writes, go out first
+            await self._execute_with_retry(self._stop_impl, priority=True)
             logger.info({"event": "ble_session_stop_success"})
 
         except Exception as e:
@@ -607,9 +642,9 @@ class BleSession:
             raise DeviceNotConnectedError("Toy not available")
 
         # Use LED indication for stop
-        self._toy.set_main_led(255, 0, 0, None)  # Red LED to indicate stop
+        self._write_led(255, 0, 0)  # Red LED to indicate stop
         await asyncio.sleep(0.5)
-        self._toy.set_main_led(0, 0, 0, None)  # Turn off LED
+        self._write_led(0, 0, 0)  # Turn off LED
 
         logger.info(
             {
@@ -618,20 +653,34 @@ class BleSession:
             }
         )
 
-    async def _execute_with_retry(self, func, *args, **kwargs) -> Any:
+    async def _execute_with_retry(
+        self, func, *args, priority: bool = False, **kwargs
+    ) -> Any:
         """Execute function with retry logic.
 
         Args:
             func: Function to execute
             *args: Function arguments
+            priority: Safety write (stop): preempts queued and in-flight
+                non-safety writes, including their retries
             **kwargs: Function keyword arguments
 
         Returns:
             Function result
 
         Raises:
+            PreemptedError: If a stop/estop flushed this write
             Exception: If all retry attempts fail
         """
+        command_trace.mark("ble_submit")
+        try:
+            return await self._lane.submit(
+                lambda: self._attempt_twice(func, *args, **kwargs), priority=priority
+            )
+        finally:
+            command_trace.mark("ble_done")
+
+    async def _attempt_twice(self, func, *args, **kwargs) -> Any:
         last_error = None
 
         for attempt in range(1, 3):  # 2 attempts max for operations
@@ -673,6 +722,7 @@ class BleSession:
         finally:
             self._connected = False
             self._toy = None
+            self._led_output.invalidate()
 
     async def disconnect(self) -> None:
         """Disconnect from BB-8 device."""
@@ -52,9 +52,14 @@ from .addon_config import load_config
 from .auto_detect import resolve_bb8_mac
 from .ble_bridge import BLEBridge
 from .ble_gateway import BleGateway
+from .ble_lane import get_ble_lane
 from .ble_link import BLELink
 from .bluez_health import probe_bluez_health
+from .command_admission import get_admission
+from .command_ingress import get_ingress
+from .command_trace import get_tracer
 from .common import STATE_TOPICS, publish_device_echo
+from .led_output import get_led_output
 
 _stop_evt = threading.Event()
 
@@ -80,9 +85,20 @@ def _config_truthy(config: dict[str, Any] | None, *keys: str, default: bool = Fa
 
 from .evidence_capture import EvidenceRecorder
 from .logging_setup import logger
+from .mqtt_asyncio import resolve_max_inflight, resolve_transport
+from .mqtt_connection import current_bus, get_bus, open_connection
 from .mqtt_dispatcher import (
     register_subscription,  # dynamic topic binding
 )
+from .mqtt_router import router_for
+from .mqtt_v5 import (
+    on_connect as mqtt_v5_on_connect,
+    publish_ack,
+    resolve_protocol,
+)
+from .retained_cache import get_retained_cache, publish_retained
+from .telemetry import get_telemetry_aggregator
+from .timer_wheel import get_timer_wheel
 
 log = logging.getLogger(__name__)
 
@@ -177,8 +193,8 @@ def _publish_presence_state(state: str, mqtt_client: Any | None = None) -> None:
     if active_client is None:
         log.warning("presence state publish skipped (no mqtt client): %s", state)
         return
-    active_client.publish(PRESENCE_STATE_TOPIC, payload=state, qos=0, retain=True)
-    log.info("presence state published -> %s %s", PRESENCE_STATE_TOPIC, state)
+    if publish_retained(active_client, PRESENCE_STATE_TOPIC, state, qos=0):
+        log.info("presence state published -> %s %s", PRESENCE_STATE_TOPIC, state)
 
 
 def _cleanup_legacy_presence_topics(mqtt_client: Any) -> None:
@@ -211,6 +227,26 @@ def _translate_presence_state(payload: Any) -> str | None:
 
 
 def _auto_detect_presence_publish_adapter(topic: str, payload: Any) -> None:
+    """Presence monitor thread: hand the change to the controller's loop.
+
+    Goes over the in-process bus (``<base>/internal/presence``, never on
+    the wire) once the controller subscribed; before that it is applied
+    directly.
+    """
+    bus = current_bus()
+    data = payload if isinstance(payload, str) else json.dumps(payload)
+    if bus is not None and bus.publish_threadsafe(
+        f"{bus.internal_prefix}presence", data
+    ):
+        return
+    _apply_monitor_presence(topic, payload)
+
+
+async def _on_bus_presence(topic: str, payload: bytes, _retain: bool) -> None:
+    _apply_monitor_presence(topic, payload.decode("utf-8", "replace"))
+
+
+def _apply_monitor_presence(topic: str, payload: Any) -> None:
     translated_state = _translate_presence_state(payload)
     if translated_state is None:
         log.warning(
@@ -235,8 +271,8 @@ def _publish_connection_availability(
         return
 
     topic = f"{_runtime_mqtt_base(config)}/status/connection"
-    active_client.publish(topic, payload=state, qos=0, retain=True)
-    log.info("connection availability published -> %s %s", topic, state)
+    if publish_retained(active_client, topic, state, qos=0):
+        log.info("connection availability published -> %s %s", topic, state)
 
 
 def _clamp_led_rgb(r: int, g: int, b: int) -> tuple[int, int, int]:
@@ -374,11 +410,8 @@ async def _process_led_command(
     if led_applied is not True:
         return False
 
-    mqtt_client.publish(
-        led_state_topic,
-        _build_ha_led_state_payload(rgb),
-        qos=0,
-        retain=True,
+    publish_retained(
+        mqtt_client, led_state_topic, _build_ha_led_state_payload(rgb), qos=0
     )
 
     if explicit_color and rgb != (0, 0, 0):
@@ -389,6 +422,18 @@ async def _process_led_command(
     return True
 
 
+def _call_on_loop(loop: Any, callback: Callable[[], Any]) -> None:
+    """Queue ``callback`` on ``loop``; the thread-safe wakeup only off-loop."""
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        loop.call_soon(callback)
+    else:
+        loop.call_soon_threadsafe(callback)
+
+
 def _schedule_async_command_ack(
     *,
     loop: asyncio.AbstractEventLoop,
@@ -417,7 +462,7 @@ def _schedule_async_command_ack(
 
         task.add_done_callback(_on_done)
 
-    loop.call_soon_threadsafe(_start)
+    _call_on_loop(loop, _start)
 
 
 async def _request_connect_attempt(
@@ -778,6 +823,8 @@ def start_bridge_controller(
     from .logging_setup import logger
 
     cfg = config or (load_config()[0] if "load_config" in globals() else {})
+    # Apply retained_refresh_s to the shared retained-state cache
+    get_retained_cache(cfg)
 
     # Start passive BLE presence monitor in background thread if enabled
     enable_presence_monitor = _config_truthy(
@@ -1200,10 +1247,9 @@ async def _publish_health_metrics(
             client = get_client()
             base = config.get("MQTT_BASE", "bb8")
             topic = f"{base}/status/health"
-            payload = json.dumps(health_data, separators=(",", ":"))
-            client.publish(topic, payload=payload, qos=1, retain=True)
-
-            logger.debug({"event": "health_metrics_published", "topic": topic})
+            # Only the timestamp changes between most ticks; skip those writes
+            if publish_retained(client, topic, health_data, qos=1, volatile_keys=("ts",)):
+                logger.debug({"event": "health_metrics_published", "topic": topic})
         except Exception as e:
             logger.debug(
                 {
@@ -1553,14 +1599,24 @@ if __name__ == "__main__":
         import paho.mqtt.client as mqtt
         from paho.mqtt.enums import CallbackAPIVersion
 
-        client = mqtt.Client(
-            callback_api_version=CallbackAPIVersion.VERSION2,
-            protocol=mqtt.MQTTv311,
-        )
-        if username and password:
-            client.username_pw_set(username, password)
-        # LWT
-        client.will_set(status_topic, payload="offline", qos=0, retain=True)
+        # One client per process: dispatcher/evidence/probe share this connection
+        def _new_client(protocol: int = resolve_protocol(cfg)):
+            return mqtt.Client(
+                callback_api_version=CallbackAPIVersion.VERSION2,
+                protocol=protocol,
+            )
+
+        def _configure(cl):
+            if username and password:
+                cl.username_pw_set(username, password)
+            # LWT
+            cl.will_set(status_topic, payload="offline", qos=0, retain=True)
+            # QoS 1 flow control; later publishes queue until PUBACKs arrive
+            cl.max_inflight_messages_set(resolve_max_inflight(cfg))
+
+        connection = open_connection(_new_client, owner="bridge_controller")
+        connection.configure(_configure)
+        client = connection.client
 
         # Helper: publish ACKs
         def _ack(
@@ -1569,6 +1625,7 @@ if __name__ == "__main__":
             ok: bool = True,
             reason: str | None = None,
             echo: dict | None = None,
+            extra: dict | None = None,
         ):
             """Publish canonical ACK with optional reason and echo block."""
             payload: dict[str, Any] = {"ok": bool(ok)}
@@ -1583,16 +1640,31 @@ if __name__ == "__main__":
                     pass
             if reason is not None:
                 payload["reason"] = str(reason)
+            if extra:
+                payload.update(extra)
             # QoS hedge: use qos=1 for diag_gatt to avoid rare race/visibility issues in gate capture
             qos_ack = 1 if cmd == "diag_gatt" else 0
-            client.publish(
+            # MQTT 5 requests with a response topic get a direct reply
+            publish_ack(
+                client,
                 f"{base}/ack/{cmd}",
                 json.dumps(payload, separators=(",", ":")),
                 qos=qos_ack,
-                retain=False,
+                cid=payload.get("cid"),
             )
 
         loop = _asyncio.get_running_loop()
+        admission = get_admission()
+        admission.bind(loop)
+        # paho's network thread (thread transport) hands commands to this loop
+        ingress = get_ingress()
+        ingress.bind(loop)
+        # auto-stops, state resets and telemetry ticks share one timer wheel
+        timers = get_timer_wheel()
+        timers.attach(loop)
+        # The presence monitor reaches this loop over the in-process bus
+        bus = get_bus(base)
+        await bus.subscribe(f"{bus.internal_prefix}presence", _on_bus_presence)
         led_state_topic = f"{base}/state/led"
         last_commanded_color = [255, 255, 255]
 
@@ -1610,8 +1682,33 @@ if __name__ == "__main__":
                 logger.info({"event": "facade_mqtt_attached_via_controller", "base": base})
         except Exception as e:
             logger.warning({"event": "facade_attach_mqtt_failed", "error": str(e)})
+        # One change-driven status/telemetry publisher for every producer
+        telemetry = get_telemetry_aggregator()
+        telemetry.bind(client, f"{base}/status/telemetry", qos=0)
+
+        def _on_client_recreated(_old, new):
+            global client
+            client = new
+            with contextlib.suppress(Exception):
+                if facade is not None and hasattr(facade, "attach_mqtt"):
+                    facade.attach_mqtt(
+                        new,
+                        base,
+                        qos=1,
+                        retain=True,
+                        enable_presence_discovery=enable_presence_discovery,
+                    )
+            telemetry.bind(new, f"{base}/status/telemetry", qos=0)
+
+        connection.add_client_listener(_on_client_recreated)
 
         def _on_connect(cl, _ud, _flags, rc, _properties=None):
+            if not mqtt_v5_on_connect(cl, rc, _properties):
+                # Broker refused MQTT 5; reconnect on a new 3.1.1 client
+                connection.recreate(protocol=mqtt.MQTTv311)
+                return
+            # New session: re-assert every retained state topic once
+            get_retained_cache().clear(cl)
             cl.publish(
                 status_topic,
                 payload="online",
@@ -1619,22 +1716,8 @@ if __name__ == "__main__":
                 retain=True,
             )
             # Emit an immediate telemetry snapshot to ensure early presence of keys
-            try:
-                initial_snap = {
-                    "connected": False,
-                    "estop": False,
-                    "last_cmd_ts": None,
-                    "battery_pct": None,
-                    "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-                }
-                cl.publish(
-                    f"{base}/status/telemetry",
-                    json.dumps(initial_snap),
-                    qos=0,
-                    retain=False,
-                )
-            except Exception:
-                pass
+            with contextlib.suppress(Exception):
+                telemetry.flush(force=True)
             try:
                 discovery_topic, discovery_payload = light_discovery_config()
                 cl.publish(discovery_topic, payload=discovery_payload, qos=0, retain=True)
@@ -1684,9 +1767,8 @@ if __name__ == "__main__":
                         "error": str(exc),
                     }
                 )
-            # Commands and echo responder subscriptions
-            cl.subscribe(f"{base}/cmd/#", qos=0)
-            cl.subscribe(f"{base}/echo/cmd", qos=0)
+            # Commands and echo responder: one batched SUBSCRIBE per session
+            router_for(cl).resubscribe(cl)
             logger.info(
                 {
                     "event": "mqtt_connected",
@@ -1695,323 +1777,390 @@ if __name__ == "__main__":
                 }
             )
 
-        def _on_message(cl, ud, msg):
+        def _log_cmd(env) -> None:
+            logger.info(
+                {
+                    "event": "mqtt_cmd_received",
+                    "topic": env.topic,
+                    "len": len(env.raw),
+                }
+            )
+
+        # Command handlers, dispatched on the main loop thread via the facade.
+        # Minimal aliases for the acceptance harness map wake/sleep/roll to the
+        # existing power/drive flows and ACK under the alias names.
+        def _cmd_wake(raw, data, cid):
+            if hasattr(facade, "power"):
+                _call_on_loop(loop, lambda: facade.power(True))
+                _ack("wake", cid, True)
+            else:
+                _ack("wake", cid, False, "Facade missing 'power' method")
+
+        def _cmd_sleep(raw, data, cid):
+            if hasattr(facade, "power"):
+                _call_on_loop(loop, lambda: facade.power(False))
+                _ack("sleep", cid, True)
+            else:
+                _ack("sleep", cid, False, "Facade missing 'power' method")
+
+        def _cmd_roll(raw, data, cid):
+            # Accept both {"speed","heading","ms"} and {"v","h","ms"}
+            v = data.get("speed", data.get("v", 0))
+            h = data.get("heading", data.get("h", 0))
+            ms = data.get("ms")
             try:
-                logger.info(
-                    {
-                        "event": "mqtt_cmd_received",
-                        "topic": getattr(msg, "topic", ""),
-                        "len": len(getattr(msg, "payload", b"")),
-                    }
+                speed = int(v)
+                heading = int(h)
+                ms_val = int(ms) if ms is not None else None
+            except Exception:
+                _ack("roll", cid, False, "Invalid payload for roll")
+                return
+            if hasattr(facade, "drive"):
+                _call_on_loop(
+                    loop,
+                    lambda: _asyncio.create_task(facade.drive(speed, heading, ms_val)),
                 )
-                topic = msg.topic or ""
-                cmd = topic.split("/")[-1]
-                raw = (msg.payload or b"{}").decode("utf-8", "ignore")
-                data = {}
-                try:
-                    data = json.loads(raw) if raw else {}
-                except Exception:
-                    data = {}
-                cid = data.get("cid")
-
-                # Dispatch to facade on main loop thread
-                if facade is not None:
-                    # Minimal command aliases for acceptance harness
-                    # Map wake/sleep/roll to existing power/drive flows and ACK under alias names
-                    if cmd == "wake":
-                        if hasattr(facade, "power"):
-                            loop.call_soon_threadsafe(lambda: facade.power(True))
-                            _ack("wake", cid, True)
-                        else:
-                            _ack("wake", cid, False, "Facade missing 'power' method")
-                    elif cmd == "sleep":
-                        if hasattr(facade, "power"):
-                            loop.call_soon_threadsafe(lambda: facade.power(False))
-                            _ack("sleep", cid, True)
-                        else:
-                            _ack(
-                                "sleep",
-                                cid,
-                                False,
-                                "Facade missing 'power' method",
-                            )
-                    elif cmd == "roll":
-                        # Accept both {"speed","heading","ms"} and {"v","h","ms"}
-                        v = data.get("speed", data.get("v", 0))
-                        h = data.get("heading", data.get("h", 0))
-                        ms = data.get("ms")
-                        try:
-                            speed = int(v)
-                            heading = int(h)
-                            ms_val = int(ms) if ms is not None else None
-                        except Exception:
-                            _ack("roll", cid, False, "Invalid payload for roll")
-                            return
-                        if hasattr(facade, "drive"):
-                            loop.call_soon_threadsafe(
-                                lambda: _asyncio.create_task(
-                                    facade.drive(speed, heading, ms_val)
-                                )
-                            )
-                            _ack("roll", cid, True)
-                        else:
-                            _ack("roll", cid, False, "Facade missing 'drive' method")
-                    # diag_gatt is handled by facade.attach_mqtt (always-on)
-                    elif cmd == "power":
-                        action = (data.get("action") or "").lower()
-                        if hasattr(facade, "power"):
-                            loop.call_soon_threadsafe(
-                                lambda: facade.power(action == "wake")
-                            )
-                            _ack("power", cid, True)
-                        else:
-                            _ack(
-                                "power",
-                                cid,
-                                False,
-                                "Facade missing 'power' method",
-                            )
-                    elif cmd == "stop":
-                        if hasattr(facade, "stop"):
-                            loop.call_soon_threadsafe(lambda: facade.stop())
-                            _ack("stop", cid, True)
-                        else:
-                            _ack(
-                                "stop",
-                                cid,
-                                False,
-                                "Facade missing 'stop' method",
-                            )
-                    elif cmd == "led":
-                        if facade is None:
-                            _ack("led", cid, False, "Facade is None")
-                        elif hasattr(facade, "set_led_async"):
-                            loop.call_soon_threadsafe(
-                                lambda: _asyncio.create_task(
-                                    _process_led_command(
-                                        facade=facade,
-                                        mqtt_client=client,
-                                        raw_payload=raw,
-                                        payload=data,
-                                        cid=cid,
-                                        last_commanded_color=last_commanded_color,
-                                        led_state_topic=led_state_topic,
-                                    )
-                                )
-                            )
-                            _ack("led", cid, True)
-                        else:
-                            _ack(
-                                "led",
-                                cid,
-                                False,
-                                "Facade missing 'set_led_async' method",
-                            )
-                    elif cmd == "led_preset":
-                        name = data.get("name")
-                        if name is not None and hasattr(facade, "set_led_preset"):
-                            loop.call_soon_threadsafe(
-                                lambda: _asyncio.create_task(
-                                    facade.set_led_preset(str(name), cid)
-                                )
-                            )
-                            _ack("led_preset", cid, True)
-                        elif name is None:
-                            _ack("led_preset", cid, False, "Missing preset name")
-                        else:
-                            _ack(
-                                "led_preset",
-                                cid,
-                                False,
-                                "Facade missing 'set_led_preset' method",
-                            )
-                    elif cmd == "drive":
-                        speed = int(data.get("speed", 0))
-                        heading = int(data.get("heading", 0))
-                        ms = data.get("ms")
-                        ms = int(ms) if ms is not None else None
-                        if facade is not None:
-                            if hasattr(facade, "drive"):
-                                loop.call_soon_threadsafe(
-                                    lambda: _asyncio.create_task(
-                                        facade.drive(speed, heading, ms)
-                                    )
-                                )
-                                _ack("drive", cid, True)
-                            else:
-                                _ack(
-                                    "drive",
-                                    cid,
-                                    False,
-                                    "Facade missing 'drive' method",
-                                )
-                        else:
-                            _ack("drive", cid, False, "Facade is None")
-                    elif cmd == "estop":
-                        reason = data.get("reason", "MQTT emergency stop")
-                        if facade is not None and hasattr(facade, "estop"):
-                            _schedule_async_command_ack(
-                                loop=loop,
-                                create_task=_asyncio.create_task,
-                                coroutine_factory=lambda: facade.estop(reason),
-                                ack_fn=_ack,
-                                cmd="estop",
-                                cid=cid,
-                            )
-                        elif facade is None:
-                            _ack("estop", cid, False, "Facade is None")
-                        else:
-                            _ack(
-                                "estop",
-                                cid,
-                                False,
-                                "Facade missing 'estop' method",
-                            )
-                    elif cmd == "connect":
-                        if not raw.strip():
-                            _ack("connect", cid, False, "Missing connect payload")
-                        else:
-                            shared_ble_session = _resolve_controller_ble_session()
-                            if shared_ble_session is None:
-                                logger.error({"event": "connect_command_session_unavailable"})
-                                _ack("connect", cid, False, "Shared BLE session unavailable")
-                                return
-                            if not _begin_manual_connect_attempt():
-                                logger.info({"event": "connect_command_already_in_progress"})
-                                _ack("connect", cid, False, "Connect already in progress")
-                                return
-                            _schedule_async_command_ack(
-                                loop=loop,
-                                create_task=_asyncio.create_task,
-                                coroutine_factory=lambda: _run_manual_connect_attempt(
-                                    facade=facade,
-                                    ble_session=shared_ble_session,
-                                    config=cfg,
-                                ),
-                                ack_fn=_ack,
-                                cmd="connect",
-                                cid=cid,
-                            )
-                    elif cmd == "clear_estop":
-                        if facade is not None and hasattr(facade, "clear_estop"):
-                            _schedule_async_command_ack(
-                                loop=loop,
-                                create_task=_asyncio.create_task,
-                                coroutine_factory=lambda: facade.clear_estop(),
-                                ack_fn=_ack,
-                                cmd="clear_estop",
-                                cid=cid,
-                            )
-                        elif facade is None:
-                            _ack("clear_estop", cid, False, "Facade is None")
-                        else:
-                            _ack(
-                                "clear_estop",
-                                cid,
-                                False,
-                                "Facade missing 'clear_estop' method",
-                            )
-                    elif cmd == "diag_scan":
-                        # Diagnostics scan command (minimal ack path)
-                        mac = data.get("mac")
-                        adapter = data.get("adapter", "hci0")
-                        _ack(
-                            "diag_scan",
-                            cid,
-                            True,
-                            echo={
-                                "cmd": "diag_scan",
-                                "mac": mac,
-                                "adapter": adapter,
-                            },
+                _ack("roll", cid, True)
+            else:
+                _ack("roll", cid, False, "Facade missing 'drive' method")
+
+        def _cmd_power(raw, data, cid):
+            action = (data.get("action") or "").lower()
+            if hasattr(facade, "power"):
+                _call_on_loop(loop, lambda: facade.power(action == "wake"))
+                _ack("power", cid, True)
+            else:
+                _ack("power", cid, False, "Facade missing 'power' method")
+
+        def _cmd_stop(raw, data, cid):
+            if hasattr(facade, "stop"):
+                _call_on_loop(loop, lambda: facade.stop())
+                _ack("stop", cid, True)
+            else:
+                _ack("stop", cid, False, "Facade missing 'stop' method")
+
+        def _cmd_led(raw, data, cid):
+            if hasattr(facade, "set_led_async"):
+                _call_on_loop(
+                    loop,
+                    lambda: _asyncio.create_task(
+                        _process_led_command(
+                            facade=facade,
+                            mqtt_client=client,
+                            raw_payload=raw,
+                            payload=data,
+                            cid=cid,
+                            last_commanded_color=last_commanded_color,
+                            led_state_topic=led_state_topic,
                         )
-                    elif cmd == "actuate_probe":
-                        # Actuation probe command (minimal ack path)
+                    ),
+                )
+                _ack("led", cid, True)
+            else:
+                _ack("led", cid, False, "Facade missing 'set_led_async' method")
+
+        def _cmd_led_preset(raw, data, cid):
+            name = data.get("name")
+            if name is not None and hasattr(facade, "set_led_preset"):
+                _call_on_loop(
+                    loop,
+                    lambda: _asyncio.create_task(facade.set_led_preset(str(name), cid)),
+                )
+                _ack("led_preset", cid, True)
+            elif name is None:
+                _ack("led_preset", cid, False, "Missing preset name")
+            else:
+                _ack(
+                    "led_preset",
+                    cid,
+                    False,
+                    "Facade missing 'set_led_preset' method",
+                )
+
+        def _cmd_drive(raw, data, cid):
+            speed = int(data.get("speed", 0))
+            heading = int(data.get("heading", 0))
+            ms = data.get("ms")
+            ms = int(ms) if ms is not None else None
+            if hasattr(facade, "drive"):
+                _call_on_loop(
+                    loop,
+                    lambda: _asyncio.create_task(facade.drive(speed, heading, ms)),
+                )
+                _ack("drive", cid, True)
+            else:
+                _ack("drive", cid, False, "Facade missing 'drive' method")
+
+        def _cmd_drive_stream(raw, data, cid):
+            # Setpoints replace one target; ACK only when the sender asks (cid)
+            # or the setpoint is refused, not 30 times a second
+            speed = data.get("speed", data.get("v", 0))
+            heading = data.get("heading", data.get("h", 0))
+            if not hasattr(facade, "drive_stream"):
+                _ack("drive_stream", cid, False, "Facade missing 'drive_stream' method")
+                return
+
+            def _submit():
+                ok, reason = facade.drive_stream(speed, heading)
+                if cid is not None or not ok:
+                    _ack("drive_stream", cid, ok, reason)
+
+            _call_on_loop(loop, _submit)
+
+        def _cmd_sequence(raw, data, cid):
+            # One ACK when the sequence ends (or fails validation), from the facade
+            steps = data.get("steps")
+            if hasattr(facade, "run_sequence"):
+                _call_on_loop(
+                    loop,
+                    lambda: _asyncio.create_task(facade.run_sequence(steps, cid)),
+                )
+            else:
+                _ack("sequence", cid, False, "Facade missing 'run_sequence' method")
+
+        def _cmd_estop(raw, data, cid):
+            reason = data.get("reason", "MQTT emergency stop")
+            if hasattr(facade, "estop"):
+                _schedule_async_command_ack(
+                    loop=loop,
+                    create_task=_asyncio.create_task,
+                    coroutine_factory=lambda: facade.estop(reason),
+                    ack_fn=_ack,
+                    cmd="estop",
+                    cid=cid,
+                )
+            else:
+                _ack("estop", cid, False, "Facade missing 'estop' method")
+
+        def _cmd_connect(raw, data, cid):
+            if not raw.strip():
+                _ack("connect", cid, False, "Missing connect payload")
+            else:
+                shared_ble_session = _resolve_controller_ble_session()
+                if shared_ble_session is None:
+                    logger.error({"event": "connect_command_session_unavailable"})
+                    _ack("connect", cid, False, "Shared BLE session unavailable")
+                    return
+                if not _begin_manual_connect_attempt():
+                    logger.info({"event": "connect_command_already_in_progress"})
+                    _ack("connect", cid, False, "Connect already in progress")
+                    return
+                _schedule_async_command_ack(
+                    loop=loop,
+                    create_task=_asyncio.create_task,
+                    coroutine_factory=lambda: _run_manual_connect_attempt(
+                        facade=facade,
+                        ble_session=shared_ble_session,
+                        config=cfg,
+                    ),
+                    ack_fn=_ack,
+                    cmd="connect",
+                    cid=cid,
+                )
+
+        def _cmd_clear_estop(raw, data, cid):
+            if hasattr(facade, "clear_estop"):
+                _schedule_async_command_ack(
+                    loop=loop,
+                    create_task=_asyncio.create_task,
+                    coroutine_factory=lambda: facade.clear_estop(),
+                    ack_fn=_ack,
+                    cmd="clear_estop",
+                    cid=cid,
+                )
+            else:
+                _ack("clear_estop", cid, False, "Facade missing 'clear_estop' method")
+
+        def _cmd_diag_scan(raw, data, cid):
+            # Diagnostics scan command (minimal ack path)
+            mac = data.get("mac")
+            adapter = data.get("adapter", "hci0")
+            _ack(
+                "diag_scan",
+                cid,
+                True,
+                echo={"cmd": "diag_scan", "mac": mac, "adapter": adapter},
+            )
+
+        def _cmd_actuate_probe(raw, data, cid):
+            # Actuation probe command (minimal ack path)
+            _ack("actuate_probe", cid, True, echo={"cmd": "actuate_probe"})
+
+        def _route(name, fn):
+            def _run(env):
+                try:
+                    # Handlers see the decoded object; an empty payload reads as "{}"
+                    fn(env.raw or "{}", env.args, env.cid)
+                except Exception as ex:  # defensive guard
+                    with contextlib.suppress(Exception):
                         _ack(
-                            "actuate_probe",
-                            cid,
-                            True,
-                            echo={"cmd": "actuate_probe"},
+                            "unknown",
+                            None,
+                            False,
+                            f"handler error: {type(ex).__name__}",
                         )
-                    # Note: diag_gatt handled earlier (and via per-topic callback); avoid duplicate branch here
-                    elif topic == f"{base}/echo/cmd":
-                        # Immediate echo responder for evidence harness
-                        try:
-                            echo_payload = {
-                                "cid": cid,
-                                "source": "device",
-                                "pong": True,
-                                "ts": time.strftime(
-                                    "%Y-%m-%dT%H:%M:%SZ", time.gmtime()
-                                ),
-                            }
-                            cl.publish(
-                                f"{base}/echo/state",
-                                json.dumps(echo_payload, separators=(",", ":")),
-                                qos=0,
-                                retain=False,
-                            )
-                        except Exception:
-                            pass
-                    else:
-                        # Defensive: surface unknown commands to aid diagnostics
-                        try:
-                            logger.info(
-                                {
-                                    "event": "mqtt_cmd_unhandled",
-                                    "cmd": cmd,
-                                    "topic": topic,
-                                }
-                            )
-                        except Exception:
-                            pass
-                        _ack("unknown", cid, False, f"no handler for {cmd}")
-                else:
-                    _ack("unknown", cid, False, f"no handler for {topic}")
-            except Exception as ex:  # defensive guard
-                import contextlib
-
-                with contextlib.suppress(Exception):
-                    _ack(
-                        "unknown",
-                        None,
-                        False,
-                        f"handler error: {type(ex).__name__}",
-                    )
 
-        client.on_connect = _on_connect
-        client.on_message = _on_message
-        client.connect(mqtt_host, mqtt_port, keepalive=60)
-        client.loop_start()
+            def _handler(cl, env):
+                _log_cmd(env)
+                # Rate-limited per command class; may run later, merged or NACKed
+                admission.submit(
+                    name,
+                    env.cid,
+                    lambda: _run(env),
+                    lambda reason, outcome: _ack(
+                        name, env.cid, False, reason, extra={"admission": outcome}
+                    ),
+                )
 
-        async def _telemetry_heartbeat():
-            while True:
-                try:
-                    conn = bool(getattr(facade, "is_connected", lambda: None)())
-                except Exception:
-                    conn = None
-                snap = {
-                    # Report actual BLE connectivity when available;
-                    # fallback True
-                    "connected": (conn if conn is not None else True),
-                    "estop": getattr(
-                        getattr(facade, "_safety", None),
-                        "is_estop_active",
-                        lambda: False,
-                    )(),
-                    "last_cmd_ts": None,
-                    "battery_pct": None,
+            return _handler
+
+        def _on_echo_cmd(cl, env):
+            # Immediate echo responder for evidence harness
+            _log_cmd(env)
+            cid = env.cid
+            if facade is None:
+                _ack("unknown", cid, False, f"no handler for {env.topic}")
+                return
+            with contextlib.suppress(Exception):
+                echo_payload = {
+                    "cid": cid,
+                    "source": "device",
+                    "pong": True,
                     "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
                 }
-                import contextlib
-
-                with contextlib.suppress(Exception):
-                    client.publish(
-                        f"{base}/status/telemetry",
-                        json.dumps(snap),
-                        qos=0,
-                        retain=False,
+                cl.publish(
+                    f"{base}/echo/state",
+                    json.dumps(echo_payload, separators=(",", ":")),
+                    qos=0,
+                    retain=False,
+                )
+
+        def _on_unhandled_cmd(cl, env):
+            # Defensive: surface unknown commands to aid diagnostics
+            _log_cmd(env)
+            cid, topic = env.cid, env.topic
+            if facade is None:
+                _ack("unknown", cid, False, f"no handler for {topic}")
+                return
+            cmd = topic.split("/")[-1]
+            logger.info({"event": "mqtt_cmd_unhandled", "cmd": cmd, "topic": topic})
+            _ack("unknown", cid, False, f"no handler for {cmd}")
+
+        command_handlers = {
+            "wake": _cmd_wake,
+            "sleep": _cmd_sleep,
+            "roll": _cmd_roll,
+            "power": _cmd_power,
+            "stop": _cmd_stop,
+            "led": _cmd_led,
+            "led_preset": _cmd_led_preset,
+            "drive": _cmd_drive,
+            "drive_stream": _cmd_drive_stream,
+            "sequence": _cmd_sequence,
+            "estop": _cmd_estop,
+            "connect": _cmd_connect,
+            "clear_estop": _cmd_clear_estop,
+            "diag_scan": _cmd_diag_scan,
+            "actuate_probe": _cmd_actuate_probe,
+        }
+        # Facade routes registered by attach_mqtt (led, estop, diag_gatt, ...)
+        # take precedence; these fill in the remaining commands.
+        router = router_for(client)
+        with router.batch():
+            if facade is not None:
+                for name, fn in command_handlers.items():
+                    router.add(
+                        f"{base}/cmd/{name}",
+                        _route(name, fn),
+                        0,
+                        name=f"cmd/{name}",
+                        envelope=True,
+                        replace=False,
+                        priority=admission.class_of(name) == "estop",
+                        nack=lambda cl, env, reason, name=name: _ack(
+                            name, env.cid, False, reason
+                        ),
                     )
+            router.add(
+                f"{base}/cmd/#",
+                _on_unhandled_cmd,
+                0,
+                name="cmd/unhandled",
+                envelope=True,
+                fallback=True,
+            )
+            router.add(
+                f"{base}/echo/cmd",
+                _on_echo_cmd,
+                0,
+                name="echo/cmd",
+                envelope=True,
+            )
+
+        connection.add_connect_listener(_on_connect)
+        # asyncio transport: the socket is read on this loop, so commands are
+        # dispatched without a thread hop; "thread" keeps paho's loop_start
+        connection.start(
+            mqtt_host,
+            mqtt_port,
+            keepalive=60,
+            loop=loop if resolve_transport(cfg) == "asyncio" else None,
+        )
+
+        def _optional_stats(owner: Any, attr: str, method: str = "stats"):
+            # stats of a facade component that may not exist yet
+            def _stats():
+                obj = getattr(owner, attr, None)
+                return getattr(obj, method)() if obj is not None else None
+
+            return _stats
+
+        # (snapshot key, stats source, include predicate): the bridge's
+        # operational counters, carried in the status/telemetry snapshot
+        stats_sources: list[tuple[str, Callable[[], Any], Callable[[Any], bool]]] = [
+            # Admission counters (admitted/merged/dropped)
+            ("admission", admission.stats, lambda s: True),
+            # Thread-to-loop hand-off (thread transport)
+            ("ingress", ingress.stats, lambda s: bool(s["queued"])),
+            # Shared timer wheel: pending timers and firing lag
+            ("timers", timers.stats, lambda s: True),
+            # Streaming drive loop: jitter and setpoint-to-roll latency
+            (
+                "drive_stream",
+                _optional_stats(facade, "_drive_stream"),
+                lambda s: s is not None,
+            ),
+            # Post-connect readiness: holdoff needed per connect, held cmds
+            (
+                "readiness",
+                _optional_stats(facade, "_readiness"),
+                lambda s: s is not None,
+            ),
+            # LED animation pacing: achieved vs target FPS, frame lateness
+            (
+                "led_animation",
+                _optional_stats(facade, "_lighting", "get_animation_stats"),
+                lambda s: s is not None,
+            ),
+            # LED output dedup: writes sent vs skipped as already shown
+            ("led_output", get_led_output().stats, lambda s: True),
+            # BLE priority lane: preemptions and estop -> stop write latency
+            ("ble_lane", get_ble_lane().stats, lambda s: bool(s["priority_writes"])),
+            # Per-stage command latency histograms
+            ("trace", get_tracer().stats, lambda s: bool(s["completed"])),
+        ]
+
+        async def _telemetry_heartbeat():
+            # connected/estop are pushed by the facade and the safety
+            # controller; the aggregator publishes the snapshot on change
+            while True:
+                stats: dict[str, Any] = {}
+                for key, stats_fn, predicate in stats_sources:
+                    with contextlib.suppress(Exception):
+                        value = stats_fn()
+                        if predicate(value):
+                            stats[key] = value
+                telemetry.update(stats=stats)
                 await _asyncio.sleep(10.0)
 
         # start telemetry task in loop
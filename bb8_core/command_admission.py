@@ -0,0 +1,329 @@
+"""
+command_admission.py
+
+Admission control for inbound MQTT commands.
+
+Every command is charged to a per-class token bucket before its handler runs.
+What happens when a class is out of tokens depends on its policy:
+
+- ``latest`` (LED colour, drive/roll/heading/speed, drive_stream setpoints):
+  only the newest pending command is kept; an older one still waiting is
+  *merged* away and NACKed with ``superseded``. The survivor runs as soon as
+  a token is available.
+- ``fifo`` (LED presets, other commands): commands wait in order up to
+  ``cap``; beyond that they are *dropped* and NACKed with ``queue_full``.
+- ``never_drop`` (estop, stop, clear_estop): bypasses the bucket entirely.
+  An estop also discards pending motion and LED commands so nothing queued
+  before it runs after it (NACK ``preempted_by_estop``); a stop discards
+  pending motion and stream setpoints (NACK ``preempted_by_stop``), so a
+  drive deferred before it cannot restart the droid.
+
+A misbehaving automation publishing at 200 Hz therefore costs at most the
+class rate in handler runs, BLE writes and acks, instead of one task each.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import contextvars
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from . import command_trace
+from .logging_setup import logger
+
+Nack = Callable[[str, str], None]  # (reason, outcome)
+
+LATEST = "latest"
+FIFO = "fifo"
+NEVER_DROP = "never_drop"
+
+
+class ClassPolicy:
+    __slots__ = ("name", "mode", "rate", "burst", "cap")
+
+    def __init__(
+        self, name: str, mode: str, rate: float = 0.0, burst: float = 1.0, cap: int = 0
+    ) -> None:
+        self.name = name
+        self.mode = mode
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.cap = int(cap)
+
+
+DEFAULT_POLICIES = {
+    "estop": ClassPolicy("estop", NEVER_DROP),
+    "led": ClassPolicy("led", LATEST, rate=20.0, burst=4),
+    "motion": ClassPolicy("motion", LATEST, rate=20.0, burst=4),
+    # setpoints are coalesced by the stream itself; this only caps abuse
+    "stream": ClassPolicy("stream", LATEST, rate=100.0, burst=10),
+    "preset": ClassPolicy("preset", FIFO, rate=2.0, burst=2, cap=4),
+    "control": ClassPolicy("control", FIFO, rate=5.0, burst=5, cap=8),
+}
+
+COMMAND_CLASSES = {
+    "estop": "estop",
+    "stop": "estop",
+    "clear_estop": "estop",
+    "led": "led",
+    "drive": "motion",
+    "roll": "motion",
+    "heading": "motion",
+    "speed": "motion",
+    "drive_stream": "stream",
+    "led_preset": "preset",
+    "sequence": "preset",
+}
+
+# Pending work an estop or stop must not let through afterwards
+_PREEMPTS = {
+    "estop": (("motion", "stream", "led", "preset"), "preempted_by_estop"),
+    "stop": (("motion", "stream"), "preempted_by_stop"),
+}
+
+
+class _Pending:
+    __slots__ = ("cmd", "cid", "run", "nack", "ctx")
+
+    def __init__(self, cmd: str, cid: Any, run: Callable[[], Any], nack: Nack):
+        self.cmd = cmd
+        self.cid = cid
+        self.run = run
+        self.nack = nack
+        # the submitter's context (command trace) for the deferred run/NACK
+        self.ctx = contextvars.copy_context()
+
+
+class _ClassState:
+    def __init__(self, policy: ClassPolicy, now: float) -> None:
+        self.policy = policy
+        self.tokens = policy.burst
+        self.stamp = now
+        self.pending: collections.deque[_Pending] = collections.deque()
+        self.timer: Any = None
+        self.admitted = 0
+        self.deferred = 0
+        self.merged = 0
+        self.dropped = 0
+
+    def refill(self, now: float) -> None:
+        p = self.policy
+        self.tokens = min(p.burst, self.tokens + (now - self.stamp) * p.rate)
+        self.stamp = now
+
+    def take(self, now: float) -> bool:
+        self.refill(now)
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+    def wait_s(self) -> float:
+        rate = self.policy.rate
+        return (1.0 - self.tokens) / rate if rate > 0 else 1.0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "admitted": self.admitted,
+            "deferred": self.deferred,
+            "merged": self.merged,
+            "dropped": self.dropped,
+            "pending": len(self.pending),
+        }
+
+
+class CommandAdmission:
+    """Per-class token buckets in front of the command handlers."""
+
+    def __init__(
+        self,
+        policies: dict[str, ClassPolicy] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._clock = clock
+        self._lock = threading.Lock()
+        now = clock()
+        self._classes = {
+            name: _ClassState(p, now)
+            for name, p in (policies or DEFAULT_POLICIES).items()
+        }
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Loop that runs deferred commands (captured on first use otherwise)."""
+        self._loop = loop
+
+    def class_of(self, cmd: str) -> str:
+        name = COMMAND_CLASSES.get(cmd, "control")
+        return name if name in self._classes else "control"
+
+    def submit(self, cmd: str, cid: Any, run: Callable[[], Any], nack: Nack) -> str:
+        """Run ``run`` now, later or never; returns the admission outcome.
+
+        ``nack(reason, outcome)`` is called for every command that will not
+        run. Outcomes: admitted, deferred, merged (a newer command replaced
+        this one) and dropped.
+        """
+        state = self._classes.get(self.class_of(cmd))
+        if state is None:  # no policy at all: admit
+            run()
+            return "admitted"
+        if self._loop is None:
+            with contextlib.suppress(RuntimeError):
+                self._loop = asyncio.get_running_loop()
+        mode = state.policy.mode
+        reason = "queue_full"
+        rejected: list[tuple[_Pending, str, str]] = []
+        with self._lock:
+            if mode == NEVER_DROP:
+                state.admitted += 1
+                if cmd in _PREEMPTS:
+                    rejected = self._preempt_locked(*_PREEMPTS[cmd])
+                outcome = "admitted"
+            elif not state.pending and state.take(self._clock()):
+                state.admitted += 1
+                outcome = "admitted"
+            elif self._loop is None or self._loop.is_closed():
+                # No loop to run it later
+                state.dropped += 1
+                reason, outcome = "rate_limited", "dropped"
+            else:
+                item: _Pending | None = _Pending(cmd, cid, run, nack)
+                if mode == LATEST:
+                    while state.pending:
+                        state.merged += 1
+                        rejected.append(
+                            (state.pending.popleft(), "superseded", "merged")
+                        )
+                elif len(state.pending) >= state.policy.cap:
+                    state.dropped += 1
+                    item = None
+                if item is not None:
+                    state.pending.append(item)
+                    state.deferred += 1
+                    self._arm_locked(state)
+                    outcome = "deferred"
+                else:
+                    outcome = "dropped"
+        for pending, why, kind in rejected:
+            pending.ctx.run(
+                self._nack, pending.cmd, pending.cid, pending.nack, why, kind
+            )
+        if outcome == "admitted":
+            command_trace.mark("admit")
+            run()
+        elif outcome == "dropped":
+            self._nack(cmd, cid, nack, reason, "dropped")
+        return outcome
+
+    def _preempt_locked(
+        self, classes: tuple[str, ...], reason: str
+    ) -> list[tuple[_Pending, str, str]]:
+        rejected = []
+        for name in classes:
+            state = self._classes.get(name)
+            while state is not None and state.pending:
+                state.dropped += 1
+                rejected.append((state.pending.popleft(), reason, "dropped"))
+        return rejected
+
+    @staticmethod
+    def _nack(cmd: str, cid: Any, nack: Nack, reason: str, outcome: str) -> None:
+        # debug: a flood would otherwise log at the flood rate
+        logger.debug(
+            {
+                "event": "command_admission_rejected",
+                "cmd": cmd,
+                "cid": cid,
+                "reason": reason,
+                "outcome": outcome,
+            }
+        )
+        try:
+            nack(reason, outcome)
+        except Exception as e:  # noqa: BLE001
+            logger.warning({"event": "command_admission_nack_error", "error": repr(e)})
+
+    # ----------------------------------------------------------------- drain
+
+    def _arm_locked(self, state: _ClassState) -> None:
+        if state.timer is not None:
+            return
+        loop = self._loop
+        assert loop is not None
+        state.timer = True  # claimed; replaced by the handle on the loop
+        delay = state.wait_s()
+
+        def _schedule() -> None:
+            state.timer = loop.call_later(delay, self._drain, state)
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            _schedule()
+        else:
+            loop.call_soon_threadsafe(_schedule)
+
+    def _drain(self, state: _ClassState) -> None:
+        ready: list[_Pending] = []
+        with self._lock:
+            state.timer = None
+            now = self._clock()
+            while state.pending and state.take(now):
+                ready.append(state.pending.popleft())
+                state.admitted += 1
+            if state.pending:
+                self._arm_locked(state)
+        for item in ready:
+            try:
+                item.ctx.run(self._run_deferred, item.run)
+            except Exception as e:  # noqa: BLE001
+                logger.warning(
+                    {
+                        "event": "command_admission_run_error",
+                        "cmd": item.cmd,
+                        "error": repr(e),
+                    }
+                )
+
+    @staticmethod
+    def _run_deferred(run: Callable[[], Any]) -> None:
+        command_trace.mark("admit")
+        run()
+
+    # ----------------------------------------------------------------- stats
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            classes = {name: s.stats() for name, s in self._classes.items()}
+        totals: collections.Counter[str] = collections.Counter()
+        for counts in classes.values():
+            totals.update(counts)
+        keys = ("admitted", "deferred", "merged", "dropped")
+        return {**{k: totals[k] for k in keys}, "classes": classes}
+
+
+_ADMISSION: CommandAdmission | None = None
+
+
+def get_admission() -> CommandAdmission:
+    global _ADMISSION
+    if _ADMISSION is None:
+        _ADMISSION = CommandAdmission()
+    return _ADMISSION
+
+
+__all__ = [
+    "COMMAND_CLASSES",
+    "DEFAULT_POLICIES",
+    "ClassPolicy",
+    "CommandAdmission",
+    "get_admission",
+]
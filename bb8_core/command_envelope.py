@@ -0,0 +1,267 @@
+"""
+command_envelope.py
+
+Parse-once decoding of inbound MQTT command payloads.
+
+Every command handler used to decode the payload and call ``json.loads`` on
+its own, some twice on error paths, and logged invalid payloads with the full
+raw bytes. ``decode_command`` runs once per message and returns a slotted
+``CommandEnvelope`` (command, cid, args, receive timestamp) that the router
+hands to every matching handler. ``orjson`` is used when installed.
+
+Schema checks only look at key names and value types, so their outcome is
+cached per payload shape: repeated payloads of the same shape skip the
+validation walk entirely.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections.abc import Mapping
+from typing import Any
+
+from .logging_setup import logger
+from .mqtt_v5 import request_properties
+
+try:  # optional fast JSON backend
+    import orjson as _orjson  # type: ignore[import-not-found]
+except Exception:  # noqa: BLE001
+    _orjson = None
+
+JSON_BACKEND = "orjson" if _orjson is not None else "json"
+_PREVIEW_CHARS = 64
+_SHAPE_CACHE_LIMIT = 1024
+
+_NUMBER = (int, float, str)
+_ID = (str, int)
+
+# command -> (required keys, {key: accepted types})
+COMMAND_SCHEMAS: dict[str, tuple[frozenset[str], dict[str, tuple[type, ...]]]] = {
+    "led": (frozenset(), {"r": _NUMBER, "g": _NUMBER, "b": _NUMBER, "cid": _ID}),
+    "led_preset": (frozenset({"name"}), {"name": (str,), "cid": _ID}),
+    "estop": (frozenset(), {"reason": (str,), "cid": _ID}),
+    "clear_estop": (frozenset(), {"cid": _ID}),
+    "diag_gatt": (frozenset(), {"adapter": (str,), "cid": _ID}),
+    "drive": (
+        frozenset(),
+        {
+            "speed": _NUMBER,
+            "heading": _NUMBER,
+            "ms": _NUMBER + (type(None),),
+            "cid": _ID,
+        },
+    ),
+    "sequence": (frozenset({"steps"}), {"steps": (list,), "cid": _ID}),
+    "drive_stream": (
+        frozenset(),
+        {"speed": _NUMBER, "heading": _NUMBER, "v": _NUMBER, "h": _NUMBER, "cid": _ID},
+    ),
+}
+
+
+def _loads(data: bytes | str) -> Any:
+    if _orjson is not None:
+        return _orjson.loads(data)
+    if isinstance(data, bytes):
+        data = data.decode("utf-8")
+    return json.loads(data)
+
+
+class CommandEnvelope:
+    """One decoded command message; shared by every handler of a route."""
+
+    __slots__ = (
+        "command",
+        "topic",
+        "cid",
+        "args",
+        "received_at",
+        "raw",
+        "error",
+        "reply_to",
+        "correlation",
+        "expires_at",
+    )
+
+    def __init__(
+        self,
+        command: str,
+        topic: str,
+        cid: str | None,
+        args: dict[str, Any],
+        received_at: float,
+        raw: str,
+        error: str | None,
+    ) -> None:
+        self.command = command
+        self.topic = topic
+        self.cid = cid
+        self.args = args
+        self.received_at = received_at
+        self.raw = raw
+        self.error = error
+        # MQTT 5 request/response properties (None on 3.1.1)
+        self.reply_to: str | None = None
+        self.correlation: bytes | None = None
+        self.expires_at: float | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.args.get(key, default)
+
+    def preview(self) -> str:
+        """Bounded payload excerpt for logs (never the full raw bytes)."""
+        if len(self.raw) <= _PREVIEW_CHARS:
+            return self.raw
+        return self.raw[:_PREVIEW_CHARS] + f"...(+{len(self.raw) - _PREVIEW_CHARS})"
+
+    def __repr__(self) -> str:
+        return (
+            f"CommandEnvelope(command={self.command!r}, cid={self.cid!r}, "
+            f"args={self.args!r}, error={self.error!r})"
+        )
+
+
+_shape_lock = threading.Lock()
+_shape_errors: dict[tuple[Any, ...], str | None] = {}
+shape_cache_hits = 0
+shape_cache_misses = 0
+
+
+def _shape(command: str, args: Mapping[str, Any]) -> tuple[Any, ...]:
+    return (command, *sorted((k, type(v)) for k, v in args.items()))
+
+
+def _validate(command: str, args: Mapping[str, Any]) -> str | None:
+    schema = COMMAND_SCHEMAS.get(command)
+    if schema is None:
+        return None
+    required, types = schema
+    missing = required.difference(args)
+    if missing:
+        return f"missing field(s): {', '.join(sorted(missing))}"
+    for key, accepted in types.items():
+        if key in args and not isinstance(args[key], accepted):
+            return f"invalid type for '{key}': {type(args[key]).__name__}"
+    return None
+
+
+def validate_shape(command: str, args: Mapping[str, Any]) -> str | None:
+    """Schema error for ``args`` (or None), memoised per payload shape."""
+    global shape_cache_hits, shape_cache_misses
+    key = _shape(command, args)
+    with _shape_lock:
+        if key in _shape_errors:
+            shape_cache_hits += 1
+            return _shape_errors[key]
+    err = _validate(command, args)
+    with _shape_lock:
+        shape_cache_misses += 1
+        if len(_shape_errors) >= _SHAPE_CACHE_LIMIT:
+            _shape_errors.clear()
+        _shape_errors[key] = err
+    return err
+
+
+def decode_command(
+    topic: str,
+    payload: bytes | bytearray | str | None,
+    *,
+    command: str | None = None,
+    received_at: float | None = None,
+) -> CommandEnvelope:
+    """Decode a command payload once.
+
+    JSON objects become ``args``. A bare string payload (e.g. ``PRESS`` or
+    ``wake``) is kept as ``args == {}`` with ``raw`` set. Malformed JSON and
+    non-object JSON set ``error``; schema errors for known commands are
+    reported the same way.
+    """
+    ts = time.time() if received_at is None else received_at
+    cmd = command or (topic.rsplit("/", 1)[-1] if topic else "")
+    if isinstance(payload, bytearray):
+        payload = bytes(payload)
+    if isinstance(payload, bytes):
+        raw = payload.decode("utf-8", "ignore")
+    else:
+        raw = payload or ""
+    body = raw.strip()
+
+    args: dict[str, Any] = {}
+    error: str | None = None
+    if body[:1] in ("{", "[") or body in ("null", "true", "false"):
+        try:
+            obj = _loads(payload if isinstance(payload, bytes) else raw)
+        except Exception:  # noqa: BLE001
+            obj = None
+            error = "invalid_json"
+        if error is None:
+            if isinstance(obj, dict):
+                args = obj
+            else:
+                error = "not_an_object"
+    elif body:
+        # Numbers/quoted strings are valid JSON but not command objects
+        try:
+            _loads(body)
+            error = "not_an_object"
+        except Exception:  # noqa: BLE001
+            pass  # bare word command payload
+
+    if error is None:
+        error = validate_shape(cmd, args)
+
+    cid = args.get("cid")
+    env = CommandEnvelope(
+        cmd, topic, str(cid) if cid is not None else None, args, ts, raw, error
+    )
+    if error is not None:
+        logger.debug(
+            {
+                "event": "command_envelope_invalid",
+                "command": cmd,
+                "error": error,
+                "len": len(raw),
+                "preview": env.preview(),
+            }
+        )
+    return env
+
+
+def decode_message(msg: Any, command: str | None = None) -> CommandEnvelope:
+    """Decode a paho message into a ``CommandEnvelope``.
+
+    MQTT 5 response topic / correlation data / message expiry are carried
+    over; a request without a body ``cid`` uses its correlation data as cid.
+    """
+    env = decode_command(
+        getattr(msg, "topic", "") or "",
+        getattr(msg, "payload", None),
+        command=command,
+    )
+    if getattr(msg, "properties", None) is None:
+        return env
+    env.reply_to, env.correlation, expiry = request_properties(msg)
+    if expiry is not None:
+        env.expires_at = env.received_at + expiry
+    if env.cid is None and env.correlation:
+        try:
+            env.cid = env.correlation.decode("utf-8")
+        except UnicodeDecodeError:
+            env.cid = env.correlation.hex()
+    return env
+
+
+__all__ = [
+    "COMMAND_SCHEMAS",
+    "JSON_BACKEND",
+    "CommandEnvelope",
+    "decode_command",
+    "decode_message",
+    "validate_shape",
+]
@@ -0,0 +1,183 @@
+"""
+command_ingress.py
+
+Thread-safe hand-off of inbound commands to the asyncio loop.
+
+With ``mqtt_transport: thread`` paho calls ``on_message`` on its own network
+thread, where handlers cannot ``create_task`` or touch loop-owned state. The
+router therefore submits every dispatch through ``CommandIngress``:
+
+- on the bound loop (asyncio transport) the handler runs inline;
+- from any other thread it is appended to a bounded queue and the loop is
+  woken with one ``call_soon_threadsafe`` per batch, not per message;
+- priority items (estop, stop) go to their own lane, are drained first and
+  are never dropped; when the normal lane is full its oldest item is dropped,
+  counted and NACKed through the ``nack`` it was submitted with (reason
+  ``ingress_overflow``), like a command admission rejects.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from .logging_setup import logger
+from .util import percentile
+
+DEFAULT_MAXSIZE = 256
+_SAMPLES = 1024
+
+Nack = Callable[[str], None]  # (reason)
+_Item = tuple[Callable, tuple, float, Nack | None]
+
+
+class CommandIngress:
+    """Bounded multi-producer queue drained on one event loop."""
+
+    def __init__(
+        self,
+        maxsize: int = DEFAULT_MAXSIZE,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = max(1, int(maxsize))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._queue: collections.deque[_Item] = collections.deque()
+        self._priority: collections.deque[_Item] = collections.deque()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup_pending = False
+        self._lag: collections.deque[float] = collections.deque(maxlen=_SAMPLES)
+        self.direct = 0
+        self.queued = 0
+        self.dropped = 0
+        self.wakeups = 0
+        self.errors = 0
+        self.max_depth = 0
+        self._dropped_reported = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Loop that runs handlers submitted from other threads."""
+        self._loop = loop
+
+    def _target(self) -> asyncio.AbstractEventLoop | None:
+        """The bound loop if work has to hop onto it, else None (run inline)."""
+        loop = self._loop
+        if loop is None or loop.is_closed() or not loop.is_running():
+            return None
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        return None if running is loop else loop
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        priority: bool = False,
+        nack: Nack | None = None,
+    ) -> None:
+        """Run ``fn(*args)`` on the bound loop: inline there, queued elsewhere.
+
+        ``nack(reason)`` is called if the item is evicted before it runs.
+        """
+        loop = self._target()
+        if loop is None:
+            self.direct += 1
+            fn(*args)
+            return
+        evicted: _Item | None = None
+        with self._lock:
+            lane = self._priority if priority else self._queue
+            if not priority and len(lane) >= self.maxsize:
+                evicted = lane.popleft()
+                self.dropped += 1
+            lane.append((fn, args, self._clock(), nack))
+            self.queued += 1
+            depth = len(self._queue) + len(self._priority)
+            if depth > self.max_depth:
+                self.max_depth = depth
+            wake = not self._wakeup_pending
+            self._wakeup_pending = True
+        if evicted is not None and evicted[3] is not None:
+            self._nack(evicted[3])
+        if wake:
+            self.wakeups += 1
+            try:
+                loop.call_soon_threadsafe(self._drain)
+            except RuntimeError:  # loop closed under us
+                self._drain()
+
+    def _nack(self, nack: Nack) -> None:
+        try:
+            nack("ingress_overflow")
+        except Exception as e:  # noqa: BLE001
+            logger.warning({"event": "command_ingress_nack_error", "error": repr(e)})
+
+    def _drain(self) -> None:
+        with self._lock:
+            self._wakeup_pending = False
+            batch = list(self._priority)
+            batch.extend(self._queue)
+            self._priority.clear()
+            self._queue.clear()
+            dropped = self.dropped - self._dropped_reported
+            self._dropped_reported = self.dropped
+        if dropped:
+            logger.warning(
+                {
+                    "event": "command_ingress_overflow",
+                    "dropped": dropped,
+                    "maxsize": self.maxsize,
+                }
+            )
+        now = self._clock()
+        for fn, args, enqueued, _nack in batch:
+            self._lag.append((now - enqueued) * 1000.0)
+            try:
+                fn(*args)
+            except Exception as e:  # noqa: BLE001
+                self.errors += 1
+                logger.warning(
+                    {
+                        "event": "command_ingress_handler_error",
+                        "handler": getattr(fn, "__qualname__", repr(fn)),
+                        "error": repr(e),
+                    }
+                )
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            depth = len(self._queue) + len(self._priority)
+            lag = sorted(self._lag)
+        return {
+            "direct": self.direct,
+            "queued": self.queued,
+            "dropped": self.dropped,
+            "wakeups": self.wakeups,
+            "errors": self.errors,
+            "depth": depth,
+            "max_depth": self.max_depth,
+            "lag_ms": {
+                "p50": percentile(lag, 0.50),
+                "p99": percentile(lag, 0.99),
+                "max": round(lag[-1], 3) if lag else None,
+            },
+        }
+
+
+_INGRESS: CommandIngress | None = None
+
+
+def get_ingress() -> CommandIngress:
+    global _INGRESS
+    if _INGRESS is None:
+        _INGRESS = CommandIngress()
+    return _INGRESS
+
+
+__all__ = ["DEFAULT_MAXSIZE", "CommandIngress", "get_ingress"]
@@ -0,0 +1,289 @@
+"""
+command_trace.py
+
+Span tracing for inbound commands, from MQTT receipt to the ack.
+
+The router opens a trace for every command (keyed by its ``cid``, or a
+generated ``t<n>`` id) and makes it current in a ``ContextVar``. asyncio
+copies the context into every task and callback created from the handler,
+so later stages just call ``mark(stage)`` without threading the trace
+through:
+
+    receive     paho read the PUBLISH (``MQTTMessage.timestamp``)
+    parse       envelope decoded, handler about to run
+    admit       admission control let the command through
+    safety      estop/holdoff/rate gates passed
+    cancel      running LED animation cancelled
+    ble_submit  BLE write started (``BleSession._execute_with_retry``)
+    ble_done    BLE write finished (after retries)
+    ack         ack/NACK published
+
+A trace completes when it has both its ack and (if it touched BLE) its
+``ble_done``; commands acked early or without BLE work complete after
+``_OPEN_TTL_S``. Each completed trace feeds per-stage histograms (time since
+the previous stage) and, for a ``sample`` fraction of traces, one JSONL line
+in ``path``.
+
+Disabled (``command_trace: false``) the router never opens traces and every
+``mark`` is a ContextVar lookup returning None.
+"""
+
+from __future__ import annotations
+
+import collections
+import contextvars
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from .logging_setup import logger
+from .util import percentile
+
+STAGES = (
+    "receive",
+    "parse",
+    "admit",
+    "safety",
+    "cancel",
+    "ble_submit",
+    "ble_done",
+    "ack",
+)
+
+DEFAULT_TRACE_FILE = "/data/command_traces.jsonl"
+_OPEN_TTL_S = 5.0
+_OPEN_LIMIT = 256
+_SAMPLES = 1024
+
+
+class Trace:
+    __slots__ = ("id", "cmd", "marks", "sampled", "done", "acked", "ble_done")
+
+    def __init__(self, trace_id: str, cmd: str, sampled: bool) -> None:
+        self.id = trace_id
+        self.cmd = cmd
+        self.marks: list[tuple[str, float]] = []
+        self.sampled = sampled
+        self.done = False
+        self.acked = False
+        self.ble_done = False
+
+
+_CURRENT: contextvars.ContextVar[Trace | None] = contextvars.ContextVar(
+    "bb8_command_trace", default=None
+)
+
+
+class CommandTracer:
+    """Opens, completes and aggregates command traces."""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        sample: float = 0.0,
+        path: str | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.enabled = enabled
+        self.sample = max(0.0, min(1.0, float(sample)))
+        self.path = path or DEFAULT_TRACE_FILE
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._open: collections.OrderedDict[int, tuple[float, Trace]] = (
+            collections.OrderedDict()
+        )
+        self._hist: dict[str, collections.deque[float]] = {
+            s: collections.deque(maxlen=_SAMPLES) for s in (*STAGES, "total")
+        }
+        self._file: Any = None
+        self.completed = 0
+        self.expired = 0
+        self.written = 0
+
+    # --------------------------------------------------------------- tracing
+
+    def begin(self, cid: Any, topic: str, received_at: float = 0.0) -> Trace | None:
+        if not self.enabled:
+            return None
+        now = self._clock()
+        trace_id = str(cid) if cid is not None else f"t{next(self._ids)}"
+        sampled = self.sample > 0 and random.random() < self.sample
+        trace = Trace(trace_id, topic.rsplit("/", 1)[-1], sampled)
+        # paho stamps messages with time.monotonic(); 0 means unknown
+        if 0 < received_at <= now:
+            trace.marks.append(("receive", received_at))
+        else:
+            trace.marks.append(("receive", now))
+        trace.marks.append(("parse", now))
+        with self._lock:
+            self._open[id(trace)] = (now, trace)
+            self._expire_locked(now)
+        return trace
+
+    def mark(self, trace: Trace, stage: str) -> None:
+        if trace.done:
+            return
+        trace.marks.append((stage, self._clock()))
+        # early acks wait for the BLE work they announced
+        if stage == "ack":
+            trace.acked = True
+            if trace.ble_done:
+                self._complete(trace)
+        elif stage == "ble_done":
+            trace.ble_done = True
+            if trace.acked:
+                self._complete(trace)
+
+    def _complete(self, trace: Trace) -> None:
+        trace.done = True
+        with self._lock:
+            self._open.pop(id(trace), None)
+            self._record_locked(trace)
+
+    def _expire_locked(self, now: float) -> None:
+        while self._open:
+            opened, trace = next(iter(self._open.values()))
+            if now - opened < _OPEN_TTL_S and len(self._open) <= _OPEN_LIMIT:
+                break
+            self._open.popitem(last=False)
+            trace.done = True
+            self.expired += 1
+            self._record_locked(trace)
+
+    def _record_locked(self, trace: Trace) -> None:
+        self.completed += 1
+        marks = trace.marks
+        start, prev = marks[0][1], marks[0][1]
+        for stage, t in marks[1:]:
+            hist = self._hist.get(stage)
+            if hist is None:
+                hist = self._hist[stage] = collections.deque(maxlen=_SAMPLES)
+            hist.append((t - prev) * 1000.0)
+            prev = t
+        self._hist["total"].append((prev - start) * 1000.0)
+        if trace.sampled:
+            self._write_locked(trace)
+
+    def _write_locked(self, trace: Trace) -> None:
+        start = trace.marks[0][1]
+        line = json.dumps(
+            {
+                "id": trace.id,
+                "cmd": trace.cmd,
+                "ts": round(time.time(), 3),
+                "stages": [[s, round((t - start) * 1000.0, 3)] for s, t in trace.marks],
+            },
+            separators=(",", ":"),
+        )
+        try:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)  # noqa: SIM115
+            self._file.write(line + "\n")
+            self.written += 1
+        except OSError as e:
+            self.sample = 0.0  # don't retry on every command
+            logger.warning(
+                {
+                    "event": "command_trace_write_failed",
+                    "path": self.path,
+                    "error": repr(e),
+                }
+            )
+
+    # ----------------------------------------------------------------- stats
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            self._expire_locked(self._clock())
+            hist = {k: sorted(v) for k, v in self._hist.items() if v}
+            open_traces = len(self._open)
+        return {
+            "completed": self.completed,
+            "expired": self.expired,
+            "open": open_traces,
+            "written": self.written,
+            "stages_ms": {
+                stage: {
+                    "n": len(samples),
+                    "p50": percentile(samples, 0.50),
+                    "p95": percentile(samples, 0.95),
+                    "p99": percentile(samples, 0.99),
+                    "max": round(samples[-1], 3),
+                }
+                for stage, samples in hist.items()
+            },
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def activate(trace: Trace | None) -> contextvars.Token | None:
+    """Make ``trace`` current for the running handler (and what it spawns)."""
+    return _CURRENT.set(trace) if trace is not None else None
+
+
+def deactivate(token: contextvars.Token | None) -> None:
+    if token is not None:
+        _CURRENT.reset(token)
+
+
+def current() -> Trace | None:
+    return _CURRENT.get()
+
+
+def mark(stage: str) -> None:
+    """Record ``stage`` on the current command's trace, if there is one."""
+    trace = _CURRENT.get()
+    if trace is not None:
+        get_tracer().mark(trace, stage)
+
+
+_TRACER: CommandTracer | None = None
+
+
+def get_tracer() -> CommandTracer:
+    """ENV BB8_TRACE / BB8_TRACE_SAMPLE / BB8_TRACE_FILE > config > defaults."""
+    global _TRACER
+    if _TRACER is None:
+        try:
+            from .addon_config import load_config
+
+            cfg, _src = load_config()
+        except Exception:  # noqa: BLE001
+            cfg = {}
+        enabled = str(
+            os.environ.get("BB8_TRACE", cfg.get("command_trace", True))
+        ).strip().lower() not in ("0", "false", "no", "off")
+        try:
+            sample = float(
+                os.environ.get("BB8_TRACE_SAMPLE")
+                or cfg.get("command_trace_sample")
+                or 0.0
+            )
+        except (TypeError, ValueError):
+            sample = 0.0
+        path = os.environ.get("BB8_TRACE_FILE") or cfg.get("command_trace_file")
+        _TRACER = CommandTracer(enabled=enabled, sample=sample, path=path)
+    return _TRACER
+
+
+__all__ = [
+    "STAGES",
+    "CommandTracer",
+    "Trace",
+    "activate",
+    "current",
+    "deactivate",
+    "get_tracer",
+    "mark",
+]
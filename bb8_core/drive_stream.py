@@ -0,0 +1,265 @@
+"""
+drive_stream.py
+
+Continuous drive mode for joysticks and gamepad automations.
+
+Discrete ``bb8/cmd/drive`` commands go through ``gate_drive``, so a 30 Hz
+controller has most of its commands rejected by ``min_drive_interval_ms``
+and every accepted one re-arms the auto-stop. ``bb8/cmd/drive_stream``
+setpoints instead overwrite a single target (speed, heading). A fixed-rate
+control loop on the shared timer wheel sends only the latest target to
+``BleSession.roll``, with at most one roll in flight. Setpoints that arrive
+between two ticks are coalesced, not queued.
+
+A dead-man timer is pushed back by every setpoint. When setpoints stop
+arriving for ``drive_stream_deadman_ms`` the stream halts and the droid is
+stopped. Each roll also carries the dead-man window as its duration, so the
+droid stops on its own if the bridge goes silent. Speed caps apply to every
+setpoint; estop rejects setpoints and halts the loop on its next tick at the
+latest.
+"""
+
+from __future__ import annotations
+
+import collections
+import inspect
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from .logging_setup import logger
+from .safety import MotionSafetyController, SafetyViolation
+from .timer_wheel import TimerHandle, TimerWheel, get_timer_wheel
+from .util import percentile
+
+_SAMPLES = 512
+
+Roll = Callable[[int, int, int | None], Awaitable[Any]]
+Stop = Callable[[], Awaitable[Any]]
+
+
+class DriveStream:
+    """Latest-setpoint drive loop with a dead-man stop."""
+
+    def __init__(
+        self,
+        roll: Roll,
+        stop: Stop,
+        safety: MotionSafetyController,
+        *,
+        wheel: TimerWheel | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        cfg = safety.config
+        self._roll = roll
+        self._stop = stop
+        self._safety = safety
+        self._wheel = wheel
+        self._clock = clock
+        # never faster than discrete drives may be sent
+        self.period_s = max(
+            1.0 / max(0.1, float(cfg.drive_stream_hz)),
+            cfg.min_drive_interval_ms / 1000.0,
+        )
+        self.deadman_ms = min(
+            int(cfg.drive_stream_deadman_ms), cfg.max_drive_duration_ms
+        )
+        # keep the device-side duration topped up while the target is steady
+        self._refresh_s = self.deadman_ms / 2000.0
+
+        self._timer: TimerHandle | None = None
+        self._deadman: TimerHandle | None = None
+        self._target: tuple[int, int] | None = None
+        self._target_at = 0.0
+        self._dirty = False
+        self._busy = False
+        self._sending: Any = None
+        self._last_sent_at = 0.0
+        self._next_tick = 0.0
+        self._jitter: collections.deque[float] = collections.deque(maxlen=_SAMPLES)
+        self._latency: collections.deque[float] = collections.deque(maxlen=_SAMPLES)
+
+        self.streams = 0
+        self.setpoints = 0
+        self.coalesced = 0
+        self.clamped = 0
+        self.rolls = 0
+        self.refreshes = 0
+        self.busy_skips = 0
+        self.missed_ticks = 0
+        self.deadman_stops = 0
+        self.halts: dict[str, int] = {}
+        self.errors = 0
+
+    @property
+    def active(self) -> bool:
+        return self._timer is not None
+
+    def submit(
+        self, speed: Any, heading: Any, received_at: float | None = None
+    ) -> tuple[bool, str | None]:
+        """Replace the target setpoint; starts the loop if idle.
+
+        Returns ``(accepted, reason)``; a rejected setpoint leaves a running
+        stream untouched.
+        """
+        try:
+            self._safety.gate_stream(charge=False)
+        except SafetyViolation as e:
+            return False, str(e)
+        try:
+            speed, heading = int(speed), int(heading)
+        except (TypeError, ValueError):
+            return False, "Invalid payload for drive_stream"
+        capped = max(0, min(self._safety.config.max_drive_speed, speed))
+        if capped != speed:
+            self.clamped += 1
+        now = self._clock()
+        if self._dirty:
+            self.coalesced += 1
+        self._target = (capped, heading % 360)
+        self._target_at = received_at if received_at is not None else now
+        self._dirty = True
+        self.setpoints += 1
+
+        wheel = self._wheel or get_timer_wheel()
+        if self._deadman is None:
+            self._deadman = wheel.call_later(
+                self.deadman_ms / 1000.0, self._on_deadman, name="drive_stream_deadman"
+            )
+        else:
+            self._deadman.reschedule(self.deadman_ms / 1000.0)
+        if self._timer is None:
+            self.streams += 1
+            self._next_tick = now
+            self._timer = wheel.call_every(
+                self.period_s, self._tick, name="drive_stream", first=0.0
+            )
+            logger.info(
+                {
+                    "event": "drive_stream_started",
+                    "rate_hz": round(1.0 / self.period_s, 2),
+                    "deadman_ms": self.deadman_ms,
+                }
+            )
+        return True, None
+
+    def halt(self, reason: str) -> bool:
+        """Stop the control loop (the caller decides whether to stop the droid)."""
+        if self._timer is None:
+            return False
+        self._timer.cancel()
+        self._timer = None
+        if self._deadman is not None:
+            self._deadman.cancel()
+            self._deadman = None
+        self._target = None
+        self._dirty = False
+        self.halts[reason] = self.halts.get(reason, 0) + 1
+        logger.info({"event": "drive_stream_halted", "reason": reason})
+        return True
+
+    # ------------------------------------------------------------- loop
+
+    def _tick(self) -> Awaitable[Any] | None:
+        now = self._clock()
+        self._jitter.append((now - self._next_tick) * 1000.0)
+        self._next_tick += self.period_s
+        while self._next_tick <= now:
+            self._next_tick += self.period_s
+            self.missed_ticks += 1
+
+        try:
+            self._safety.gate_stream(charge=False)
+        except SafetyViolation as e:
+            self.halt(e.constraint)
+            return None
+        if self._target is None:
+            return None
+        if self._busy and self._dropped():
+            # The wheel had no loop and closed the send before it ran, so its
+            # finally never cleared the flag
+            self._busy = False
+        if self._busy:
+            self.busy_skips += 1
+            return None
+        if not self._dirty:
+            if now - self._last_sent_at < self._refresh_s:
+                return None
+            self.refreshes += 1
+        speed, heading = self._target
+        received_at = self._target_at if self._dirty else None
+        self._dirty = False
+        self._busy = True
+        self._last_sent_at = now
+        self._safety.charge_drive()
+        self._sending = self._send(speed, heading, received_at)
+        return self._sending
+
+    def _dropped(self) -> bool:
+        sending = self._sending
+        return (
+            inspect.iscoroutine(sending)
+            and inspect.getcoroutinestate(sending) == inspect.CORO_CLOSED
+        )
+
+    async def _send(self, speed: int, heading: int, received_at: float | None) -> None:
+        try:
+            await self._roll(speed, heading, self.deadman_ms)
+            self.rolls += 1
+            if received_at is not None:
+                self._latency.append((self._clock() - received_at) * 1000.0)
+        except Exception as e:  # noqa: BLE001
+            self.errors += 1
+            logger.warning(
+                {
+                    "event": "drive_stream_roll_error",
+                    "speed": speed,
+                    "heading": heading,
+                    "error": str(e),
+                }
+            )
+        finally:
+            self._busy = False
+            self._sending = None
+
+    def _on_deadman(self) -> Awaitable[Any] | None:
+        self._deadman = None
+        if not self.halt("deadman"):
+            return None
+        self.deadman_stops += 1
+        logger.warning({"event": "drive_stream_deadman", "deadman_ms": self.deadman_ms})
+        return self._stop()
+
+    def stats(self) -> dict[str, Any]:
+        jitter = sorted(abs(j) for j in self._jitter)
+        latency = sorted(self._latency)
+        return {
+            "active": self.active,
+            "rate_hz": round(1.0 / self.period_s, 2),
+            "deadman_ms": self.deadman_ms,
+            "streams": self.streams,
+            "setpoints": self.setpoints,
+            "coalesced": self.coalesced,
+            "clamped": self.clamped,
+            "rolls": self.rolls,
+            "refreshes": self.refreshes,
+            "busy_skips": self.busy_skips,
+            "missed_ticks": self.missed_ticks,
+            "deadman_stops": self.deadman_stops,
+            "halts": dict(self.halts),
+            "errors": self.errors,
+            "jitter_ms": {
+                "p50": percentile(jitter, 0.50),
+                "p99": percentile(jitter, 0.99),
+                "max": round(jitter[-1], 3) if jitter else None,
+            },
+            "setpoint_to_roll_ms": {
+                "p50": percentile(latency, 0.50),
+                "p99": percentile(latency, 0.99),
+                "max": round(latency[-1], 3) if latency else None,
+            },
+        }
+
+
+__all__ = ["DriveStream"]
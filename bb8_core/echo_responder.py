@@ -145,23 +145,18 @@ def _write_atomic(path: str, content: str) -> None:
 
 
 def _start_heartbeat(path: str, interval: int) -> None:
+    from .timer_wheel import get_timer_wheel
+
     interval = 2 if interval < 2 else interval  # lower bound
 
     def _hb():
-        # write immediately, then tick
         try:
             _write_atomic(path, f"{time.time()}\n")
         except Exception as e:
-            LOG.debug("heartbeat initial write failed: %s", e)
-        while True:
-            try:
-                _write_atomic(path, f"{time.time()}\n")
-            except Exception as e:
-                LOG.debug("heartbeat write failed: %s", e)
-            time.sleep(interval)
+            LOG.debug("heartbeat write failed: %s", e)
 
-    t = threading.Thread(target=_hb, daemon=True)
-    t.start()
+    # write immediately, then tick on the shared timer wheel
+    get_timer_wheel().call_every(interval, _hb, name=f"heartbeat:{path}", first=0.0)
 
 
 ENABLE_HEALTH_CHECKS = _env_truthy(os.environ.get("ENABLE_HEALTH_CHECKS", "0"))
@@ -210,22 +205,6 @@ atexit.register(_flush_logs_echo)
 
 # DIAG-BEGIN HEALTH-ECHO
 ENABLE_HEALTH_CHECKS = bool(int(os.environ.get("ENABLE_HEALTH_CHECKS", "0")))
-
-
-def _heartbeat_echo():
-    while True:
-        try:
-            with open("/tmp/bb8_heartbeat_echo", "w") as f:
-                f.write(f"{time.time()}\n")
-        except Exception:
-            # Don't crash the process if /tmp is unavailable; just retry next tick
-            pass
-        time.sleep(5)
-
-
-if ENABLE_HEALTH_CHECKS:
-    LOG.info("echo_responder.py health check enabled: /tmp/bb8_heartbeat_echo")
-    threading.Thread(target=_heartbeat_echo, daemon=True).start()
 # DIAG-END HEALTH-ECHO
 
 MQTT_BASE = os.environ.get("MQTT_BASE") or os.environ.get("MQTT_NAMESPACE") or "bb8"
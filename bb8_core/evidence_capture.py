@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import contextlib
 import json
 import os
 import queue
@@ -8,6 +7,8 @@ import threading
 import time
 from typing import Any
 
+from .mqtt_router import router_for
+
 
 class EvidenceRecorder:
     """
@@ -53,8 +54,6 @@ class EvidenceRecorder:
     def _install_callbacks(self):
         cmd_topic = f"{self.topic_prefix}/cmd/#"
         state_topic = f"{self.topic_prefix}/state/#"
-        self.client.subscribe(cmd_topic, qos=1)  # pragma: no cover
-        self.client.subscribe(state_topic, qos=1)  # pragma: no cover
 
         def on_message(client, userdata, msg):
             now = time.time()
@@ -65,16 +64,12 @@ class EvidenceRecorder:
             evt = {"ts": now, "topic": msg.topic, "payload": payload}
             (self._cmd_q if "/cmd/" in msg.topic else self._evt_q).put(evt)
 
-        old = getattr(self.client, "on_message", None)
-
-        def chained(client, userdata, msg):
-            if callable(old):
-                with contextlib.suppress(Exception):
-                    old(client, userdata, msg)
-            on_message(client, userdata, msg)
-            on_message(client, userdata, msg)
-
-        self.client.on_message = chained  # pragma: no cover
+        # Observe through the client's router instead of replacing on_message,
+        # so the command handlers (and their fallback) keep running untouched
+        router = router_for(self.client)
+        with router.batch():
+            router.tap(cmd_topic, on_message, 1, name="evidence/cmd")
+            router.tap(state_topic, on_message, 1, name="evidence/state")
 
     def _runner(self):
         lines = 0
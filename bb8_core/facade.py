@@ -8,22 +8,35 @@ Provides event-loop safety and proper async task management.
 from __future__ import annotations
 
 import asyncio
+import contextlib
 import json
 import logging
 import os
 import sys
-import threading
 import time
 from collections.abc import Callable
 from typing import Any
 
+from . import command_trace
 from .addon_config import load_config
 from .bb8_presence_scanner import publish_discovery
+from .ble_lane import DEFAULT_TARGET_MS, get_ble_lane
 from .ble_session import BleSession, BleSessionError
+from .command_admission import get_admission
+from .command_ingress import get_ingress
 from .common import STATE_TOPICS
-from .lighting import get_lighting_controller
+from .drive_stream import DriveStream
+from .led_output import DEFAULT_DELTA_E, get_led_output
+from .lighting import STATIC_PRESETS, get_lighting_controller
 from .logging_setup import logger
+from .mqtt_router import router_for
+from .mqtt_v5 import publish_ack
+from .readiness import DEFAULT_MAX_AGE_S, DEFAULT_PROBE_INTERVAL_S, ReadinessGate
+from .retained_cache import publish_retained
 from .safety import SafetyViolation, get_safety_controller
+from .sequence import Sequence, SequenceError, Step, parse_sequence
+from .telemetry import get_telemetry_aggregator
+from .timer_wheel import TimerHandle, get_timer_wheel
 
 
 def _sleep_led_pattern():
@@ -83,17 +96,35 @@ class BB8Facade:
 
         # Task management
         self._tasks: set[asyncio.Task] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
         self._shutdown_event = asyncio.Event()
 
         # Safety, lighting, and telemetry
         self._safety = get_safety_controller()
         self._lighting = get_lighting_controller()
-        self._telemetry_task: asyncio.Task | None = None
+        self._telemetry = get_telemetry_aggregator()
+        self._telemetry_timer: TimerHandle | None = None
+        self._telemetry_ticks = 0
         self._last_cmd_timestamp: float = 0.0
+        self._drive_stream: DriveStream | None = None
+        self._sequence: Sequence | None = None
 
         cfg, _ = load_config()
         self._post_connect_delay_s = self._read_post_connect_delay_s(cfg)
-        self._commands_ready_at_monotonic: float = 0.0
+        self._readiness = ReadinessGate(
+            self._post_connect_delay_s,
+            probe_interval_s=self._read_float(
+                cfg, "readiness_probe_interval_s", DEFAULT_PROBE_INTERVAL_S
+            ),
+            max_age_s=self._read_float(cfg, "readiness_max_age_s", DEFAULT_MAX_AGE_S),
+        )
+        get_ble_lane().target_ms = self._read_float(
+            cfg, "estop_stop_target_ms", DEFAULT_TARGET_MS
+        )
+        get_led_output().delta_e = self._read_float(
+            cfg, "led_dedup_delta_e", DEFAULT_DELTA_E
+        )
+        self._lighting.load_presets(cfg.get("led_presets"))
 
     @staticmethod
     def _read_post_connect_delay_s(cfg: dict[str, Any]) -> int:
@@ -104,19 +135,32 @@ class BB8Facade:
             return 15
         return max(0, delay)
 
+    @staticmethod
+    def _read_float(cfg: dict[str, Any], key: str, default: float) -> float:
+        try:
+            return max(0.0, float(cfg.get(key, default)))
+        except (TypeError, ValueError):
+            return default
+
     def mark_post_connect_holdoff(self, now_monotonic: float | None = None) -> None:
-        """Start holdoff window after a successful BLE connect."""
-        now = time.monotonic() if now_monotonic is None else float(now_monotonic)
-        self._commands_ready_at_monotonic = now + float(self._post_connect_delay_s)
+        """Start holdoff window after a successful BLE connect.
+
+        Commands are held until a readiness probe (a battery read) succeeds
+        or ``post_connect_delay_s`` runs out, whichever comes first.
+        """
+        self._readiness.begin(self._readiness_probe, now_monotonic)
+
+    async def _readiness_probe(self) -> None:
+        session = self._ble_session
+        if session is None or not session.is_connected():
+            raise RuntimeError("not connected")
+        await session.battery()
 
     def get_post_connect_holdoff_remaining_s(
         self, now_monotonic: float | None = None
     ) -> int:
         """Return remaining holdoff seconds for command readiness."""
-        if self._commands_ready_at_monotonic <= 0:
-            return 0
-        now = time.monotonic() if now_monotonic is None else float(now_monotonic)
-        remaining = self._commands_ready_at_monotonic - now
+        remaining = self._readiness.remaining_s(now_monotonic)
         if remaining <= 0:
             return 0
         return int(remaining) if remaining.is_integer() else int(remaining) + 1
@@ -127,6 +171,14 @@ class BB8Facade:
             self._ble_session = BleSession(self._target_mac)
         return self._ble_session
 
+    def _get_drive_stream(self) -> DriveStream:
+        """Get or create the streaming drive loop (bound to the safety layer)."""
+        if self._drive_stream is None:
+            self._drive_stream = DriveStream(
+                self._stream_roll, self._stop_impl, self._safety
+            )
+        return self._drive_stream
+
     def set_target_mac(self, mac: str) -> None:
         """Set target MAC address for BLE connection."""
         self._target_mac = mac
@@ -137,6 +189,8 @@ class BB8Facade:
         """Use an externally managed BLE session for facade and lighting commands."""
         self._ble_session = session
         self._lighting.set_ble_session(session)
+        # connected follows the session: push it now
+        self._publish_telemetry_update()
 
         target_mac = getattr(session, "_target_mac", None)
         if isinstance(target_mac, str) and target_mac:
@@ -181,11 +235,28 @@ class BB8Facade:
                 raise
 
     def _schedule_task(self, coro) -> None:
-        """Schedule async task safely."""
-        if asyncio.iscoroutine(coro):
-            task = asyncio.create_task(coro)
-            self._tasks.add(task)
-            task.add_done_callback(self._tasks.discard)
+        """Schedule async task safely.
+
+        MQTT handlers run on the event loop with the asyncio transport; with
+        paho's network thread they are handed to the loop captured in
+        ``attach_mqtt``. Raises ``RuntimeError`` when there is no loop at
+        all, so callers reject the command instead of dropping it silently.
+        """
+        if not asyncio.iscoroutine(coro):
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            loop = getattr(self, "_loop", None)
+            if loop is None or loop.is_closed():
+                coro.close()
+                logger.warning({"event": "facade_task_dropped_no_loop"})
+                raise
+            loop.call_soon_threadsafe(self._schedule_task, coro)
+            return
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
 
     # --------- High-level actions (validate → delegate to session) ---------
 
@@ -274,6 +345,8 @@ class BB8Facade:
 
     def stop(self) -> None:
         """Stop the BB-8 device."""
+        if self._sequence is not None:
+            self._sequence.cancel("stop")
         try:
             self._schedule_task(self._stop_impl())
         except Exception as e:
@@ -282,6 +355,8 @@ class BB8Facade:
 
     async def _stop_impl(self) -> None:
         """Internal stop implementation."""
+        if self._drive_stream is not None:
+            self._drive_stream.halt("stop")
         try:
             session = self._get_or_create_session()
             if not session.is_connected():
@@ -331,33 +406,45 @@ class BB8Facade:
     async def set_led_async(
         self, r: int, g: int, b: int, cid: str | None = None
     ) -> bool:
-        """Async LED control with validation and ACK/NACK."""
+        """Async LED control with validation and ACK/NACK.
+
+        During the post-connect holdoff the command is held (latest LED
+        command wins) and applied once the droid is ready.
+        """
+        if self._readiness.holding:
+            applied = await self._readiness.defer(
+                "led",
+                lambda: self._apply_led(r, g, b, cid),
+                cid=cid,
+                on_drop=lambda reason: self._reject_held("led", cid, reason),
+            )
+            return applied is True
+        return await self._apply_led(r, g, b, cid)
+
+    def _reject_held(self, cmd: str, cid: str | None, reason: str) -> None:
+        """NACK a command the readiness gate dropped instead of running."""
+        remaining_s = self.get_post_connect_holdoff_remaining_s()
+        self._publish_ack(
+            cmd,
+            False,
+            cid,
+            "post_connect_holdoff",
+            extra={"dropped": reason, "remaining_s": remaining_s},
+        )
+        self._publish_rejected(
+            cmd,
+            "post_connect_holdoff",
+            remaining_s=remaining_s,
+            extra={"dropped": reason},
+        )
+
+    async def _apply_led(self, r: int, g: int, b: int, cid: str | None) -> bool:
         try:
-            remaining_s = self.get_post_connect_holdoff_remaining_s()
-            if remaining_s > 0:
-                self._publish_ack(
-                    "led",
-                    False,
-                    cid,
-                    "post_connect_holdoff",
-                    extra={"remaining_s": remaining_s},
-                )
-                self._publish_rejected(
-                    "led",
-                    "post_connect_holdoff",
-                    remaining_s=remaining_s,
-                )
-                logger.info(
-                    {
-                        "event": "facade_led_deferred_post_connect",
-                        "remaining_s": remaining_s,
-                        "cid": cid,
-                    }
-                )
-                return False
+            command_trace.mark("safety")
 
             # Always cancel any active animation first (idempotent)
             await self._lighting.cancel_active()
+            command_trace.mark("cancel")
 
             # Validate and clamp RGB values
             r, g, b = self._lighting.clamp_rgb(r, g, b)
@@ -413,7 +500,21 @@ class BB8Facade:
             return False
 
     async def set_led_preset(self, preset_name: str, cid: str | None = None) -> None:
-        """Run LED preset animation with estop checking."""
+        """Run LED preset animation with estop checking.
+
+        Held like ``set_led_async`` during the post-connect holdoff.
+        """
+        if self._readiness.holding:
+            await self._readiness.defer(
+                "led",
+                lambda: self._apply_led_preset(preset_name, cid),
+                cid=cid,
+                on_drop=lambda reason: self._reject_held("led_preset", cid, reason),
+            )
+            return
+        await self._apply_led_preset(preset_name, cid)
+
+    async def _apply_led_preset(self, preset_name: str, cid: str | None) -> None:
         try:
             # Always cancel any active animation first (idempotent)
             await self._lighting.cancel_active()
@@ -421,7 +522,7 @@ class BB8Facade:
             # Check if estop is active
             if self._safety.estop_latched:
                 # Only allow static presets during estop
-                if preset_name in ["off", "white"]:
+                if preset_name in STATIC_PRESETS:
                     # Convert to static color
                     if preset_name == "off":
                         await self._lighting.set_static(0, 0, 0)
@@ -552,8 +653,15 @@ class BB8Facade:
                 self._safety.normalize_drive(speed, heading, duration_ms)
             )
 
-            # Gate the actual execution (timing and safety checks)
-            self._safety.gate_drive()
+            # Gate the actual execution (timing and safety checks); a heading
+            # change at speed 0 is a turn, limited apart from drives
+            motion = "turn" if validated_speed == 0 else "drive"
+            self._safety.gate_drive(motion=motion)
+            command_trace.mark("safety")
+
+            # A discrete drive takes over from a running stream
+            if self._drive_stream is not None:
+                self._drive_stream.halt("drive")
 
             self._last_cmd_timestamp = time.time()
             await self._drive_impl(
@@ -585,6 +693,113 @@ class BB8Facade:
             )
             self._publish_rejected("drive", str(e))
 
+    def drive_stream(self, speed: int, heading: int) -> tuple[bool, str | None]:
+        """Update the streaming drive setpoint; see ``drive_stream.DriveStream``."""
+        accepted, reason = self._get_drive_stream().submit(speed, heading)
+        if accepted:
+            command_trace.mark("safety")
+        else:
+            logger.debug(
+                {
+                    "event": "facade_drive_stream_rejected",
+                    "speed": speed,
+                    "heading": heading,
+                    "reason": reason,
+                }
+            )
+        return accepted, reason
+
+    async def _stream_roll(self, speed: int, heading: int, duration_ms: int | None):
+        """One control-loop roll of the drive stream (no auto-stop, no state)."""
+        session = self._get_or_create_session()
+        await session.roll(speed, heading, duration_ms)
+        self._last_cmd_timestamp = time.time()
+
+    async def run_sequence(self, raw_steps: Any, cid: str | None = None) -> None:
+        """Run a ``bb8/cmd/sequence`` and ACK once with per-step deviations."""
+        try:
+            steps = parse_sequence(
+                raw_steps, min_motion_gap_ms=self._safety.config.min_drive_interval_ms
+            )
+        except SequenceError as e:
+            self._publish_ack("sequence", False, cid, str(e))
+            return
+
+        # A newer sequence replaces the running one
+        if self._sequence is not None:
+            self._sequence.cancel("superseded")
+        seq = Sequence(steps, cid)
+        self._sequence = seq
+        logger.info(
+            {
+                "event": "facade_sequence_started",
+                "cid": cid,
+                "steps": len(steps),
+                "duration_ms": seq.duration_ms,
+            }
+        )
+        seq.task = asyncio.ensure_future(
+            seq.run(
+                {
+                    "led": self._sequence_led,
+                    "preset": self._sequence_preset,
+                    "roll": self._sequence_roll,
+                    "heading": self._sequence_roll,
+                    "wait": self._sequence_wait,
+                },
+                blocked=self._sequence_blocked,
+            )
+        )
+        # wait() rather than await: a cancelled run still gets its ACK
+        await asyncio.wait({seq.task})
+        if self._sequence is seq:
+            self._sequence = None
+        seq.log_done()
+        report = seq.report()
+        self._publish_ack(
+            "sequence",
+            report.pop("ok"),
+            report.pop("cid", cid),
+            report.pop("reason"),
+            extra=report,
+        )
+
+    def _sequence_blocked(self) -> str | None:
+        if self._safety.estop_latched:
+            reason = self._safety.get_estop_reason()
+            return f"Motion blocked by emergency stop: {reason}"
+        return None
+
+    async def _sequence_led(self, step: Step) -> None:
+        a = step.args
+        if not await self._lighting.set_static(a["r"], a["g"], a["b"]):
+            raise RuntimeError("LED hardware path unavailable: not_connected")
+
+    async def _sequence_preset(self, step: Step) -> None:
+        if not await self._lighting.run_preset(step.args["name"]):
+            raise ValueError(f"Unknown preset '{step.args['name']}'")
+
+    async def _sequence_roll(self, step: Step) -> None:
+        # "heading" is a turn in place: speed 0, no duration
+        speed, heading, duration_ms = self._safety.normalize_drive(
+            step.args.get("speed", 0), step.args["heading"], step.args.get("ms")
+        )
+        if step.op == "heading":
+            duration_ms = 0
+        # motion steps were spaced at parse time; only estop/offline gate here
+        self._safety.gate_stream()
+        if self._drive_stream is not None:
+            self._drive_stream.halt("sequence")
+        session = self._get_or_create_session()
+        await session.roll(speed, heading, duration_ms or None)
+        self._last_cmd_timestamp = time.time()
+        if step.op == "roll":
+            # every roll ends in a stop, even if the radio ignores the duration
+            self._safety.schedule_auto_stop(duration_ms, self._stop_impl)
+
+    async def _sequence_wait(self, step: Step) -> None:
+        return None
+
     async def _drive_impl(
         self, speed: int, heading: int, duration_ms: int | None
     ) -> None:
@@ -642,18 +857,33 @@ class BB8Facade:
 
     async def estop(self, reason: str = "Manual emergency stop") -> None:
         """Activate emergency stop."""
+        lane = get_ble_lane()
+        # First: flush queued LED/motion writes and cancel in-flight retries;
+        # the stop-write latency metric starts here
+        lane.preempt("estop")
         try:
             activated, message = self._safety.activate_estop(reason)
 
             if activated:
-                # Cancel any active LED animations
+                # No further streamed setpoints or sequence steps reach the radio
+                if self._drive_stream is not None:
+                    self._drive_stream.halt("estop")
+                if self._sequence is not None:
+                    self._sequence.cancel("estop")
+
+                # Cancel any active LED animations without waiting on them
                 if self._lighting:
-                    self._lighting.cancel_active()
+                    self._lighting.halt()
 
-                # Stop device immediately
-                await self._stop_impl()
+                # Stop device immediately: the dead-man stop fires now (or
+                # this one runs if no drive was armed), never both
+                stopping = self._safety.force_auto_stop(self._stop_impl)
+                if stopping is not None:
+                    await stopping
+                else:
+                    await self._stop_impl()
 
-                # Publish telemetry update
+                # Telemetry only after the stop is out (it reads the battery)
                 await self._publish_telemetry()
 
                 logger.warning(
@@ -683,6 +913,8 @@ class BB8Facade:
                 }
             )
             self._publish_rejected("estop", str(e))
+        finally:
+            lane.settle()
 
     async def clear_estop(self) -> None:
         """Clear emergency stop if safe."""
@@ -748,7 +980,7 @@ class BB8Facade:
                 payload["reason"] = reason
             if extra:
                 payload.update(extra)
-            client.publish(topic, payload=json.dumps(payload), qos=1, retain=False)
+            publish_ack(client, topic, json.dumps(payload), qos=1, cid=cid)
 
     def is_connected(self) -> bool:
         """Check if device is connected."""
@@ -783,80 +1015,87 @@ class BB8Facade:
             return 0
 
     def _publish_telemetry_update(self) -> None:
-        """Publish telemetry update immediately."""
-        if self._mqtt["client"] and self._mqtt["base"]:
-            self._schedule_task(self._publish_telemetry())
+        """Push the facade's fields to the aggregator (publishes on change)."""
+        try:
+            self._telemetry.update(**self._build_telemetry())
+        except Exception as e:
+            logger.error({"event": "facade_telemetry_error", "error": str(e)})
 
     async def publish_telemetry_async(self) -> None:
         """Async version of telemetry publishing for direct await."""
         await self._publish_telemetry()
 
     def _build_telemetry(self) -> dict:
-        """Build telemetry payload as plain dict."""
-        current_time = time.time()
+        """Facade-owned snapshot fields as a plain dict (battery read apart)."""
         return {
             "connected": self.is_connected(),
             "estop": self._safety.is_estop_active(),
             "last_cmd_ts": time.strftime(
-                "%Y-%m-%dT%H:%M:%S.%fZ",
+                "%Y-%m-%dT%H:%M:%SZ",
                 time.gmtime(self._last_cmd_timestamp),
             )
             if self._last_cmd_timestamp > 0
             else None,
-            "battery_pct": None,  # Battery will be updated async if available
-            "ts": time.strftime("%Y-%m-%dT%H:%M:%S.%fZ", time.gmtime(current_time)),
         }
 
+    def _bind_telemetry(self) -> bool:
+        """Publish through this facade's client unless already bound to it."""
+        client = self._mqtt["client"]
+        base = self._mqtt["base"]
+        if not client or not base:
+            return False
+        if self._telemetry.client is not client:
+            # QoS 0 like the controller: snapshots supersede each other
+            self._telemetry.bind(client, f"{base}/status/telemetry", qos=0)
+        return True
+
     async def _publish_telemetry(self) -> None:
-        """Publish telemetry data."""
+        """Refresh every facade field, battery included, and publish now."""
         try:
-            client = self._mqtt["client"]
-            base = self._mqtt["base"]
-
-            if not client or not base:
+            if not self._bind_telemetry():
                 return
 
-            # Build base telemetry payload (pure dict, no coroutines)
-            telemetry = self._build_telemetry()
+            fields = self._build_telemetry()
 
-            # Try to get battery with timeout
+            # Try to get battery with timeout; a failed read keeps the last value
             try:
                 battery_pct = await asyncio.wait_for(self.get_battery(), timeout=1.0)
-                telemetry["battery_pct"] = battery_pct
+                if fields["connected"]:
+                    fields["battery_pct"] = battery_pct
             except (TimeoutError, Exception):
-                # Keep battery_pct as None
                 pass
 
-            # Publish telemetry
-            topic = f"{base}/status/telemetry"
-            payload = json.dumps(telemetry)
-            client.publish(topic, payload=payload, qos=1, retain=False)
+            self._telemetry.update(**fields)
+            self._telemetry.flush()
 
             logger.debug(
                 {
                     "event": "facade_telemetry_published",
-                    "telemetry": telemetry,
+                    "telemetry": fields,
                 }
             )
 
         except Exception as e:
             logger.error({"event": "facade_telemetry_error", "error": str(e)})
 
-    async def _telemetry_heartbeat(self) -> None:
-        """Telemetry heartbeat task - publishes every 10 seconds."""
+    def _telemetry_tick(self):
+        """Refresh facade fields every 10 s; battery (a BLE read) every 60 s.
+
+        The aggregator publishes only what changed, plus its own keep-alive.
+        """
+        self._telemetry_ticks += 1
+        self._publish_telemetry_update()
+        if self._telemetry_ticks % 6 == 1 and self.is_connected():
+            return self._refresh_battery()
+        return None
+
+    async def _refresh_battery(self) -> None:
         try:
-            while not self._shutdown_event.is_set():
-                await self._publish_telemetry()
-                await asyncio.sleep(10.0)
-        except asyncio.CancelledError:
-            logger.debug({"event": "facade_telemetry_heartbeat_cancelled"})
-        except Exception as e:
-            logger.error(
-                {
-                    "event": "facade_telemetry_heartbeat_error",
-                    "error": str(e),
-                }
-            )
+            battery_pct = await asyncio.wait_for(self.get_battery(), timeout=1.0)
+        except (TimeoutError, Exception):
+            return
+        if self.is_connected():
+            self._telemetry.update(battery_pct=battery_pct)
 
     # ---------- MQTT wiring (subscribe/dispatch/state echo + discovery) ------
 
@@ -878,6 +1117,12 @@ class BB8Facade:
         retain_val = retain if retain is not None else CFG.get("RETAIN", True)
         base_topic = f"{MQTT_BASE}/{MQTT_CLIENT_ID}"
 
+        # Loop for handlers that arrive on paho's network thread
+        with contextlib.suppress(RuntimeError):
+            self._loop = asyncio.get_running_loop()
+        if self._loop is not None:
+            get_ingress().bind(self._loop)
+
         self._mqtt = {
             "client": client,
             "base": base_topic,
@@ -899,6 +1144,13 @@ class BB8Facade:
                 retain=r,
             )
 
+        # Helper: publish retained state, skipping unchanged payloads
+        def _pub_state(suffix: str, payload: str):
+            if not retain_val:
+                _pub(suffix, payload)
+                return
+            publish_retained(client, f"{base_topic}/{suffix}", payload, qos=qos_val)
+
         # Helper: parse color payload
         def _parse_color(raw: str) -> dict | None:
             raw = raw.strip()
@@ -976,39 +1228,45 @@ class BB8Facade:
             except Exception as e:
                 logger.error({"event": "led_handler_error", "error": repr(e)})
 
+        stop_reset: list[TimerHandle | None] = [None]
+
         def _handle_stop(_c, _u, _msg):
             try:
                 self.stop()
                 _pub("stop/state", "pressed", r=False)
-
-                def _reset():
-                    time.sleep(0.5)
-                    _pub("stop/state", "idle", r=False)
-
-                threading.Thread(target=_reset, daemon=True).start()
+                # repeated presses push the single "idle" reset back
+                if stop_reset[0] is None:
+                    stop_reset[0] = get_timer_wheel().call_later(
+                        0.5, _pub, "stop/state", "idle", False, name="stop_reset"
+                    )
+                else:
+                    stop_reset[0].reschedule(0.5)
             except Exception as e:
                 logger.error({"event": "stop_handler_error", "error": repr(e)})
 
-        def _handle_led_cmd(_c, _u, msg):
+        def _handle_led_cmd(_c, env):
             """Handle bb8/cmd/led - static RGB LED control."""
             try:
-                payload = json.loads((msg.payload or b"").decode("utf-8"))
-                if not isinstance(payload, dict):
+                if env.error in ("invalid_json", "not_an_object"):
                     logger.error(
                         {
-                            "event": "led_cmd_invalid_payload",
-                            "payload": payload,
+                            "event": "led_cmd_json_error"
+                            if env.error == "invalid_json"
+                            else "led_cmd_invalid_payload",
+                            "payload": env.preview(),
                         }
                     )
                     return
 
-                r = payload.get("r", 0)
-                g = payload.get("g", 0)
-                b = payload.get("b", 0)
-                cid = payload.get("cid")
+                r = env.get("r", 0)
+                g = env.get("g", 0)
+                b = env.get("b", 0)
+                cid = env.cid
 
                 # Validate RGB values are numeric
                 try:
+                    if env.error:
+                        raise TypeError(env.error)
                     r, g, b = int(r), int(g), int(b)
                 except (ValueError, TypeError):
                     if cid:
@@ -1029,15 +1287,8 @@ class BB8Facade:
                     return
 
                 # Schedule async LED operation
-                asyncio.create_task(self.set_led_async(r, g, b, cid))
+                self._schedule_task(self.set_led_async(r, g, b, cid))
 
-            except json.JSONDecodeError:
-                logger.error(
-                    {
-                        "event": "led_cmd_json_error",
-                        "payload": msg.payload,
-                    }
-                )
             except Exception as e:
                 logger.error(
                     {
@@ -1046,23 +1297,24 @@ class BB8Facade:
                     }
                 )
 
-        def _handle_led_preset_cmd(_c, _u, msg):
+        def _handle_led_preset_cmd(_c, env):
             """Handle bb8/cmd/led_preset - preset animations."""
             try:
-                payload = json.loads((msg.payload or b"").decode("utf-8"))
-                if not isinstance(payload, dict):
+                if env.error in ("invalid_json", "not_an_object"):
                     logger.error(
                         {
-                            "event": "led_preset_invalid_payload",
-                            "payload": payload,
+                            "event": "led_preset_json_error"
+                            if env.error == "invalid_json"
+                            else "led_preset_invalid_payload",
+                            "payload": env.preview(),
                         }
                     )
                     return
 
-                preset_name = payload.get("name")
-                cid = payload.get("cid")
+                preset_name = env.get("name")
+                cid = env.cid
 
-                if not preset_name or not isinstance(preset_name, str):
+                if env.error or not preset_name:
                     if cid:
                         self._publish_ack(
                             "led_preset",
@@ -1073,21 +1325,14 @@ class BB8Facade:
                     logger.error(
                         {
                             "event": "led_preset_missing_name",
-                            "payload": payload,
+                            "payload": env.preview(),
                         }
                     )
                     return
 
                 # Schedule async preset operation
-                asyncio.create_task(self.set_led_preset(preset_name, cid))
+                self._schedule_task(self.set_led_preset(preset_name, cid))
 
-            except json.JSONDecodeError:
-                logger.error(
-                    {
-                        "event": "led_preset_json_error",
-                        "payload": msg.payload,
-                    }
-                )
             except Exception as e:
                 logger.error(
                     {
@@ -1096,20 +1341,15 @@ class BB8Facade:
                     }
                 )
 
-        def _handle_estop(_c, _u, msg):
+        def _handle_estop(_c, env):
             try:
-                # Parse optional payload for reason/cid
-                reason = "MQTT emergency stop"
-                cid = None
-                try:
-                    payload = json.loads((msg.payload or b"").decode("utf-8"))
-                    if isinstance(payload, dict):
-                        reason = payload.get("reason", reason)
-                        cid = payload.get("cid")
-                except Exception:
-                    pass
+                # Optional payload carries reason/cid; malformed payloads still stop
+                reason = env.get("reason", "MQTT emergency stop")
+                if not isinstance(reason, str):
+                    reason = "MQTT emergency stop"
+                cid = env.cid
 
-                asyncio.create_task(self.estop(reason))
+                self._schedule_task(self.estop(reason))
 
                 # Publish acknowledgment
                 ack_payload = {
@@ -1121,20 +1361,14 @@ class BB8Facade:
                     ack_payload["cid"] = cid
 
                 _pub("ack/estop", ack_payload, r=False)
+                command_trace.mark("ack")
 
             except Exception as e:
                 logger.error({"event": "estop_handler_error", "error": repr(e)})
 
-        def _handle_clear_estop(_c, _u, msg):
+        def _handle_clear_estop(_c, env):
             try:
-                # Parse optional payload for cid
-                cid = None
-                try:
-                    payload = json.loads((msg.payload or b"").decode("utf-8"))
-                    if isinstance(payload, dict):
-                        cid = payload.get("cid")
-                except Exception:
-                    pass
+                cid = env.cid
 
                 # Attempt to clear estop
                 cleared, reason = self._safety.clear_estop()
@@ -1162,19 +1396,11 @@ class BB8Facade:
                     }
                 )
 
-        def _handle_diag_gatt_cmd(_c, _u, msg):
+        def _handle_diag_gatt_cmd(_c, env):
             """Handle bb8/cmd/diag_gatt — publish ACK on {base}/ack/diag_gatt."""
             try:
-                try:
-                    payload = (
-                        json.loads((msg.payload or b"").decode("utf-8", "ignore"))
-                        if msg.payload
-                        else {}
-                    )
-                except Exception:
-                    payload = {}
-                cid = payload.get("cid") or f"diag-gatt-{int(time.time())}"
-                adapter = payload.get("adapter", "hci0")
+                cid = env.cid or f"diag-gatt-{int(time.time())}"
+                adapter = env.get("adapter", "hci0")
                 ack = {
                     "ok": True,
                     "cid": cid,
@@ -1201,7 +1427,6 @@ class BB8Facade:
         dbus_path = os.environ.get("BB8_DBUS_PATH") or CFG.get(
             "BB8_DBUS_PATH", "/org/bluez/hci0"
         )
-        import asyncio
 
         should_publish_presence_discovery = enable_presence_discovery
         if should_publish_presence_discovery is None:
@@ -1226,47 +1451,88 @@ class BB8Facade:
             logger.info({"event": "facade_presence_discovery", "status": "disabled"})
 
         # Bind telemetry publishers for use by controller/telemetry loop
-        self.publish_presence = lambda online: _pub(
+        self.publish_presence = lambda online: _pub_state(
             "presence/state", "ON" if online else "OFF"
         )
-        self.publish_rssi = lambda dbm: _pub("rssi/state", str(int(dbm)))
+        self.publish_rssi = lambda dbm: _pub_state("rssi/state", str(int(dbm)))
 
-        # ---- Subscriptions ----
-        if not REQUIRE_DEVICE_ECHO:
-            client.message_callback_add(f"{base_topic}/power/set", _handle_power)
-            client.subscribe(f"{base_topic}/power/set", qos=qos_val)
+        admission = get_admission()
 
-            client.message_callback_add(f"{base_topic}/led/set", _handle_led)
-            client.subscribe(f"{base_topic}/led/set", qos=qos_val)
+        def _admitted(cmd, handler):
+            """Charge a command to its admission class before handling it."""
 
-            client.message_callback_add(f"{base_topic}/stop/press", _handle_stop)
-            client.subscribe(f"{base_topic}/stop/press", qos=qos_val)
+            def _handler(c, *args):
+                env = args[0] if len(args) == 1 else None
+                cid = getattr(env, "cid", None)
 
-            # LED command subscriptions
-            client.message_callback_add(f"{MQTT_BASE}/cmd/led", _handle_led_cmd)
-            client.subscribe(f"{MQTT_BASE}/cmd/led", qos=qos_val)
+                def _nack(reason, outcome):
+                    # HA entity topics (led/set) have no ack channel
+                    if env is not None:
+                        self._publish_ack(
+                            cmd, False, cid, reason, {"admission": outcome}
+                        )
 
-            client.message_callback_add(
-                f"{MQTT_BASE}/cmd/led_preset", _handle_led_preset_cmd
-            )
-            client.subscribe(f"{MQTT_BASE}/cmd/led_preset", qos=qos_val)
+                admission.submit(cmd, cid, lambda: handler(c, *args), _nack)
 
-            # Emergency stop subscriptions
-            client.message_callback_add(f"{MQTT_BASE}/cmd/estop", _handle_estop)
-            client.subscribe(f"{MQTT_BASE}/cmd/estop", qos=qos_val)
+            return _handler
 
-            client.message_callback_add(
-                f"{MQTT_BASE}/cmd/clear_estop", _handle_clear_estop
-            )
-            client.subscribe(f"{MQTT_BASE}/cmd/clear_estop", qos=qos_val)
+        def _dropped(cmd):
+            """NACK a command dropped before it reached admission."""
+            return lambda c, env, reason: self._publish_ack(cmd, False, env.cid, reason)
+
+        # ---- Subscriptions (routed through the client's topic trie) ----
+        router = router_for(client)
+        if not REQUIRE_DEVICE_ECHO:
+            with router.batch():
+                router.add(f"{base_topic}/power/set", _handle_power, qos_val)
+                router.add(
+                    f"{base_topic}/led/set", _admitted("led", _handle_led), qos_val
+                )
+                router.add(
+                    f"{base_topic}/stop/press",
+                    _admitted("stop", _handle_stop),
+                    qos_val,
+                    priority=True,
+                )
+                # LED command routes
+                router.add(
+                    f"{MQTT_BASE}/cmd/led",
+                    _admitted("led", _handle_led_cmd),
+                    qos_val,
+                    envelope=True,
+                    nack=_dropped("led"),
+                )
+                router.add(
+                    f"{MQTT_BASE}/cmd/led_preset",
+                    _admitted("led_preset", _handle_led_preset_cmd),
+                    qos_val,
+                    envelope=True,
+                    nack=_dropped("led_preset"),
+                )
+                # Emergency stop routes
+                router.add(
+                    f"{MQTT_BASE}/cmd/estop",
+                    _admitted("estop", _handle_estop),
+                    qos_val,
+                    envelope=True,
+                    priority=True,
+                )
+                router.add(
+                    f"{MQTT_BASE}/cmd/clear_estop",
+                    _admitted("clear_estop", _handle_clear_estop),
+                    qos_val,
+                    envelope=True,
+                    priority=True,
+                )
 
             logger.info({"event": "facade_mqtt_attached", "base": base_topic})
 
-            # Start telemetry heartbeat
-            if self._telemetry_task is None or self._telemetry_task.done():
-                self._telemetry_task = asyncio.create_task(self._telemetry_heartbeat())
-                self._tasks.add(self._telemetry_task)
-                self._telemetry_task.add_done_callback(self._tasks.discard)
+            # Feed the telemetry snapshot (published by the aggregator)
+            self._bind_telemetry()
+            if self._telemetry_timer is None:
+                self._telemetry_timer = get_timer_wheel().call_every(
+                    10.0, self._telemetry_tick, name="facade_telemetry", first=0.0
+                )
         else:
             logger.warning(
                 {
@@ -1277,10 +1543,9 @@ class BB8Facade:
             )
 
         # Diagnostics: diag_gatt (ALWAYS-ON)
-        client.message_callback_add(
-            f"{MQTT_BASE}/cmd/diag_gatt", _handle_diag_gatt_cmd
+        router.add(
+            f"{MQTT_BASE}/cmd/diag_gatt", _handle_diag_gatt_cmd, qos_val, envelope=True
         )
-        client.subscribe(f"{MQTT_BASE}/cmd/diag_gatt", qos=qos_val)
 
     def _emit_led(self, r: int, g: int, b: int) -> None:
         """Emit an RGB LED update exactly once per logical emit."""
@@ -1316,6 +1581,12 @@ class BB8Facade:
     async def shutdown(self) -> None:
         """Shutdown facade and cancel running tasks."""
         self._shutdown_event.set()
+        if self._drive_stream is not None:
+            self._drive_stream.halt("shutdown")
+        self._readiness.abort("shutdown")
+        if self._telemetry_timer is not None:
+            self._telemetry_timer.cancel()
+            self._telemetry_timer = None
 
         # Cancel all running tasks
         for task in list(self._tasks):
@@ -1332,6 +1603,7 @@ class BB8Facade:
 
         # Notify safety controller of disconnection
         self._safety.set_device_connected(False)
+        self._publish_telemetry_update()
 
         logger.info({"event": "facade_shutdown_complete"})
 
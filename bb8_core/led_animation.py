@@ -0,0 +1,350 @@
+"""
+led_animation.py
+
+Declarative keyframe LED animations.
+
+A preset is data, not code::
+
+    {"fps": 10, "loops": 3, "easing": "ease_in_out", "duration_ms": 2000,
+     "keyframes": [{"at_ms": 0, "rgb": [255, 80, 0]},
+                   {"at_ms": 1000, "rgb": [120, 0, 10]}]}
+
+``keyframes`` may also be the compact string form used in the add-on
+options, ``"0:255,80,0;1000:120,0,10"``. One cycle lasts ``duration_ms``
+(default: the last keyframe); past the last keyframe the colour eases back
+towards the first, so cycles join up. ``easing`` is one of ``EASINGS``;
+``step`` holds each keyframe until the next. ``loops: 0`` repeats until the
+animation is cancelled.
+
+``compile_preset`` samples one cycle at ``fps`` into a flat ``array('B')``
+of RGB triples, so playback does little colour math. ``Player`` writes one
+frame at a time on an absolute timeline (``start + t``) on the monotonic
+clock, so a slow BLE write delays a frame but not the animation. It keeps a
+rolling window of write latencies and stretches the frame interval to what
+the link sustains (at most ``1 / fps``, with headroom); each write then
+shows the colour due at its time, blended between the two nearest frames
+(held, for ``step``). Frames the slower rate passes over, or that a stalled
+write leaves behind, are dropped; the last frame of the run is always
+written on schedule, so the LED ends where and when the preset says.
+``Player.stats`` reports target, effective and achieved FPS, dropped frames,
+write latency and frame lateness.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import math
+import time
+from array import array
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from .util import percentile
+
+MAX_FPS = 30.0
+MAX_FRAMES = 4096
+MAX_KEYFRAMES = 64
+# Rolling write-latency window, and the interval headroom over its mean
+LATENCY_WINDOW = 8
+LATENCY_HEADROOM = 1.25
+
+EASINGS: dict[str, Callable[[float], float]] = {
+    "linear": lambda u: u,
+    "step": lambda u: 0.0,
+    "ease_in": lambda u: u * u,
+    "ease_out": lambda u: u * (2.0 - u),
+    "ease_in_out": lambda u: u * u * (3.0 - 2.0 * u),
+}
+
+# The stock animations, as keyframes (same colours and timing as before)
+BUILTIN_PRESETS: dict[str, dict[str, Any]] = {
+    "police": {
+        "fps": 5,
+        "loops": 10,
+        "easing": "step",
+        "duration_ms": 400,
+        "keyframes": "0:0,0,255;200:255,0,0",
+    },
+    "sunset": {
+        "fps": 1000 / 300,
+        "loops": 2,
+        "easing": "step",
+        "duration_ms": 1500,
+        "keyframes": (
+            "0:255,80,0;300:255,50,0;600:255,20,0;900:200,10,5;1200:120,0,10"
+        ),
+    },
+}
+
+Write = Callable[[int, int, int], Awaitable[Any]]
+
+
+class AnimationError(ValueError):
+    """Raised for a preset definition that fails validation."""
+
+
+class Animation:
+    """One precomputed cycle of RGB frames."""
+
+    __slots__ = ("name", "fps", "loops", "frames", "count", "smooth")
+
+    def __init__(
+        self, name: str, fps: float, loops: int, frames: array, smooth: bool = True
+    ) -> None:
+        self.name = name
+        self.fps = fps
+        self.loops = loops
+        self.frames = frames
+        self.count = len(frames) // 3
+        self.smooth = smooth  # blend between frames (False: hold, for step)
+
+    @property
+    def total(self) -> int | None:
+        """Frames in a full run, or None when looping until cancelled."""
+        return self.count * self.loops if self.loops else None
+
+    def frame(self, i: int) -> tuple[int, int, int]:
+        j = (i % self.count) * 3
+        f = self.frames
+        return f[j], f[j + 1], f[j + 2]
+
+    def sample(self, t: float) -> tuple[int, int, int]:
+        """Colour ``t`` seconds into the run, between the two nearest frames."""
+        pos = t * self.fps + 1e-6
+        i = int(pos)
+        u = pos - i
+        if not self.smooth or u < 1e-3:
+            return self.frame(i)
+        a, b = self.frame(i), self.frame(i + 1)
+        r, g, bl = (round(x + (y - x) * u) for x, y in zip(a, b, strict=True))
+        return r, g, bl
+
+    def __repr__(self) -> str:
+        return f"Animation({self.name!r}, {self.count} frames @ {self.fps:g} fps)"
+
+
+def _number(value: Any, where: str) -> float:
+    if isinstance(value, bool):
+        raise AnimationError(f"{where}: expected a number")
+    try:
+        out = float(value)
+    except (TypeError, ValueError):
+        raise AnimationError(f"{where}: expected a number") from None
+    if not math.isfinite(out):
+        raise AnimationError(f"{where}: expected a finite number")
+    return out
+
+
+def _rgb(value: Any, where: str) -> tuple[int, int, int]:
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)) or len(value) != 3:
+        raise AnimationError(f"{where}: expected [r, g, b]")
+    r, g, b = (
+        max(0, min(255, int(_number(c, f"{where}[{k}]")))) for k, c in enumerate(value)
+    )
+    return r, g, b
+
+
+def _keyframes(raw: Any, where: str) -> list[tuple[float, tuple[int, int, int]]]:
+    if isinstance(raw, str):
+        raw = [
+            dict(zip(("at_ms", "rgb"), part.split(":", 1), strict=False))
+            for part in raw.split(";")
+            if part.strip()
+        ]
+    if not isinstance(raw, list) or not raw:
+        raise AnimationError(f"{where}: expected a non-empty list")
+    if len(raw) > MAX_KEYFRAMES:
+        raise AnimationError(f"{where}: at most {MAX_KEYFRAMES} keyframes")
+    out = []
+    for i, item in enumerate(raw):
+        if not isinstance(item, dict) or "at_ms" not in item or "rgb" not in item:
+            raise AnimationError(f"{where}[{i}]: expected at_ms and rgb")
+        at = _number(item["at_ms"], f"{where}[{i}].at_ms")
+        if at < 0 or (out and at <= out[-1][0]):
+            raise AnimationError(f"{where}[{i}].at_ms: must increase from 0")
+        out.append((at, _rgb(item["rgb"], f"{where}[{i}].rgb")))
+    if out[0][0] != 0:
+        raise AnimationError(f"{where}[0].at_ms: the first keyframe must be at 0")
+    return out
+
+
+def compile_preset(name: str, spec: Any) -> Animation:
+    """Validate ``spec`` and sample one cycle into an ``Animation``."""
+    if not isinstance(spec, dict):
+        raise AnimationError(f"{name}: expected an object")
+    fps = _number(spec.get("fps", 10), f"{name}.fps")
+    if not 0 < fps <= MAX_FPS:
+        raise AnimationError(f"{name}.fps: must be in (0, {MAX_FPS:g}]")
+    loops = int(_number(spec.get("loops", 1), f"{name}.loops"))
+    if loops < 0:
+        raise AnimationError(f"{name}.loops: must be >= 0 (0 = until cancelled)")
+    easing_name = spec.get("easing", "linear")
+    easing = EASINGS.get(easing_name) if isinstance(easing_name, str) else None
+    if easing is None:
+        raise AnimationError(f"{name}.easing: one of {', '.join(EASINGS)}")
+    keys = _keyframes(spec.get("keyframes"), f"{name}.keyframes")
+    duration = _number(spec.get("duration_ms", keys[-1][0]), f"{name}.duration_ms")
+    if duration < keys[-1][0]:
+        raise AnimationError(f"{name}.duration_ms: shorter than the last keyframe")
+
+    # A single frame for a static preset (or a zero-length cycle)
+    count = max(1, math.ceil(duration / 1000.0 * fps - 1e-9))
+    if count * max(1, loops) > MAX_FRAMES:
+        raise AnimationError(f"{name}: more than {MAX_FRAMES} frames")
+    # Wrap segment: the last keyframe eases back to the first at duration
+    keys = keys + [(duration, keys[0][1])] if duration > keys[-1][0] else keys
+    frames = array("B")
+    k = 0
+    for i in range(count):
+        t = i * 1000.0 / fps
+        while k + 1 < len(keys) and keys[k + 1][0] <= t + 1e-6:
+            k += 1
+        at, rgb = keys[k]
+        if k + 1 == len(keys):
+            frames.extend(rgb)
+            continue
+        nxt_at, nxt = keys[k + 1]
+        u = easing((t - at) / (nxt_at - at))
+        frames.extend(round(a + (b - a) * u) for a, b in zip(rgb, nxt, strict=True))
+    return Animation(name, fps, loops, frames, smooth=easing_name != "step")
+
+
+def parse_presets(raw: Any) -> dict[str, Animation]:
+    """Compile ``led_presets`` from config (a dict by name or a named list)."""
+    if raw in (None, "", [], {}):
+        return {}
+    if isinstance(raw, list):
+        named = {}
+        for i, item in enumerate(raw):
+            if not isinstance(item, dict) or not isinstance(item.get("name"), str):
+                raise AnimationError(f"led_presets[{i}]: expected an object with name")
+            named[item["name"]] = item
+        raw = named
+    if not isinstance(raw, dict):
+        raise AnimationError("led_presets: expected a list or an object")
+    return {name: compile_preset(name, spec) for name, spec in raw.items()}
+
+
+class Player:
+    """Plays one ``Animation`` on an absolute, latency-adaptive timeline.
+
+    ``latency`` is the rolling window of write durations (seconds); pass the
+    same deque to successive players so a new animation starts at the rate
+    the link sustained for the last one. ``stats`` is valid at any time,
+    including after the run was cancelled.
+    """
+
+    def __init__(
+        self,
+        animation: Animation,
+        write: Write,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+        latency: collections.deque[float] | None = None,
+    ) -> None:
+        self.animation = animation
+        self._write = write
+        self._clock = clock
+        self._sleep = sleep
+        self._latency = (
+            latency if latency is not None else collections.deque(maxlen=LATENCY_WINDOW)
+        )
+        self._lateness: list[float] = []
+        self._start: float | None = None
+        self._end: float | None = None
+        self._interval = 1.0 / animation.fps
+        self._slowest = self._interval
+        self.written = 0
+        self.dropped = 0
+
+    def _adapt(self) -> float:
+        """Frame interval the link sustains: never faster than the preset."""
+        latency = self._latency
+        interval = 1.0 / self.animation.fps
+        if latency:
+            interval = max(interval, sum(latency) / len(latency) * LATENCY_HEADROOM)
+        self._interval = interval
+        self._slowest = max(self._slowest, interval)
+        return interval
+
+    async def run(self, stop: Callable[[], bool] | None = None) -> dict[str, Any]:
+        """Write frames (``stop`` is polled before each); returns stats."""
+        animation = self.animation
+        fps = animation.fps
+        total = animation.total
+        end = None if total is None else (total - 1) / fps  # the last frame
+        clock = self._clock
+        start = self._start = clock()
+        t = 0.0  # when the next frame is due, from start
+        shown = -1  # source frame slot of the last write
+        interval = self._adapt()
+        try:
+            while True:
+                if stop is not None and stop():
+                    break
+                now = clock() - start
+                if now < t:
+                    await self._sleep(t - now)
+                    now = clock() - start
+                late = now - t
+                if late >= interval:
+                    # A write stalled: show what is due now, not a stale frame
+                    t = now if end is None else min(now, end)
+                    late = now - t
+                self._lateness.append(max(0.0, late) * 1000.0)
+                slot = int(t * fps + 1e-6)
+                self.dropped += max(0, slot - shown - 1)
+                shown = slot
+                began = clock()
+                await self._write(*animation.sample(t))
+                self._latency.append(clock() - began)
+                self.written += 1
+                if end is not None and t >= end - 1e-9:
+                    break
+                interval = self._adapt()
+                t += interval
+                if end is not None and t > end - interval + 1e-6:
+                    t = end  # leave the last frame room to go out on time
+        finally:
+            self._end = clock()
+        return self.stats()
+
+    def stats(self) -> dict[str, Any]:
+        start = self._start
+        elapsed = 0.0 if start is None else (self._end or self._clock()) - start
+        lateness = sorted(self._lateness)
+        latency = self._latency
+        return {
+            "preset": self.animation.name,
+            "target_fps": round(self.animation.fps, 2),
+            "effective_fps": round(1.0 / self._interval, 2),
+            "min_effective_fps": round(1.0 / self._slowest, 2),
+            "achieved_fps": round(self.written / elapsed, 2) if elapsed > 0 else None,
+            "written": self.written,
+            "dropped": self.dropped,
+            "write_ms": (
+                round(sum(latency) / len(latency) * 1000.0, 2) if latency else None
+            ),
+            "late_ms": {
+                "p50": percentile(lateness, 0.50),
+                "p99": percentile(lateness, 0.99),
+                "max": round(lateness[-1], 2) if lateness else None,
+            },
+            "duration_s": round(elapsed, 3),
+        }
+
+
+__all__ = [
+    "Animation",
+    "AnimationError",
+    "BUILTIN_PRESETS",
+    "EASINGS",
+    "LATENCY_WINDOW",
+    "Player",
+    "compile_preset",
+    "parse_presets",
+]
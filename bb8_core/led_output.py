@@ -0,0 +1,131 @@
+"""
+led_output.py
+
+Last stage before an LED write goes on the radio.
+
+``LedOutput`` remembers the colour last confirmed on the device (set only
+after a write succeeded) and lets ``BleSession.set_led`` skip a write that
+would not change what the droid shows:
+
+* an identical colour is always skipped;
+* with ``delta_e > 0``, a colour closer than ``delta_e`` to the confirmed
+  one in CIE Lab (CIE76 distance, sRGB/D65) is skipped too. The distance is
+  measured against the *confirmed* colour, not the last request, so a slow
+  colour-wheel drag still moves the LED once it has drifted far enough.
+  Turning the LED off (0, 0, 0) is never quantized away.
+
+The confirmed colour belongs to one device handle: a reconnect brings a new
+handle, so its first write always goes out. ``invalidate`` forgets the
+colour (disconnect, write error); ``force=True`` writes regardless.
+A ``delta_e`` of about 2.3 is one just-noticeable difference.
+"""
+
+from __future__ import annotations
+
+import functools
+from typing import Any
+
+DEFAULT_DELTA_E = 0.0
+
+RGB = tuple[int, int, int]
+
+# sRGB component -> linear light, per 8-bit code
+_LINEAR = tuple(
+    c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4
+    for c in (i / 255.0 for i in range(256))
+)
+_EPS = (6 / 29) ** 3
+
+
+def _f(t: float) -> float:
+    return t ** (1 / 3) if t > _EPS else t / (3 * (6 / 29) ** 2) + 4 / 29
+
+
+@functools.lru_cache(maxsize=1024)
+def to_lab(rgb: RGB) -> tuple[float, float, float]:
+    """CIE L*a*b* of an 8-bit sRGB colour (D65 white)."""
+    r, g, b = (_LINEAR[c] for c in rgb)
+    fx = _f((0.4124564 * r + 0.3575761 * g + 0.1804375 * b) / 0.95047)
+    fy = _f(0.2126729 * r + 0.7151522 * g + 0.0721750 * b)
+    fz = _f((0.0193339 * r + 0.1191920 * g + 0.9503041 * b) / 1.08883)
+    return 116.0 * fy - 16.0, 500.0 * (fx - fy), 200.0 * (fy - fz)
+
+
+def delta_e(a: RGB, b: RGB) -> float:
+    """CIE76 colour difference between two sRGB colours."""
+    la, lb = to_lab(a), to_lab(b)
+    return sum((x - y) ** 2 for x, y in zip(la, lb, strict=True)) ** 0.5
+
+
+class LedOutput:
+    """Skips LED writes the device would not show; counts what it saved."""
+
+    def __init__(self, delta_e: float = DEFAULT_DELTA_E) -> None:
+        self.delta_e = float(delta_e)
+        self._confirmed: RGB | None = None
+        self._device: Any = None
+        self.writes = 0
+        self.forced = 0
+        self.saved_identical = 0
+        self.saved_quantized = 0
+
+    @property
+    def confirmed(self) -> RGB | None:
+        return self._confirmed
+
+    def should_write(self, rgb: RGB, device: Any, *, force: bool = False) -> bool:
+        """True if ``rgb`` has to go out to ``device``; counts a skipped write."""
+        confirmed = self._confirmed
+        if force or confirmed is None or device is not self._device:
+            if force:
+                self.forced += 1
+            return True
+        if rgb == confirmed:
+            self.saved_identical += 1
+            return False
+        if (
+            self.delta_e > 0
+            and rgb != (0, 0, 0)
+            and delta_e(rgb, confirmed) < self.delta_e
+        ):
+            self.saved_quantized += 1
+            return False
+        return True
+
+    def confirm(self, rgb: RGB, device: Any) -> None:
+        """Record that ``device`` now shows ``rgb`` (after a successful write)."""
+        self._confirmed = rgb
+        self._device = device
+        self.writes += 1
+
+    def invalidate(self) -> None:
+        """Forget the confirmed colour: the next write always goes out."""
+        self._confirmed = None
+        self._device = None
+
+    def stats(self) -> dict[str, Any]:
+        saved = self.saved_identical + self.saved_quantized
+        requested = saved + self.writes
+        return {
+            "delta_e": self.delta_e,
+            "confirmed": list(self._confirmed) if self._confirmed else None,
+            "writes": self.writes,
+            "forced": self.forced,
+            "saved_identical": self.saved_identical,
+            "saved_quantized": self.saved_quantized,
+            "saved_pct": round(100.0 * saved / requested, 1) if requested else 0.0,
+        }
+
+
+_output: LedOutput | None = None
+
+
+def get_led_output() -> LedOutput:
+    """Process-wide output stage shared by every BleSession (one LED)."""
+    global _output
+    if _output is None:
+        _output = LedOutput()
+    return _output
+
+
+__all__ = ["DEFAULT_DELTA_E", "LedOutput", "delta_e", "get_led_output", "to_lab"]
@@ -3,15 +3,29 @@ BB-8 Lighting Controller - LED control with presets and animations
 
 Provides RGB LED control with input validation, preset animations, and
 cancellation support. Integrates with safety system for estop handling.
+Animated presets are keyframe definitions (see ``led_animation``): the
+stock ones plus any from the ``led_presets`` option.
 """
 
 from __future__ import annotations
 
 import asyncio
-import time
-
+import collections
+
+from .led_animation import (
+    BUILTIN_PRESETS,
+    LATENCY_WINDOW,
+    Animation,
+    AnimationError,
+    Player,
+    compile_preset,
+    parse_presets,
+)
 from .logging_setup import logger
 
+# Presets that set one colour and are not animations (allowed under estop)
+STATIC_PRESETS = ("off", "white")
+
 
 class LightingController:
     """
@@ -31,6 +45,18 @@ class LightingController:
         self._active_task: asyncio.Task | None = None
         self._cancel_event = asyncio.Event()
         self._last_static_rgb: tuple[int, int, int] | None = None
+        self._presets: dict[str, Animation] = {
+            name: compile_preset(name, spec) for name, spec in BUILTIN_PRESETS.items()
+        }
+        self._player: Player | None = None
+        # Rolling LED write latency on this link, shared by every animation
+        self._write_latency: collections.deque[float] = collections.deque(
+            maxlen=LATENCY_WINDOW
+        )
+        self._last_animation: dict | None = None
+        self._animation_runs = 0
+        self._frames_dropped = 0
+        self._worst_late_ms = 0.0
 
         logger.info(
             {
@@ -42,8 +68,36 @@ class LightingController:
     def set_ble_session(self, session) -> None:
         """Update BLE session reference."""
         self._ble_session = session
+        self._write_latency.clear()  # a new link: measure it afresh
         logger.debug({"event": "lighting_session_updated"})
 
+    def load_presets(self, raw) -> list[str]:
+        """Add (or replace) animated presets from the ``led_presets`` option.
+
+        A definition that fails validation is logged and the stock presets
+        stay in place. Returns the names loaded.
+        """
+        try:
+            presets = parse_presets(raw)
+        except AnimationError as e:
+            logger.error({"event": "lighting_presets_invalid", "error": str(e)})
+            return []
+        for name in [n for n in presets if n in STATIC_PRESETS]:
+            logger.warning({"event": "lighting_preset_reserved", "preset": name})
+            del presets[name]
+        self._presets.update(presets)
+        if presets:
+            logger.info(
+                {
+                    "event": "lighting_presets_loaded",
+                    "presets": {n: a.count for n, a in presets.items()},
+                }
+            )
+        return list(presets)
+
+    def preset_names(self) -> list[str]:
+        return [*STATIC_PRESETS, *self._presets]
+
     @staticmethod
     def clamp_rgb(r: int, g: int, b: int) -> tuple[int, int, int]:
         """
@@ -76,36 +130,34 @@ class LightingController:
 
         This method is idempotent and safe to call multiple times.
         """
-        if self._active_task and not self._active_task.done():
+        task = self._active_task
+        if task and not task.done():
             logger.info({"event": "lighting_cancel_active_animation"})
 
-            # Signal cancellation
+            # Frames sleep on the timeline, so cancel the task outright
             self._cancel_event.set()
-
-            # Give task up to 100ms to cancel gracefully
-            try:
-                await asyncio.wait_for(self._active_task, timeout=0.1)
-            except asyncio.TimeoutError:
+            task.cancel()
+            done, _ = await asyncio.wait({task}, timeout=0.1)
+            if not done:
                 logger.warning(
                     {
                         "event": "lighting_cancel_timeout",
                         "timeout_ms": 100,
                     }
                 )
-                # Force cancel if timeout
-                self._active_task.cancel()
-                try:
-                    await self._active_task
-                except asyncio.CancelledError:
-                    pass
-            except asyncio.CancelledError:
-                pass
 
-            self._active_task = None
+        self._active_task = None
 
         # Reset cancel event for next animation
         self._cancel_event.clear()
 
+    def halt(self) -> None:
+        """Stop any active animation now, without waiting for it (estop)."""
+        if self._active_task and not self._active_task.done():
+            logger.info({"event": "lighting_halt_active_animation"})
+            self._cancel_event.set()
+            self._active_task.cancel()
+
     async def set_static(self, r: int, g: int, b: int) -> bool:
         """
         Set static LED color with RGB clamping.
@@ -156,18 +208,21 @@ class LightingController:
         Run a named preset animation.
 
         Args:
-            name: Preset name ('off', 'white', 'police', 'sunset')
+            name: Preset name ('off', 'white', 'police', 'sunset', or one
+                loaded from ``led_presets``)
 
         Returns:
             bool: True if preset exists and started, False otherwise
         """
         # Validate preset name
-        if name not in ["off", "white", "police", "sunset"]:
+        if not isinstance(name, str) or (
+            name not in STATIC_PRESETS and name not in self._presets
+        ):
             logger.error(
                 {
                     "event": "lighting_invalid_preset",
                     "preset": name,
-                    "available": ["off", "white", "police", "sunset"],
+                    "available": self.preset_names(),
                 }
             )
             return False
@@ -199,10 +254,8 @@ class LightingController:
                 await self._preset_off()
             elif name == "white":
                 await self._preset_white()
-            elif name == "police":
-                await self._preset_police()
-            elif name == "sunset":
-                await self._preset_sunset()
+            else:
+                await self._play(self._presets[name])
 
             logger.info(
                 {
@@ -241,64 +294,21 @@ class LightingController:
             self._toy.set_led(255, 255, 255)
         logger.info({"event": "lighting_static_applied", "rgb": [255, 255, 255]})
 
-    async def _preset_police(self) -> None:
-        """
-        Preset: Police lights - alternate blue/red for ~4s max.
-
-        Pattern: Blue (0,0,255) ↔ Red (255,0,0) at ~200ms intervals
-        """
-        end_time = time.time() + 4.0  # 4 second max duration
-        colors = [(0, 0, 255), (255, 0, 0)]  # Blue, Red
-        color_idx = 0
-
-        while time.time() < end_time:
-            if self._cancel_event.is_set():
-                break
-
-            r, g, b = colors[color_idx]
-            await self._apply_color(r, g, b)
-
-            # Wait 200ms or until cancelled
-            try:
-                await asyncio.wait_for(self._cancel_event.wait(), timeout=0.2)
-                break  # Cancelled
-            except asyncio.TimeoutError:
-                pass  # Continue animation
-
-            color_idx = (color_idx + 1) % len(colors)
-
-    async def _preset_sunset(self) -> None:
-        """
-        Preset: Sunset animation - warm color ramp.
-
-        Pattern: (255,80,0) → (255,20,0) → (120,0,10) with ~300ms steps
-        Runs for 1-2 cycles depending on cancellation.
-        """
-        colors = [
-            (255, 80, 0),  # Bright orange
-            (255, 50, 0),  # Orange
-            (255, 20, 0),  # Dark orange
-            (200, 10, 5),  # Deep orange
-            (120, 0, 10),  # Dark red
-        ]
-
-        # Run 2 cycles max
-        for cycle in range(2):
-            if self._cancel_event.is_set():
-                break
-
-            for r, g, b in colors:
-                if self._cancel_event.is_set():
-                    break
-
-                await self._apply_color(r, g, b)
-
-                # Wait 300ms or until cancelled
-                try:
-                    await asyncio.wait_for(self._cancel_event.wait(), timeout=0.3)
-                    return  # Cancelled
-                except asyncio.TimeoutError:
-                    pass  # Continue animation
+    async def _play(self, animation: Animation) -> None:
+        """Play a keyframe animation at the frame rate the link sustains."""
+        player = self._player = Player(
+            animation, self._apply_color, latency=self._write_latency
+        )
+        try:
+            await player.run(stop=self._cancel_event.is_set)
+        finally:
+            stats = self._last_animation = player.stats()
+            self._player = None
+            self._animation_runs += 1
+            self._frames_dropped += stats["dropped"]
+            worst = stats["late_ms"]["max"] or 0.0
+            self._worst_late_ms = max(self._worst_late_ms, worst)
+            logger.info({"event": "lighting_animation_stats", **stats})
 
     async def _apply_color(self, r: int, g: int, b: int) -> None:
         """
@@ -309,7 +319,7 @@ class LightingController:
         """
         if self._ble_session:
             try:
-                await self._ble_session.set_led_rgb(r, g, b)
+                await self._ble_session.set_led(r, g, b)
                 self._last_static_rgb = (r, g, b)  # Track last applied color
             except Exception as e:
                 logger.error(
@@ -336,6 +346,21 @@ class LightingController:
         """Check if an animation is currently running."""
         return self._active_task is not None and not self._active_task.done()
 
+    def get_animation_stats(self) -> dict:
+        """Frame pacing: the running animation, the last one, and totals."""
+        player = self._player
+        latency = self._write_latency
+        return {
+            "active": player.stats() if player is not None else None,
+            "write_ms": (
+                round(sum(latency) / len(latency) * 1000.0, 2) if latency else None
+            ),
+            "last": self._last_animation,
+            "runs": self._animation_runs,
+            "dropped": self._frames_dropped,
+            "worst_late_ms": round(self._worst_late_ms, 2),
+        }
+
     async def shutdown(self) -> None:
         """Shutdown lighting controller and cancel active animations."""
         logger.info({"event": "lighting_controller_shutdown"})
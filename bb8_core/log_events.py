@@ -0,0 +1,112 @@
+"""
+log_events.py
+
+Structured logging for hot paths: level-guarded, lazy and sampled.
+
+An ``EventLog`` is declared once per event, next to the code that logs it::
+
+    _PUBLISH_LOG = EventLog(logger, "mqtt_publish", logging.INFO, per_s=1.0)
+    ...
+    _PUBLISH_LOG(topic=topic, len=len(s))
+    _ERROR_LOG(lambda: {"error": str(e), "state": expensive()})
+
+A call checks ``logger.isEnabledFor(level)`` first: when the level is
+filtered out nothing else runs, so the positional factory (a callable
+returning the fields) is only called for records that are written. Two
+optional limits thin busy events: ``every=N`` writes 1 in N calls and
+``per_s`` writes at most that many per second. A written record carries
+``suppressed``, the number of calls thinned out since the previous one.
+``stats`` / ``get_event_log_stats`` report emitted, suppressed and
+filtered counts per event. Counters are not locked; under concurrent
+callers they are approximate.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Callable
+from typing import Any
+
+Fields = Callable[[], dict[str, Any]]
+
+_registry: dict[str, EventLog] = {}
+
+
+class EventLog:
+    """One structured log event with a level guard and optional sampling."""
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        event: str,
+        level: int = logging.INFO,
+        *,
+        every: int = 1,
+        per_s: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.logger = logger
+        self.event = event
+        self.level = level
+        self.every = max(1, int(every))
+        self.per_s = per_s
+        self._clock = clock
+        self._next_at = 0.0
+        self._calls = 0
+        self._pending = 0  # thinned out since the last written record
+        self.emitted = 0
+        self.suppressed = 0
+        self.filtered = 0
+        _registry[event] = self
+
+    def enabled(self) -> bool:
+        return self.logger.isEnabledFor(self.level)
+
+    def __call__(self, fields: Fields | None = None, /, **values: Any) -> bool:
+        """Log the event; returns True if a record was written."""
+        if not self.logger.isEnabledFor(self.level):
+            self.filtered += 1
+            return False
+        self._calls += 1
+        if self.every > 1 and (self._calls - 1) % self.every:
+            return self._thin()
+        if self.per_s:
+            now = self._clock()
+            if now < self._next_at:
+                return self._thin()
+            interval = 1.0 / self.per_s
+            # Keep the cadence while busy; restart it after a quiet spell
+            base = self._next_at if now - self._next_at < interval else now
+            self._next_at = base + interval
+        payload: dict[str, Any] = {"event": self.event}
+        if fields is not None:
+            payload.update(fields())
+        if values:
+            payload.update(values)
+        if self._pending:
+            payload["suppressed"] = self._pending
+            self._pending = 0
+        self.emitted += 1
+        self.logger.log(self.level, payload)
+        return True
+
+    def _thin(self) -> bool:
+        self._pending += 1
+        self.suppressed += 1
+        return False
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "emitted": self.emitted,
+            "suppressed": self.suppressed,
+            "filtered": self.filtered,
+        }
+
+
+def get_event_log_stats() -> dict[str, dict[str, int]]:
+    """Counters for every declared event, by event name."""
+    return {event: log.stats() for event, log in _registry.items()}
+
+
+__all__ = ["EventLog", "get_event_log_stats"]
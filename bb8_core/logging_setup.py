@@ -1,10 +1,15 @@
+import contextlib
+import copy
+import functools
 import json
 import logging
 import os
 import pathlib
+import queue
 import re
 import sys
 import tempfile
+import threading
 
 # Use shared config
 try:
@@ -25,20 +30,295 @@ def redact(s: str) -> str:
     return REDACT.sub(lambda m: f"{m.group(1)}=***REDACTED***", s)
 
 
+# Key-based redaction for structured (dict) records: the same names as
+# REDACT, matched as whole words of the key ("api-token", "mqtt_password"
+# but not "tokens"); "_" separates words too, and two adjacent words can
+# spell a compound name ("api_key", "API-KEY")
+SENSITIVE_KEYS = frozenset(("pass", "password", "token", "apikey", "secret", "bearer"))
+MASK = "***REDACTED***"
+_KEY_WORDS = re.compile(r"[\W_]+")
+
+
+@functools.lru_cache(maxsize=1024)
+def _sensitive_key(key: str) -> bool:
+    words = [w for w in _KEY_WORDS.split(key.lower()) if w]
+    compounds = (a + b for a, b in zip(words, words[1:], strict=False))
+    return any(w in SENSITIVE_KEYS for w in (*words, *compounds))
+
+
+def redact_fields(value):
+    """Mask sensitive fields of a structured value in one walk.
+
+    Values under a sensitive key are replaced by ``MASK`` (``None`` and
+    booleans are kept); other strings get the ``redact`` regex, since
+    free-form text such as an error message can still carry ``token=...``;
+    other scalars are left alone. Containers are copied only when something
+    in them changed, so a clean record is returned as is.
+    """
+    if isinstance(value, str):
+        # REDACT needs a ":" or "=": most values (names, topics) have neither
+        return redact(value) if "=" in value or ":" in value else value
+    if isinstance(value, dict):
+        out = None
+        for k, v in value.items():
+            if isinstance(k, str) and _sensitive_key(k):
+                new = v if v is None or isinstance(v, bool) else MASK
+            else:
+                new = redact_fields(v)
+            if new is not v:
+                if out is None:
+                    out = dict(value)
+                out[k] = new
+        return value if out is None else out
+    if isinstance(value, (list, tuple)):
+        items = [redact_fields(v) for v in value]
+        changed = any(n is not v for n, v in zip(items, value, strict=True))
+        return items if changed else value
+    return value
+
+
+def _redacted_str(obj) -> str:
+    # json.dumps fallback for objects without a JSON form
+    return redact(str(obj))
+
+
 class JsonRedactingHandler(logging.StreamHandler):
+    def format(self, record: logging.LogRecord) -> str:
+        msg = record.msg
+        if isinstance(msg, dict):
+            return json.dumps(redact_fields(msg), default=_redacted_str)
+        return redact(str(msg))
+
     def emit(self, record: logging.LogRecord) -> None:
         try:
-            msg = record.msg
-            line = json.dumps(msg, default=str) if isinstance(msg, dict) else str(msg)
-            line = redact(line)
+            line = self.format(record)
             stream = self.stream if hasattr(self, "stream") else sys.stdout
             stream.write(line + "\n")
         except Exception:
             super().emit(record)
 
 
+# Handlers whose emit is "format, write a line": the listener batches them
+_LINE_EMITS = (
+    logging.StreamHandler.emit,
+    logging.FileHandler.emit,
+    JsonRedactingHandler.emit,
+)
+
+
+class LogListener:
+    """Background thread that formats, redacts and writes queued records.
+
+    Producers only enqueue (``put``); the queue is bounded and a record that
+    does not fit is dropped and counted, never waited for. The listener
+    drains up to ``batch_size`` records at a time, writes each stream
+    handler's lines in one write and flushes once per batch. After drops it
+    writes a ``log_records_dropped`` record. ``flush`` waits until
+    everything queued before it has been written.
+    """
+
+    def __init__(self, maxsize: int = 10000, batch_size: int = 256) -> None:
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._notice: tuple[logging.Handler, ...] = ()
+        self._dropped_unreported = 0
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.max_batch = 0
+
+    def put(self, targets: tuple[logging.Handler, ...], record) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait((targets, record))
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+            self._dropped_unreported += 1
+
+    def flush(self, timeout: float = 2.0) -> bool:
+        """Block until records queued so far are written (False on timeout)."""
+        thread = self._thread
+        if thread is None or threading.current_thread() is thread:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put((None, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "max_batch": self.max_batch,
+            "depth": self._queue.qsize(),
+            "maxsize": self._queue.maxsize,
+        }
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                thread = threading.Thread(
+                    target=self._run, name="bb8-log-listener", daemon=True
+                )
+                thread.start()
+                self._thread = thread
+
+    def _run(self) -> None:
+        q = self._queue
+        while True:
+            batch = [q.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            with contextlib.suppress(Exception):  # the listener must survive
+                self._write(batch)
+
+    def _write(self, batch: list) -> None:
+        markers = [record for targets, record in batch if targets is None]
+        try:
+            self._write_records(batch)
+        finally:
+            self.written += len(batch) - len(markers)
+            self.batches += 1
+            self.max_batch = max(self.max_batch, len(batch))
+            for done in markers:
+                done.set()
+
+    def _write_records(self, batch: list) -> None:
+        pending: dict[logging.Handler, list] = {}
+        for targets, record in batch:
+            if targets is not None:
+                for h in targets:
+                    pending.setdefault(h, []).append(record)
+        if self._dropped_unreported:
+            dropped, self._dropped_unreported = self._dropped_unreported, 0
+            notice = logging.LogRecord(
+                logger.name,
+                logging.WARNING,
+                __file__,
+                0,
+                {
+                    "event": "log_records_dropped",
+                    "dropped": dropped,
+                    "total_dropped": self.dropped,
+                },
+                None,
+                None,
+            )
+            for h in self._notice:
+                pending.setdefault(h, []).append(notice)
+        for h, records in pending.items():
+            with contextlib.suppress(Exception):
+                self._emit(h, records)
+
+    @staticmethod
+    def _emit(h: logging.Handler, records: list) -> None:
+        stream = getattr(h, "stream", None)
+        if type(h).emit not in _LINE_EMITS or stream is None:
+            for record in records:
+                h.handle(record)
+            if hasattr(h, "flush"):
+                h.flush()
+            return
+        lines = []
+        for record in records:
+            if record.levelno < h.level or not h.filter(record):
+                continue
+            try:
+                lines.append(h.format(record))
+            except Exception:
+                h.handleError(record)
+        if not lines:
+            return
+        terminator = getattr(h, "terminator", "\n")
+        h.acquire()
+        try:
+            stream.write(terminator.join(lines) + terminator)
+            h.flush()
+        except Exception:
+            h.handleError(records[-1])
+        finally:
+            h.release()
+
+
+_EXC_FORMATTER = logging.Formatter()
+
+
+def _snapshot(value):
+    # Copy the containers of a structured message; leaves are shared
+    if isinstance(value, dict):
+        return {k: _snapshot(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_snapshot(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_snapshot(v) for v in value)
+    return value
+
+
+class QueueLogHandler(logging.Handler):
+    """Hands records to the shared ``LogListener`` for a set of handlers.
+
+    On the calling thread (event loop, paho's network thread) a log call
+    costs record creation, ``prepare`` and a non-blocking enqueue; JSON
+    serialization, redaction and the write happen on the listener.
+    """
+
+    def __init__(self, targets, listener: LogListener) -> None:
+        super().__init__()
+        self.targets = tuple(targets)
+        self.listener = listener
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.listener.put(self.targets, self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Freeze what the caller may still mutate, like ``QueueHandler.prepare``.
+
+        A dict message stays structured for ``JsonRedactingHandler`` but its
+        containers are copied, nested ones included. Any other message is
+        merged with its args now, and a traceback is rendered to ``exc_text``,
+        so the listener never touches the caller's objects. Other handlers
+        of the logger still see the original record.
+        """
+        record = copy.copy(record)
+        if isinstance(record.msg, dict):
+            record.msg = _snapshot(record.msg)
+        else:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def flush(self) -> None:
+        self.listener.flush()
+
+
 # Structured loggers for evidence-friendly logs
 LOG_LEVEL = _cfg.get("LOG_LEVEL") or os.environ.get("BB8_LOG_LEVEL", "DEBUG")
+try:
+    LOG_QUEUE_SIZE = int(
+        _cfg.get("LOG_QUEUE_SIZE") or os.environ.get("BB8_LOG_QUEUE_SIZE", 10000)
+    )
+except (TypeError, ValueError):
+    LOG_QUEUE_SIZE = 10000
+_listener = LogListener(maxsize=max(1, LOG_QUEUE_SIZE))
 # Use module qualified logger names so tests that import logger expect the
 # module path to match.
 logger = logging.getLogger(__name__)
@@ -68,7 +348,11 @@ for log in (logger, bridge_logger, ble_logger):
 
 # Ensure all log handlers are flushed on exit
 def _flush_all_log_handlers():
-    """Flush all log handlers safely, handling already-closed streams."""
+    """Flush all log handlers safely, handling already-closed streams.
+
+    A ``QueueLogHandler`` flush first waits for the listener to write
+    everything queued, so nothing logged before exit is lost.
+    """
     # Allow tests to patch logging.getLogger() and return a mock root logger.
     # Consult the root logger first (as tests do), then fall back to module
     # loggers to ensure real runtime behaviour is preserved.
@@ -248,12 +532,33 @@ def setup_logging(level: str | None = None):
             log.addHandler(JsonRedactingHandler())
 
 
+def get_log_stats() -> dict:
+    """Log pipeline counters: enqueued, written, dropped, batches, depth."""
+    return _listener.stats()
+
+
+def _install_queue(*logs: logging.Logger) -> None:
+    """Move each logger's handlers behind the shared listener."""
+    for log in logs:
+        targets = [h for h in log.handlers if not isinstance(h, QueueLogHandler)]
+        if not targets:
+            continue
+        if not _listener._notice:
+            _listener._notice = tuple(targets)
+        log.handlers = [QueueLogHandler(targets, _listener)]
+
+
 __all__ = [
     "LOG_LEVEL_MAP",
+    "LogListener",
+    "QueueLogHandler",
     "_flush_all_log_handlers",
     "_get_log_level",
     "get_log_level",
+    "get_log_stats",
     "logger",
+    "redact",
+    "redact_fields",
     "setup_logging",
 ]
 
@@ -282,3 +587,6 @@ if not logger.handlers:
     h.setFormatter(fmt)
     logger.addHandler(h)
     logger.propagate = False
+
+# Log calls only enqueue; the listener thread serializes and writes
+_install_queue(logger, bridge_logger, ble_logger)
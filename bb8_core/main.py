@@ -5,7 +5,6 @@ import logging
 import os
 import signal
 import sys
-import threading
 import time
 
 logger = logging.getLogger(__name__)
@@ -30,23 +29,18 @@ def _write_atomic(path: str, content: str) -> None:
 
 
 def _start_heartbeat(path: str, interval: int) -> None:
+    from .timer_wheel import get_timer_wheel
+
     interval = 2 if interval < 2 else interval  # lower bound
 
     def _hb():
-        # write immediately, then tick
         try:
             _write_atomic(path, f"{time.time()}\n")
         except Exception as e:
-            logger.debug("heartbeat initial write failed: %s", e)
-        while True:
-            try:
-                _write_atomic(path, f"{time.time()}\n")
-            except Exception as e:
-                logger.debug("heartbeat write failed: %s", e)
-            time.sleep(interval)
-
-    t = threading.Thread(target=_hb, daemon=True)
-    t.start()
+            logger.debug("heartbeat write failed: %s", e)
+
+    # write immediately, then tick on the shared timer wheel
+    get_timer_wheel().call_every(interval, _hb, name=f"heartbeat:{path}", first=0.0)
 
 
 ENABLE_HEALTH_CHECKS = _env_truthy(os.environ.get("ENABLE_HEALTH_CHECKS", "0"))
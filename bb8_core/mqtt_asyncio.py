@@ -0,0 +1,209 @@
+"""
+mqtt_asyncio.py
+
+Asyncio-native MQTT transport: the shared paho client without a network thread.
+
+``AsyncioTransport`` drives the client's socket from the running event loop
+through paho's external-loop API (``loop_read``/``loop_write``/``loop_misc``
+plus the ``on_socket_*`` callbacks). Inbound messages are dispatched by the
+router on the loop thread, so command handlers can create tasks and touch
+facade state directly; nothing crosses a thread boundary between the broker
+socket and the BLE dispatch.
+
+Select it with ``mqtt_transport: "asyncio"`` (the default for the
+controller); ``"thread"`` keeps paho's ``loop_start`` network thread.
+
+QoS 1 flow control: at most ``mqtt_max_inflight`` publishes wait for a
+PUBACK (``resolve_max_inflight``, applied with paho's
+``max_inflight_messages_set``). Further publishes queue in the client and
+go out as PUBACKs are read on the loop, so a burst of acks or state
+cannot flood the broker or grow paho's retry set without bound.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+import socket
+import threading
+from collections.abc import Callable
+from typing import Any
+
+from .logging_setup import logger
+
+_MISC_INTERVAL_S = 1.0
+_RECONNECT_MIN_S = 1.0
+_RECONNECT_MAX_S = 30.0
+_READ_BURST = 64
+_MAX_INFLIGHT = 20
+
+
+def _buffered(sock: Any) -> bool:
+    """Whether ``sock`` has more bytes to read right now (never blocks)."""
+    pending = getattr(sock, "pending", None)
+    if pending is not None:
+        return bool(pending())  # TLS: decrypted bytes only
+    try:
+        return bool(sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT))
+    except (BlockingIOError, InterruptedError):
+        return False
+    except OSError:
+        return False
+
+
+def resolve_transport(config: dict[str, Any] | None = None) -> str:
+    """ENV BB8_MQTT_TRANSPORT > config mqtt_transport > "asyncio"."""
+    raw = os.environ.get("BB8_MQTT_TRANSPORT") or (config or {}).get("mqtt_transport")
+    value = str(raw or "").strip().lower()
+    return "thread" if value in ("thread", "threaded", "paho") else "asyncio"
+
+
+def resolve_max_inflight(config: dict[str, Any] | None = None) -> int:
+    """ENV BB8_MQTT_MAX_INFLIGHT > config mqtt_max_inflight > 20 (min 1)."""
+    raw = os.environ.get("BB8_MQTT_MAX_INFLIGHT") or (config or {}).get(
+        "mqtt_max_inflight"
+    )
+    try:
+        return max(1, int(raw)) if raw not in (None, "") else _MAX_INFLIGHT
+    except (TypeError, ValueError):
+        return _MAX_INFLIGHT
+
+
+class AsyncioTransport:
+    """Runs a paho client's network I/O on an asyncio event loop."""
+
+    def __init__(
+        self,
+        client: Any,
+        loop: asyncio.AbstractEventLoop,
+        *,
+        reconnect_min_s: float = _RECONNECT_MIN_S,
+        reconnect_max_s: float = _RECONNECT_MAX_S,
+    ) -> None:
+        self.client = client
+        self.loop = loop
+        self.reconnect_min_s = reconnect_min_s
+        self.reconnect_max_s = reconnect_max_s
+        self._thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self.connect_attempts = 0
+        self.reads = 0
+        self.writes = 0
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+
+    # ----------------------------------------------------- socket callbacks
+
+    def _on_loop(self, fn: Callable[..., Any], *args: Any) -> None:
+        # connect()/reconnect() run in the executor; everything else is on
+        # the loop already
+        if threading.get_ident() == self._thread_id:
+            fn(*args)
+        else:
+            self.loop.call_soon_threadsafe(fn, *args)
+
+    def _read(self) -> None:
+        # paho's loop_read handles one packet; drain what is already buffered
+        # (bounded, so a flood cannot starve other tasks) instead of paying
+        # a selector round trip per message
+        for _ in range(_READ_BURST):
+            self.reads += 1
+            if self.client.loop_read() != 0:
+                return
+            sock = self.client.socket()
+            if sock is None or not _buffered(sock):
+                return
+
+    def _write(self) -> None:
+        self.writes += 1
+        self.client.loop_write()
+
+    def _on_socket_open(self, _client, _userdata, sock) -> None:
+        self._on_loop(self.loop.add_reader, sock, self._read)
+
+    def _on_socket_close(self, _client, _userdata, sock) -> None:
+        self._on_loop(self._forget, sock)
+
+    def _forget(self, sock) -> None:
+        with contextlib.suppress(Exception):
+            self.loop.remove_reader(sock)
+        with contextlib.suppress(Exception):
+            self.loop.remove_writer(sock)
+
+    def _on_socket_register_write(self, _client, _userdata, sock) -> None:
+        self._on_loop(self.loop.add_writer, sock, self._write)
+
+    def _on_socket_unregister_write(self, _client, _userdata, sock) -> None:
+        self._on_loop(self.loop.remove_writer, sock)
+
+    # ------------------------------------------------------------ lifecycle
+
+    def start(self, host: str, port: int, keepalive: int = 60) -> None:
+        """Start the connect/keepalive supervisor; call on the loop thread."""
+        self._thread_id = threading.get_ident()
+        self._task = self.loop.create_task(
+            self._supervise(str(host), int(port), int(keepalive))
+        )
+
+    async def _supervise(self, host: str, port: int, keepalive: int) -> None:
+        delay = self.reconnect_min_s
+        first = True
+        while not self._closing:
+            if self.client.socket() is None:
+                self.connect_attempts += 1
+                try:
+                    # Only the blocking TCP connect leaves the loop
+                    if first:
+                        await self.loop.run_in_executor(
+                            None, self.client.connect, host, port, keepalive
+                        )
+                    else:
+                        await self.loop.run_in_executor(None, self.client.reconnect)
+                    first = False
+                    delay = self.reconnect_min_s
+                except (OSError, ValueError) as e:
+                    logger.warning(
+                        {
+                            "event": "mqtt_asyncio_connect_failed",
+                            "host": host,
+                            "port": port,
+                            "error": repr(e),
+                            "retry_s": delay,
+                        }
+                    )
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.reconnect_max_s)
+                    continue
+            self.client.loop_misc()
+            await asyncio.sleep(_MISC_INTERVAL_S)
+
+    async def close(self) -> None:
+        self._closing = True
+        with contextlib.suppress(Exception):
+            self.client.disconnect()
+        sock = self.client.socket()
+        if sock is not None:
+            self._forget(sock)
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "transport": "asyncio",
+            "connect_attempts": self.connect_attempts,
+            "reads": self.reads,
+            "writes": self.writes,
+        }
+
+
+__all__ = [
+    "AsyncioTransport",
+    "resolve_max_inflight",
+    "resolve_transport",
+]
@@ -0,0 +1,391 @@
+"""
+mqtt_connection.py
+
+One MQTT connection per add-on process, plus an in-process topic bus.
+
+``open_connection`` creates (once) the paho client that the controller,
+the dispatcher, the evidence recorder and the B1 probe share: one TCP
+connection, one keepalive, one reconnect loop and one network thread (or,
+with ``start(..., loop=loop)``, no thread at all: see ``mqtt_asyncio``).
+Components register ``on_connect``/``on_disconnect`` listeners instead of
+overwriting the client's callbacks, and route messages through
+``router_for(client)``.
+
+``InProcessBus`` implements ``ports.MqttBus`` on top of it. Local
+subscribers get messages published in-process directly, without the
+broker round trip; topics under ``<base>/internal/`` never leave the
+process. Anything else is also published to the broker, and the broker's
+echo of our own publish is dropped so local subscribers see it once.
+Threads that have no loop (the BLE presence monitor) use
+``publish_threadsafe``, which hands the publish to the subscribers' loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from .logging_setup import logger
+from .mqtt_asyncio import AsyncioTransport
+from .mqtt_router import MqttRouter, move_router, router_for
+
+BusCallback = Callable[[str, bytes, bool], Awaitable[None]]
+
+_ECHO_TTL_S = 10.0
+
+
+class MqttConnection:
+    """Owns the process-wide paho client and fans out its callbacks."""
+
+    def __init__(self, client: Any, factory: Callable[..., Any] | None = None) -> None:
+        self.client = client
+        self.owners: set[str] = set()
+        self._factory = factory
+        self._configurers: list[Callable[[Any], Any]] = []
+        self._connect_listeners: list[Callable[..., Any]] = []
+        self._disconnect_listeners: list[Callable[..., Any]] = []
+        self._client_listeners: list[Callable[[Any, Any], Any]] = []
+        self._lock = threading.Lock()
+        self._started = False
+        # (host, port, keepalive, loop) once started
+        self._endpoint: tuple[str, int, int, Any] = ("", 0, 60, None)
+        self.transport: Any = None
+        self.connects = 0
+        self.recreated = 0
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+
+    def acquire(self, owner: str) -> Any:
+        """Register a component as a user of the shared client and return it."""
+        with self._lock:
+            self.owners.add(owner)
+        logger.info({"event": "mqtt_connection_shared", "owner": owner})
+        return self.client
+
+    def add_connect_listener(self, fn: Callable[..., Any]) -> None:
+        with self._lock:
+            if fn not in self._connect_listeners:
+                self._connect_listeners.append(fn)
+
+    def add_disconnect_listener(self, fn: Callable[..., Any]) -> None:
+        with self._lock:
+            if fn not in self._disconnect_listeners:
+                self._disconnect_listeners.append(fn)
+
+    def add_client_listener(self, fn: Callable[[Any, Any], Any]) -> None:
+        """Call ``fn(old, new)`` when ``recreate`` replaces the client."""
+        with self._lock:
+            if fn not in self._client_listeners:
+                self._client_listeners.append(fn)
+
+    def configure(self, fn: Callable[[Any], Any]) -> None:
+        """Apply ``fn(client)`` (credentials, will, TLS) now and to any
+        client created later by ``recreate``."""
+        with self._lock:
+            self._configurers.append(fn)
+        fn(self.client)
+
+    def _fan_out(self, listeners: list[Callable[..., Any]], *args: Any) -> None:
+        for fn in list(listeners):
+            try:
+                fn(*args)
+            except Exception as e:  # noqa: BLE001
+                logger.warning(
+                    {
+                        "event": "mqtt_connection_listener_error",
+                        "listener": getattr(fn, "__qualname__", repr(fn)),
+                        "error": repr(e),
+                    }
+                )
+
+    def _on_connect(self, client, userdata, flags, rc, properties=None):
+        self.connects += 1
+        self._fan_out(self._connect_listeners, client, userdata, flags, rc, properties)
+
+    def _on_disconnect(self, client, userdata, flags, rc, properties=None):
+        self._fan_out(
+            self._disconnect_listeners, client, userdata, flags, rc, properties
+        )
+
+    def start(
+        self,
+        host: str,
+        port: int,
+        keepalive: int = 60,
+        loop: asyncio.AbstractEventLoop | None = None,
+    ) -> bool:
+        """Connect once; later calls are no-ops.
+
+        With ``loop`` the socket is driven by that event loop (call from the
+        loop thread); otherwise paho's network thread is started.
+        """
+        with self._lock:
+            if self._started:
+                return False
+            self._started = True
+            self._endpoint = (str(host), int(port), int(keepalive), loop)
+        self._run(self.client)
+        logger.info(
+            {
+                "event": "mqtt_connection_started",
+                "host": host,
+                "port": int(port),
+                "transport": "thread" if loop is None else "asyncio",
+            }
+        )
+        return True
+
+    def _run(self, client: Any) -> None:
+        host, port, keepalive, loop = self._endpoint
+        if loop is not None:
+            self.transport = AsyncioTransport(client, loop)
+            self.transport.start(host, port, keepalive)
+        else:
+            client.connect_async(host, port, keepalive)
+            client.loop_start()
+
+    def _stop(self, client: Any) -> None:
+        transport = self.transport
+        if transport is not None:
+            self.transport = None
+            asyncio.run_coroutine_threadsafe(transport.close(), transport.loop)
+            return
+        try:
+            client.disconnect()
+            client.loop_stop()
+        except Exception as e:  # noqa: BLE001
+            logger.debug({"event": "mqtt_connection_stop_failed", "error": repr(e)})
+
+    def recreate(self, **overrides: Any) -> Any:
+        """Replace the paho client with a new one from the factory.
+
+        For settings paho fixes at construction, such as the protocol
+        version. Call from the connection's own callbacks (paho's network
+        thread, or the event loop with the asyncio transport). Routes and
+        configuration move to the new client; components holding the old
+        one are told through ``add_client_listener``.
+        """
+        if self._factory is None:
+            raise RuntimeError("mqtt connection has no client factory")
+        old = self.client
+        new = self._factory(**overrides)
+        with self._lock:
+            configurers = list(self._configurers)
+        for fn in configurers:
+            fn(new)
+        new.on_connect = self._on_connect
+        new.on_disconnect = self._on_disconnect
+        move_router(old, new)
+        self.client = new
+        self.recreated += 1
+        if self._started:
+            self._stop(old)
+            self._run(new)
+        logger.warning(
+            {
+                "event": "mqtt_connection_recreated",
+                "overrides": sorted(overrides),
+            }
+        )
+        self._fan_out(self._client_listeners, old, new)
+        return new
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "connections": 1 if self._started else 0,
+            "owners": sorted(self.owners),
+            "connects": self.connects,
+            "recreated": self.recreated,
+            "transport": "asyncio" if self.transport is not None else "thread",
+            "threads": threading.active_count(),
+        }
+
+
+_CONNECTION: MqttConnection | None = None
+_CONNECTION_LOCK = threading.Lock()
+
+
+def open_connection(factory: Callable[..., Any], owner: str) -> MqttConnection:
+    """Create the shared connection on first use; later callers share it.
+
+    ``factory`` is kept so ``MqttConnection.recreate`` can build a
+    replacement client; it must accept the overrides passed there.
+    """
+    global _CONNECTION
+    with _CONNECTION_LOCK:
+        if _CONNECTION is None:
+            _CONNECTION = MqttConnection(factory(), factory)
+    _CONNECTION.acquire(owner)
+    return _CONNECTION
+
+
+def current_connection() -> MqttConnection | None:
+    """The shared connection if one was opened in this process."""
+    return _CONNECTION
+
+
+class InProcessBus:
+    """``ports.MqttBus`` with in-process delivery for local subscribers."""
+
+    def __init__(self, client: Any | None = None, base: str = "bb8") -> None:
+        self.client = client
+        self.internal_prefix = f"{base.rstrip('/')}/internal/"
+        self._local = MqttRouter()
+        self._lock = threading.Lock()
+        self._echoes: dict[tuple[str, bytes], list[float]] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._filters: set[str] = set()
+        self._wire_filters: set[str] = set()
+        self.local_delivered = 0
+        self.remote_delivered = 0
+        self.echoes_dropped = 0
+        self.published_external = 0
+
+    @staticmethod
+    def _bytes(payload: Any) -> bytes:
+        if isinstance(payload, bytes):
+            return payload
+        if isinstance(payload, (bytearray, memoryview)):
+            return bytes(payload)
+        return b"" if payload is None else str(payload).encode("utf-8")
+
+    def is_internal(self, topic: str) -> bool:
+        return topic.startswith(self.internal_prefix)
+
+    async def publish(
+        self, topic: str, payload: Any, retain: bool = False, qos: int = 0
+    ) -> None:
+        data = self._bytes(payload)
+        routes = self._local.match(topic)
+        if self.client is not None and not self.is_internal(topic):
+            if any(r.filter in self._wire_filters for r in routes):
+                # Our wire subscription will see this message again
+                self._expect_echo(topic, data)
+            self.client.publish(topic, payload=data, qos=qos, retain=retain)
+            self.published_external += 1
+        for route in routes:
+            self.local_delivered += 1
+            await route.handler(topic, data, retain)
+
+    def publish_threadsafe(
+        self, topic: str, payload: Any, retain: bool = False, qos: int = 0
+    ) -> bool:
+        """Publish from a thread without a loop; False if nothing subscribed yet."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return False
+        asyncio.run_coroutine_threadsafe(
+            self.publish(topic, payload, retain=retain, qos=qos), loop
+        )
+        return True
+
+    async def subscribe(self, topic: str, cb: BusCallback) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._local.add(topic, cb, 0)
+        self._filters.add(topic)
+        if self.client is not None and not self.is_internal(topic):
+            route = router_for(self.client).add(
+                topic, self._on_wire, 0, name=f"bus:{topic}", replace=False
+            )
+            if route.handler == self._on_wire:
+                self._wire_filters.add(topic)
+            else:
+                logger.warning(
+                    {
+                        "event": "mqtt_bus_filter_already_routed",
+                        "topic": topic,
+                        "route": route.name,
+                    }
+                )
+
+    def _expect_echo(self, topic: str, data: bytes) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if len(self._echoes) > 256:
+                # Echoes that never arrived (e.g. broker ACL, disconnect)
+                self._echoes = {
+                    k: v for k, v in self._echoes.items() if now - v[-1] <= _ECHO_TTL_S
+                }
+            self._echoes.setdefault((topic, data), []).append(now)
+
+    def _is_echo(self, topic: str, data: bytes) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            stamps = self._echoes.get((topic, data))
+            if not stamps:
+                return False
+            while stamps and now - stamps[0] > _ECHO_TTL_S:
+                stamps.pop(0)
+            if not stamps:
+                del self._echoes[(topic, data)]
+                return False
+            stamps.pop(0)
+            if not stamps:
+                del self._echoes[(topic, data)]
+            return True
+
+    def _on_wire(self, _client: Any, _userdata: Any, msg: Any) -> None:
+        """paho thread: hand broker messages to subscribers on the bus loop."""
+        topic = msg.topic
+        data = self._bytes(msg.payload)
+        if self._is_echo(topic, data):
+            self.echoes_dropped += 1
+            return
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        retain = bool(getattr(msg, "retain", False))
+        for route in self._local.match(topic):
+            self.remote_delivered += 1
+            asyncio.run_coroutine_threadsafe(route.handler(topic, data, retain), loop)
+
+    async def close(self) -> None:
+        router = router_for(self.client) if self.client is not None else None
+        for topic_filter in self._filters:
+            self._local.remove(topic_filter)
+            if router is not None and topic_filter in self._wire_filters:
+                router.remove(topic_filter)
+        self._filters.clear()
+        self._wire_filters.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "local_delivered": self.local_delivered,
+            "remote_delivered": self.remote_delivered,
+            "echoes_dropped": self.echoes_dropped,
+            "published_external": self.published_external,
+        }
+
+
+_BUS: InProcessBus | None = None
+
+
+def get_bus(base: str = "bb8") -> InProcessBus:
+    """Process-wide bus bound to the shared connection (local-only if none)."""
+    global _BUS
+    if _BUS is None:
+        conn = current_connection()
+        bus = InProcessBus(conn.client if conn else None, base=base)
+        if conn is not None:
+            # Wire routes move with the client; keep publishing on the new one
+            conn.add_client_listener(lambda _old, new: setattr(bus, "client", new))
+        _BUS = bus
+    return _BUS
+
+
+def current_bus() -> InProcessBus | None:
+    """The process-wide bus if ``get_bus`` created one."""
+    return _BUS
+
+
+__all__ = [
+    "InProcessBus",
+    "MqttConnection",
+    "current_bus",
+    "current_connection",
+    "get_bus",
+    "open_connection",
+]
@@ -6,6 +6,7 @@ import json
 import logging
 import os
 import socket
+import threading
 import time
 from collections.abc import Callable
 from datetime import UTC, datetime
@@ -17,7 +18,13 @@ from paho.mqtt.enums import CallbackAPIVersion
 from .addon_config import CONFIG, CONFIG_SOURCE, init_config
 from .bb8_presence_scanner import publish_discovery as _publish_discovery_async
 from .common import CMD_TOPICS, STATE_TOPICS
+from .log_events import EventLog
 from .logging_setup import logger
+from .mqtt_connection import current_connection
+from .mqtt_outbox import PublishHandle, get_outbox
+from .mqtt_router import router_for
+from .offline_outbox import get_offline_outbox
+from .retained_cache import get_retained_cache
 
 """
 mqtt_dispatcher.py
@@ -27,6 +34,10 @@ the BLE bridge/controller, and publishes status + discovery information for HA.
 """
 log = logging.getLogger(__name__)
 
+# Every state/status publish passes through here; one record a second with
+# a count of the ones in between is enough to see the traffic
+_PUBLISH_LOG = EventLog(logger, "mqtt_publish", logging.INFO, per_s=1.0)
+
 SCANNER_PUBLISH_HOOK: Callable[..., None] | None = None
 
 # Idempotency set for scanner discovery publisher (per-entity unique_id)
@@ -295,8 +306,8 @@ _DISPATCHER_STARTED: bool = False
 # (host, port, topic, client_id, user_present)
 _START_KEY: tuple[str, int, str, str, bool] | None = None
 CLIENT: Any | None = None
+# (topic, handler) registered before a client exists; routed on first bind
 _PENDING_SUBS: list = []
-_BOUND_TOPICS: set = set()
 
 
 # ---- Optional: LED discovery (gated by config) ------------------------------
@@ -909,22 +920,27 @@ def start_mqtt_dispatcher(
             clean_session=True,
         )
 
-    client = get_mqtt_client()
+    # Reuse the process-wide connection when the controller already opened one
+    shared = current_connection()
+    if shared is not None:
+        client = shared.acquire("mqtt_dispatcher")
+    else:
+        client = get_mqtt_client()
 
-    # Auth
-    if username is not None:
-        client.username_pw_set(username=username, password=(password or ""))
+        # Auth
+        if username is not None:
+            client.username_pw_set(username=username, password=(password or ""))
 
-    # TLS (optional)
-    if tls:
-        client.tls_set()  # customize CA/cert paths if needed
-        # client.tls_insecure_set(True)  # only if you accept self-signed risk
+        # TLS (optional)
+        if tls:
+            client.tls_set()  # customize CA/cert paths if needed
+            # client.tls_insecure_set(True)  # only if you accept self-signed risk
 
-    # LWT/availability
-    client.will_set(status_topic, payload="offline", qos=qos, retain=True)
+        # LWT/availability
+        client.will_set(status_topic, payload="offline", qos=qos, retain=True)
 
-    # Reconnect backoff (let paho handle retries)
-    client.reconnect_delay_set(min_delay=1, max_delay=30)
+        # Reconnect backoff (let paho handle retries)
+        client.reconnect_delay_set(min_delay=1, max_delay=30)
 
     # ---- Callbacks ----
     def _on_connect(client, userdata, flags, rc, properties=None):
@@ -937,6 +953,7 @@ def start_mqtt_dispatcher(
             global _CONNECTED_AT, _OFFLINE_SINCE
             _CONNECTED_AT = time.time()
             _OFFLINE_SINCE = None
+            get_retained_cache().clear(client)
             # Policy: status 'online' is retained for fast consumer bootstrap
             client.publish(status_topic, payload="online", qos=qos, retain=True)
             try:
@@ -978,8 +995,9 @@ def start_mqtt_dispatcher(
                     pass
 
             try:
-                client.message_callback_add(echo_cmd_topic, _on_echo_cmd)
-                client.subscribe(echo_cmd_topic, qos=0)
+                # batch() re-issues the full SUBSCRIBE set for this session
+                with router_for(client).batch() as router:
+                    router.add(echo_cmd_topic, _on_echo_cmd, 0, name="echo/cmd")
                 logger.info(
                     {
                         "event": "mqtt_subscribed",
@@ -1017,6 +1035,12 @@ def start_mqtt_dispatcher(
         # Note: disconnects are common; keep at INFO
         logger.info({"event": "mqtt_disconnect", "rc": rc})
 
+    if shared is not None:
+        shared.add_connect_listener(_on_connect)
+        shared.add_disconnect_listener(_on_disconnect)
+        shared.start(str(mqtt_host), mqtt_port, keepalive)
+        return client
+
     client.on_connect = _on_connect
     client.on_disconnect = _on_disconnect
 
@@ -1077,60 +1101,34 @@ def get_client() -> Any | None:
     return CLIENT
 
 
-def _make_cb(handler):
-    """
-    Wraps a handler function to process MQTT message payloads as UTF-8 text.
-    Used as a callback for MQTT topic subscriptions.
-    """
-
-    def _cb(_client, _userdata, message):
-        payload = message.payload or b""
-        try:
-            text = payload.decode("utf-8")
-        except Exception:
-            text = ""
-        handler(text)
-
-    return _cb
-
-
 def _bind_subscription(topic, handler):
     """
-    Bind an MQTT topic subscription to a handler function.
-    Adds a message callback for the given topic and subscribes to it if not
-    already bound. Returns True if successful, False otherwise.
+    Route an MQTT topic filter to a text handler on the active client.
+    The client's router owns the SUBSCRIBE; re-registering a topic replaces
+    its handler. Returns True if bound, False if no client exists yet.
     """
     if CLIENT is None:
         return False
-    if topic in _BOUND_TOPICS:
-        return True
     try:
-        CLIENT.message_callback_add(topic, _make_cb(handler))
-        CLIENT.subscribe(topic, qos=1)
-        _BOUND_TOPICS.add(topic)
+        router_for(CLIENT).add(topic, handler, 1, text=True)
         log.info("mqtt_sub topic=%s qos=1", topic)
         return True
     except Exception as exc:
         log.warning("failed to subscribe %s: %s", topic, exc)
         return False
-        return True
 
 
 def _apply_pending_subscriptions():
     """
-    Attempt to bind all pending MQTT topic subscriptions to the active client.
-    Removes successfully bound subscriptions from the pending list.
+    Bind all pending subscriptions to the active client in one batched
+    SUBSCRIBE. Successfully bound entries are removed from the pending list.
     """
-    if CLIENT is None:
+    if CLIENT is None or not _PENDING_SUBS:
         return
-    for topic, handler in list(_PENDING_SUBS):
-        if _bind_subscription(topic, handler):
-            import contextlib
-
-            with contextlib.suppress(ValueError):
-                _PENDING_SUBS.remove((topic, handler))
-        if _bind_subscription(topic, handler):
-            import contextlib
+    with router_for(CLIENT).batch():
+        for entry in list(_PENDING_SUBS):
+            if _bind_subscription(*entry):
+                _PENDING_SUBS.remove(entry)
 
 
 def register_subscription(topic, handler):
@@ -1168,6 +1166,7 @@ __all__ = [
     "ensure_dispatcher_started",
     "start_mqtt_dispatcher",
     "get_client",
+    "enqueue_publish",
     "register_subscription",
     "turn_on_bb8",
     "turn_off_bb8",
@@ -1179,13 +1178,11 @@ __all__ = [
 # -----------------------------------------------------------------------------
 
 # Module-level counters and state
-_PUBLISH_QUEUE: list[
-    tuple[str, str, int, bool, float]
-] = []  # (topic, payload, qos, retain, ts)
+_REPLAY_THREAD: threading.Thread | None = None
+_REPLAY_LOCK = threading.Lock()
 _OFFLINE_SINCE: float | None = None
 _PROCESS_STARTED_AT: float = time.time()
 _CONNECTED_AT: float | None = None
-mqtt_publish_failures_total: int = 0
 
 
 def _json_sanitise(obj: Any) -> Any:
@@ -1234,15 +1231,21 @@ def _publish_metrics(client: Any) -> None:
     try:
         base = CONFIG.get("MQTT_BASE", "bb8")
         topic = f"{base}/status/metrics"
-        queue_depth = len(_PUBLISH_QUEUE)
+        outbox = get_outbox().stats()
         now = time.time()
         up_ratio = 0.0
         if _CONNECTED_AT is not None:
             denom = max(0.001, now - _PROCESS_STARTED_AT)
             up_ratio = max(0.0, min(1.0, (now - _CONNECTED_AT) / denom))
         payload = {
-            "publish_failures_total": mqtt_publish_failures_total,
-            "queue_depth": queue_depth,
+            "queue_depth": outbox["queue_depth"],
+            "offline_queue_depth": get_offline_outbox(CONFIG).pending(),
+            "inflight": outbox["inflight"],
+            "published_total": outbox["published_total"],
+            "dropped_total": outbox["dropped_total"],
+            "dropped": outbox["dropped"],
+            "publish_latency_ms": outbox["latency_ms"],
+            "retained_dedup": get_retained_cache().stats(),
             "uptime_ratio": round(up_ratio, 4),
             "ts": datetime.now(UTC).isoformat(),
         }
@@ -1252,66 +1255,94 @@ def _publish_metrics(client: Any) -> None:
             return
         # Use qos 0, retain False for metrics
         client.publish(topic, s, qos=0, retain=False)
-        logger.info({"event": "mqtt_publish", "topic": topic, "len": len(s)})
+        _PUBLISH_LOG(topic=topic, len=len(s))
     except Exception as e:  # noqa: BLE001
         # Metrics failures are non-fatal
         logger.debug({"event": "metrics_publish_failed", "error": repr(e)})
 
 
-def _flush_queue(client: Any, max_age_s: float = 5.0) -> None:
-    """Flush queued publishes; drop items older than max_age_s."""
-    global mqtt_publish_failures_total
-    if not _PUBLISH_QUEUE:
-        return
-    now = time.time()
-    kept: list[tuple[str, str, int, bool, float]] = []
-    to_send = []
-    for item in _PUBLISH_QUEUE:
-        if now - item[4] <= max_age_s:
-            to_send.append(item)
-        else:
-            mqtt_publish_failures_total += 1
-    # Clear queue then re-add any kept (should be none after flush)
-    _PUBLISH_QUEUE.clear()
-    for topic, payload, qos, retain, _ts in to_send:
-        try:
-            client.publish(topic, payload, qos=qos, retain=retain)
-        except Exception as e:  # noqa: BLE001
-            mqtt_publish_failures_total += 1
-            logger.debug({"event": "mqtt_publish_transient", "error": repr(e)})
-            # Requeue once at head to avoid loss if connect bounces immediately
-            kept.append((topic, payload, qos, retain, now))
-    _PUBLISH_QUEUE.extend(kept)
-    _publish_metrics(client)
+def _replay_offline(client: Any, rate_per_s: float) -> None:
+    outbox = get_outbox()
 
+    def _send(
+        topic: str, payload: str, qos: int, retain: bool
+    ) -> PublishHandle | bool:
+        is_conn = getattr(client, "is_connected", None)
+        if callable(is_conn) and not is_conn():
+            return False
+        handle = outbox.enqueue(client, topic, payload, qos=qos, retain=retain)
+        # The replay forgets the record only once the handle resolves True
+        return False if handle.reason == "queue_full" else handle
 
-def safe_publish(
-    client: Any, topic: str, payload: Any, qos: int = 0, retain: bool = False
-) -> bool:
-    """Publish safely with validation and simple backoff.
+    try:
+        get_offline_outbox(CONFIG).replay(_send, rate_per_s=rate_per_s)
+    except Exception as e:  # noqa: BLE001
+        logger.warning({"event": "offline_outbox_replay_failed", "error": repr(e)})
+    _publish_metrics(client)
 
-    - Validates topic and payload (JSON-serialisable)
-    - If client is not connected yet, enqueue and return False (will flush on connect)
-    - Backoff on transient exceptions: 0.5s, 2s, 5s (max 3 tries)
-    - DEBUG on transient errors; ERROR only on schema faults
-    Returns True if a publish was attempted (or queued), False on validation error.
+
+def _flush_queue(client: Any, rate_per_s: float | None = None) -> None:
+    """Replay the offline outbox in order, rate-limited, off the callback thread."""
+    global _REPLAY_THREAD
+    if get_offline_outbox(CONFIG).pending() == 0:
+        return
+    rate = float(
+        rate_per_s
+        if rate_per_s is not None
+        else CONFIG.get("outbox_replay_rate_per_s", 50.0)
+    )
+    with _REPLAY_LOCK:
+        if _REPLAY_THREAD is not None and _REPLAY_THREAD.is_alive():
+            return
+        _REPLAY_THREAD = threading.Thread(
+            target=_replay_offline,
+            args=(client, rate),
+            name="mqtt-offline-replay",
+            daemon=True,
+        )
+        _REPLAY_THREAD.start()
+
+
+def enqueue_publish(
+    client: Any,
+    topic: str,
+    payload: Any,
+    qos: int = 0,
+    retain: bool = False,
+    deadline_s: float | None = None,
+) -> PublishHandle | None:
+    """Validate and enqueue a publish without blocking the caller.
+
+    Returns the outbox completion handle (awaitable, or ``result(timeout)``
+    from threads), or None when the message was rejected or parked in the
+    disk-backed offline outbox because the client is not connected.
     """
-    global _OFFLINE_SINCE, mqtt_publish_failures_total
+    global _OFFLINE_SINCE
     if not topic or not isinstance(topic, str):
         logger.error({"event": "mqtt_publish_invalid_topic"})
-        return False
+        return None
     ok, payload_str, err = _validate_payload(payload)
     if not ok or payload_str is None:
-        mqtt_publish_failures_total += 1
+        get_outbox().record_drop("schema_error")
         logger.error({"event": "mqtt_publish_schema_error", "error": err})
-        return False
+        return None
 
     # Gate on connectivity if available
     is_conn = getattr(client, "is_connected", None)
     connected = bool(is_conn() if callable(is_conn) else True)
     if not connected:
-        # Queue and return; on_connect will flush
-        _PUBLISH_QUEUE.append((topic, payload_str, qos, retain, time.time()))
+        # Persist and return; on_connect replays in order
+        try:
+            get_offline_outbox(CONFIG).append(topic, payload_str, qos, retain)
+        except Exception as e:  # noqa: BLE001
+            get_outbox().record_drop("offline_persist_error")
+            logger.warning(
+                {
+                    "event": "offline_outbox_append_failed",
+                    "topic": topic,
+                    "error": repr(e),
+                }
+            )
         if _OFFLINE_SINCE is None:
             _OFFLINE_SINCE = time.time()
         else:
@@ -1322,26 +1353,36 @@ def safe_publish(
                         "secs": round(time.time() - _OFFLINE_SINCE, 1),
                     }
                 )
-        return False
+        return None
 
-    # Connected path with backoff on transient exceptions
-    backoffs = (0.5, 2.0, 5.0)
-    for i, delay in enumerate(backoffs, start=1):
+    if retain:
+        # Fresher than anything parked for this topic during an outage
         try:
-            mid = client.publish(topic, payload_str, qos=qos, retain=retain)
-            # Best-effort wait if available
-            getattr(mid, "wait_for_publish", lambda timeout=1: True)(timeout=1)
-            logger.info(
-                {"event": "mqtt_publish", "topic": topic, "len": len(payload_str)}
-            )
-            return True
+            get_offline_outbox(CONFIG).supersede(topic)
         except Exception as e:  # noqa: BLE001
-            logger.debug(
-                {"event": "mqtt_publish_transient", "try": i, "error": repr(e)}
-            )
-            time.sleep(delay)
-    mqtt_publish_failures_total += 1
-    return False
+            logger.debug({"event": "offline_outbox_supersede_failed", "error": repr(e)})
+    handle = get_outbox().enqueue(
+        client, topic, payload_str, qos=qos, retain=retain, deadline_s=deadline_s
+    )
+    _PUBLISH_LOG(topic=topic, len=len(payload_str))
+    return handle
+
+
+def safe_publish(
+    client: Any, topic: str, payload: Any, qos: int = 0, retain: bool = False
+) -> bool:
+    """Publish safely with validation; never blocks on broker acks.
+
+    - Validates topic and payload (JSON-serialisable)
+    - If client is not connected yet, persist to the offline outbox and return
+      False (replayed on connect)
+    - Otherwise hand the message to the outbox worker, which retries transient
+      errors and enforces the per-message deadline
+    - DEBUG on transient errors; ERROR only on schema faults
+    Returns True if the publish was accepted by the outbox, False otherwise.
+    """
+    handle = enqueue_publish(client, topic, payload, qos=qos, retain=retain)
+    return handle is not None and handle.reason is None
 
 
 def _cache_guard_version() -> None:
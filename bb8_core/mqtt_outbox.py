@@ -0,0 +1,425 @@
+"""
+mqtt_outbox.py
+
+Non-blocking MQTT publish pipeline.
+
+Producers (asyncio coroutines, paho callback threads, BLE worker threads)
+enqueue a message and immediately receive a PublishHandle. A single worker
+thread drains the queue in batches, hands messages to paho, and tracks QoS>0
+acknowledgements through the client's ``on_publish`` mid mapping. Every message
+carries a deadline; anything that is not acknowledged in time is dropped and
+counted instead of stalling the caller.
+
+Messages for one topic are published in the order they were enqueued. A
+publish that fails is retried from its place in the queue, and later
+messages for that topic wait behind it (other topics keep flowing), so a
+retried retained state never lands after a newer one.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import concurrent.futures
+import threading
+import time
+import weakref
+from typing import Any
+
+from .logging_setup import logger
+from .util import percentile
+
+DEFAULT_MAX_QUEUE = 1000
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_DEADLINE_S = 10.0
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_DELAY_S = 0.5
+_LATENCY_SAMPLES = 512
+_EARLY_ACK_LIMIT = 256
+
+
+class PublishHandle:
+    """Completion handle for an enqueued publish.
+
+    Resolves to True once the broker acknowledged the message (QoS>0) or paho
+    accepted it (QoS 0), and to False when it was dropped. ``reason`` carries
+    the drop reason. The handle can be awaited from any running event loop or
+    waited on synchronously with ``result()``.
+    """
+
+    __slots__ = ("_future", "reason", "topic")
+
+    def __init__(self, topic: str) -> None:
+        self._future: concurrent.futures.Future[bool] = concurrent.futures.Future()
+        self.reason: str | None = None
+        self.topic = topic
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def result(self, timeout: float | None = None) -> bool:
+        return self._future.result(timeout=timeout)
+
+    def add_done_callback(self, fn) -> None:
+        self._future.add_done_callback(lambda _f: fn(self))
+
+    def _resolve(self, ok: bool, reason: str | None = None) -> None:
+        if self._future.done():
+            return
+        self.reason = reason
+        self._future.set_result(ok)
+
+    def __await__(self):
+        return asyncio.wrap_future(self._future).__await__()
+
+
+class _Outgoing:
+    __slots__ = (
+        "client",
+        "topic",
+        "payload",
+        "qos",
+        "retain",
+        "enqueued_at",
+        "deadline",
+        "not_before",
+        "attempts",
+        "handle",
+    )
+
+    def __init__(
+        self,
+        client: Any,
+        topic: str,
+        payload: Any,
+        qos: int,
+        retain: bool,
+        enqueued_at: float,
+        deadline: float,
+    ) -> None:
+        self.client = client
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+        self.enqueued_at = enqueued_at
+        self.deadline = deadline
+        self.not_before = 0.0
+        self.attempts = 0
+        self.handle = PublishHandle(topic)
+
+
+class MqttOutbox:
+    """Bounded publish queue drained by one worker thread."""
+
+    def __init__(
+        self,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        deadline_s: float = DEFAULT_DEADLINE_S,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        retry_delay_s: float = DEFAULT_RETRY_DELAY_S,
+    ) -> None:
+        self.max_queue = max(1, int(max_queue))
+        self.batch_size = max(1, int(batch_size))
+        self.deadline_s = float(deadline_s)
+        self.max_attempts = max(1, int(max_attempts))
+        self.retry_delay_s = float(retry_delay_s)
+
+        self._cond = threading.Condition()
+        self._queue: collections.deque[_Outgoing] = collections.deque()
+        # (id(client), mid) -> message awaiting PUBACK/PUBCOMP
+        self._inflight: dict[tuple[int, int], _Outgoing] = {}
+        # acks that arrived before the mid was registered (fast brokers);
+        # bounded because on_publish also fires for direct client.publish calls
+        self._early_acks: collections.OrderedDict[tuple[int, int], None] = (
+            collections.OrderedDict()
+        )
+        self._hooked: weakref.WeakSet[Any] = weakref.WeakSet()
+        self._hooked_ids: set[int] = set()
+        self._sending = 0
+        self._worker: threading.Thread | None = None
+        self._closed = False
+
+        self._latencies_ms: collections.deque[float] = collections.deque(
+            maxlen=_LATENCY_SAMPLES
+        )
+        self.published_total = 0
+        self.dropped: collections.Counter[str] = collections.Counter()
+
+    # ------------------------------------------------------------------ API
+
+    def enqueue(
+        self,
+        client: Any,
+        topic: str,
+        payload: Any,
+        qos: int = 0,
+        retain: bool = False,
+        deadline_s: float | None = None,
+    ) -> PublishHandle:
+        """Queue a publish and return immediately with its completion handle."""
+        now = time.monotonic()
+        ttl = self.deadline_s if deadline_s is None else float(deadline_s)
+        item = _Outgoing(client, topic, payload, int(qos), bool(retain), now, now + ttl)
+        with self._cond:
+            if self._closed:
+                self._drop_locked(item, "closed")
+                return item.handle
+            if len(self._queue) >= self.max_queue:
+                self._drop_locked(item, "queue_full")
+                return item.handle
+            self._queue.append(item)
+            self._ensure_worker_locked()
+            self._cond.notify()
+        return item.handle
+
+    def record_drop(self, reason: str, count: int = 1) -> None:
+        """Count a message dropped before it reached the outbox."""
+        with self._cond:
+            self.dropped[reason] += count
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    def stats(self) -> dict[str, Any]:
+        """Snapshot of queue depth, latency percentiles and drop counters."""
+        with self._cond:
+            samples = sorted(self._latencies_ms)
+            return {
+                "queue_depth": len(self._queue),
+                "inflight": len(self._inflight),
+                "published_total": self.published_total,
+                "dropped_total": sum(self.dropped.values()),
+                "dropped": dict(self.dropped),
+                "latency_ms": {
+                    "p50": percentile(samples, 0.50),
+                    "p95": percentile(samples, 0.95),
+                    "p99": percentile(samples, 0.99),
+                },
+            }
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until the queue and in-flight set drain. True if drained."""
+        end = time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._inflight or self._sending:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.notify_all()
+                self._cond.wait(min(remaining, 0.05))
+        return True
+
+    def close(self) -> None:
+        """Stop the worker and drop anything still pending."""
+        with self._cond:
+            self._closed = True
+            while self._queue:
+                self._drop_locked(self._queue.popleft(), "closed")
+            for key in list(self._inflight):
+                self._drop_locked(self._inflight.pop(key), "closed")
+            self._cond.notify_all()
+        worker = self._worker
+        if worker is not None and worker is not threading.current_thread():
+            worker.join(timeout=1.0)
+
+    # ------------------------------------------------------------- internals
+
+    def _ensure_worker_locked(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._worker = threading.Thread(
+            target=self._run, name="mqtt-outbox", daemon=True
+        )
+        self._worker.start()
+
+    def _drop_locked(self, item: _Outgoing, reason: str) -> None:
+        self.dropped[reason] += 1
+        item.handle._resolve(False, reason)
+        logger.debug(
+            {"event": "mqtt_outbox_drop", "topic": item.topic, "reason": reason}
+        )
+
+    def _complete_locked(self, item: _Outgoing, now: float) -> None:
+        self.published_total += 1
+        self._latencies_ms.append((now - item.enqueued_at) * 1000.0)
+        item.handle._resolve(True)
+
+    def _install_ack_hook(self, client: Any) -> None:
+        try:
+            if client in self._hooked:
+                return
+        except TypeError:
+            if id(client) in self._hooked_ids:
+                return
+        previous = getattr(client, "on_publish", None)
+        outbox = self
+
+        def _on_publish(c, userdata, mid, *rest):
+            outbox._on_ack(c, mid)
+            if callable(previous):
+                previous(c, userdata, mid, *rest)
+
+        try:
+            client.on_publish = _on_publish
+        except Exception:  # noqa: BLE001
+            return
+        try:
+            self._hooked.add(client)
+        except TypeError:
+            self._hooked_ids.add(id(client))
+
+    def _on_ack(self, client: Any, mid: Any) -> None:
+        if not isinstance(mid, int):
+            return
+        key = (id(client), mid)
+        now = time.monotonic()
+        with self._cond:
+            item = self._inflight.pop(key, None)
+            if item is None:
+                self._early_acks[key] = None
+                while len(self._early_acks) > _EARLY_ACK_LIMIT:
+                    self._early_acks.popitem(last=False)
+                return
+            self._complete_locked(item, now)
+            self._cond.notify_all()
+
+    def _take_batch_locked(self, now: float) -> list[_Outgoing]:
+        batch: list[_Outgoing] = []
+        deferred: list[_Outgoing] = []
+        # topics with an earlier message still waiting on its retry delay
+        blocked: set[str] = set()
+        while self._queue and len(batch) < self.batch_size:
+            item = self._queue.popleft()
+            if item.not_before > now or item.topic in blocked:
+                blocked.add(item.topic)
+                deferred.append(item)
+                continue
+            batch.append(item)
+        # keep ordering for messages still waiting on their retry delay
+        self._queue.extendleft(reversed(deferred))
+        return batch
+
+    def _expire_locked(self, now: float) -> None:
+        for key, item in list(self._inflight.items()):
+            if item.deadline <= now:
+                del self._inflight[key]
+                self._drop_locked(item, "ack_timeout")
+        while self._queue and self._queue[0].deadline <= now:
+            self._drop_locked(self._queue.popleft(), "expired")
+
+    def _next_wakeup_locked(self, now: float) -> float:
+        deadlines = [item.deadline for item in self._inflight.values()]
+        blocked: set[str] = set()
+        for item in self._queue:
+            # a message behind a waiting one of its topic sends after it
+            if item.topic in blocked:
+                continue
+            if item.not_before <= now:
+                deadlines.append(now)
+                break
+            blocked.add(item.topic)
+            deadlines.append(item.not_before)
+        if not deadlines:
+            return 1.0
+        return max(0.0, min(deadlines) - now)
+
+    def _send(self, item: _Outgoing) -> bool:
+        """Publish one message; False if it is to be retried."""
+        now = time.monotonic()
+        item.attempts += 1
+        try:
+            info = item.client.publish(
+                item.topic, item.payload, qos=item.qos, retain=item.retain
+            )
+            rc = getattr(info, "rc", 0)
+            if isinstance(rc, int) and rc != 0:
+                raise RuntimeError(f"publish rc={rc}")
+        except Exception as e:  # noqa: BLE001
+            logger.debug(
+                {
+                    "event": "mqtt_publish_transient",
+                    "topic": item.topic,
+                    "try": item.attempts,
+                    "error": repr(e),
+                }
+            )
+            with self._cond:
+                if item.attempts >= self.max_attempts:
+                    self._drop_locked(item, "publish_error")
+                    return True
+                item.not_before = now + self.retry_delay_s * item.attempts
+            return False
+
+        mid = getattr(info, "mid", None)
+        with self._cond:
+            if item.qos <= 0 or not isinstance(mid, int):
+                self._complete_locked(item, now)
+                return True
+            key = (id(item.client), mid)
+            if key in self._early_acks:
+                del self._early_acks[key]
+                self._complete_locked(item, now)
+                return True
+            is_published = getattr(info, "is_published", None)
+            try:
+                already = bool(is_published()) if callable(is_published) else False
+            except Exception:  # noqa: BLE001
+                already = False
+            if already is True:
+                self._complete_locked(item, now)
+                return True
+            self._inflight[key] = item
+        return True
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                now = time.monotonic()
+                self._expire_locked(now)
+                batch = self._take_batch_locked(now)
+                if not batch:
+                    self._cond.notify_all()
+                    self._cond.wait(self._next_wakeup_locked(now))
+                    continue
+                self._sending = len(batch)
+            retry: list[_Outgoing] = []
+            failed: set[str] = set()
+            for item in batch:
+                if item.topic in failed:
+                    retry.append(item)
+                    continue
+                if item.qos > 0:
+                    self._install_ack_hook(item.client)
+                if not self._send(item):
+                    failed.add(item.topic)
+                    retry.append(item)
+            with self._cond:
+                if self._closed:
+                    for item in retry:
+                        self._drop_locked(item, "closed")
+                else:
+                    # back at the head, ahead of anything enqueued meanwhile
+                    self._queue.extendleft(reversed(retry))
+                self._sending = 0
+                self._cond.notify_all()
+
+
+_OUTBOX: MqttOutbox | None = None
+_OUTBOX_LOCK = threading.Lock()
+
+
+def get_outbox() -> MqttOutbox:
+    """Return the process-wide outbox, creating it on first use."""
+    global _OUTBOX
+    with _OUTBOX_LOCK:
+        if _OUTBOX is None:
+            _OUTBOX = MqttOutbox()
+        return _OUTBOX
+
+
+__all__ = ["MqttOutbox", "PublishHandle", "get_outbox"]
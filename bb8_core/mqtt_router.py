@@ -0,0 +1,575 @@
+"""
+mqtt_router.py
+
+Topic-filter trie router for inbound MQTT messages.
+
+Topic filters (including ``+`` and ``#``) are compiled into a trie once, so
+each message is matched in O(topic depth) instead of walking an if/elif alias
+chain or paho's linear ``message_callback_add`` list. The router is installed
+as the client's ``on_message``, keeps per-route counters and handler latency,
+and owns the subscription set: ``resubscribe`` issues one batched SUBSCRIBE
+with filters already covered by a broader one removed.
+
+Route semantics mirror paho's callback rules: every matching route runs, and
+``fallback`` routes run only when no regular route matched (the role
+``on_message`` used to play next to ``message_callback_add``). ``tap``
+registers a passive observer (e.g. the evidence recorder) that sees every
+matching message without taking part in that decision.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import functools
+import threading
+import time
+import weakref
+from collections.abc import Callable, Iterator
+from typing import Any
+
+from . import command_trace
+from .command_envelope import CommandEnvelope, decode_message
+from .command_ingress import get_ingress
+from .logging_setup import logger
+from .mqtt_v5 import observe_request
+
+MessageHandler = Callable[[Any, Any, Any], Any]
+TextHandler = Callable[[str], Any]
+EnvelopeHandler = Callable[[Any, CommandEnvelope], Any]
+
+
+class Route:
+    """A compiled topic filter bound to one handler, with its own counters."""
+
+    __slots__ = (
+        "filter",
+        "handler",
+        "qos",
+        "name",
+        "text",
+        "envelope",
+        "fallback",
+        "priority",
+        "nack",
+        "count",
+        "errors",
+        "total_s",
+        "max_s",
+    )
+
+    def __init__(
+        self,
+        topic_filter: str,
+        handler: Callable[..., Any],
+        qos: int,
+        name: str,
+        text: bool,
+        fallback: bool,
+        envelope: bool = False,
+        priority: bool = False,
+        nack: Callable[..., Any] | None = None,
+    ) -> None:
+        self.filter = topic_filter
+        self.handler = handler
+        self.qos = qos
+        self.name = name
+        self.text = text
+        self.envelope = envelope
+        self.fallback = fallback
+        self.priority = priority
+        self.nack = nack
+        self.count = 0
+        self.errors = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    def stats(self) -> dict[str, Any]:
+        mean = (self.total_s / self.count * 1000.0) if self.count else None
+        return {
+            "filter": self.filter,
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": round(mean, 3) if mean is not None else None,
+            "max_ms": round(self.max_s * 1000.0, 3),
+        }
+
+
+class _Node:
+    __slots__ = ("children", "plus", "hash", "routes")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node] = {}
+        self.plus: _Node | None = None
+        self.hash: list[Route] = []
+        self.routes: list[Route] = []
+
+
+def _validate_filter(topic_filter: str) -> list[str]:
+    if not topic_filter:
+        raise ValueError("empty topic filter")
+    levels = topic_filter.split("/")
+    for i, level in enumerate(levels):
+        if level == "#" and i != len(levels) - 1:
+            raise ValueError(f"'#' must be the last level: {topic_filter!r}")
+        if level not in ("#", "+") and ("#" in level or "+" in level):
+            raise ValueError(f"wildcard must occupy a whole level: {topic_filter!r}")
+    return levels
+
+
+def filter_covers(broad: str, narrow: str) -> bool:
+    """True if every topic matched by ``narrow`` is also matched by ``broad``."""
+    b = broad.split("/")
+    n = narrow.split("/")
+    for i, level in enumerate(b):
+        if level == "#":
+            return True
+        if i >= len(n):
+            return False
+        if level == "+":
+            if n[i] == "#":
+                return False
+            continue
+        if level != n[i]:
+            return False
+    return len(b) == len(n)
+
+
+class MqttRouter:
+    """Trie of topic filters dispatching to handlers; owns subscriptions."""
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._root = _Node()
+        self._routes: dict[str, Route] = {}
+        self._taps: dict[str, Route] = {}
+        self._client_ref: Callable[[], Any] | None = None
+        self._batching = 0
+        self.dispatched = 0
+        self.unmatched = 0
+
+    # ------------------------------------------------------------ routing
+
+    def add(
+        self,
+        topic_filter: str,
+        handler: MessageHandler | TextHandler | EnvelopeHandler,
+        qos: int = 1,
+        *,
+        name: str | None = None,
+        text: bool = False,
+        envelope: bool = False,
+        fallback: bool = False,
+        replace: bool = True,
+        priority: bool = False,
+        nack: Callable[[Any, CommandEnvelope, str], Any] | None = None,
+    ) -> Route:
+        """Compile a route. Handlers take ``(client, userdata, msg)``, the
+        decoded payload string when ``text`` is set, or ``(client, envelope)``
+        when ``envelope`` is set (payload parsed once per message).
+
+        ``replace=False`` keeps an existing route for the same filter, so a
+        specialised handler registered first wins over a generic default.
+        ``priority`` routes (estop, stop) skip ahead of queued commands when
+        handed from paho's thread to the loop. ``nack(client, envelope,
+        reason)`` answers a command that hand-off dropped before it ran.
+        """
+        levels = _validate_filter(topic_filter)
+        with self._lock:
+            existing = self._routes.get(topic_filter)
+            if existing is not None and not replace:
+                return existing
+            if existing is not None:
+                self._unlink(existing)
+            route = Route(
+                topic_filter,
+                handler,
+                int(qos),
+                name or topic_filter,
+                text,
+                fallback,
+                envelope,
+                priority,
+                nack,
+            )
+            node = self._root
+            for level in levels:
+                if level == "#":
+                    node.hash.append(route)
+                    break
+                if level == "+":
+                    if node.plus is None:
+                        node.plus = _Node()
+                    node = node.plus
+                else:
+                    node = node.children.setdefault(level, _Node())
+            else:
+                node.routes.append(route)
+            self._routes[topic_filter] = route
+            new_filter = existing is None
+        if new_filter and not self._batching:
+            self._subscribe_one(route)
+        return route
+
+    def tap(
+        self, topic_filter: str, handler: MessageHandler, qos: int = 0, *, name: str
+    ) -> Route:
+        """Observe ``topic_filter`` with ``(client, userdata, msg)``.
+
+        Taps are keyed by ``name``, may share a filter with a route, and never
+        suppress ``fallback`` routes.
+        """
+        _validate_filter(topic_filter)
+        route = Route(topic_filter, handler, int(qos), name, False, False, False)
+        with self._lock:
+            self._taps[name] = route
+        if not self._batching:
+            self._subscribe_one(route)
+        return route
+
+    def untap(self, name: str) -> bool:
+        with self._lock:
+            route = self._taps.pop(name, None)
+        if route is None:
+            return False
+        self._release(route)
+        return True
+
+    @contextlib.contextmanager
+    def batch(self) -> Iterator[MqttRouter]:
+        """Register several routes, then send a single batched SUBSCRIBE."""
+        with self._lock:
+            self._batching += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batching -= 1
+                done = self._batching == 0
+            if done:
+                self.resubscribe()
+
+    def remove(self, topic_filter: str) -> bool:
+        with self._lock:
+            route = self._routes.pop(topic_filter, None)
+            if route is None:
+                return False
+            self._unlink(route)
+        self._release(route)
+        return True
+
+    def _release(self, route: Route) -> None:
+        """Unsubscribe a filter nothing else needs any more.
+
+        Narrower filters the removed one covered were never subscribed on
+        their own; they are subscribed first so their messages keep flowing.
+        """
+        topic_filter = route.filter
+        if topic_filter in self._filters():
+            return
+        client = self._client_ref() if self._client_ref else None
+        unsubscribe = getattr(client, "unsubscribe", None)
+        if callable(unsubscribe) and not self._covered(topic_filter, route.qos):
+            exposed = [
+                (f, q)
+                for f, q in self.subscriptions()
+                if filter_covers(topic_filter, f)
+            ]
+            if exposed:
+                self._subscribe_many(client, exposed)
+            try:
+                unsubscribe(topic_filter)
+            except Exception as e:  # noqa: BLE001
+                logger.debug(
+                    {"event": "mqtt_router_unsubscribe_failed", "error": repr(e)}
+                )
+
+    def _unlink(self, route: Route) -> None:
+        node: _Node | None = self._root
+        for level in route.filter.split("/"):
+            if node is None:
+                return
+            if level == "#":
+                if route in node.hash:
+                    node.hash.remove(route)
+                return
+            node = node.plus if level == "+" else node.children.get(level)
+        if node is not None and route in node.routes:
+            node.routes.remove(route)
+
+    def match(self, topic: str) -> list[Route]:
+        """All routes whose filter matches ``topic`` (no fallback filtering)."""
+        levels = topic.split("/")
+        out: list[Route] = []
+        # wildcards at the first level never match $SYS-style topics
+        system = topic.startswith("$")
+        stack: list[tuple[_Node, int]] = [(self._root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            if node.hash and not (system and depth == 0):
+                out.extend(node.hash)
+            if depth == len(levels):
+                out.extend(node.routes)
+                continue
+            child = node.children.get(levels[depth])
+            if child is not None:
+                stack.append((child, depth + 1))
+            if node.plus is not None and not (system and depth == 0):
+                stack.append((node.plus, depth + 1))
+        return out
+
+    def dispatch(self, client: Any, userdata: Any, msg: Any) -> int:
+        """paho ``on_message`` entry point; returns the number of handlers run
+        (or queued for the loop, when called from paho's network thread)."""
+        topic = getattr(msg, "topic", "") or ""
+        matched = self.match(topic)
+        primary = [r for r in matched if not r.fallback]
+        routes = primary or [r for r in matched if r.fallback]
+        if self._taps:
+            routes = routes + [
+                t
+                for t in list(self._taps.values())
+                if not (topic.startswith("$") and t.filter[0] in "+#")
+                and filter_covers(t.filter, topic)
+            ]
+        self.dispatched += 1
+        if not routes:
+            self.unmatched += 1
+            logger.debug({"event": "mqtt_router_unmatched", "topic": topic})
+            return 0
+        env: CommandEnvelope | None = None
+        props = getattr(msg, "properties", None)
+        if props is not None and isinstance(getattr(props, "ResponseTopic", None), str):
+            # MQTT 5 request: remember where its ack goes
+            env = decode_message(msg)
+            observe_request(client, env)
+        trace = None
+        if any(r.envelope for r in routes):
+            if env is None:
+                env = decode_message(msg)
+            trace = command_trace.get_tracer().begin(
+                env.cid, topic, getattr(msg, "timestamp", 0.0)
+            )
+        nacks = [r.nack for r in routes if r.nack is not None]
+        # paho's network thread (thread transport) hands off to the loop
+        get_ingress().submit(
+            self._run_routes,
+            routes,
+            client,
+            userdata,
+            msg,
+            topic,
+            env,
+            trace,
+            priority=any(r.priority for r in routes),
+            nack=(
+                functools.partial(self._nack_routes, nacks, client, env)
+                if nacks and env is not None
+                else None
+            ),
+        )
+        return len(routes)
+
+    @staticmethod
+    def _nack_routes(
+        nacks: list[Callable[..., Any]], client: Any, env: CommandEnvelope, reason: str
+    ) -> None:
+        for nack in nacks:
+            nack(client, env, reason)
+
+    def _run_routes(
+        self,
+        routes: list[Route],
+        client: Any,
+        userdata: Any,
+        msg: Any,
+        topic: str,
+        env: CommandEnvelope | None,
+        trace: command_trace.Trace | None,
+    ) -> None:
+        token = command_trace.activate(trace)
+        try:
+            self._run_routes_traced(routes, client, userdata, msg, topic, env)
+        finally:
+            command_trace.deactivate(token)
+
+    def _run_routes_traced(
+        self,
+        routes: list[Route],
+        client: Any,
+        userdata: Any,
+        msg: Any,
+        topic: str,
+        env: CommandEnvelope | None,
+    ) -> None:
+        text: str | None = None
+        for route in routes:
+            t0 = time.perf_counter()
+            try:
+                if route.envelope:
+                    if env is None:
+                        env = decode_message(msg)
+                    route.handler(client, env)
+                elif route.text:
+                    if text is None:
+                        try:
+                            text = (msg.payload or b"").decode("utf-8")
+                        except Exception:  # noqa: BLE001
+                            text = ""
+                    route.handler(text)
+                else:
+                    route.handler(client, userdata, msg)
+            except Exception as e:  # noqa: BLE001
+                route.errors += 1
+                logger.warning(
+                    {
+                        "event": "mqtt_route_handler_error",
+                        "route": route.name,
+                        "topic": topic,
+                        "error": repr(e),
+                    }
+                )
+            finally:
+                dt = time.perf_counter() - t0
+                route.count += 1
+                route.total_s += dt
+                if dt > route.max_s:
+                    route.max_s = dt
+
+    # ------------------------------------------------------- subscriptions
+
+    def subscriptions(self) -> list[tuple[str, int]]:
+        """Minimal (filter, qos) set: filters covered by a broader one are dropped."""
+        filters = self._filters()
+        return [
+            (f, q)
+            for f, q in sorted(filters.items())
+            if not self._covered(f, q, filters)
+        ]
+
+    def _filters(self) -> dict[str, int]:
+        with self._lock:
+            filters = {f: r.qos for f, r in self._routes.items()}
+            for t in self._taps.values():
+                filters[t.filter] = max(t.qos, filters.get(t.filter, 0))
+        return filters
+
+    def _covered(
+        self, topic_filter: str, qos: int, filters: dict[str, int] | None = None
+    ) -> bool:
+        if filters is None:
+            filters = self._filters()
+        return any(
+            other != topic_filter and oq >= qos and filter_covers(other, topic_filter)
+            for other, oq in filters.items()
+        )
+
+    def attach(self, client: Any) -> None:
+        """Install the router as ``client.on_message`` and subscribe its filters."""
+        try:
+            self._client_ref = weakref.ref(client)
+        except TypeError:
+            self._client_ref = lambda: client
+        client.on_message = self.dispatch
+        self.resubscribe(client)
+
+    def resubscribe(self, client: Any | None = None) -> int:
+        """Issue one batched SUBSCRIBE for the current filter set (on connect)."""
+        if client is None:
+            client = self._client_ref() if self._client_ref else None
+        if client is None:
+            return 0
+        subs = self.subscriptions()
+        if not subs:
+            return 0
+        self._subscribe_many(client, subs)
+        return len(subs)
+
+    def _subscribe_many(self, client: Any, subs: list[tuple[str, int]]) -> None:
+        try:
+            client.subscribe(subs)
+        except Exception:  # noqa: BLE001
+            # clients without list support: fall back to one call per filter
+            for topic_filter, qos in subs:
+                try:
+                    client.subscribe(topic_filter, qos=qos)
+                except Exception as e:  # noqa: BLE001
+                    logger.warning(
+                        {
+                            "event": "mqtt_router_subscribe_failed",
+                            "topic": topic_filter,
+                            "error": repr(e),
+                        }
+                    )
+        logger.info(
+            {"event": "mqtt_router_subscribed", "filters": [f for f, _ in subs]}
+        )
+
+    def _subscribe_one(self, route: Route) -> None:
+        client = self._client_ref() if self._client_ref else None
+        if client is None or self._covered(route.filter, route.qos):
+            return
+        try:
+            client.subscribe(route.filter, qos=route.qos)
+        except Exception as e:  # noqa: BLE001
+            logger.debug(
+                {
+                    "event": "mqtt_router_subscribe_deferred",
+                    "topic": route.filter,
+                    "error": repr(e),
+                }
+            )
+
+    # --------------------------------------------------------------- stats
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            routes = {r.name: r.stats() for r in self._routes.values()}
+        return {
+            "dispatched": self.dispatched,
+            "unmatched": self.unmatched,
+            "routes": routes,
+        }
+
+
+_ROUTERS: weakref.WeakKeyDictionary[Any, MqttRouter] = weakref.WeakKeyDictionary()
+_ROUTERS_BY_ID: dict[int, MqttRouter] = {}
+_ROUTERS_LOCK = threading.Lock()
+
+
+def router_for(client: Any) -> MqttRouter:
+    """Return the router bound to ``client``, creating and attaching it once."""
+    with _ROUTERS_LOCK:
+        try:
+            router = _ROUTERS.get(client)
+        except TypeError:
+            router = _ROUTERS_BY_ID.get(id(client))
+        if router is not None:
+            return router
+        router = MqttRouter()
+        try:
+            _ROUTERS[client] = router
+        except TypeError:
+            _ROUTERS_BY_ID[id(client)] = router
+    router.attach(client)
+    return router
+
+
+def move_router(old: Any, new: Any) -> MqttRouter:
+    """Re-home ``old``'s router (routes and filters) on a replacement client."""
+    with _ROUTERS_LOCK:
+        try:
+            router = _ROUTERS.pop(old, None)
+        except TypeError:
+            router = _ROUTERS_BY_ID.pop(id(old), None)
+    if router is None:
+        return router_for(new)
+    with _ROUTERS_LOCK:
+        try:
+            _ROUTERS[new] = router
+        except TypeError:
+            _ROUTERS_BY_ID[id(new)] = router
+    router.attach(new)
+    return router
+
+
+__all__ = ["MqttRouter", "Route", "filter_covers", "move_router", "router_for"]
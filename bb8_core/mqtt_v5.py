@@ -0,0 +1,288 @@
+"""
+mqtt_v5.py
+
+Optional MQTT 5 request/response mode for command acknowledgements.
+
+With ``mqtt_protocol: "5"`` (or ``BB8_MQTT_PROTOCOL=5``) the controller client
+connects with MQTT 5 and:
+
+- commands carrying a *Response Topic* are answered on that topic with the
+  caller's *Correlation Data*, instead of the shared ``<base>/ack/<cmd>``
+  topic every client has to filter;
+- acks carry a *Message Expiry Interval* so stale replies are not delivered
+  to a caller that reconnects late; commands published with an expiry are
+  discarded by the broker if they expire while queued for the bridge;
+- high-frequency QoS 0 telemetry topics are sent with *Topic Aliases* (the
+  topic string goes over the wire once per connection).
+
+Brokers that refuse MQTT 5 get a transparent downgrade to 3.1.1, where all
+of the above collapses to the existing fixed-topic behaviour.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any
+
+import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+from . import command_trace
+from .logging_setup import logger
+
+ACK_EXPIRY_S = 30
+_REPLY_TTL_S = 60.0
+_REPLY_LIMIT = 256
+# CONNACK "Unsupported protocol version" (v5 reason 132); v3-only brokers
+# answer a v5 CONNECT with the 3.1.1 return code 1, which paho maps to 132
+_UNSUPPORTED_PROTOCOL = (132, 1)
+
+
+def resolve_protocol(config: dict[str, Any] | None = None) -> int:
+    """ENV BB8_MQTT_PROTOCOL > config mqtt_protocol > MQTT 3.1.1."""
+    raw = os.environ.get("BB8_MQTT_PROTOCOL") or (config or {}).get("mqtt_protocol")
+    value = str(raw or "").strip().lower().lstrip("v").removeprefix("mqttv")
+    return mqtt.MQTTv5 if value in ("5", "5.0") else mqtt.MQTTv311
+
+
+def is_v5(client: Any) -> bool:
+    return getattr(client, "protocol", None) == mqtt.MQTTv5
+
+
+class ReplyTo:
+    """Where (and with which correlation data) to send a command's ack."""
+
+    __slots__ = ("topic", "correlation", "expires_at")
+
+    def __init__(self, topic: str, correlation: bytes | None, expires_at: float):
+        self.topic = topic
+        self.correlation = correlation
+        self.expires_at = expires_at
+
+
+def request_properties(msg: Any) -> tuple[str | None, bytes | None, float | None]:
+    """(response topic, correlation data, message expiry s) of an inbound message."""
+    props = getattr(msg, "properties", None)
+    if props is None:
+        return None, None, None
+    response = getattr(props, "ResponseTopic", None)
+    correlation = getattr(props, "CorrelationData", None)
+    expiry = getattr(props, "MessageExpiryInterval", None)
+    return (
+        response if isinstance(response, str) and response else None,
+        correlation if isinstance(correlation, bytes) else None,
+        float(expiry) if isinstance(expiry, int) else None,
+    )
+
+
+class V5Session:
+    """Per-connection MQTT 5 state: pending replies and topic aliases."""
+
+    def __init__(self, clock=time.monotonic) -> None:
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._replies: OrderedDict[str, ReplyTo] = OrderedDict()
+        self.alias_max = 0
+        self._aliases: dict[str, int] = {}
+        self._established: set[int] = set()
+        self.replies_sent = 0
+        self.replies_expired = 0
+        self.aliased_publishes = 0
+        self.alias_bytes_saved = 0
+
+    # ------------------------------------------------------------ connection
+
+    def on_connect(self, properties: Any = None) -> None:
+        """Aliases are per network connection; reset them on every CONNACK."""
+        alias_max = getattr(properties, "TopicAliasMaximum", 0) if properties else 0
+        with self._lock:
+            self.alias_max = int(alias_max or 0)
+            self._aliases.clear()
+            self._established.clear()
+
+    # --------------------------------------------------------------- replies
+
+    def expect_reply(
+        self, cid: str, topic: str, correlation: bytes | None, ttl_s: float | None
+    ) -> None:
+        ttl = _REPLY_TTL_S if ttl_s is None else min(ttl_s, _REPLY_TTL_S)
+        with self._lock:
+            self._replies[cid] = ReplyTo(topic, correlation, self._clock() + ttl)
+            self._replies.move_to_end(cid)
+            while len(self._replies) > _REPLY_LIMIT:
+                self._replies.popitem(last=False)
+                self.replies_expired += 1
+
+    def take_reply(self, cid: str | None) -> ReplyTo | None:
+        if cid is None:
+            return None
+        with self._lock:
+            reply = self._replies.pop(str(cid), None)
+        if reply is not None and reply.expires_at < self._clock():
+            self.replies_expired += 1
+            return None
+        return reply
+
+    # --------------------------------------------------------------- publish
+
+    def _alias_for(self, topic: str) -> tuple[int, bool]:
+        alias = self._aliases.get(topic)
+        if alias is None:
+            if len(self._aliases) >= self.alias_max:
+                return 0, False
+            alias = len(self._aliases) + 1
+            self._aliases[topic] = alias
+        return alias, alias in self._established
+
+    def publish(
+        self,
+        client: Any,
+        topic: str,
+        payload: Any,
+        qos: int = 0,
+        retain: bool = False,
+        *,
+        alias: bool = False,
+    ) -> Any:
+        """Publish with a topic alias when possible.
+
+        Only QoS 0 messages are aliased: QoS 1/2 messages can be resent by
+        paho after a reconnect, when the alias no longer exists.
+        """
+        if not (alias and qos == 0 and is_v5(client) and self.alias_max):
+            return client.publish(topic, payload=payload, qos=qos, retain=retain)
+        with self._lock:
+            number, established = self._alias_for(topic)
+            if not number:
+                return client.publish(topic, payload=payload, qos=qos, retain=retain)
+            props = Properties(PacketTypes.PUBLISH)
+            props.TopicAlias = number
+            info = client.publish(
+                "" if established else topic,
+                payload=payload,
+                qos=qos,
+                retain=retain,
+                properties=props,
+            )
+            if getattr(info, "rc", 0) == mqtt.MQTT_ERR_SUCCESS:
+                if established:
+                    self.aliased_publishes += 1
+                    self.alias_bytes_saved += len(topic.encode("utf-8")) - 3
+                else:
+                    self._established.add(number)
+            return info
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            pending = len(self._replies)
+            aliases = len(self._aliases)
+        return {
+            "alias_max": self.alias_max,
+            "aliases": aliases,
+            "aliased_publishes": self.aliased_publishes,
+            "alias_bytes_saved": self.alias_bytes_saved,
+            "replies_pending": pending,
+            "replies_sent": self.replies_sent,
+            "replies_expired": self.replies_expired,
+        }
+
+
+_SESSIONS: weakref.WeakKeyDictionary[Any, V5Session] = weakref.WeakKeyDictionary()
+_SESSIONS_LOCK = threading.Lock()
+
+
+def session_for(client: Any) -> V5Session:
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(client)
+        if session is None:
+            session = _SESSIONS[client] = V5Session()
+        return session
+
+
+def on_connect(client: Any, reason_code: Any, properties: Any = None) -> bool:
+    """CONNACK hook. Returns False when the broker refused MQTT 5.
+
+    paho fixes the protocol version when a client is built, so the caller
+    reconnects on a new 3.1.1 client (``MqttConnection.recreate``).
+    """
+    rc = getattr(reason_code, "value", reason_code)
+    if is_v5(client) and rc in _UNSUPPORTED_PROTOCOL:
+        logger.warning({"event": "mqtt_v5_unsupported_fallback_v311", "rc": rc})
+        return False
+    session_for(client).on_connect(properties if is_v5(client) else None)
+    return True
+
+
+def observe_request(client: Any, env: Any) -> None:
+    """Remember the response topic of a v5 command so its ack can be routed."""
+    if env.reply_to is None or env.cid is None:
+        return
+    ttl = None
+    if env.expires_at is not None:
+        ttl = max(0.0, env.expires_at - env.received_at)
+    session_for(client).expect_reply(env.cid, env.reply_to, env.correlation, ttl)
+
+
+def _expiry_props(expiry_s: int) -> Properties:
+    props = Properties(PacketTypes.PUBLISH)
+    props.MessageExpiryInterval = expiry_s
+    return props
+
+
+# Shared by every fixed-topic ack (paho Properties are costly to build);
+# never mutated after creation.
+_ACK_PROPS = _expiry_props(ACK_EXPIRY_S)
+
+
+def publish_ack(
+    client: Any, topic: str, payload: str, qos: int = 0, cid: str | None = None
+) -> Any:
+    """Publish an ack; v5 requests with a response topic get a direct reply."""
+    if not is_v5(client):
+        info = client.publish(topic, payload, qos=qos, retain=False)
+        command_trace.mark("ack")
+        return info
+    session = session_for(client)
+    reply = session.take_reply(cid)
+    if reply is None:
+        props = _ACK_PROPS
+    else:
+        topic = reply.topic
+        props = _expiry_props(ACK_EXPIRY_S)
+        if reply.correlation is not None:
+            props.CorrelationData = reply.correlation
+        session.replies_sent += 1
+    info = client.publish(topic, payload, qos=qos, retain=False, properties=props)
+    command_trace.mark("ack")
+    return info
+
+
+def publish_telemetry(
+    client: Any, topic: str, payload: Any, qos: int = 0, retain: bool = False
+) -> Any:
+    """Publish a high-frequency topic, aliased when running MQTT 5."""
+    if not is_v5(client):
+        return client.publish(topic, payload, qos=qos, retain=retain)
+    return session_for(client).publish(
+        client, topic, payload, qos=qos, retain=retain, alias=True
+    )
+
+
+__all__ = [
+    "ACK_EXPIRY_S",
+    "ReplyTo",
+    "V5Session",
+    "is_v5",
+    "on_connect",
+    "observe_request",
+    "publish_ack",
+    "publish_telemetry",
+    "request_properties",
+    "resolve_protocol",
+    "session_for",
+]
@@ -0,0 +1,484 @@
+"""
+offline_outbox.py
+
+Disk-backed outbox for publishes issued while the broker is unreachable.
+
+Records are appended as JSON lines to segment files under ``/data`` so they
+survive broker restarts and add-on crashes. The live set is kept compact:
+
+- retained (state) topics keep only the last value per topic
+- event (non-retained) topics are bounded by total bytes and by age
+
+On reconnect the live set is replayed in original order through a rate
+limit so a long outage does not flood the broker.
+"""
+
+from __future__ import annotations
+
+import collections
+import json
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from .logging_setup import logger
+
+DEFAULT_DIR = "/data/mqtt_outbox"
+DEFAULT_SEGMENT_MAX_BYTES = 256 * 1024
+DEFAULT_EVENT_MAX_BYTES = 1024 * 1024
+DEFAULT_EVENT_MAX_AGE_S = 3600.0
+DEFAULT_REPLAY_RATE_PER_S = 50.0
+DEFAULT_REPLAY_ACK_TIMEOUT_S = 10.0
+_SEGMENT_PREFIX = "seg-"
+_SEGMENT_SUFFIX = ".log"
+
+
+class _Record:
+    __slots__ = ("seq", "ts", "topic", "payload", "qos", "retain", "size")
+
+    def __init__(
+        self,
+        seq: int,
+        ts: float,
+        topic: str,
+        payload: str,
+        qos: int,
+        retain: bool,
+        size: int,
+    ) -> None:
+        self.seq = seq
+        self.ts = ts
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+        self.size = size
+
+    def encode(self) -> bytes:
+        line = json.dumps(
+            {
+                "seq": self.seq,
+                "ts": round(self.ts, 3),
+                "t": self.topic,
+                "p": self.payload,
+                "q": self.qos,
+                "r": self.retain,
+            },
+            separators=(",", ":"),
+        )
+        return (line + "\n").encode("utf-8")
+
+
+def _decode(line: bytes) -> _Record | None:
+    try:
+        obj = json.loads(line)
+        return _Record(
+            int(obj["seq"]),
+            float(obj["ts"]),
+            str(obj["t"]),
+            str(obj["p"]),
+            int(obj.get("q", 0)),
+            bool(obj.get("r", False)),
+            len(line),
+        )
+    except Exception:  # noqa: BLE001
+        return None
+
+
+def _acked(result: Any, timeout: float) -> bool:
+    """Whether a replay ``publish`` result was delivered.
+
+    Anything but False counts for plain values. Completion objects are
+    waited on:
+    ``result(timeout)`` for outbox handles, ``wait_for_publish`` for paho's
+    MQTTMessageInfo (which only means queued until ``is_published()``).
+    """
+    if result is None or isinstance(result, bool):
+        return result is not False
+    try:
+        if callable(getattr(result, "result", None)):
+            return bool(result.result(timeout=timeout))
+        if callable(getattr(result, "wait_for_publish", None)):
+            if getattr(result, "rc", 0) != 0:
+                return False
+            result.wait_for_publish(timeout=timeout)
+            return bool(result.is_published())
+    except Exception:  # noqa: BLE001
+        return False
+    return bool(result)
+
+
+class OfflineOutbox:
+    """Append-only segment log with per-topic compaction for retained state."""
+
+    def __init__(
+        self,
+        root: str | os.PathLike[str] = DEFAULT_DIR,
+        segment_max_bytes: int = DEFAULT_SEGMENT_MAX_BYTES,
+        event_max_bytes: int = DEFAULT_EVENT_MAX_BYTES,
+        event_max_age_s: float = DEFAULT_EVENT_MAX_AGE_S,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.root = Path(root)
+        self.segment_max_bytes = max(1024, int(segment_max_bytes))
+        self.event_max_bytes = max(1, int(event_max_bytes))
+        self.event_max_age_s = float(event_max_age_s)
+        self._clock = clock
+
+        self._lock = threading.RLock()
+        self._retained: dict[str, _Record] = {}
+        self._events: collections.deque[_Record] = collections.deque()
+        self._event_bytes = 0
+        self._seq = 0
+        self._segment_index = 0
+        self._active: Any = None
+        self._active_size = 0
+        self._disk_bytes = 0
+
+        self.appended_total = 0
+        self.replayed_total = 0
+        self.compacted_total = 0
+        self.dropped: collections.Counter[str] = collections.Counter()
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._recover()
+
+    # ------------------------------------------------------------------ API
+
+    def append(
+        self, topic: str, payload: str, qos: int = 0, retain: bool = False
+    ) -> int:
+        """Persist a publish; returns its sequence number."""
+        with self._lock:
+            self._seq += 1
+            rec = _Record(
+                self._seq, self._clock(), topic, payload, int(qos), bool(retain), 0
+            )
+            data = rec.encode()
+            rec.size = len(data)
+            self._write(data)
+            self.appended_total += 1
+            self._admit(rec)
+            self._enforce_event_bounds()
+            if self._active_size >= self.segment_max_bytes:
+                self._rotate()
+            return rec.seq
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._retained) + len(self._events)
+
+    def snapshot(self) -> list[tuple[str, str, int, bool]]:
+        """Live records in replay order as (topic, payload, qos, retain)."""
+        with self._lock:
+            self._enforce_event_bounds()
+            return [(r.topic, r.payload, r.qos, r.retain) for r in self._ordered()]
+
+    def replay(
+        self,
+        publish: Callable[[str, str, int, bool], Any],
+        rate_per_s: float = DEFAULT_REPLAY_RATE_PER_S,
+        sleep: Callable[[float], None] = time.sleep,
+        ack_timeout_s: float = DEFAULT_REPLAY_ACK_TIMEOUT_S,
+    ) -> int:
+        """Replay live records in order, at most ``rate_per_s`` per second.
+
+        ``publish`` returns False (or raises) to stop early, e.g. when the
+        connection drops again. Otherwise it returns True, or a completion
+        object (an outbox ``PublishHandle`` or paho ``MQTTMessageInfo``) that
+        is waited on for up to ``ack_timeout_s``: a record is forgotten only
+        once the broker acknowledged it, so a disconnect mid-replay keeps the
+        unacknowledged records on disk. A retained record superseded by a
+        live publish (``supersede``) is skipped. Returns the number of records
+        delivered.
+        """
+        with self._lock:
+            self._enforce_event_bounds()
+            batch = self._ordered()
+        interval = 1.0 / rate_per_s if rate_per_s and rate_per_s > 0 else 0.0
+        handed: list[tuple[_Record, Any]] = []
+        skipped: list[_Record] = []
+        next_at = time.monotonic()
+        for rec in batch:
+            if interval:
+                delay = next_at - time.monotonic()
+                if delay > 0:
+                    sleep(delay)
+                next_at = max(next_at, time.monotonic()) + interval
+            # Checked and handed over under the lock so a live publish to the
+            # same topic either supersedes the record first or queues after it
+            with self._lock:
+                if rec.retain and self._retained.get(rec.topic) is not rec:
+                    skipped.append(rec)
+                    continue
+                try:
+                    ok = publish(rec.topic, rec.payload, rec.qos, rec.retain)
+                except Exception as e:  # noqa: BLE001
+                    logger.debug(
+                        {"event": "offline_outbox_replay_error", "error": repr(e)}
+                    )
+                    ok = False
+            if ok is False:
+                break
+            handed.append((rec, ok))
+        deadline = time.monotonic() + ack_timeout_s
+        sent = [
+            rec
+            for rec, result in handed
+            if _acked(result, max(0.0, deadline - time.monotonic()))
+        ]
+        with self._lock:
+            self._forget(sent)
+            self.replayed_total += len(sent)
+            if len(sent) < len(handed):
+                self.dropped["replay_unacked"] += len(handed) - len(sent)
+            self._compact()
+        if handed or skipped:
+            logger.info(
+                {
+                    "event": "offline_outbox_replayed",
+                    "sent": len(sent),
+                    "unacked": len(handed) - len(sent),
+                    "superseded": len(skipped),
+                    "remaining": self.pending(),
+                }
+            )
+        return len(sent)
+
+    def supersede(self, topic: str) -> bool:
+        """Drop the parked retained value for ``topic``; a live one went out.
+
+        Called for retained publishes made while connected, so a replay that
+        is still running (or the next one) never overwrites fresher broker
+        state with the value parked during the outage.
+        """
+        with self._lock:
+            if self._retained.pop(topic, None) is None:
+                return False
+            self.dropped["superseded_live"] += 1
+            # Rewrite now so a restart does not resurrect the stale value
+            self._compact(force=True)
+            return True
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "pending": len(self._retained) + len(self._events),
+                "retained_topics": len(self._retained),
+                "events": len(self._events),
+                "event_bytes": self._event_bytes,
+                "disk_bytes": self._disk_bytes,
+                "appended_total": self.appended_total,
+                "replayed_total": self.replayed_total,
+                "compacted_total": self.compacted_total,
+                "dropped": dict(self.dropped),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._active is not None:
+                try:
+                    self._active.flush()
+                    os.fsync(self._active.fileno())
+                except Exception:  # noqa: BLE001
+                    pass
+                self._active.close()
+                self._active = None
+
+    # ------------------------------------------------------------- internals
+
+    def _segments(self) -> list[tuple[int, Path]]:
+        out = []
+        for p in self.root.glob(f"{_SEGMENT_PREFIX}*{_SEGMENT_SUFFIX}"):
+            try:
+                idx = int(p.name[len(_SEGMENT_PREFIX) : -len(_SEGMENT_SUFFIX)])
+            except ValueError:
+                continue
+            out.append((idx, p))
+        return sorted(out)
+
+    def _segment_path(self, index: int) -> Path:
+        return self.root / f"{_SEGMENT_PREFIX}{index:08d}{_SEGMENT_SUFFIX}"
+
+    def _recover(self) -> None:
+        """Rebuild the live set from disk, skipping torn or corrupt lines."""
+        seen: set[int] = set()
+        corrupt = 0
+        for tmp in self.root.glob(f"{_SEGMENT_PREFIX}*{_SEGMENT_SUFFIX}.tmp"):
+            tmp.unlink(missing_ok=True)
+        segments = self._segments()
+        for idx, path in segments:
+            self._segment_index = max(self._segment_index, idx)
+            try:
+                data = path.read_bytes()
+            except OSError as e:
+                logger.warning(
+                    {
+                        "event": "offline_outbox_segment_unreadable",
+                        "path": str(path),
+                        "error": repr(e),
+                    }
+                )
+                continue
+            self._disk_bytes += len(data)
+            for line in data.splitlines(keepends=True):
+                rec = _decode(line) if line.endswith(b"\n") else None
+                if rec is None:
+                    corrupt += 1
+                    continue
+                if rec.seq in seen:
+                    continue
+                seen.add(rec.seq)
+                self._seq = max(self._seq, rec.seq)
+                self._admit(rec)
+        if corrupt:
+            self.dropped["corrupt"] += corrupt
+        self._enforce_event_bounds()
+        if segments:
+            logger.info(
+                {
+                    "event": "offline_outbox_recovered",
+                    "segments": len(segments),
+                    "pending": len(self._retained) + len(self._events),
+                    "corrupt_lines": corrupt,
+                }
+            )
+            # Start from a clean, compacted segment so torn tails never linger
+            self._compact(force=True)
+        else:
+            self._open_segment(self._segment_index + 1)
+
+    def _admit(self, rec: _Record) -> None:
+        if rec.retain:
+            prev = self._retained.get(rec.topic)
+            if prev is None or prev.seq < rec.seq:
+                self._retained[rec.topic] = rec
+                if prev is not None:
+                    self.dropped["superseded"] += 1
+            return
+        self._events.append(rec)
+        self._event_bytes += rec.size
+
+    def _enforce_event_bounds(self) -> None:
+        cutoff = self._clock() - self.event_max_age_s
+        while self._events and self._events[0].ts < cutoff:
+            self._event_bytes -= self._events.popleft().size
+            self.dropped["event_age"] += 1
+        while self._events and self._event_bytes > self.event_max_bytes:
+            self._event_bytes -= self._events.popleft().size
+            self.dropped["event_size"] += 1
+
+    def _ordered(self) -> list[_Record]:
+        return sorted([*self._retained.values(), *self._events], key=lambda r: r.seq)
+
+    def _forget(self, sent: list[_Record]) -> None:
+        sent_seqs = {r.seq for r in sent}
+        for rec in sent:
+            if rec.retain and self._retained.get(rec.topic) is rec:
+                del self._retained[rec.topic]
+        if sent_seqs and self._events:
+            kept = collections.deque(r for r in self._events if r.seq not in sent_seqs)
+            self._event_bytes = sum(r.size for r in kept)
+            self._events = kept
+
+    def _open_segment(self, index: int) -> None:
+        self._segment_index = index
+        self._active = open(self._segment_path(index), "ab")  # noqa: SIM115
+        self._active_size = self._active.tell()
+
+    def _write(self, data: bytes) -> None:
+        if self._active is None:
+            self._open_segment(self._segment_index + 1)
+        self._active.write(data)
+        self._active.flush()
+        self._active_size += len(data)
+        self._disk_bytes += len(data)
+
+    def _rotate(self) -> None:
+        self.close()
+        live = sum(r.size for r in self._retained.values()) + self._event_bytes
+        # Rewrite once dead (superseded/expired) records dominate the log
+        if self._disk_bytes > 2 * live:
+            self._compact(force=True)
+        else:
+            self._open_segment(self._segment_index + 1)
+
+    def _compact(self, force: bool = False) -> None:
+        """Rewrite the live set into a fresh segment and drop older ones."""
+        live = self._ordered()
+        if not force and self._disk_bytes <= sum(r.size for r in live):
+            return
+        self.close()
+        old = self._segments()
+        index = self._segment_index + 1
+        target = self._segment_path(index)
+        tmp = target.with_name(target.name + ".tmp")
+        size = 0
+        with open(tmp, "wb") as fh:
+            for rec in live:
+                data = rec.encode()
+                rec.size = len(data)
+                fh.write(data)
+                size += len(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, target)
+        # A crash before these unlinks leaves duplicates; recovery dedups by seq
+        for _idx, path in old:
+            path.unlink(missing_ok=True)
+        self._event_bytes = sum(r.size for r in self._events)
+        self._disk_bytes = size
+        self.compacted_total += 1
+        self._open_segment(index)
+
+
+def resolve_outbox_dir(config: dict[str, Any] | None = None) -> Path:
+    """ENV BB8_OUTBOX_DIR > config outbox_dir > /data/mqtt_outbox > tempdir."""
+    cfg = config or {}
+    candidate = os.environ.get("BB8_OUTBOX_DIR") or cfg.get("outbox_dir") or DEFAULT_DIR
+    path = Path(str(candidate))
+    try:
+        path.mkdir(parents=True, exist_ok=True)
+        if os.access(path, os.W_OK):
+            return path
+    except OSError:
+        pass
+    fallback = Path(tempfile.gettempdir()) / "bb8_mqtt_outbox"
+    logger.warning(
+        {
+            "event": "offline_outbox_dir_fallback",
+            "target": str(fallback),
+            "wanted": str(path),
+        }
+    )
+    fallback.mkdir(parents=True, exist_ok=True)
+    return fallback
+
+
+_OFFLINE_OUTBOX: OfflineOutbox | None = None
+_OFFLINE_LOCK = threading.Lock()
+
+
+def get_offline_outbox(config: dict[str, Any] | None = None) -> OfflineOutbox:
+    """Return the process-wide offline outbox, recovering it from disk once."""
+    global _OFFLINE_OUTBOX
+    with _OFFLINE_LOCK:
+        if _OFFLINE_OUTBOX is None:
+            cfg = config or {}
+            _OFFLINE_OUTBOX = OfflineOutbox(
+                resolve_outbox_dir(cfg),
+                event_max_bytes=int(
+                    cfg.get("outbox_event_max_bytes", DEFAULT_EVENT_MAX_BYTES)
+                ),
+                event_max_age_s=float(
+                    cfg.get("outbox_event_max_age_s", DEFAULT_EVENT_MAX_AGE_S)
+                ),
+            )
+        return _OFFLINE_OUTBOX
+
+
+__all__ = ["OfflineOutbox", "get_offline_outbox", "resolve_outbox_dir"]
@@ -0,0 +1,350 @@
+"""
+readiness.py
+
+Post-connect readiness gate.
+
+After a BLE connect the droid ignores (or drops) writes for a while, so the
+facade used to NACK every LED command for a fixed ``post_connect_delay_s``
+(15 s by default). Users retried, multiplying traffic, or gave up.
+
+``ReadinessGate`` holds those commands instead:
+
+* ``begin`` opens a holdoff window of at most ``holdoff_s`` and starts an
+  active probe (a battery read) every ``probe_interval_s``; the first probe
+  that succeeds ends the holdoff early, otherwise the deadline does.
+* ``defer(cls, run)`` buffers a command while the gate is closed. Each
+  class keeps only its latest command (the older one is dropped as
+  ``superseded``); anything older than ``max_age_s`` when the gate opens is
+  dropped as ``expired``.
+* When the gate opens the buffered commands run in submission order, one
+  at a time; commands that arrive during the flush queue behind it.
+
+``stats`` reports the holdoff each connect actually needed (and whether the
+probe or the deadline ended it), so ``post_connect_delay_s`` can be tuned
+from data.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import itertools
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from .logging_setup import logger
+from .timer_wheel import TimerHandle, TimerWheel, get_timer_wheel
+from .util import percentile
+
+DEFAULT_PROBE_INTERVAL_S = 1.0
+DEFAULT_MAX_AGE_S = 20.0
+_PROBE_TIMEOUT_S = 2.0
+_SAMPLES = 64
+
+Probe = Callable[[], Awaitable[Any]]
+
+
+class _Held:
+    __slots__ = ("seq", "cls", "cid", "at", "run", "on_drop", "future")
+
+    def __init__(
+        self,
+        seq: int,
+        cls: str,
+        cid: str | None,
+        at: float,
+        run: Callable[[], Awaitable[Any]],
+        on_drop: Callable[[str], Any] | None,
+        future: asyncio.Future,
+    ) -> None:
+        self.seq = seq
+        self.cls = cls
+        self.cid = cid
+        self.at = at
+        self.run = run
+        self.on_drop = on_drop
+        self.future = future
+
+
+class ReadinessGate:
+    """Buffers commands between a BLE connect and the droid being ready."""
+
+    def __init__(
+        self,
+        holdoff_s: float,
+        *,
+        probe_interval_s: float = DEFAULT_PROBE_INTERVAL_S,
+        max_age_s: float = DEFAULT_MAX_AGE_S,
+        wheel: TimerWheel | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.holdoff_s = max(0.0, float(holdoff_s))
+        self.probe_interval_s = max(0.01, float(probe_interval_s))
+        self.max_age_s = max(0.0, float(max_age_s))
+        self._wheel = wheel
+        self._clock = clock
+        self._seq = itertools.count()
+        self._held: dict[str, _Held] = {}
+        self._queue: collections.deque[_Held] = collections.deque()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._flushing = False
+        self._open = True
+        self._began_at = 0.0
+        self._ready_at = 0.0
+        self._deadline: TimerHandle | None = None
+        self._probe_timer: TimerHandle | None = None
+        self._probe: Probe | None = None
+        self._probing = False
+        self._holdoffs: collections.deque[float] = collections.deque(maxlen=_SAMPLES)
+        self.connects = 0
+        self.opened_by = {"probe": 0, "deadline": 0}
+        self.buffered = 0
+        self.flushed = 0
+        self.superseded = 0
+        self.expired = 0
+        self.aborted = 0
+        self.probes = 0
+        self.probe_failures = 0
+        self.last: dict[str, Any] | None = None
+
+    # ------------------------------------------------------------ holdoff
+
+    def begin(self, probe: Probe | None = None, now: float | None = None) -> None:
+        """Close the gate after a connect; ``probe`` may open it early."""
+        now = self._clock() if now is None else float(now)
+        self._cancel_timers()
+        self.connects += 1
+        self._began_at = now
+        self._ready_at = now + self.holdoff_s
+        self._open = False
+        wheel = self._wheel or get_timer_wheel()
+        self._deadline = wheel.call_later(
+            max(0.0, self._ready_at - self._clock()),
+            self._open_gate,
+            "deadline",
+            name="readiness_deadline",
+        )
+        self._probe = probe
+        if probe is not None and _running_loop() is not None:
+            self._probe_timer = wheel.call_every(
+                self.probe_interval_s, self._probe_tick, name="readiness_probe"
+            )
+
+    def abort(self, reason: str) -> None:
+        """Drop everything held (disconnect/shutdown) and reopen the gate."""
+        self._cancel_timers()
+        self._open = True
+        held, self._held = list(self._held.values()), {}
+        held += list(self._queue)
+        self._queue.clear()
+        for item in held:
+            self.aborted += 1
+            self._drop(item, reason)
+
+    @property
+    def holding(self) -> bool:
+        """True while commands must go through ``defer``."""
+        if not self._open and self._clock() >= self._ready_at:
+            self._open_gate("deadline")
+        return not self._open or self._flushing or bool(self._held)
+
+    def remaining_s(self, now: float | None = None) -> float:
+        if self._open:
+            return 0.0
+        now = self._clock() if now is None else float(now)
+        return max(0.0, self._ready_at - now)
+
+    # ------------------------------------------------------------ buffering
+
+    async def defer(
+        self,
+        cls: str,
+        run: Callable[[], Awaitable[Any]],
+        *,
+        cid: str | None = None,
+        on_drop: Callable[[str], Any] | None = None,
+    ) -> Any:
+        """Run ``run()`` once the gate opens; its result, or None if dropped.
+
+        A newer command of the same ``cls`` replaces this one; ``on_drop``
+        gets the reason (``superseded``, ``expired`` or the abort reason).
+        """
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        item = _Held(
+            next(self._seq), cls, cid, self._clock(), run, on_drop, loop.create_future()
+        )
+        previous = self._held.pop(cls, None)
+        if previous is not None:
+            self.superseded += 1
+            self._drop(previous, "superseded")
+        self._held[cls] = item
+        self.buffered += 1
+        logger.info(
+            {
+                "event": "readiness_buffered",
+                "cls": cls,
+                "cid": cid,
+                "remaining_s": round(self.remaining_s(), 2),
+            }
+        )
+        if not self._open and self._clock() >= self._ready_at:
+            self._open_gate("deadline")
+        elif self._open:
+            self._start_flush()
+        return await item.future
+
+    # ------------------------------------------------------------ stats
+
+    def stats(self) -> dict[str, Any]:
+        samples = sorted(self._holdoffs)
+        return {
+            "holding": not self._open,
+            "remaining_s": round(self.remaining_s(), 2),
+            "pending": len(self._held) + len(self._queue),
+            "connects": self.connects,
+            "opened_by": dict(self.opened_by),
+            "holdoff_s": {
+                "p50": percentile(samples, 0.50),
+                "p99": percentile(samples, 0.99),
+                "max": round(samples[-1], 2) if samples else None,
+                "configured": self.holdoff_s,
+            },
+            "buffered": self.buffered,
+            "flushed": self.flushed,
+            "superseded": self.superseded,
+            "expired": self.expired,
+            "aborted": self.aborted,
+            "probes": self.probes,
+            "probe_failures": self.probe_failures,
+            "last": self.last,
+        }
+
+    # ------------------------------------------------------------ internals
+
+    def _cancel_timers(self) -> None:
+        for timer in (self._deadline, self._probe_timer):
+            if timer is not None:
+                timer.cancel()
+        self._deadline = self._probe_timer = None
+
+    def _open_gate(self, via: str) -> None:
+        if self._open:
+            return
+        self._cancel_timers()
+        self._open = True
+        needed = max(0.0, self._clock() - self._began_at)
+        self._holdoffs.append(needed)
+        self.opened_by[via] += 1
+        self.last = {
+            "holdoff_s": round(needed, 2),
+            "via": via,
+            "held": len(self._held),
+        }
+        logger.info(
+            {
+                "event": "readiness_open",
+                "via": via,
+                "holdoff_s": round(needed, 2),
+                "configured_s": self.holdoff_s,
+                "held": len(self._held),
+            }
+        )
+        if self._held:
+            loop = self._loop
+            if loop is None or loop.is_closed():
+                return
+            if _running_loop() is loop:
+                self._start_flush()
+            else:
+                loop.call_soon_threadsafe(self._start_flush)
+
+    def _probe_tick(self) -> Awaitable[None] | None:
+        if self._open or self._probing or self._probe is None:
+            return None
+        return self._run_probe(self._probe)
+
+    async def _run_probe(self, probe: Probe) -> None:
+        self._probing = True
+        self.probes += 1
+        try:
+            await asyncio.wait_for(probe(), _PROBE_TIMEOUT_S)
+        except Exception as e:  # noqa: BLE001
+            self.probe_failures += 1
+            logger.debug({"event": "readiness_probe_failed", "error": repr(e)})
+            return
+        finally:
+            self._probing = False
+        self._open_gate("probe")
+
+    def _start_flush(self) -> None:
+        if self._flushing or not self._open:
+            return
+        held = sorted(self._held.values(), key=lambda item: item.seq)
+        self._held.clear()
+        self._queue.extend(held)
+        if not self._queue:
+            return
+        self._flushing = True
+        asyncio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self) -> None:
+        try:
+            while True:
+                if not self._queue:
+                    # commands deferred during the flush queue behind it
+                    held = sorted(self._held.values(), key=lambda item: item.seq)
+                    self._held.clear()
+                    self._queue.extend(held)
+                    if not self._queue:
+                        return
+                item = self._queue.popleft()
+                if self._clock() - item.at > self.max_age_s:
+                    self.expired += 1
+                    self._drop(item, "expired")
+                    continue
+                try:
+                    result = await item.run()
+                except Exception as e:  # noqa: BLE001
+                    logger.warning(
+                        {
+                            "event": "readiness_flush_error",
+                            "cls": item.cls,
+                            "cid": item.cid,
+                            "error": repr(e),
+                        }
+                    )
+                    result = None
+                self.flushed += 1
+                if not item.future.done():
+                    item.future.set_result(result)
+        finally:
+            self._flushing = False
+
+    def _drop(self, item: _Held, reason: str) -> None:
+        logger.info(
+            {
+                "event": "readiness_dropped",
+                "cls": item.cls,
+                "cid": item.cid,
+                "reason": reason,
+            }
+        )
+        if item.on_drop is not None:
+            try:
+                item.on_drop(reason)
+            except Exception as e:  # noqa: BLE001
+                logger.warning({"event": "readiness_drop_cb_error", "error": repr(e)})
+        if not item.future.done():
+            item.future.set_result(None)
+
+
+def _running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+__all__ = ["ReadinessGate"]
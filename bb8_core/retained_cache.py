@@ -0,0 +1,200 @@
+"""
+retained_cache.py
+
+Last-value cache for retained state topics.
+
+Retained state (presence, RSSI, connection availability, health, LED state)
+is republished on every scan tick, watchdog transition or command ack even
+when nothing changed. Each of those is a broker write and a Home Assistant
+state-machine event. ``publish_retained`` keeps a per-client, per-topic hash
+of the last payload and skips identical publishes, while still forcing a
+refresh every ``refresh_s`` seconds. The cache is cleared on reconnect so a
+fresh session always re-asserts its state.
+"""
+
+from __future__ import annotations
+
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from .logging_setup import logger
+
+DEFAULT_REFRESH_S = 300.0
+
+
+def _fingerprint(payload: Any, volatile_keys: Iterable[str] = ()) -> bytes:
+    if isinstance(payload, dict):
+        skip = set(volatile_keys)
+        stable = {k: v for k, v in payload.items() if k not in skip}
+        raw = json.dumps(stable, sort_keys=True, separators=(",", ":")).encode()
+    elif isinstance(payload, bytes | bytearray):
+        raw = bytes(payload)
+    else:
+        raw = str(payload).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=8).digest()
+
+
+class RetainedStateCache:
+    """Per-client, per-topic last-payload hashes with suppression counters."""
+
+    def __init__(
+        self,
+        refresh_s: float = DEFAULT_REFRESH_S,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.refresh_s = float(refresh_s)
+        self._clock = clock
+        self._lock = threading.Lock()
+        # client -> {topic: (digest, last_sent_at)}
+        self._by_client: weakref.WeakKeyDictionary[
+            Any, dict[str, tuple[bytes, float]]
+        ] = weakref.WeakKeyDictionary()
+        self._by_client_id: dict[int, dict[str, tuple[bytes, float]]] = {}
+        self.published: collections.Counter[str] = collections.Counter()
+        self.suppressed: collections.Counter[str] = collections.Counter()
+
+    def _entries(self, client: Any) -> dict[str, tuple[bytes, float]]:
+        try:
+            return self._by_client.setdefault(client, {})
+        except TypeError:
+            return self._by_client_id.setdefault(id(client), {})
+
+    def should_publish(
+        self,
+        client: Any,
+        topic: str,
+        payload: Any,
+        volatile_keys: Iterable[str] = (),
+        force: bool = False,
+    ) -> bool:
+        """Record the payload and return False if it repeats the last one."""
+        digest = _fingerprint(payload, volatile_keys)
+        now = self._clock()
+        with self._lock:
+            entries = self._entries(client)
+            last = entries.get(topic)
+            if (
+                not force
+                and last is not None
+                and last[0] == digest
+                and now - last[1] < self.refresh_s
+            ):
+                self.suppressed[topic] += 1
+                return False
+            entries[topic] = (digest, now)
+            self.published[topic] += 1
+            return True
+
+    def forget(self, client: Any, topic: str) -> None:
+        """Drop one topic so its next publish always goes out."""
+        with self._lock:
+            self._entries(client).pop(topic, None)
+
+    def clear(self, client: Any | None = None) -> None:
+        """Forget cached payloads (all clients, or one after it reconnects)."""
+        with self._lock:
+            if client is None:
+                self._by_client.clear()
+                self._by_client_id.clear()
+                return
+            try:
+                self._by_client.pop(client, None)
+            except TypeError:
+                self._by_client_id.pop(id(client), None)
+
+    def stats(self) -> dict[str, Any]:
+        """Per-topic published/suppressed counts and suppression ratio."""
+        with self._lock:
+            topics = {}
+            for topic in set(self.published) | set(self.suppressed):
+                sent = self.published[topic]
+                skipped = self.suppressed[topic]
+                topics[topic] = {
+                    "published": sent,
+                    "suppressed": skipped,
+                    "suppression_ratio": round(skipped / (sent + skipped), 4),
+                }
+            total_sent = sum(self.published.values())
+            total_skipped = sum(self.suppressed.values())
+            total = total_sent + total_skipped
+            return {
+                "published": total_sent,
+                "suppressed": total_skipped,
+                "suppression_ratio": round(total_skipped / total, 4) if total else 0.0,
+                "topics": topics,
+            }
+
+
+_CACHE: RetainedStateCache | None = None
+_CACHE_LOCK = threading.Lock()
+
+
+def _refresh_s(config: dict[str, Any] | None) -> float:
+    """ENV BB8_RETAINED_REFRESH_S > config retained_refresh_s > default."""
+    refresh = os.environ.get("BB8_RETAINED_REFRESH_S")
+    if refresh is None:
+        refresh = (config or {}).get("retained_refresh_s")
+    return float(DEFAULT_REFRESH_S if refresh is None else refresh)
+
+
+def get_retained_cache(config: dict[str, Any] | None = None) -> RetainedStateCache:
+    """Return the process-wide retained-state cache.
+
+    Passing the loaded add-on config (re)applies ``retained_refresh_s``, so
+    the cache may be created by an early publish and configured afterwards.
+    """
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = RetainedStateCache(refresh_s=_refresh_s(config))
+        elif config is not None:
+            _CACHE.refresh_s = _refresh_s(config)
+        return _CACHE
+
+
+def publish_retained(
+    client: Any,
+    topic: str,
+    payload: Any,
+    qos: int = 0,
+    *,
+    volatile_keys: Iterable[str] = (),
+    force: bool = False,
+) -> bool:
+    """Publish a retained state payload unless it repeats the cached value.
+
+    Dict payloads are serialised compactly; ``volatile_keys`` (e.g. ``ts``)
+    are ignored when comparing so a timestamp alone does not force a write.
+    The publish takes the same path as ``safe_publish``: the outbox while
+    connected, the disk-backed offline outbox otherwise. Returns True if the
+    outbox accepted the message.
+    """
+    # Imported here: the dispatcher imports this module
+    from .mqtt_dispatcher import enqueue_publish
+
+    cache = get_retained_cache()
+    if not cache.should_publish(
+        client, topic, payload, volatile_keys=volatile_keys, force=force
+    ):
+        logger.debug({"event": "retained_publish_suppressed", "topic": topic})
+        return False
+    if isinstance(payload, dict):
+        payload = json.dumps(payload, separators=(",", ":"))
+    handle = enqueue_publish(client, topic, payload, qos=qos, retain=True)
+    # Parked offline, rejected or dropped: let the next call publish again
+    # instead of suppressing a write that never reached the broker
+    if handle is None or handle.reason is not None:
+        cache.forget(client, topic)
+        return False
+    handle.add_done_callback(lambda h: h.result() or cache.forget(client, topic))
+    return True
+
+
+__all__ = ["RetainedStateCache", "get_retained_cache", "publish_retained"]
@@ -2,30 +2,43 @@
 BB-8 Safety Layer - Rate limiting, duration caps, speed caps, and emergency stop
 
 Implements comprehensive motion safety controls:
-- Rate limiting: Enforces minimum 50ms between drive commands
+- Rate limiting: Token bucket per motion class (drive, turn) on the monotonic
+  clock; one command per 50ms on average, ``burst`` back to back
 - Duration capping: Limits motion duration to configurable maximum (default 2000ms)
 - Speed capping: Limits speed to configurable maximum (default 180/255)
 - Emergency stop: Latched stop that blocks all motion until cleared
 - Hard stop timer: Automatically stops motion after duration expires
+- Drive streaming: Control-loop rate and dead-man window for drive_stream
 """
 
 from __future__ import annotations
 
 import asyncio
+import logging
 import os
 import time
+from collections.abc import Awaitable, Callable
 from dataclasses import dataclass
 from typing import Any
 
+from .log_events import EventLog
 from .logging_setup import logger
+from .telemetry import get_telemetry_aggregator
+from .timer_wheel import TimerHandle, get_timer_wheel
+
+_DRIVE_GATED_LOG = EventLog(logger, "safety_drive_gated", logging.DEBUG)
 
 
 @dataclass
 class SafetyConfig:
     """Safety configuration parameters."""
 
-    # Rate limiting
+    # Rate limiting (token bucket per motion class: refill one token per
+    # interval, hold at most ``burst``)
     min_drive_interval_ms: int = 50  # Minimum milliseconds between drive commands
+    drive_burst: int = 1  # Drive commands allowed back to back
+    turn_interval_ms: int = 50  # Turn-in-place (speed 0) commands
+    turn_burst: int = 1
 
     # Duration limits
     max_drive_duration_ms: int = 2000  # Maximum drive duration in milliseconds
@@ -33,6 +46,10 @@ class SafetyConfig:
     # Speed limits
     max_drive_speed: int = 180  # Maximum drive speed (0-255)
 
+    # Drive streaming (bb8/cmd/drive_stream)
+    drive_stream_hz: float = 10.0  # Control-loop rate for streamed setpoints
+    drive_stream_deadman_ms: int = 500  # Stop when setpoints stop this long
+
     # Emergency stop
     estop_latched: bool = False  # Emergency stop latch state
 
@@ -41,12 +58,210 @@ class SafetyConfig:
         """Load safety configuration from environment variables."""
         return cls(
             min_drive_interval_ms=int(os.getenv("BB8_MIN_DRIVE_INTERVAL_MS", "50")),
+            drive_burst=int(os.getenv("BB8_DRIVE_BURST", "1")),
+            turn_interval_ms=int(os.getenv("BB8_TURN_INTERVAL_MS", "50")),
+            turn_burst=int(os.getenv("BB8_TURN_BURST", "1")),
             max_drive_duration_ms=int(os.getenv("BB8_MAX_DRIVE_DURATION_MS", "2000")),
             max_drive_speed=int(os.getenv("BB8_MAX_DRIVE_SPEED", "180")),
+            drive_stream_hz=float(os.getenv("BB8_DRIVE_STREAM_HZ", "10")),
+            drive_stream_deadman_ms=int(
+                os.getenv("BB8_DRIVE_STREAM_DEADMAN_MS", "500")
+            ),
             estop_latched=False,  # Always start with estop cleared
         )
 
 
+class MotionLimiter:
+    """Token bucket for one motion class, on ``time.monotonic``.
+
+    Kept as GCRA: the whole state is one float, the theoretical arrival time
+    ``_tat`` of the next conforming command. A command at ``now`` conforms
+    while ``_tat - now`` is within ``(burst - 1) * interval``, i.e. while a
+    token is left; taking it pushes ``_tat`` one interval out. The check
+    takes no lock: it runs on the event loop, and the single attribute store
+    means ``tokens`` read from another thread never sees a torn state.
+    """
+
+    __slots__ = ("interval", "burst", "_tat", "accepted", "throttled")
+
+    def __init__(self, interval_s: float, burst: int = 1) -> None:
+        self.interval = max(0.0, float(interval_s))
+        self.burst = max(1, int(burst))
+        self._tat = 0.0
+        self.accepted = 0
+        self.throttled = 0
+
+    def try_acquire(self, now: float) -> float:
+        """Take a token; 0.0 on success, else seconds until one is free."""
+        tat = self._tat
+        if tat < now:
+            tat = now
+        wait = tat - now - (self.burst - 1) * self.interval
+        if wait > 1e-9:  # float slack: n intervals summed != n * interval
+            self.throttled += 1
+            return wait
+        self._tat = tat + self.interval
+        self.accepted += 1
+        return 0.0
+
+    def charge(self, now: float) -> None:
+        """Spend a token unconditionally (motion paced elsewhere).
+
+        Never past an empty bucket: a steady stream of charges leaves the
+        next ``try_acquire`` at most one interval away, not the whole stream.
+        """
+        tat = max(self._tat, now) + self.interval
+        self._tat = min(tat, now + self.burst * self.interval)
+
+    def tokens(self, now: float) -> float:
+        if self.interval <= 0.0:
+            return float(self.burst)
+        spent = max(0.0, self._tat - now) / self.interval
+        return round(max(0.0, self.burst - spent), 2)
+
+    def stats(self, now: float) -> dict[str, Any]:
+        return {
+            "rate_hz": round(1.0 / self.interval, 2) if self.interval else None,
+            "burst": self.burst,
+            "tokens": self.tokens(now),
+            "accepted": self.accepted,
+            "throttled": self.throttled,
+        }
+
+
+class AutoStopSupervisor:
+    """One long-lived dead-man deadline shared by every drive.
+
+    Each drive re-arms the same wheel handle (``TimerHandle.reschedule``)
+    instead of cancelling a timer and creating a new one, so 50 Hz input
+    allocates no handle or Task per command. When the deadline passes the
+    stop callback runs exactly once, as a Task on the loop that armed it;
+    ``force`` runs it immediately (estop).
+    """
+
+    def __init__(self) -> None:
+        self._timer: TimerHandle | None = None
+        self._callback: Callable[[], Awaitable[Any]] | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._deadline = 0.0
+        self._stopping: asyncio.Task | None = None
+        self.armed = 0
+        self.extended = 0
+        self.shortened = 0
+        self.fired = 0
+        self.forced = 0
+
+    @property
+    def pending(self) -> bool:
+        return self._callback is not None
+
+    @property
+    def stopping(self) -> asyncio.Task | None:
+        """The stop Task while it is still running."""
+        task = self._stopping
+        return task if task is not None and not task.done() else None
+
+    def arm(
+        self,
+        delay_s: float,
+        callback: Callable[[], Awaitable[Any]],
+        loop: asyncio.AbstractEventLoop,
+    ) -> None:
+        deadline = time.monotonic() + delay_s
+        if self._callback is None:
+            self.armed += 1
+        elif deadline >= self._deadline:
+            self.extended += 1
+        else:
+            self.shortened += 1
+        self._callback = callback
+        self._loop = loop
+        self._deadline = deadline
+        if self._timer is None:
+            self._timer = get_timer_wheel().call_later(
+                delay_s, self._expire, name="safety_auto_stop"
+            )
+        else:
+            self._timer.reschedule(delay_s)
+
+    def disarm(self) -> None:
+        self._callback = None
+        if self._timer is not None and self._timer.active:
+            self._timer.cancel()
+
+    def force(
+        self, fallback: Callable[[], Awaitable[Any]] | None = None
+    ) -> asyncio.Task | None:
+        running = self.stopping
+        if running is not None:
+            return running
+        callback = self._callback or fallback
+        loop = self._loop if self._callback is not None else None
+        self.disarm()
+        if callback is None:
+            return None
+        loop = loop or _running_loop()
+        if loop is None or loop.is_closed():
+            return None
+        self.forced += 1
+        if _running_loop() is loop:
+            return self._start(callback, loop, "forced")
+        loop.call_soon_threadsafe(self._start, callback, loop, "forced")
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        remaining = max(0.0, self._deadline - time.monotonic())
+        return {
+            "pending": self.pending,
+            "remaining_ms": round(remaining * 1000.0, 1) if self.pending else None,
+            "stopping": self.stopping is not None,
+            "armed": self.armed,
+            "extended": self.extended,
+            "shortened": self.shortened,
+            "fired": self.fired,
+            "forced": self.forced,
+        }
+
+    def _expire(self) -> None:
+        callback, loop = self._callback, self._loop
+        self._callback = None
+        if callback is None or loop is None or loop.is_closed():
+            return
+        self.fired += 1
+        if _running_loop() is loop:
+            self._start(callback, loop, "deadline")
+        else:
+            loop.call_soon_threadsafe(self._start, callback, loop, "deadline")
+
+    def _start(
+        self,
+        callback: Callable[[], Awaitable[Any]],
+        loop: asyncio.AbstractEventLoop,
+        via: str,
+    ) -> asyncio.Task:
+        task = loop.create_task(self._run(callback, via))
+        self._stopping = task
+        return task
+
+    async def _run(self, callback: Callable[[], Awaitable[Any]], via: str) -> None:
+        logger.info({"event": "safety_auto_stop_triggered", "via": via})
+        try:
+            await callback()
+        except asyncio.CancelledError:
+            logger.debug({"event": "safety_auto_stop_cancelled", "via": via})
+        except Exception as e:
+            logger.error(
+                {"event": "safety_auto_stop_error", "via": via, "error": str(e)}
+            )
+
+
+def _running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
 class SafetyViolation(Exception):
     """Raised when a safety constraint is violated."""
 
@@ -70,7 +285,15 @@ class MotionSafetyController:
 
         # State tracking
         self._last_drive_time: float = 0.0
-        self._active_stop_tasks: set[asyncio.Task] = set()
+        self._limiters = {
+            "drive": MotionLimiter(
+                self.config.min_drive_interval_ms / 1000.0, self.config.drive_burst
+            ),
+            "turn": MotionLimiter(
+                self.config.turn_interval_ms / 1000.0, self.config.turn_burst
+            ),
+        }
+        self._auto_stop = AutoStopSupervisor()
         self._device_connected: bool = False
 
         # Emergency stop state
@@ -184,25 +407,30 @@ class MotionSafetyController:
 
         return speed, heading, duration_ms
 
-    def gate_drive(self, current_time: float | None = None) -> None:
+    def gate_drive(
+        self, current_time: float | None = None, motion: str = "drive"
+    ) -> None:
         """
         Gate drive command execution with safety checks.
 
-        This method checks emergency stop, device connection, and rate limiting.
+        This method checks emergency stop, device connection, and the rate
+        limit of the ``motion`` class ("drive", or "turn" for a heading
+        change at speed 0), so a turn followed by a drive is not throttled.
         Only call this when the command will actually be executed.
 
         Parameters
         ----------
         current_time : float | None
-            Current time in seconds. If None, uses time.time()
+            Current ``time.monotonic()`` in seconds. If None, reads it.
+        motion : str
+            Motion class whose token bucket is charged
 
         Raises
         ------
         SafetyViolation
             If safety constraints are violated
         """
-        if current_time is None:
-            current_time = time.time()
+        now = time.monotonic() if current_time is None else current_time
 
         # Check emergency stop first
         if self._estop_latched:
@@ -217,33 +445,64 @@ class MotionSafetyController:
                 "Motion blocked - device not connected", "device_offline"
             )
 
-        # Check rate limiting (but not on first command)
-        if self._last_drive_time > 0:  # Skip rate limit check for first command
-            time_since_last = (
-                current_time - self._last_drive_time
-            ) * 1000  # Convert to ms
-
-            if time_since_last < self.config.min_drive_interval_ms:
-                raise SafetyViolation(
-                    f"Drive command rate limit exceeded - {time_since_last:.1f}ms < {self.config.min_drive_interval_ms}ms",
-                    "rate_limit",
-                    time_since_last,
-                )
+        # Check rate limiting: a token must be left in the class's bucket
+        limiter = self._limiters[motion]
+        wait_s = limiter.try_acquire(now)
+        if wait_s > 0.0:
+            raise SafetyViolation(
+                f"Drive command rate limit exceeded - next {motion} in "
+                f"{wait_s * 1000:.1f}ms (burst {limiter.burst})",
+                "rate_limit",
+                wait_s * 1000,
+            )
 
-        # Update last drive time only after all checks pass
-        self._last_drive_time = current_time
+        # Wall-clock stamp for status only; limiting runs on the monotonic clock
+        self._last_drive_time = time.time()
 
-        logger.debug(
-            {
-                "event": "safety_drive_gated",
-                "timestamp": current_time,
-            }
-        )
+        _DRIVE_GATED_LOG(motion=motion, timestamp=now)
+
+    def gate_stream(
+        self, current_time: float | None = None, *, charge: bool = True
+    ) -> None:
+        """
+        Gate a roll the bridge paces itself (drive stream, sequence steps).
+
+        Same estop and connection checks as ``gate_drive``; the caller keeps
+        rolls at least ``min_drive_interval_ms`` apart, so the drive bucket
+        is charged here but not checked. Pass ``charge=False`` to only check
+        (a setpoint or an idle tick sends no roll); ``charge_drive`` then
+        charges the roll actually sent.
+
+        Raises
+        ------
+        SafetyViolation
+            If safety constraints are violated
+        """
+        if self._estop_latched:
+            raise SafetyViolation(
+                f"Motion blocked by emergency stop: {self._estop_reason}",
+                "estop_active",
+            )
+        if not self._device_connected:
+            raise SafetyViolation(
+                "Motion blocked - device not connected", "device_offline"
+            )
+        if charge:
+            self.charge_drive(current_time)
+
+    def charge_drive(self, current_time: float | None = None) -> None:
+        """Charge the drive bucket for a roll that ``gate_stream`` checked."""
+        now = time.monotonic() if current_time is None else current_time
+        self._limiters["drive"].charge(now)
+        self._last_drive_time = time.time()
 
     def schedule_auto_stop(self, duration_ms: int, stop_callback) -> None:
         """
         Schedule automatic stop after specified duration.
 
+        Every call moves the one dead-man deadline (later or earlier); the
+        stop runs once, when the latest deadline passes.
+
         Parameters
         ----------
         duration_ms : int
@@ -254,43 +513,9 @@ class MotionSafetyController:
         if duration_ms <= 0:
             return
 
-        async def _auto_stop():
-            try:
-                await asyncio.sleep(duration_ms / 1000.0)
-
-                # Check if estop is active (don't double-stop)
-                if not self._estop_latched:
-                    logger.info(
-                        {
-                            "event": "safety_auto_stop_triggered",
-                            "duration_ms": duration_ms,
-                        }
-                    )
-                    await stop_callback()
-
-            except asyncio.CancelledError:
-                logger.debug(
-                    {
-                        "event": "safety_auto_stop_cancelled",
-                        "duration_ms": duration_ms,
-                    }
-                )
-            except Exception as e:
-                logger.error(
-                    {
-                        "event": "safety_auto_stop_error",
-                        "duration_ms": duration_ms,
-                        "error": str(e),
-                    }
-                )
-
-        # Cancel any existing auto-stop tasks
-        self.cancel_auto_stop()
-
-        # Schedule new auto-stop
-        task = asyncio.create_task(_auto_stop())
-        self._active_stop_tasks.add(task)
-        task.add_done_callback(self._active_stop_tasks.discard)
+        self._auto_stop.arm(
+            duration_ms / 1000.0, stop_callback, asyncio.get_running_loop()
+        )
 
         logger.debug(
             {
@@ -299,12 +524,19 @@ class MotionSafetyController:
             }
         )
 
+    def force_auto_stop(self, stop_callback=None) -> asyncio.Task | None:
+        """
+        Run the stop now instead of at the deadline (estop).
+
+        Uses the armed stop callback, or ``stop_callback`` when nothing is
+        armed. A stop already in flight is returned rather than started a
+        second time. Returns the Task to await, if any.
+        """
+        return self._auto_stop.force(stop_callback)
+
     def cancel_auto_stop(self) -> None:
-        """Cancel any pending auto-stop tasks."""
-        for task in list(self._active_stop_tasks):
-            if not task.done():
-                task.cancel()
-        self._active_stop_tasks.clear()
+        """Disarm the pending auto-stop (a stop already running finishes)."""
+        self._auto_stop.disarm()
 
         logger.debug({"event": "safety_auto_stop_cancelled"})
 
@@ -337,9 +569,11 @@ class MotionSafetyController:
 
         self._estop_latched = True
         self._estop_reason = reason
+        # urgent field: the snapshot goes out now, not on the next poll
+        get_telemetry_aggregator().update(estop=True)
 
-        # Cancel any pending auto-stop tasks
-        self.cancel_auto_stop()
+        # Stop now rather than at the dead-man deadline
+        self.force_auto_stop()
 
         logger.warning(
             {
@@ -394,6 +628,7 @@ class MotionSafetyController:
         self._estop_latched = False
         previous_reason = self._estop_reason
         self._estop_reason = ""
+        get_telemetry_aggregator().update(estop=False)
 
         logger.info(
             {
@@ -414,16 +649,26 @@ class MotionSafetyController:
         dict
             Safety status information
         """
+        now = time.monotonic()
         return {
             "estop_active": self._estop_latched,
             "estop_reason": self._estop_reason,
             "device_connected": self._device_connected,
             "last_drive_time": self._last_drive_time,
-            "active_stop_tasks": len(self._active_stop_tasks),
+            "active_stop_tasks": int(self._auto_stop.stopping is not None),
+            "auto_stop": self._auto_stop.stats(),
+            "rate_limits": {
+                motion: limiter.stats(now) for motion, limiter in self._limiters.items()
+            },
             "config": {
                 "min_interval_ms": self.config.min_drive_interval_ms,
+                "drive_burst": self.config.drive_burst,
+                "turn_interval_ms": self.config.turn_interval_ms,
+                "turn_burst": self.config.turn_burst,
                 "max_duration_ms": self.config.max_drive_duration_ms,
                 "max_speed": self.config.max_drive_speed,
+                "drive_stream_hz": self.config.drive_stream_hz,
+                "drive_stream_deadman_ms": self.config.drive_stream_deadman_ms,
             },
         }
 
@@ -431,12 +676,11 @@ class MotionSafetyController:
         """Shutdown safety controller and cancel all tasks."""
         logger.info({"event": "safety_controller_shutdown"})
 
-        # Cancel all auto-stop tasks
+        # Disarm the deadline and let a stop already in flight finish
         self.cancel_auto_stop()
-
-        # Wait for tasks to complete
-        if self._active_stop_tasks:
-            await asyncio.gather(*self._active_stop_tasks, return_exceptions=True)
+        stopping = self._auto_stop.stopping
+        if stopping is not None:
+            await asyncio.gather(stopping, return_exceptions=True)
 
 
 # Global safety controller instance (initialized by bridge_controller)
@@ -0,0 +1,248 @@
+"""
+sequence.py
+
+On-bridge command sequences (``bb8/cmd/sequence``).
+
+Choreography driven from Home Assistant costs one MQTT round trip and one
+automation delay per step, so every step inherits broker and HA scheduling
+jitter. A sequence carries the whole list instead::
+
+    {"cid": "show-1", "steps": [
+        {"op": "led", "r": 255, "g": 0, "b": 0},
+        {"op": "roll", "speed": 80, "heading": 0, "ms": 1000},
+        {"op": "heading", "heading": 90},
+        {"op": "wait", "ms": 200},
+        {"op": "preset", "name": "police"}]}
+
+``parse_sequence`` validates the steps up front and lays them out on a
+timeline: ``roll`` and ``wait`` advance it by their ``ms``, the other steps
+take no time (an optional ``hold_ms`` adds a pause after any step). The
+runner then starts step *i* at ``start + offset_i`` on the loop's monotonic
+clock, so lateness in one step is not carried into the next. Each step's
+deviation from its planned start is reported in the single ACK.
+
+A sequence is cancelled by estop or by a newer sequence.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from .logging_setup import logger
+
+MAX_STEPS = 64
+MAX_DURATION_MS = 60_000
+
+OPS = ("led", "preset", "roll", "heading", "wait")
+# op -> required keys ("hold_ms" is accepted on every step)
+_STEP_KEYS: dict[str, tuple[str, ...]] = {
+    "led": ("r", "g", "b"),
+    "preset": ("name",),
+    "roll": ("speed", "heading", "ms"),
+    "heading": ("heading",),
+    "wait": ("ms",),
+}
+
+StepOp = Callable[["Step"], Awaitable[Any]]
+
+
+class SequenceError(ValueError):
+    """Raised for a sequence that fails validation (nothing has run)."""
+
+
+class Step:
+    """One validated step and its planned start offset."""
+
+    __slots__ = ("index", "op", "args", "at_ms", "duration_ms")
+
+    def __init__(
+        self, index: int, op: str, args: dict[str, Any], at_ms: int, duration_ms: int
+    ) -> None:
+        self.index = index
+        self.op = op
+        self.args = args
+        self.at_ms = at_ms
+        self.duration_ms = duration_ms
+
+    def __repr__(self) -> str:
+        return f"Step({self.index}, {self.op!r}, {self.args!r}, at={self.at_ms})"
+
+
+def _int(value: Any, where: str) -> int:
+    if isinstance(value, bool):
+        raise SequenceError(f"{where}: expected a number")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise SequenceError(f"{where}: expected a number") from None
+
+
+def parse_sequence(
+    raw: Any,
+    *,
+    min_motion_gap_ms: int = 0,
+    max_steps: int = MAX_STEPS,
+    max_duration_ms: int = MAX_DURATION_MS,
+) -> list[Step]:
+    """Validate ``raw`` (a list of step objects) into a timeline of ``Step``.
+
+    Motion steps (roll, heading) closer together than ``min_motion_gap_ms``
+    are rejected here rather than tripping the drive rate limit mid-run.
+    """
+    if not isinstance(raw, list) or not raw:
+        raise SequenceError("steps: expected a non-empty list")
+    if len(raw) > max_steps:
+        raise SequenceError(f"steps: at most {max_steps} steps")
+    steps: list[Step] = []
+    at = 0
+    last_motion: int | None = None
+    for i, item in enumerate(raw):
+        where = f"steps[{i}]"
+        if not isinstance(item, dict):
+            raise SequenceError(f"{where}: expected an object")
+        op = item.get("op")
+        if op not in _STEP_KEYS:
+            raise SequenceError(f"{where}: unknown op {op!r} (one of {', '.join(OPS)})")
+        required = _STEP_KEYS[op]
+        missing = [k for k in required if k not in item]
+        if missing:
+            raise SequenceError(f"{where}: {op} needs {', '.join(missing)}")
+        args: dict[str, Any] = {}
+        for key in required:
+            if op == "preset":
+                if not isinstance(item[key], str):
+                    raise SequenceError(f"{where}.{key}: expected a string")
+                args[key] = item[key]
+            else:
+                args[key] = _int(item[key], f"{where}.{key}")
+        duration = 0
+        if op in ("roll", "wait"):
+            if args["ms"] < 0:
+                raise SequenceError(f"{where}.ms: must be >= 0")
+            # a zero-length roll would reach the radio as "roll indefinitely"
+            if op == "roll" and args["ms"] == 0:
+                raise SequenceError(f"{where}.ms: must be > 0 for roll")
+            duration = args["ms"]
+        hold = _int(item.get("hold_ms", 0), f"{where}.hold_ms")
+        if hold < 0:
+            raise SequenceError(f"{where}.hold_ms: must be >= 0")
+        if op in ("roll", "heading"):
+            if last_motion is not None and at - last_motion < min_motion_gap_ms:
+                raise SequenceError(
+                    f"{where}: motion steps must be {min_motion_gap_ms} ms apart"
+                )
+            last_motion = at
+        steps.append(Step(i, op, args, at, duration + hold))
+        at += duration + hold
+        if at > max_duration_ms:
+            raise SequenceError(f"steps: longer than {max_duration_ms} ms")
+    return steps
+
+
+class Sequence:
+    """One running sequence; ``report`` is the payload of its ACK."""
+
+    def __init__(self, steps: list[Step], cid: str | None = None) -> None:
+        self.steps = steps
+        self.cid = cid
+        self.results: list[dict[str, Any]] = []
+        self.cancelled: str | None = None
+        self.error: str | None = None
+        self.task: asyncio.Task | None = None
+
+    @property
+    def duration_ms(self) -> int:
+        last = self.steps[-1]
+        return last.at_ms + last.duration_ms
+
+    def cancel(self, reason: str) -> bool:
+        """Cancel the run; the ACK says why. False if it already finished."""
+        if self.task is None or self.task.done():
+            return False
+        self.cancelled = reason
+        self.task.cancel()
+        return True
+
+    async def run(
+        self,
+        ops: dict[str, StepOp],
+        blocked: Callable[[], str | None] = lambda: None,
+    ) -> None:
+        """Execute the steps on schedule; ``blocked()`` is checked before each."""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for step in self.steps:
+            delay = start + step.at_ms / 1000.0 - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            reason = blocked()
+            if reason:
+                self.error = f"step {step.index} ({step.op}): {reason}"
+                return
+            began = loop.time()
+            result: dict[str, Any] = {
+                "i": step.index,
+                "op": step.op,
+                "at_ms": step.at_ms,
+                "dev_ms": round((began - start) * 1000.0 - step.at_ms, 2),
+            }
+            self.results.append(result)
+            try:
+                await ops[step.op](step)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # noqa: BLE001
+                result["error"] = str(e)
+                self.error = f"step {step.index} ({step.op}): {e}"
+                return
+        # hold the run open until the last step's time is up
+        delay = start + self.duration_ms / 1000.0 - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def report(self) -> dict[str, Any]:
+        devs = [abs(r["dev_ms"]) for r in self.results]
+        ok = self.cancelled is None and self.error is None
+        report: dict[str, Any] = {
+            "ok": ok,
+            "steps": self.results,
+            "ran": len(self.results),
+            "total": len(self.steps),
+            "max_dev_ms": round(max(devs), 2) if devs else None,
+        }
+        if self.cancelled is not None:
+            report["reason"] = f"cancelled: {self.cancelled}"
+        elif self.error is not None:
+            report["reason"] = self.error
+        else:
+            report["reason"] = f"Sequence of {len(self.steps)} steps completed"
+        if self.cid is not None:
+            report["cid"] = self.cid
+        return report
+
+    def log_done(self) -> None:
+        report = self.report()
+        logger.info(
+            {
+                "event": "sequence_done",
+                "cid": self.cid,
+                "ok": report["ok"],
+                "ran": report["ran"],
+                "total": report["total"],
+                "max_dev_ms": report["max_dev_ms"],
+                "reason": report["reason"],
+            }
+        )
+
+
+__all__ = [
+    "MAX_DURATION_MS",
+    "MAX_STEPS",
+    "OPS",
+    "Sequence",
+    "SequenceError",
+    "Step",
+    "parse_sequence",
+]
@@ -1,5 +1,41 @@
+"""
+telemetry.py
+
+Telemetry for the bridge: one-off metric events (``publish_metric``), the
+presence/RSSI probe (``Telemetry``) and the ``{base}/status/telemetry``
+snapshot (``TelemetryAggregator``).
+
+The snapshot used to come from three loops on fixed timers (the facade
+heartbeat, the controller heartbeat with hard-coded nulls and the probe),
+so consumers saw conflicting snapshots and the broker saw duplicates. Now
+every producer calls ``update(**fields)``: a cheap dict merge under a lock.
+The facade pushes ``connected`` when its BLE session changes, the safety
+controller pushes ``estop`` when it latches or clears, and the controller
+refreshes the bridge's operational counters (``stats``) every 10 s. The
+aggregator publishes one consistent snapshot when a field changes (at
+most once per ``min_interval_s``; coalesced through one timer on the shared
+wheel) and otherwise only a keep-alive ``keepalive_s`` after the last
+publish.
+
+Snapshot payload (QoS 0, not retained)::
+
+    {"connected": bool, "estop": bool, "last_cmd_ts": str | null,
+     "battery_pct": int | null, "rssi": int | null,
+     "stats": {name: dict} | null, "telemetry": dict, "ts": str}
+
+``stats`` maps a component (admission, ingress, timers, drive_stream,
+readiness, led_animation, led_output, ble_lane, trace) to its ``stats()``.
+``telemetry`` is the aggregator's own ``stats()`` (publish rate, field
+staleness) when the snapshot was taken; like ``ts`` it never counts as a
+change. ``ts`` and ``last_cmd_ts`` are UTC ``YYYY-MM-DDTHH:MM:SSZ`` (whole
+seconds).
+The facade heartbeat used to send ``...SS.%fZ``, with a literal ``%f`` on
+glibc; the controller heartbeat already sent the whole-second form.
+"""
+
 from __future__ import annotations
 
+import collections
 import json
 import os
 import threading
@@ -8,6 +44,8 @@ from collections.abc import Callable
 from typing import TYPE_CHECKING, Any
 
 from .logging_setup import logger
+from .mqtt_v5 import publish_telemetry
+from .timer_wheel import TimerHandle, get_timer_wheel
 
 if TYPE_CHECKING:
     pass
@@ -23,7 +61,7 @@ def _now() -> int:
 def publish_metric(mqtt, name: str, data: dict[str, Any]) -> None:
     topic = f"{TELEMETRY_BASE}/{name}"
     payload = json.dumps({**data, "ts": _now()})
-    mqtt.publish(topic, payload, qos=0, retain=RET)
+    publish_telemetry(mqtt, topic, payload, qos=0, retain=RET)
 
 
 def echo_roundtrip(mqtt, ms: int, outcome: str) -> None:
@@ -40,6 +78,232 @@ def led_discovery(mqtt, unique_id: str, duplicates: int) -> None:
     )
 
 
+SNAPSHOT_FIELDS = ("connected", "estop", "last_cmd_ts", "battery_pct", "rssi", "stats")
+# changes to these skip the min interval
+URGENT_FIELDS = ("connected", "estop")
+DEFAULT_MIN_INTERVAL_S = 1.0
+DEFAULT_KEEPALIVE_S = 60.0
+_RATE_WINDOW_S = 60.0
+
+
+class TelemetryAggregator:
+    """Single change-driven publisher of the ``status/telemetry`` snapshot."""
+
+    def __init__(
+        self,
+        min_interval_s: float = DEFAULT_MIN_INTERVAL_S,
+        keepalive_s: float = DEFAULT_KEEPALIVE_S,
+        clock: Callable[[], float] = time.monotonic,
+        urgent_fields: tuple[str, ...] = URGENT_FIELDS,
+    ) -> None:
+        self.min_interval_s = max(0.0, float(min_interval_s))
+        self.urgent_fields = frozenset(urgent_fields)
+        self.keepalive_s = max(1.0, float(keepalive_s))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state: dict[str, Any] = dict.fromkeys(SNAPSHOT_FIELDS)
+        self._stamps: dict[str, float] = {}
+        self._client: Any = None
+        self._topic: str | None = None
+        self._qos = 0
+        self._dirty = False
+        self._flush_timer: TimerHandle | None = None
+        self._keepalive_timer: TimerHandle | None = None
+        self._last_publish = 0.0
+        self._publish_times: collections.deque[float] = collections.deque()
+        self.updates = 0
+        self.changes = 0
+        self.coalesced = 0
+        self.published = 0
+        self.keepalives = 0
+        self.errors = 0
+
+    @property
+    def client(self) -> Any:
+        return self._client
+
+    def bind(self, client: Any, topic: str, qos: int = 0) -> None:
+        """Publish snapshots to ``topic`` through ``client`` (rebinds)."""
+        with self._lock:
+            self._client = client
+            self._topic = topic
+            self._qos = qos
+            self._dirty = True
+            self._schedule_locked(self._clock(), urgent=True)
+
+    def update(self, urgent: bool = False, **fields: Any) -> bool:
+        """Merge ``fields`` into the snapshot; True if anything changed.
+
+        A change to one of ``urgent_fields`` (or ``urgent=True``) publishes
+        without waiting out ``min_interval_s``.
+        """
+        now = self._clock()
+        with self._lock:
+            self.updates += 1
+            changed = False
+            for key, value in fields.items():
+                self._stamps[key] = now
+                if self._state.get(key, _MISSING) != value:
+                    self._state[key] = value
+                    changed = True
+                    urgent = urgent or key in self.urgent_fields
+            if not changed:
+                return False
+            self.changes += 1
+            self._dirty = True
+            self._schedule_locked(now, urgent)
+        return True
+
+    def flush(self, force: bool = False) -> bool:
+        """Publish now if anything changed (or always with ``force``)."""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not (self._dirty or force):
+                return False
+            payload = self._take_locked()
+        return self._publish(payload)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return self._snapshot_locked()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return self._stats_locked(self._clock())
+
+    # ----------------------------------------------------------- internals
+
+    def _stats_locked(self, now: float) -> dict[str, Any]:
+        window = self._publish_times
+        while window and now - window[0] > _RATE_WINDOW_S:
+            window.popleft()
+        staleness = {key: round(now - stamp, 1) for key, stamp in self._stamps.items()}
+        return {
+            "updates": self.updates,
+            "changes": self.changes,
+            "coalesced": self.coalesced,
+            "published": self.published,
+            "keepalives": self.keepalives,
+            "errors": self.errors,
+            "publishes_per_min": len(window),
+            "last_publish_age_s": (
+                round(now - self._last_publish, 1) if self.published else None
+            ),
+            "staleness_s": staleness,
+            "max_staleness_s": max(staleness.values()) if staleness else None,
+        }
+
+    def _snapshot_locked(self) -> dict[str, Any]:
+        snap = dict(self._state)
+        snap["telemetry"] = self._stats_locked(self._clock())
+        snap["ts"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        return snap
+
+    def _schedule_locked(self, now: float, urgent: bool = False) -> None:
+        if self._client is None:
+            return  # nowhere to publish yet; bind() flushes
+        if self._flush_timer is not None and self._flush_timer.active:
+            if urgent:
+                self._flush_timer.reschedule(0.0)
+            else:
+                self.coalesced += 1
+            return
+        delay = 0.0
+        if not urgent and self.published:
+            delay = max(0.0, self._last_publish + self.min_interval_s - now)
+        self._flush_timer = get_timer_wheel().call_later(
+            delay, self._flush_due, name="telemetry_flush"
+        )
+
+    def _take_locked(self) -> dict[str, Any]:
+        self._dirty = False
+        now = self._clock()
+        self._last_publish = now
+        self._publish_times.append(now)
+        # the keep-alive is due keepalive_s after whichever publish was last
+        if self._keepalive_timer is None:
+            self._keepalive_timer = get_timer_wheel().call_later(
+                self.keepalive_s, self._keepalive, name="telemetry_keepalive"
+            )
+        else:
+            self._keepalive_timer.reschedule(self.keepalive_s)
+        return self._snapshot_locked()
+
+    def _flush_due(self) -> None:
+        with self._lock:
+            self._flush_timer = None
+            if not self._dirty:
+                return
+            payload = self._take_locked()
+        self._publish(payload)
+
+    def _keepalive(self) -> None:
+        with self._lock:
+            if self._client is None:
+                return
+            if self._clock() - self._last_publish < self.keepalive_s:
+                return  # collected in the same tick as a publish that re-armed it
+            self.keepalives += 1
+            payload = self._take_locked()
+        self._publish(payload)
+
+    def _publish(self, payload: dict[str, Any]) -> bool:
+        client, topic, qos = self._client, self._topic, self._qos
+        if client is None or topic is None:
+            return False
+        try:
+            publish_telemetry(client, topic, json.dumps(payload), qos=qos, retain=RET)
+            self.published += 1
+            return True
+        except Exception as e:  # noqa: BLE001
+            self.errors += 1
+            logger.warning({"event": "telemetry_publish_error", "error": repr(e)})
+            return False
+
+
+_MISSING = object()
+_AGGREGATOR: TelemetryAggregator | None = None
+
+
+def _setting(cfg: dict[str, Any], env: str, key: str, default: float) -> float:
+    """ENV > config > default; an explicit 0 is a value, not "unset"."""
+    raw = os.environ.get(env)
+    if raw is None or raw == "":
+        raw = cfg.get(key)
+    try:
+        return default if raw is None else float(raw)
+    except (TypeError, ValueError):
+        return default
+
+
+def get_telemetry_aggregator() -> TelemetryAggregator:
+    """ENV BB8_TELEMETRY_MIN_INTERVAL_S / BB8_TELEMETRY_KEEPALIVE_S > config."""
+    global _AGGREGATOR
+    if _AGGREGATOR is None:
+        try:
+            from .addon_config import load_config
+
+            cfg, _src = load_config()
+        except Exception:  # noqa: BLE001
+            cfg = {}
+        min_interval = _setting(
+            cfg,
+            "BB8_TELEMETRY_MIN_INTERVAL_S",
+            "telemetry_min_interval_s",
+            DEFAULT_MIN_INTERVAL_S,
+        )
+        keepalive = _setting(
+            cfg,
+            "BB8_TELEMETRY_KEEPALIVE_S",
+            "telemetry_keepalive_s",
+            DEFAULT_KEEPALIVE_S,
+        )
+        _AGGREGATOR = TelemetryAggregator(min_interval, keepalive)
+    return _AGGREGATOR
+
+
 class Telemetry:
     def __init__(
         self,
@@ -50,88 +314,88 @@ class Telemetry:
     ):
         self.bridge = bridge
         self.interval_s = interval_s
-        self._stop = threading.Event()
-        self._t: threading.Thread | None = None
+        self._timer: TimerHandle | None = None
         self._cb_presence = publish_presence
         self._cb_rssi = publish_rssi
 
     def start(self):
-        if self._t and self._t.is_alive():
+        if self._timer is not None and self._timer.active:
             return
-        self._stop.clear()
-        self._t = threading.Thread(target=self._run, daemon=True)  # pragma: no cover
-        self._t.start()  # pragma: no cover
+        # one periodic timer on the shared wheel (first probe immediately)
+        self._timer = get_timer_wheel().call_every(
+            self.interval_s, self._tick, name="telemetry", first=0.0
+        )
         logger.info({"event": "telemetry_start", "interval_s": self.interval_s})
 
     def stop(self):
-        self._stop.set()
-        if self._t:
-            self._t.join(timeout=2)  # pragma: no cover
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
         logger.info({"event": "telemetry_stop"})
 
-    def _run(self):
-        while not self._stop.is_set():
-            try:
-                # --- connectivity probe ---
-                is_connected = getattr(self.bridge, "is_connected", None)
-                online = bool(is_connected()) if callable(is_connected) else True
-
-                # --- presence publish ---
-                cb_presence = self._cb_presence
-                if cb_presence is None:
-                    cb_presence = getattr(self.bridge, "publish_presence", None)
-                if callable(cb_presence):
-                    try:
-                        cb_presence(online)
-                    except Exception as e:
-                        logger.warning(
-                            {
-                                "event": "telemetry_presence_cb_error",
-                                "error": repr(e),
-                            }
-                        )
+    def _tick(self):
+        """One presence/RSSI probe and publish."""
+        try:
+            # --- connectivity probe ---
+            is_connected = getattr(self.bridge, "is_connected", None)
+            online = bool(is_connected()) if callable(is_connected) else True
+            aggregator = get_telemetry_aggregator()
+            if callable(is_connected):
+                aggregator.update(connected=online)
 
-                # --- rssi probe ---
-                get_rssi = getattr(self.bridge, "get_rssi", None)
-                dbm = None
-                if callable(get_rssi):
-                    try:
-                        dbm = get_rssi()
-                    except Exception as e:
-                        logger.warning(
-                            {
-                                "event": "telemetry_rssi_probe_error",
-                                "error": repr(e),
-                            }
-                        )
+            # --- presence publish ---
+            cb_presence = self._cb_presence
+            if cb_presence is None:
+                cb_presence = getattr(self.bridge, "publish_presence", None)
+            if callable(cb_presence):
+                try:
+                    cb_presence(online)
+                except Exception as e:
+                    logger.warning(
+                        {
+                            "event": "telemetry_presence_cb_error",
+                            "error": repr(e),
+                        }
+                    )
+
+            # --- rssi probe ---
+            get_rssi = getattr(self.bridge, "get_rssi", None)
+            dbm = None
+            if callable(get_rssi):
+                try:
+                    dbm = get_rssi()
+                except Exception as e:
+                    logger.warning(
+                        {
+                            "event": "telemetry_rssi_probe_error",
+                            "error": repr(e),
+                        }
+                    )
+
+            if isinstance(dbm, int | float) and not isinstance(dbm, bool):
+                aggregator.update(rssi=int(dbm))
 
-                # --- rssi publish ---
-                cb_rssi = self._cb_rssi
-                if cb_rssi is None:
-                    cb_rssi = getattr(self.bridge, "publish_rssi", None)
-                if callable(cb_rssi) and dbm is not None:
-                    try:
-                        if isinstance(dbm, int | float | str):
-                            cb_rssi(int(dbm))
-                        else:
-                            logger.warning(
-                                {
-                                    "event": "telemetry_invalid_rssi",
-                                    "dbm": repr(dbm),
-                                }
-                            )
-                    except Exception as e:
+            # --- rssi publish ---
+            cb_rssi = self._cb_rssi
+            if cb_rssi is None:
+                cb_rssi = getattr(self.bridge, "publish_rssi", None)
+            if callable(cb_rssi) and dbm is not None:
+                try:
+                    if isinstance(dbm, int | float | str):
+                        cb_rssi(int(dbm))
+                    else:
                         logger.warning(
                             {
-                                "event": "telemetry_rssi_cb_error",
-                                "error": repr(e),
+                                "event": "telemetry_invalid_rssi",
+                                "dbm": repr(dbm),
                             }
                         )
-            except Exception as e:
-                logger.warning({"event": "telemetry_error", "error": repr(e)})
-            finally:
-                sleep_interval = 0.2
-                slept = 0.0
-                while slept < self.interval_s and not self._stop.is_set():
-                    time.sleep(sleep_interval)
-                    slept += sleep_interval
+                except Exception as e:
+                    logger.warning(
+                        {
+                            "event": "telemetry_rssi_cb_error",
+                            "error": repr(e),
+                        }
+                    )
+        except Exception as e:
+            logger.warning({"event": "telemetry_error", "error": repr(e)})
@@ -0,0 +1,377 @@
+"""
+timer_wheel.py
+
+One shared scheduler for delayed and periodic actions (auto-stops, state
+resets, telemetry ticks, health heartbeats) instead of a sleeping thread or
+Task per timer.
+
+``TimerWheel`` is a hashed timing wheel: a timer due at tick ``t`` lives in
+slot ``t % slots``, so inserting, cancelling and rescheduling a handle are
+O(1) dict operations however many timers are pending. The wheel is driven
+by the asyncio loop it is attached to (the first running loop that schedules
+on it, or ``attach``): one ``call_later`` armed for the next occupied tick,
+none while idle. Processes without a loop (the echo responder) get a single
+driver thread for all their timers instead.
+
+Callbacks run on the driver; a callback returning a coroutine has it run as
+a task on the loop. Timers never fire early; late firing (tick granularity
+plus loop latency) is sampled and reported by ``stats``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import math
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from .logging_setup import logger
+from .util import percentile
+
+DEFAULT_TICK_S = 0.005
+DEFAULT_SLOTS = 1024
+_SAMPLES = 1024
+_EPS = 1e-6  # in ticks: absorbs float error at exact tick boundaries
+
+
+class TimerHandle:
+    """A pending (or fired/cancelled) timer; cancel or reschedule in O(1)."""
+
+    __slots__ = (
+        "when",
+        "tick",
+        "fn",
+        "args",
+        "interval",
+        "name",
+        "cancelled",
+        "_wheel",
+        "_slot",
+    )
+
+    def __init__(
+        self,
+        wheel: TimerWheel,
+        fn: Callable[..., Any],
+        args: tuple,
+        interval: float | None,
+        name: str | None,
+    ) -> None:
+        self._wheel = wheel
+        self.fn = fn
+        self.args = args
+        self.interval = interval
+        self.name = name or getattr(fn, "__qualname__", "timer")
+        self.when = 0.0
+        self.tick = 0
+        self.cancelled = False
+        self._slot: int | None = None
+
+    @property
+    def active(self) -> bool:
+        return self._slot is not None
+
+    def cancel(self) -> None:
+        self._wheel._cancel(self)
+
+    def reschedule(self, delay: float) -> None:
+        """Move the deadline to ``delay`` seconds from now (re-arms if fired)."""
+        self._wheel._reschedule(self, delay)
+
+
+class TimerWheel:
+    """Hashed timing wheel driven by an asyncio loop (or one fallback thread)."""
+
+    def __init__(
+        self,
+        tick_s: float = DEFAULT_TICK_S,
+        slots: int = DEFAULT_SLOTS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.tick_s = tick_s
+        self._n = slots
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._cond = threading.Condition(self._lock)
+        self._slots: list[dict[TimerHandle, None]] = [{} for _ in range(slots)]
+        self._now_tick = int(clock() / tick_s)
+        self._pending = 0
+        self._armed_tick: int | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_handle: asyncio.TimerHandle | None = None
+        self._thread: threading.Thread | None = None
+        self._lag: collections.deque[float] = collections.deque(maxlen=_SAMPLES)
+        self.scheduled = 0
+        self.rescheduled = 0
+        self.cancelled = 0
+        self.fired = 0
+        self.errors = 0
+
+    # ------------------------------------------------------------ public
+
+    def call_later(
+        self, delay: float, fn: Callable[..., Any], *args: Any, name: str | None = None
+    ) -> TimerHandle:
+        """Run ``fn(*args)`` once, ``delay`` seconds from now."""
+        handle = TimerHandle(self, fn, args, None, name)
+        with self._lock:
+            self._ensure_driver_locked()
+            self._insert_locked(handle, self._clock() + max(0.0, delay))
+            self.scheduled += 1
+        return handle
+
+    def call_every(
+        self,
+        interval: float,
+        fn: Callable[..., Any],
+        *args: Any,
+        name: str | None = None,
+        first: float | None = None,
+    ) -> TimerHandle:
+        """Run ``fn(*args)`` every ``interval`` s (first after ``first`` s).
+
+        Deadlines advance by ``interval`` from the previous deadline, so the
+        period does not drift; missed periods are skipped, not replayed.
+        """
+        interval = max(self.tick_s, float(interval))
+        handle = TimerHandle(self, fn, args, interval, name)
+        delay = interval if first is None else max(0.0, first)
+        with self._lock:
+            self._ensure_driver_locked()
+            self._insert_locked(handle, self._clock() + delay)
+            self.scheduled += 1
+        return handle
+
+    def attach(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Drive the wheel from ``loop`` (call from any thread)."""
+        with self._lock:
+            self._loop = loop
+            self._cond.notify_all()  # a fallback driver thread exits
+        if _running_loop() is loop:
+            self._rearm()
+        else:
+            loop.call_soon_threadsafe(self._rearm)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lag = sorted(self._lag)
+            pending = self._pending
+            driver = (
+                "loop"
+                if self._loop is not None and not self._loop.is_closed()
+                else "thread"
+                if self._thread is not None
+                else None
+            )
+        return {
+            "pending": pending,
+            "scheduled": self.scheduled,
+            "rescheduled": self.rescheduled,
+            "cancelled": self.cancelled,
+            "fired": self.fired,
+            "errors": self.errors,
+            "driver": driver,
+            "lag_ms": {
+                "p50": percentile(lag, 0.50),
+                "p99": percentile(lag, 0.99),
+                "max": round(lag[-1], 3) if lag else None,
+            },
+        }
+
+    # ----------------------------------------------------------- handles
+
+    def _cancel(self, handle: TimerHandle) -> None:
+        with self._lock:
+            handle.cancelled = True
+            if handle._slot is not None:
+                self._remove_locked(handle)
+                self.cancelled += 1
+
+    def _reschedule(self, handle: TimerHandle, delay: float) -> None:
+        with self._lock:
+            if handle._slot is not None:
+                self._remove_locked(handle)
+            handle.cancelled = False
+            self._ensure_driver_locked()
+            self._insert_locked(handle, self._clock() + max(0.0, delay))
+            self.rescheduled += 1
+
+    def _insert_locked(self, handle: TimerHandle, when: float) -> None:
+        handle.when = when
+        # ceil: a timer never fires before its deadline
+        handle.tick = max(math.ceil(when / self.tick_s - _EPS), self._now_tick + 1)
+        handle._slot = handle.tick % self._n
+        self._slots[handle._slot][handle] = None
+        self._pending += 1
+        if self._armed_tick is None or handle.tick < self._armed_tick:
+            self._arm_locked(handle.tick)
+
+    def _remove_locked(self, handle: TimerHandle) -> None:
+        del self._slots[handle._slot][handle]  # type: ignore[index]
+        handle._slot = None
+        self._pending -= 1
+
+    # ------------------------------------------------------------ ticking
+
+    def _collect_locked(self, now: float) -> list[TimerHandle]:
+        target = int(now / self.tick_s + _EPS)
+        due: list[TimerHandle] = []
+        if self._pending:
+            for i in range(1, min(target - self._now_tick, self._n) + 1):
+                slot = self._slots[(self._now_tick + i) % self._n]
+                if slot:
+                    for handle in [h for h in slot if h.tick <= target]:
+                        self._remove_locked(handle)
+                        due.append(handle)
+        self._now_tick = max(self._now_tick, target)
+        due.sort(key=lambda h: h.when)
+        return due
+
+    def _next_tick_locked(self) -> int | None:
+        if not self._pending:
+            return None
+        for i in range(1, self._n + 1):
+            tick = self._now_tick + i
+            slot = self._slots[tick % self._n]
+            if slot and any(h.tick == tick for h in slot):
+                return tick
+        # everything is more than a revolution away: look again then
+        return self._now_tick + self._n
+
+    def _fire(self, due: list[TimerHandle], now: float) -> None:
+        for handle in due:
+            self._lag.append((now - handle.when) * 1000.0)
+            if handle.interval is not None and not handle.cancelled:
+                nxt = handle.when + handle.interval
+                if nxt <= now:
+                    nxt = now + handle.interval
+                with self._lock:
+                    if handle._slot is None:
+                        self._insert_locked(handle, nxt)
+            self.fired += 1
+            try:
+                result = handle.fn(*handle.args)
+                if asyncio.iscoroutine(result):
+                    self._spawn(result, handle)
+            except Exception as e:  # noqa: BLE001
+                self.errors += 1
+                logger.warning(
+                    {
+                        "event": "timer_wheel_callback_error",
+                        "timer": handle.name,
+                        "error": repr(e),
+                    }
+                )
+
+    def _spawn(self, coro: Any, handle: TimerHandle) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            coro.close()
+            logger.warning({"event": "timer_wheel_coro_no_loop", "timer": handle.name})
+            return
+        loop.create_task(coro)
+
+    # ------------------------------------------------------------ drivers
+
+    def _ensure_driver_locked(self) -> None:
+        loop = self._loop
+        running = _running_loop()
+        if running is not None and (
+            loop is None or loop.is_closed() or not loop.is_running()
+        ):
+            # first (or replacement) loop to schedule here drives the wheel
+            self._loop = running
+            self._loop_handle = None
+            self._armed_tick = None
+            self._cond.notify_all()
+            tick = self._next_tick_locked()
+            if tick is not None:
+                self._arm_locked(tick)
+        elif (loop is None or loop.is_closed()) and self._thread is None:
+            self._loop = None
+            self._thread = threading.Thread(
+                target=self._thread_main, name="bb8-timers", daemon=True
+            )
+            self._thread.start()
+
+    def _arm_locked(self, tick: int) -> None:
+        self._armed_tick = tick
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self._cond.notify_all()
+            return
+        if _running_loop() is loop:
+            if self._loop_handle is not None:
+                self._loop_handle.cancel()
+            delay = max(0.0, tick * self.tick_s - self._clock())
+            self._loop_handle = loop.call_later(delay, self._on_loop_tick)
+        else:
+            loop.call_soon_threadsafe(self._rearm)
+
+    def _rearm(self) -> None:
+        with self._lock:
+            tick = self._next_tick_locked()
+            if tick is None:
+                self._armed_tick = None
+            else:
+                self._arm_locked(tick)
+
+    def _on_loop_tick(self) -> None:
+        now = self._clock()
+        with self._lock:
+            self._loop_handle = None
+            self._armed_tick = None
+            due = self._collect_locked(now)
+        self._fire(due, now)
+        self._rearm()
+
+    def _thread_main(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if self._loop is not None and not self._loop.is_closed():
+                        self._thread = None
+                        return
+                    if self._armed_tick is None:
+                        self._cond.wait()
+                        continue
+                    wait = self._armed_tick * self.tick_s - self._clock()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                now = self._clock()
+                self._armed_tick = None
+                due = self._collect_locked(now)
+            self._fire(due, now)
+            with self._lock:
+                if self._armed_tick is None:
+                    self._armed_tick = self._next_tick_locked()
+
+
+def _running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+_WHEEL: TimerWheel | None = None
+
+
+def get_timer_wheel() -> TimerWheel:
+    global _WHEEL
+    if _WHEEL is None:
+        _WHEEL = TimerWheel()
+    return _WHEEL
+
+
+__all__ = [
+    "DEFAULT_SLOTS",
+    "DEFAULT_TICK_S",
+    "TimerHandle",
+    "TimerWheel",
+    "get_timer_wheel",
+]
@@ -8,3 +8,11 @@ def clamp(x: int, lo: int, hi: int) -> int:
     if x > hi:
         return hi
     return x
+
+
+def percentile(sorted_samples: list[float], pct: float) -> float | None:
+    """Nearest-rank ``pct`` (0..1) of already sorted samples, for stats."""
+    if not sorted_samples:
+        return None
+    idx = min(len(sorted_samples) - 1, int(round(pct * (len(sorted_samples) - 1))))
+    return round(sorted_samples[idx], 2)
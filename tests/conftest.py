@@ -9,7 +9,9 @@ from __future__ import annotations
 
 import importlib
 import os
+import shutil
 import sys
+import tempfile
 import types
 from pathlib import Path
 
@@ -62,6 +64,16 @@ def pytest_configure(config):  # noqa: D401
     os.environ.setdefault("MQTT_BASE", "bb8")
     # Prefer local MQTT host for unit tests unless explicitly overridden
     os.environ.setdefault("MQTT_HOST", "127.0.0.1")
+    # Keep the disk-backed offline outbox out of /data during tests
+    if "BB8_OUTBOX_DIR" not in os.environ:
+        config._bb8_outbox_dir = tempfile.mkdtemp(prefix="bb8_outbox_test_")
+        os.environ["BB8_OUTBOX_DIR"] = config._bb8_outbox_dir
+
+
+def pytest_unconfigure(config):
+    outbox_dir = getattr(config, "_bb8_outbox_dir", None)
+    if outbox_dir:
+        shutil.rmtree(outbox_dir, ignore_errors=True)
 
 
 # Provide a lightweight stub for 'bleak' if not installed so that modules
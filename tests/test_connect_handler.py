@@ -57,27 +57,16 @@ def _load_bridge_controller_tree() -> ast.AST:
     return ast.parse(source_path.read_text())
 
 
-def _find_connect_branch() -> ast.If:
+def _find_connect_branch() -> ast.FunctionDef:
+    """Locate the routed ``connect`` command handler in the controller."""
     tree = _load_bridge_controller_tree()
     for node in ast.walk(tree):
-        if not isinstance(node, ast.If):
-            continue
-        test = node.test
-        if not isinstance(test, ast.Compare):
-            continue
-        if not isinstance(test.left, ast.Name) or test.left.id != "cmd":
-            continue
-        if len(test.ops) != 1 or not isinstance(test.ops[0], ast.Eq):
-            continue
-        if len(test.comparators) != 1:
-            continue
-        comparator = test.comparators[0]
-        if isinstance(comparator, ast.Constant) and comparator.value == "connect":
+        if isinstance(node, ast.FunctionDef) and node.name == "_cmd_connect":
             return node
     raise AssertionError("connect command branch not found")
 
 
-def _branch_rejects_only_empty_payload(branch: ast.If) -> bool:
+def _branch_rejects_only_empty_payload(branch: ast.FunctionDef) -> bool:
     if not branch.body:
         return False
     guard = branch.body[0]
@@ -98,7 +87,7 @@ def _branch_rejects_only_empty_payload(branch: ast.If) -> bool:
     return bool(guard.orelse)
 
 
-def _branch_schedules_connect_attempt(branch: ast.If) -> bool:
+def _branch_schedules_connect_attempt(branch: ast.FunctionDef) -> bool:
     if not branch.body:
         return False
     raw_guard = branch.body[0]
@@ -157,7 +146,7 @@ def _branch_schedules_connect_attempt(branch: ast.If) -> bool:
     return False
 
 
-def _branch_has_missing_session_guard(branch: ast.If) -> bool:
+def _branch_has_missing_session_guard(branch: ast.FunctionDef) -> bool:
     if not branch.body:
         return False
     raw_guard = branch.body[0]
@@ -181,7 +170,7 @@ def _branch_has_missing_session_guard(branch: ast.If) -> bool:
     return bool(session_guard.body)
 
 
-def _branch_has_inflight_guard(branch: ast.If) -> bool:
+def _branch_has_inflight_guard(branch: ast.FunctionDef) -> bool:
     if not branch.body:
         return False
     raw_guard = branch.body[0]
@@ -5,6 +5,7 @@
 import contextlib
 import json
 import os
+import tempfile
 import time
 from unittest.mock import MagicMock, mock_open, patch
 
@@ -210,25 +211,26 @@ class TestEchoResponderComplete:
 
     def test_heartbeat_system_comprehensive(self):
         """Test comprehensive heartbeat system functionality."""
-        # Test heartbeat thread creation
-        with patch("threading.Thread") as mock_thread, patch("time.sleep"):
+        # Heartbeats are periodic timers on the shared wheel, not threads
+        with patch("addon.bb8_core.timer_wheel.get_timer_wheel") as mock_wheel:
             _start_heartbeat("/test/heartbeat.txt", interval=5)
 
-            mock_thread.assert_called()
-            thread_instance = mock_thread.return_value
-            thread_instance.start.assert_called()
+            call_every = mock_wheel.return_value.call_every
+            call_every.assert_called_once()
+            assert call_every.call_args[0][0] == 5
+            assert call_every.call_args[1]["first"] == 0.0
 
         # Test heartbeat with file writing
-        heartbeat_calls = []
-
-        def mock_heartbeat_worker():
-            heartbeat_calls.append(time.time())
-
-        with patch("threading.Thread") as mock_thread:
-            mock_thread.return_value.start = mock_heartbeat_worker
-            _start_heartbeat("/test/heartbeat.txt", interval=1)
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            patch("addon.bb8_core.timer_wheel.get_timer_wheel") as mock_wheel,
+        ):
+            path = os.path.join(tmp, "heartbeat.txt")
+            _start_heartbeat(path, interval=1)
 
-            assert len(heartbeat_calls) > 0
+            tick = mock_wheel.return_value.call_every.call_args[0][1]
+            tick()
+            assert os.path.exists(path)
 
     def test_mqtt_connection_callbacks_comprehensive(self, caplog):
         """Test comprehensive MQTT connection callback scenarios."""
@@ -462,22 +464,16 @@ class TestEchoResponderComplete:
 
     def test_threading_and_concurrency(self):
         """Test threading and concurrency aspects."""
-        # Test multiple heartbeat threads
-        thread_count = 0
-
-        def mock_thread_init(*args, **kwargs):
-            nonlocal thread_count
-            thread_count += 1
-            mock_thread = MagicMock()
-            mock_thread.start = MagicMock()
-            return mock_thread
-
-        with patch("threading.Thread", side_effect=mock_thread_init):
-            # Start multiple heartbeats
+        # Multiple heartbeats share the timer wheel instead of one thread each
+        with (
+            patch("threading.Thread") as mock_thread,
+            patch("addon.bb8_core.timer_wheel.get_timer_wheel") as mock_wheel,
+        ):
             _start_heartbeat("/test1.txt", 1)
             _start_heartbeat("/test2.txt", 2)
 
-            assert thread_count == 2
+            mock_thread.assert_not_called()
+            assert mock_wheel.return_value.call_every.call_count == 2
 
         # Test BLE ready spawn threading
         with (
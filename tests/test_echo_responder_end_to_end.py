@@ -288,40 +288,13 @@ class TestHeartbeatSystem:
     """Test heartbeat system functionality."""
 
     def test_start_heartbeat(self):
-        """Test heartbeat thread startup."""
-        with patch("threading.Thread") as mock_thread:
+        """Test heartbeat timer startup."""
+        with patch("addon.bb8_core.timer_wheel.get_timer_wheel") as mock_wheel:
             _start_heartbeat("/test/heartbeat.txt", interval=1)
 
-        # Should start heartbeat thread
-        mock_thread.assert_called()
-        thread_instance = mock_thread.return_value
-        thread_instance.start.assert_called()
-
-    def test_heartbeat_echo_env_disabled(self, monkeypatch):
-        """Test heartbeat echo when disabled via environment."""
-        monkeypatch.delenv("ECHO_HEARTBEAT", raising=False)
-
-        with patch("addon.bb8_core.echo_responder._start_heartbeat") as mock_start:
-            from addon.bb8_core.echo_responder import _heartbeat_echo
-
-            _heartbeat_echo()
-
-        # Should not start heartbeat when not enabled
-        mock_start.assert_not_called()
-
-    def test_heartbeat_echo_env_enabled(self, monkeypatch):
-        """Test heartbeat echo when enabled via environment."""
-        monkeypatch.setenv("ECHO_HEARTBEAT", "1")
-        monkeypatch.setenv("ECHO_HEARTBEAT_PATH", "/test/heartbeat.txt")
-        monkeypatch.setenv("ECHO_HEARTBEAT_INTERVAL", "5")
-
-        with patch("addon.bb8_core.echo_responder._start_heartbeat") as mock_start:
-            from addon.bb8_core.echo_responder import _heartbeat_echo
-
-            _heartbeat_echo()
-
-        # Should start heartbeat when enabled
-        mock_start.assert_called_with("/test/heartbeat.txt", 5)
+        # Should register one periodic timer (interval floored at 2 s)
+        mock_wheel.return_value.call_every.assert_called_once()
+        assert mock_wheel.return_value.call_every.call_args[0][0] == 2
 
 
 class TestEndToEndIntegration:
@@ -48,8 +48,8 @@ def test_evidence_recorder_message_handling(monkeypatch):
         msg.payload = payload.encode()
         msg.topic = "bb8/cmd/anything"
         recorder.client.on_message(client, None, msg)
-    # Should queue evidence twice due to chained callback
-    assert recorder._cmd_q.qsize() == 2
+    # The router tap queues each command exactly once
+    assert recorder._cmd_q.qsize() == 1
     recorder.stop()
 
 
@@ -120,8 +120,8 @@ def test_evidence_recorder_malformed_payload(monkeypatch):
     msg.topic = "bb8/cmd/anything"
     # Use the installed on_message callback
     recorder.client.on_message(client, None, msg)
-    # Should queue evidence twice due to chained callback
-    assert recorder._cmd_q.qsize() == 2
+    # The router tap queues each command exactly once
+    assert recorder._cmd_q.qsize() == 1
     recorder.stop()
 
 
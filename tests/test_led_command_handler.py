@@ -10,12 +10,15 @@ sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 
 def _install_bridge_controller_import_stubs():
+    """Stub bridge_controller's heavy imports; returns what they replaced."""
     logger = logging.getLogger("test_bridge_controller")
+    replaced = {}
 
     def _stub_module(name, **attrs):
         module = types.ModuleType(name)
         for key, value in attrs.items():
             setattr(module, key, value)
+        replaced.setdefault(name, sys.modules.get(name))
         sys.modules[name] = module
         return module
 
@@ -48,17 +51,35 @@ def _install_bridge_controller_import_stubs():
     )
     _stub_module("bb8_core.evidence_capture", EvidenceRecorder=_NoOpRecorder)
     _stub_module("bb8_core.logging_setup", logger=logger)
+    def _enqueue_publish(client, topic, payload, qos=0, retain=False):
+        # Synchronous stand-in for the outbox: published and acked on return
+        client.publish(topic, payload, qos=qos, retain=retain)
+        return types.SimpleNamespace(reason=None, add_done_callback=lambda fn: None)
+
     _stub_module(
         "bb8_core.mqtt_dispatcher",
         register_subscription=lambda *args, **kwargs: None,
+        enqueue_publish=_enqueue_publish,
     )
     _stub_module("bb8_core.ble_session", BleSession=type("BleSession", (), {}))
     _stub_module("bb8_core.facade", BB8Facade=type("BB8Facade", (), {}))
+    return replaced
+
 
+def _restore_modules(replaced):
+    # Later test modules import the real ones, not these stubs
+    for name, module in replaced.items():
+        if module is None:
+            sys.modules.pop(name, None)
+        else:
+            sys.modules[name] = module
 
-_install_bridge_controller_import_stubs()
 
-bridge_controller = importlib.import_module("bb8_core.bridge_controller")
+_replaced = _install_bridge_controller_import_stubs()
+try:
+    bridge_controller = importlib.import_module("bb8_core.bridge_controller")
+finally:
+    _restore_modules(_replaced)
 
 
 class FakeMQTTClient:
@@ -188,12 +209,14 @@ def test_led_on_without_color_uses_default_or_last():
         0,
         True,
     )
-    assert mqtt_client.publishes[2] == (
+    assert mqtt_client.publishes[1] == (
         "bb8/state/led",
         '{"state":"ON","color_mode":"rgb","color":{"r":4,"g":5,"b":6}}',
         0,
         True,
     )
+    # third command repeats the retained state, so the publish is suppressed
+    assert len(mqtt_client.publishes) == 2
 
 
 def test_led_malformed_payload(caplog):
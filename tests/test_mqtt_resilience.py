@@ -47,4 +47,36 @@ def test_safe_publish_transient(monkeypatch, caplog):
         )
         is True
     )
+    # Publishing is handed to the outbox worker; wait for it to drain
+    assert md.get_outbox().flush(timeout=2.0)
     assert calls["publishes"] >= 1
+
+
+def test_offline_publishes_replay_in_order_on_connect(monkeypatch, tmp_path):
+    from addon.bb8_core import mqtt_dispatcher as md, offline_outbox as oo
+
+    monkeypatch.setattr(oo, "_OFFLINE_OUTBOX", oo.OfflineOutbox(tmp_path))
+    sent = []
+
+    class StubClient:
+        connected = False
+
+        def is_connected(self):
+            return self.connected
+
+        def publish(self, topic, payload=None, qos=0, retain=False):
+            sent.append((topic, payload))
+
+    c = StubClient()
+    md.safe_publish(c, "bb8/state/led", "a", retain=True)
+    md.safe_publish(c, "bb8/event/x", "e")
+    md.safe_publish(c, "bb8/state/led", "b", retain=True)
+    assert oo.get_offline_outbox().pending() == 2
+
+    c.connected = True
+    md._flush_queue(c, rate_per_s=0)
+    md._REPLAY_THREAD.join(timeout=2.0)
+    assert md.get_outbox().flush(timeout=2.0)
+    replayed = [s for s in sent if not s[0].endswith("/status/metrics")]
+    assert replayed == [("bb8/event/x", "e"), ("bb8/state/led", "b")]
+    assert oo.get_offline_outbox().pending() == 0
@@ -1,6 +1,16 @@
+import asyncio
+import sys
+import threading
+
 from bb8_core import bridge_controller
 
 
+def _flush():
+    # Retained state goes through the publish outbox of the same module copy
+    name = bridge_controller.__name__.replace("bridge_controller", "mqtt_outbox")
+    assert sys.modules[name].get_outbox().flush(timeout=2.0)
+
+
 class FakeClient:
     def __init__(self):
         self.calls = []
@@ -24,6 +34,7 @@ def test_presence_detected_publishes_correct_payload(monkeypatch):
         "bb8/presence/C9:5A:63:6B:B5:4A",
         {"state": "present", "mac": "C9:5A:63:6B:B5:4A"},
     )
+    _flush()
 
     assert fake_client.calls == [
         {
@@ -43,6 +54,7 @@ def test_presence_not_detected_publishes_correct_payload(monkeypatch):
         "bb8/presence/C9:5A:63:6B:B5:4A",
         {"state": "absent", "mac": "C9:5A:63:6B:B5:4A"},
     )
+    _flush()
 
     assert fake_client.calls == [
         {
@@ -58,6 +70,7 @@ def test_presence_initial_state_is_not_detected():
     fake_client = FakeClient()
 
     bridge_controller._publish_presence_state("not_detected", mqtt_client=fake_client)
+    _flush()
 
     assert fake_client.calls == [
         {
@@ -66,4 +79,35 @@ def test_presence_initial_state_is_not_detected():
             "qos": 0,
             "retain": True,
         }
-    ]
\ No newline at end of file
+    ]
+
+
+async def test_monitor_presence_reaches_the_controller_over_the_bus(monkeypatch):
+    fake_client = FakeClient()
+    monkeypatch.setattr(bridge_controller, "client", fake_client)
+    bus_mod = sys.modules[
+        bridge_controller.__name__.replace("bridge_controller", "mqtt_connection")
+    ]
+    bus = bus_mod.InProcessBus(None, base="bb8")
+    monkeypatch.setattr(bridge_controller, "current_bus", lambda: bus)
+    await bus.subscribe("bb8/internal/presence", bridge_controller._on_bus_presence)
+
+    # the presence monitor calls the adapter from its own thread
+    t = threading.Thread(
+        target=bridge_controller._auto_detect_presence_publish_adapter,
+        args=("bb8/presence/C9:5A:63:6B:B5:4A", {"state": "present"}),
+    )
+    t.start()
+    t.join()
+    await asyncio.sleep(0.01)
+    _flush()
+
+    assert bus.stats()["local_delivered"] == 1
+    assert fake_client.calls == [
+        {
+            "topic": "bb8/state/presence",
+            "payload": "detected",
+            "qos": 0,
+            "retain": True,
+        }
+    ]
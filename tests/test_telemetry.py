@@ -1,5 +1,4 @@
-import threading
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
 
 import pytest
 
@@ -75,12 +74,14 @@ class DummyBridge:
 def test_telemetry_start_stop(mock_logger):
     bridge = DummyBridge()
     t = telemetry.Telemetry(bridge)
-    with patch.object(threading.Thread, "start") as mock_start:
+    with patch("addon.bb8_core.telemetry.get_timer_wheel") as mock_wheel:
         t.start()
-        mock_start.assert_called_once()
-    with patch.object(threading.Thread, "join") as mock_join:
-        t.stop()
-        mock_join.assert_called_once_with(timeout=2)
+        mock_wheel.return_value.call_every.assert_called_once_with(
+            20, t._tick, name="telemetry", first=0.0
+        )
+    handle = mock_wheel.return_value.call_every.return_value
+    t.stop()
+    handle.cancel.assert_called_once()
     assert mock_logger.info.call_count == 2
 
 
@@ -88,16 +89,11 @@ def test_telemetry_start_stop(mock_logger):
 def test_telemetry_run_presence_and_rssi(mock_logger):
     bridge = DummyBridge()
     t = telemetry.Telemetry(bridge)
-    t._stop = MagicMock()
-    t._stop.is_set.side_effect = [False, True] + [
-        True
-    ] * 10  # ensure enough values for all loop calls
     with (
-        patch("time.sleep"),
         patch.object(bridge, "publish_presence") as mock_presence,
         patch.object(bridge, "publish_rssi") as mock_rssi,
     ):
-        t._run()
+        t._tick()
         mock_presence.assert_called_once_with(True)
         mock_rssi.assert_called_once_with(55)
 
@@ -110,12 +106,7 @@ def test_telemetry_run_presence_exception(mock_logger):
         raise ValueError("fail")
 
     t = telemetry.Telemetry(bridge, publish_presence=bad_presence)
-    t._stop = MagicMock()
-    t._stop.is_set.side_effect = [False, True] + [
-        True
-    ] * 10  # ensure enough values for all loop calls
-    with patch("time.sleep"):
-        t._run()
+    t._tick()
     assert any(
         "telemetry_presence_cb_error" in str(c)
         for c in mock_logger.warning.call_args_list
@@ -131,12 +122,7 @@ def test_telemetry_run_rssi_exception(mock_logger):
 
     t = telemetry.Telemetry(bridge, publish_rssi=None)
     bridge.get_rssi = bad_rssi
-    t._stop = MagicMock()
-    t._stop.is_set.side_effect = [False, True] + [
-        True
-    ] * 10  # ensure enough values for all loop calls
-    with patch("time.sleep"):
-        t._run()
+    t._tick()
     assert any(
         "telemetry_rssi_probe_error" in str(c)
         for c in mock_logger.warning.call_args_list
@@ -148,12 +134,7 @@ def test_telemetry_run_invalid_rssi_type(mock_logger):
     bridge = DummyBridge()
     bridge.get_rssi = lambda: ["not", "int"]
     t = telemetry.Telemetry(bridge)
-    t._stop = MagicMock()
-    t._stop.is_set.side_effect = [False, True] + [
-        True
-    ] * 10  # ensure enough values for all loop calls
-    with patch("time.sleep"):
-        t._run()
+    t._tick()
     assert any(
         "telemetry_invalid_rssi" in str(c) for c in mock_logger.warning.call_args_list
     )
@@ -167,13 +148,8 @@ def test_telemetry_run_rssi_cb_exception(mock_logger):
         raise ValueError("fail")
 
     t = telemetry.Telemetry(bridge, publish_rssi=bad_cb)
-    t._stop = MagicMock()
-    t._stop.is_set.side_effect = [False, True] + [
-        True
-    ] * 10  # ensure enough values for all loop calls
     bridge.get_rssi = lambda: 99
-    with patch("time.sleep"):
-        t._run()
+    t._tick()
     assert any(
         "telemetry_rssi_cb_error" in str(c) for c in mock_logger.warning.call_args_list
     )
@@ -183,14 +159,9 @@ def test_telemetry_run_rssi_cb_exception(mock_logger):
 def test_telemetry_run_general_exception(mock_logger):
     bridge = DummyBridge()
     t = telemetry.Telemetry(bridge)
-    t._stop = MagicMock()
-    t._stop.is_set.side_effect = [False, True] + [
-        True
-    ] * 10  # ensure enough values for all loop calls
-    # Force an exception in the run loop
+    # Force an exception in the probe
     t.bridge = None
-    with patch("time.sleep"):
-        t._run()
+    t._tick()
     assert any(
         call[0][0].get("event") == "telemetry_error"
         for call in mock_logger.warning.call_args_list
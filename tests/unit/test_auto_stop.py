@@ -0,0 +1,85 @@
+import asyncio
+
+import bb8_core.safety as safety  # type: ignore[import-not-found]
+from bb8_core.timer_wheel import TimerWheel  # type: ignore[import-not-found]
+
+
+def _controller(monkeypatch):
+    wheel = TimerWheel()
+    monkeypatch.setattr(safety, "get_timer_wheel", lambda: wheel)
+    return safety.MotionSafetyController(), wheel
+
+
+def _counter(stops):
+    async def _stop():
+        stops.append(asyncio.get_running_loop().time())
+
+    return _stop
+
+
+async def test_many_extensions_fire_exactly_once_at_the_last_deadline(monkeypatch):
+    controller, wheel = _controller(monkeypatch)
+    stops = []
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for _ in range(10):  # 50 Hz drive input keeps pushing the deadline out
+        controller.schedule_auto_stop(60, _counter(stops))
+        await asyncio.sleep(0.02)
+    assert stops == [] and wheel.stats()["pending"] == 1
+    await asyncio.sleep(0.15)
+    assert len(stops) == 1 and stops[0] - start >= 0.2
+    stats = controller.get_safety_status()["auto_stop"]
+    assert stats["armed"] == 1 and stats["extended"] == 9
+    assert stats["fired"] == 1 and not stats["pending"]
+
+
+async def test_a_shorter_drive_moves_the_deadline_earlier(monkeypatch):
+    controller, _wheel = _controller(monkeypatch)
+    stops = []
+    controller.schedule_auto_stop(5000, _counter(stops))
+    controller.schedule_auto_stop(30, _counter(stops))
+    await asyncio.sleep(0.12)
+    assert len(stops) == 1
+    assert controller.get_safety_status()["auto_stop"]["shortened"] == 1
+
+
+async def test_estop_stops_immediately_and_only_once(monkeypatch):
+    controller, _wheel = _controller(monkeypatch)
+    stops = []
+    stop = _counter(stops)
+    controller.schedule_auto_stop(50, stop)
+    controller.activate_estop("test")
+    # the facade then asks for its own stop: it joins the one in flight
+    stopping = controller.force_auto_stop(stop)
+    assert stopping is not None
+    await stopping
+    await asyncio.sleep(0.1)  # the old deadline must not fire again
+    assert len(stops) == 1
+    stats = controller.get_safety_status()["auto_stop"]
+    assert stats["forced"] == 1 and stats["fired"] == 0
+
+
+async def test_force_without_a_drive_runs_the_fallback(monkeypatch):
+    controller, _wheel = _controller(monkeypatch)
+    stops = []
+    await controller.force_auto_stop(_counter(stops))
+    assert len(stops) == 1
+    assert controller.force_auto_stop() is None
+
+
+async def test_force_racing_the_deadline_does_not_double_stop(monkeypatch):
+    controller, wheel = _controller(monkeypatch)
+    stops = []
+
+    async def slow_stop():
+        stops.append(1)
+        await asyncio.sleep(0.05)
+
+    controller.schedule_auto_stop(10, slow_stop)
+    await asyncio.sleep(0.04)  # the deadline stop is now running
+    assert controller.get_safety_status()["active_stop_tasks"] == 1
+    await controller.force_auto_stop(slow_stop)
+    controller.cancel_auto_stop()
+    await controller.shutdown()
+    assert stops == [1]
+    assert wheel.stats()["pending"] == 0
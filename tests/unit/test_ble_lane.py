@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import pytest
+
+from bb8_core.ble_lane import BleLane, PreemptedError  # type: ignore[import-not-found]
+from bb8_core.ble_session import BleSession  # type: ignore[import-not-found]
+
+STOP_RGB = (255, 0, 0)
+
+
+class FakeToy:
+    """LED writes fail on their first attempt, so each one sits in a retry."""
+
+    def __init__(self):
+        self.writes = []
+        self.attempts = {}
+
+    def set_main_led(self, r, g, b, _brightness):
+        rgb = (r, g, b)
+        self.attempts[rgb] = self.attempts.get(rgb, 0) + 1
+        if rgb != STOP_RGB and rgb != (0, 0, 0) and self.attempts[rgb] == 1:
+            raise RuntimeError("gatt busy")
+        self.writes.append((time.monotonic(), rgb))
+
+
+def _session():
+    lane = BleLane(target_ms=50.0)
+    session = BleSession("AA:BB:CC:DD:EE:FF", lane=lane)
+    session._toy = FakeToy()
+    session._connected = True
+    return session, lane
+
+
+async def test_estop_preempts_a_saturated_led_queue():
+    session, lane = _session()
+    leds = [asyncio.create_task(session.set_led(i + 1, 10, 10)) for i in range(40)]
+    await asyncio.sleep(0.01)  # every LED write is now sleeping in its retry
+    assert lane.stats()["inflight"] == 40
+
+    estop_at = time.monotonic()
+    lane.preempt("estop")
+    await session.stop()
+
+    results = await asyncio.gather(*leds, return_exceptions=True)
+    assert all(isinstance(r, PreemptedError) for r in results)
+    toy = session._toy
+    stop_at = next(t for t, rgb in toy.writes if rgb == STOP_RGB)
+    assert (stop_at - estop_at) * 1000.0 < 50.0
+    # no LED write landed: the stop was the first thing on the radio
+    assert [rgb for _, rgb in toy.writes] == [STOP_RGB, (0, 0, 0)]
+    assert session.is_connected()  # preemption is not a link error
+    stats = lane.stats()
+    assert stats["cancelled"] == 40 and stats["inflight"] == 0
+    assert stats["stop_write_ms"]["estop"]["samples"] == 1
+    assert stats["over_target"] == 0
+
+
+async def test_writes_queued_behind_a_stop_are_flushed_by_the_next_estop():
+    session, lane = _session()
+    stop = asyncio.create_task(session.stop())
+    await asyncio.sleep(0.01)  # the stop holds the lane
+    queued = [asyncio.create_task(session.set_led(9, 9, i)) for i in range(10)]
+    await asyncio.sleep(0)
+    lane.preempt("estop")
+    late = asyncio.create_task(session.set_led(1, 2, 3))  # after the estop
+    for task in queued:
+        with pytest.raises(PreemptedError):
+            await task
+    await stop
+    await late  # waited for the stop, then went out
+    assert lane.stats()["flushed"] == 10
+    assert session._toy.writes[-1][1] == (1, 2, 3)
@@ -1,5 +1,6 @@
 import asyncio
 import sys
+import threading
 from pathlib import Path
 
 # Add repository root to path for test imports
@@ -42,7 +43,12 @@ def test_watchdog_publishes_disconnected_after_session_invalidation(monkeypatch)
     def _publish_connection(state, *, config=None):
         published_states.append(state)
 
+    real_sleep = asyncio.sleep
+
     async def _fake_sleep(_seconds):
+        # The BLE link thread started at import shares the patched function
+        if threading.current_thread() is not threading.main_thread():
+            return await real_sleep(_seconds)
         sleep_calls["count"] += 1
         if sleep_calls["count"] == 2:
             session.connected = False
@@ -0,0 +1,149 @@
+import asyncio
+import time
+
+from bb8_core.command_admission import (  # type: ignore[import-not-found]
+    FIFO,
+    LATEST,
+    NEVER_DROP,
+    ClassPolicy,
+    CommandAdmission,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def _policies():
+    return {
+        "estop": ClassPolicy("estop", NEVER_DROP),
+        "led": ClassPolicy("led", LATEST, rate=10.0, burst=2),
+        "motion": ClassPolicy("motion", LATEST, rate=10.0, burst=1),
+        "preset": ClassPolicy("preset", FIFO, rate=10.0, burst=1, cap=2),
+        "control": ClassPolicy("control", FIFO, rate=10.0, burst=1, cap=1),
+    }
+
+
+def _submit(adm, cmd, i, ran, nacks):
+    return adm.submit(
+        cmd,
+        f"c{i}",
+        lambda: ran.append((cmd, i)),
+        lambda reason, outcome: nacks.append((i, reason, outcome)),
+    )
+
+
+async def test_latest_wins_merges_pending_commands():
+    clock = Clock()
+    adm = CommandAdmission(_policies(), clock=clock)
+    ran, nacks = [], []
+    outcomes = [_submit(adm, "led", i, ran, nacks) for i in range(5)]
+    assert outcomes == ["admitted", "admitted", "deferred", "deferred", "deferred"]
+    assert ran == [("led", 0), ("led", 1)]
+    assert nacks == [(2, "superseded", "merged"), (3, "superseded", "merged")]
+    clock.t = 1.0
+    await asyncio.sleep(0.15)
+    assert ran[-1] == ("led", 4)
+    stats = adm.stats()
+    assert (stats["admitted"], stats["merged"], stats["dropped"]) == (3, 2, 0)
+
+
+async def test_fifo_keeps_order_up_to_cap():
+    clock = Clock()
+    adm = CommandAdmission(_policies(), clock=clock)
+    ran, nacks = [], []
+    outcomes = [_submit(adm, "led_preset", i, ran, nacks) for i in range(5)]
+    assert outcomes == ["admitted", "deferred", "deferred", "dropped", "dropped"]
+    assert [n[1] for n in nacks] == ["queue_full", "queue_full"]
+    clock.t = 1.0
+    await asyncio.sleep(0.15)
+    clock.t = 2.0
+    await asyncio.sleep(0.15)
+    assert ran == [("led_preset", 0), ("led_preset", 1), ("led_preset", 2)]
+
+
+async def test_estop_is_never_dropped_and_preempts_pending_motion():
+    clock = Clock()
+    adm = CommandAdmission(_policies(), clock=clock)
+    ran, nacks = [], []
+    _submit(adm, "drive", 0, ran, nacks)
+    assert _submit(adm, "drive", 1, ran, nacks) == "deferred"
+    for i in range(2, 50):
+        assert _submit(adm, "estop", i, ran, nacks) == "admitted"
+    assert nacks == [(1, "preempted_by_estop", "dropped")]
+    clock.t = 1.0
+    await asyncio.sleep(0.15)
+    assert ("drive", 1) not in ran
+    assert adm.stats()["classes"]["estop"]["admitted"] == 48
+
+
+async def test_stop_preempts_a_deferred_drive_so_it_cannot_restart():
+    clock = Clock()
+    adm = CommandAdmission(_policies(), clock=clock)
+    ran, nacks = [], []
+    for i in range(6):
+        _submit(adm, "drive", i, ran, nacks)
+    assert _submit(adm, "stop", 6, ran, nacks) == "admitted"
+    assert nacks[-1] == (5, "preempted_by_stop", "dropped")
+    clock.t = 1.0
+    await asyncio.sleep(0.15)
+    assert ran == [("drive", 0), ("stop", 6)]
+
+
+def test_no_loop_rejects_instead_of_queueing():
+    adm = CommandAdmission(_policies(), clock=Clock())
+    ran, nacks = [], []
+    _submit(adm, "wake", 0, ran, nacks)
+    assert _submit(adm, "wake", 1, ran, nacks) == "dropped"
+    assert nacks == [(1, "rate_limited", "dropped")]
+
+
+async def test_led_flood_keeps_the_loop_responsive():
+    """200 Hz LED flood for 0.5 s: bounded BLE work, estop still immediate."""
+    adm = CommandAdmission()
+    writes = 0
+    estop_at = []
+
+    async def ble_write():
+        nonlocal writes
+        writes += 1
+        await asyncio.sleep(0.005)
+
+    def on_led():
+        asyncio.get_running_loop().create_task(ble_write())
+
+    lag = 0.0
+
+    async def heartbeat():
+        nonlocal lag
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lag = max(lag, time.perf_counter() - t0 - 0.01)
+
+    hb = asyncio.create_task(heartbeat())
+    start = time.perf_counter()
+    for i in range(100):
+        adm.submit("led", str(i), on_led, lambda *_: None)
+        if i == 50:
+            sent = time.perf_counter()
+            adm.submit(
+                "estop",
+                "e",
+                lambda sent=sent: estop_at.append(time.perf_counter() - sent),
+                lambda *_: None,
+            )
+        await asyncio.sleep(0.005)
+    await asyncio.sleep(0.1)
+    hb.cancel()
+    elapsed = time.perf_counter() - start
+    stats = adm.stats()["classes"]["led"]
+    # burst + rate * elapsed (+1 for the pending survivor)
+    assert writes <= 4 + 20 * elapsed + 1
+    assert stats["merged"] > 50
+    assert estop_at and estop_at[0] < 0.001
+    assert lag < 0.05
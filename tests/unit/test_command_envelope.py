@@ -0,0 +1,65 @@
+import importlib
+import types
+
+from bb8_core.command_envelope import decode_command  # type: ignore[import-not-found]
+from bb8_core.mqtt_router import MqttRouter  # type: ignore[import-not-found]
+
+# The module decode_command lives in; the bb8_core package attribute can be
+# rebound to an addon.bb8_core alias copy once another test imports one
+command_envelope = importlib.import_module("bb8_core.command_envelope")
+
+
+def test_object_payload_decodes_args_and_cid():
+    env = decode_command("bb8/cmd/led", b'{"r":1,"g":2,"b":3,"cid":7}', received_at=5.0)
+    assert env.ok
+    assert env.command == "led"
+    assert env.cid == "7"
+    assert env.get("g") == 2
+    assert env.received_at == 5.0
+
+
+def test_bare_word_payload_is_not_an_error():
+    env = decode_command("bb8/cmd/power", b"wake")
+    assert env.ok
+    assert env.args == {}
+    assert env.raw == "wake"
+
+
+def test_invalid_and_non_object_json():
+    assert decode_command("bb8/cmd/led", b'{"r":').error == "invalid_json"
+    assert decode_command("bb8/cmd/led", b"[1,2]").error == "not_an_object"
+    assert decode_command("bb8/cmd/led", b"42").error == "not_an_object"
+
+
+def test_schema_errors_for_known_commands():
+    assert decode_command("bb8/cmd/led_preset", b"{}").error == (
+        "missing field(s): name"
+    )
+    env = decode_command("bb8/cmd/led", b'{"r":[1]}')
+    assert env.error == "invalid type for 'r': list"
+    # unknown commands are not schema-checked
+    assert decode_command("bb8/cmd/whatever", b'{"x":[1]}').ok
+
+
+def test_schema_result_cached_per_shape():
+    hits = command_envelope.shape_cache_hits
+    decode_command("bb8/cmd/estop", b'{"reason":"a","cid":"1"}')
+    decode_command("bb8/cmd/estop", b'{"reason":"b","cid":"2"}')
+    assert command_envelope.shape_cache_hits >= hits + 1
+
+
+def test_preview_is_bounded():
+    env = decode_command("bb8/cmd/led", b'{"pad":"' + b"x" * 500 + b'"}')
+    assert len(env.preview()) < 80
+    assert env.preview().endswith("(+446)")
+
+
+def test_router_decodes_once_for_all_envelope_routes():
+    r = MqttRouter()
+    seen = []
+    r.add("bb8/cmd/led", lambda c, env: seen.append(env), envelope=True)
+    r.add("bb8/cmd/+", lambda c, env: seen.append(env), envelope=True)
+    msg = types.SimpleNamespace(topic="bb8/cmd/led", payload=b'{"r":1}')
+    assert r.dispatch(None, None, msg) == 2
+    assert seen[0] is seen[1]
+    assert seen[0].get("r") == 1
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+
+import bb8_core.mqtt_router as mqtt_router  # type: ignore[import-not-found]
+from bb8_core.command_ingress import CommandIngress  # type: ignore[import-not-found]
+
+
+def _from_thread(fn):
+    t = threading.Thread(target=fn)
+    t.start()
+    t.join()
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_on_loop_submit_runs_inline():
+    ingress = CommandIngress()
+    ingress.bind(asyncio.get_running_loop())
+    ran = []
+    ingress.submit(ran.append, 1)
+    assert ran == [1]
+    assert (ingress.direct, ingress.queued) == (1, 0)
+
+
+async def test_thread_submits_run_on_the_loop_in_order_with_batched_wakeups():
+    loop = asyncio.get_running_loop()
+    ingress = CommandIngress()
+    ingress.bind(loop)
+    ran = []
+
+    def _record(i):
+        ran.append((i, asyncio.get_running_loop() is loop))
+
+    _from_thread(lambda: [ingress.submit(_record, i) for i in range(100)])
+    await _settle()
+    assert ran == [(i, True) for i in range(100)]
+    stats = ingress.stats()
+    assert stats["queued"] == 100 and stats["depth"] == 0
+    assert stats["wakeups"] == 1
+    assert stats["lag_ms"]["p99"] is not None
+
+
+async def test_full_queue_drops_oldest_but_never_priority():
+    ingress = CommandIngress(maxsize=3)
+    ingress.bind(asyncio.get_running_loop())
+    ran = []
+
+    def _burst():
+        for i in range(6):
+            ingress.submit(ran.append, i)
+        ingress.submit(ran.append, "estop", priority=True)
+
+    _from_thread(_burst)
+    await _settle()
+    assert ran == ["estop", 3, 4, 5]
+    assert ingress.stats()["dropped"] == 3
+
+
+async def test_evicted_commands_are_nacked_with_the_route_nack(monkeypatch):
+    ingress = CommandIngress(maxsize=2)
+    ingress.bind(asyncio.get_running_loop())
+    monkeypatch.setattr(mqtt_router, "get_ingress", lambda: ingress)
+    ran, nacks = [], []
+    router = mqtt_router.MqttRouter()
+    router.add(
+        "bb8/cmd/led",
+        lambda _c, env: ran.append(env.cid),
+        envelope=True,
+        nack=lambda _c, env, reason: nacks.append((env.cid, reason)),
+    )
+
+    def _paho():
+        for i in range(5):
+            msg = SimpleNamespace(
+                topic="bb8/cmd/led",
+                payload=json.dumps({"cid": f"c{i}"}).encode(),
+                properties=None,
+            )
+            router.dispatch(None, None, msg)
+
+    _from_thread(_paho)
+    await _settle()
+    assert ran == ["c3", "c4"]
+    assert nacks == [(f"c{i}", "ingress_overflow") for i in range(3)]
+
+
+async def test_router_dispatch_from_paho_thread_can_create_tasks(monkeypatch):
+    ingress = CommandIngress()
+    ingress.bind(asyncio.get_running_loop())
+    monkeypatch.setattr(mqtt_router, "get_ingress", lambda: ingress)
+    done = asyncio.Event()
+    cids = []
+
+    async def _work(cid):
+        cids.append(cid)
+        if len(cids) == 10:
+            done.set()
+
+    def _handler(_client, env):
+        # would raise "no running event loop" on paho's thread
+        asyncio.create_task(_work(env.cid))
+
+    router = mqtt_router.MqttRouter()
+    router.add("bb8/cmd/led", _handler, name="led", envelope=True)
+
+    def _paho():
+        for i in range(10):
+            msg = SimpleNamespace(
+                topic="bb8/cmd/led",
+                payload=json.dumps({"cid": f"c{i}"}).encode(),
+                properties=None,
+            )
+            router.dispatch(None, None, msg)
+
+    _from_thread(_paho)
+    await asyncio.wait_for(done.wait(), 1.0)
+    assert cids == [f"c{i}" for i in range(10)]
+    assert router.stats()["routes"]["led"]["errors"] == 0
@@ -0,0 +1,129 @@
+import asyncio
+import importlib
+import json
+from types import SimpleNamespace
+
+from bb8_core.command_admission import (  # type: ignore[import-not-found]
+    LATEST,
+    ClassPolicy,
+    CommandAdmission,
+)
+from bb8_core.command_trace import CommandTracer  # type: ignore[import-not-found]
+from bb8_core.mqtt_router import MqttRouter  # type: ignore[import-not-found]
+
+# The module MqttRouter and the admission layer record into: ``import
+# bb8_core.command_trace`` can bind the addon.bb8_core alias copy in a full run
+command_trace = importlib.import_module("bb8_core.command_trace")
+
+
+class Clock:
+    def __init__(self):
+        self.t = 100.0
+
+    def __call__(self):
+        return self.t
+
+
+def _use(monkeypatch, tracer):
+    monkeypatch.setattr(command_trace, "_TRACER", tracer)
+    return tracer
+
+
+def test_stages_feed_histograms_once_ack_and_ble_done():
+    clock = Clock()
+    tracer = CommandTracer(clock=clock)
+    trace = tracer.begin("c1", "bb8/cmd/led", received_at=99.998)
+    for stage, dt in (("admit", 0.001), ("ble_submit", 0.002), ("ack", 0.001)):
+        clock.t += dt
+        tracer.mark(trace, stage)
+    assert tracer.stats()["completed"] == 0  # ack came before the BLE write
+    clock.t += 0.010
+    tracer.mark(trace, "ble_done")
+    tracer.mark(trace, "ack")  # ignored once complete
+    stats = tracer.stats()
+    assert stats["completed"] == 1 and stats["open"] == 0
+    assert [s for s, _t in trace.marks] == [
+        "receive",
+        "parse",
+        "admit",
+        "ble_submit",
+        "ack",
+        "ble_done",
+    ]
+    stages = stats["stages_ms"]
+    assert stages["parse"]["p50"] == 2.0
+    assert stages["ble_done"]["p50"] == 10.0
+    assert stages["total"]["max"] == 16.0
+
+
+def test_open_traces_expire_into_the_histograms():
+    clock = Clock()
+    tracer = CommandTracer(clock=clock)
+    tracer.begin(None, "bb8/cmd/wake")
+    clock.t += 10.0
+    stats = tracer.stats()
+    assert (stats["completed"], stats["expired"], stats["open"]) == (1, 1, 0)
+
+
+def test_sampled_traces_are_written_as_jsonl(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = CommandTracer(sample=1.0, path=str(path), clock=Clock())
+    trace = tracer.begin("c9", "bb8/cmd/drive")
+    tracer.mark(trace, "ble_done")
+    tracer.mark(trace, "ack")
+    tracer.close()
+    line = json.loads(path.read_text().strip())
+    assert (line["id"], line["cmd"]) == ("c9", "drive")
+    assert [s[0] for s in line["stages"]] == [
+        "receive",
+        "parse",
+        "ble_done",
+        "ack",
+    ]
+
+
+def test_disabled_tracer_opens_nothing(monkeypatch):
+    tracer = _use(monkeypatch, CommandTracer(enabled=False))
+    assert tracer.begin("c1", "bb8/cmd/led") is None
+    command_trace.mark("ack")
+    assert tracer.stats()["completed"] == 0
+
+
+async def test_trace_follows_the_command_through_router_admission_and_tasks(
+    monkeypatch,
+):
+    tracer = _use(monkeypatch, CommandTracer())
+    adm = CommandAdmission({"led": ClassPolicy("led", LATEST, rate=100.0, burst=1)})
+    done = asyncio.Event()
+
+    async def ble_write():
+        command_trace.mark("ble_submit")
+        await asyncio.sleep(0)
+        command_trace.mark("ble_done")
+        done.set()
+
+    def run():
+        asyncio.get_running_loop().create_task(ble_write())
+        command_trace.mark("ack")
+
+    def handler(_client, env):
+        adm.submit("led", env.cid, run, lambda *_: None)
+
+    router = MqttRouter()
+    router.add("bb8/cmd/led", handler, name="led", envelope=True)
+    for cid in ("a", "b"):  # the second one is deferred by the bucket
+        msg = SimpleNamespace(
+            topic="bb8/cmd/led",
+            payload=json.dumps({"r": 1, "cid": cid}).encode(),
+            properties=None,
+            timestamp=0.0,
+        )
+        router.dispatch(None, None, msg)
+        assert command_trace.current() is None
+    await asyncio.wait_for(done.wait(), 1.0)
+    done.clear()
+    await asyncio.wait_for(done.wait(), 1.0)
+    stats = tracer.stats()
+    assert stats["completed"] == 2
+    assert stats["stages_ms"]["admit"]["n"] == 2
+    assert stats["stages_ms"]["ble_done"]["n"] == 2
@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+from bb8_core.drive_stream import DriveStream  # type: ignore[import-not-found]
+from bb8_core.safety import (  # type: ignore[import-not-found]
+    MotionSafetyController,
+    SafetyConfig,
+)
+from bb8_core.timer_wheel import TimerWheel  # type: ignore[import-not-found]
+
+
+class FakeRadio:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.rolls = []
+        self.stops = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def roll(self, speed, heading, ms):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            self.rolls.append((speed, heading, ms))
+        finally:
+            self.in_flight -= 1
+
+    async def stop(self):
+        self.stops += 1
+
+
+def _stream(radio, hz=50.0, deadman_ms=200, max_speed=180):
+    safety = MotionSafetyController(
+        SafetyConfig(
+            min_drive_interval_ms=10,
+            max_drive_speed=max_speed,
+            drive_stream_hz=hz,
+            drive_stream_deadman_ms=deadman_ms,
+        )
+    )
+    safety.set_device_connected(True)
+    stream = DriveStream(radio.roll, radio.stop, safety, wheel=TimerWheel())
+    return stream, safety
+
+
+async def test_setpoints_coalesce_to_the_latest_at_the_loop_rate():
+    radio = FakeRadio()
+    stream, _ = _stream(radio, deadman_ms=1000)
+    for i in range(10):  # a burst between two ticks
+        assert stream.submit(10 + i, 370) == (True, None)
+    await asyncio.sleep(0.05)
+    assert radio.rolls[0] == (19, 10, 1000)
+    stats = stream.stats()
+    assert stats["coalesced"] == 9 and stats["rolls"] == len(radio.rolls)
+    assert stats["setpoint_to_roll_ms"]["p50"] is not None
+    # rate is capped by min_drive_interval_ms, never above the configured hz
+    stream.submit(250, 90)
+    await asyncio.sleep(0.05)
+    assert radio.rolls[-1] == (180, 90, 1000)
+    assert stream.stats()["clamped"] == 1
+    stream.halt("test")
+
+
+async def test_dead_man_stops_once_when_setpoints_stop():
+    radio = FakeRadio()
+    stream, _ = _stream(radio, deadman_ms=60)
+    for _ in range(5):
+        stream.submit(100, 0)
+        await asyncio.sleep(0.03)  # each setpoint pushes the dead-man back
+    assert stream.active and radio.stops == 0
+    await asyncio.sleep(0.15)
+    assert not stream.active
+    assert radio.stops == 1
+    assert stream.stats()["deadman_stops"] == 1
+
+
+async def test_estop_rejects_setpoints_and_halts_the_loop():
+    radio = FakeRadio()
+    stream, safety = _stream(radio)
+    stream.submit(100, 0)
+    await asyncio.sleep(0.03)
+    safety.activate_estop("test")
+    sent = len(radio.rolls)
+    ok, reason = stream.submit(120, 45)
+    assert not ok and "emergency stop" in reason
+    await asyncio.sleep(0.05)
+    assert not stream.active and len(radio.rolls) == sent
+    assert stream.stats()["halts"] == {"estop_active": 1}
+
+
+async def test_one_roll_in_flight_on_a_slow_radio():
+    radio = FakeRadio(latency=0.05)
+    stream, _ = _stream(radio, hz=100.0)
+    for i in range(10):
+        stream.submit(i, 0)
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.15)  # the held-back latest setpoint goes out next
+    stream.halt("test")
+    assert radio.max_in_flight == 1
+    assert stream.stats()["busy_skips"] > 0
+    assert radio.rolls[-1][0] == 9
+
+
+def test_send_dropped_without_a_loop_does_not_wedge_the_stream():
+    radio = FakeRadio()
+    stream, _ = _stream(radio, deadman_ms=1000)
+    # no event loop: the wheel's thread driver closes each send unrun
+    stream.submit(100, 0)
+    time.sleep(0.05)
+    stream.submit(120, 0)
+    time.sleep(0.05)
+    stream.halt("test")
+    assert stream.stats()["busy_skips"] == 0
@@ -4,6 +4,8 @@ from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock
 
 import bb8_core.facade as facade_mod  # type: ignore[import-not-found]
+from bb8_core.readiness import ReadinessGate  # type: ignore[import-not-found]
+from bb8_core.timer_wheel import TimerWheel  # type: ignore[import-not-found]
 
 
 class FakeClient:
@@ -40,12 +42,18 @@ class FakeLighting:
 class FakeSession:
     def __init__(self, connected=True):
         self._connected = connected
+        self.ready = False
 
     def is_connected(self):
         return self._connected
 
+    async def battery(self):
+        if not self.ready:
+            raise RuntimeError("not ready")
+        return 90
 
-def test_led_deferred_during_post_connect_holdoff(monkeypatch):
+
+def test_led_held_during_post_connect_holdoff_until_ready(monkeypatch):
     monkeypatch.setattr(
         facade_mod,
         "load_config",
@@ -53,31 +61,33 @@ def test_led_deferred_during_post_connect_holdoff(monkeypatch):
     )
 
     facade = facade_mod.BB8Facade(bridge=SimpleNamespace())
+    facade._readiness = ReadinessGate(15, probe_interval_s=0.02, wheel=TimerWheel())
     facade._lighting = FakeLighting()
-    facade._ble_session = FakeSession(connected=True)
+    session = FakeSession(connected=True)
+    facade._ble_session = session
     facade._mqtt = {"client": FakeClient(), "base": "bb8/test", "qos": 1, "retain": False}
 
-    facade.mark_post_connect_holdoff(now_monotonic=100.0)
-    monkeypatch.setattr(facade_mod.time, "monotonic", lambda: 100.2)
+    async def scenario():
+        facade.mark_post_connect_holdoff()
+        assert facade.get_post_connect_holdoff_remaining_s() == 15
+        led = asyncio.create_task(facade.set_led_async(1, 2, 3, cid="cid-holdoff"))
+        await asyncio.sleep(0.01)
+        assert facade._lighting.static_calls == []
+        session.ready = True  # next readiness probe (battery read) succeeds
+        return await asyncio.wait_for(led, 1.0)
 
-    result = asyncio.run(facade.set_led_async(1, 2, 3, cid="cid-holdoff"))
+    result = asyncio.run(scenario())
 
-    assert facade._lighting.static_calls == []
-    assert result is False
+    assert result is True
+    assert facade._lighting.static_calls == [(1, 2, 3)]
+    assert facade.get_post_connect_holdoff_remaining_s() == 0
     ack = next(c for c in facade._mqtt["client"].calls if c["topic"].endswith("/ack/led"))
-    rej = next(
-        c for c in facade._mqtt["client"].calls if c["topic"].endswith("/event/rejected")
+    assert json.loads(ack["payload"])["ok"] is True
+    assert all(
+        not c["topic"].endswith("/event/rejected")
+        for c in facade._mqtt["client"].calls
     )
-
-    ack_payload = json.loads(ack["payload"])
-    rej_payload = json.loads(rej["payload"])
-
-    assert ack_payload["ok"] is False
-    assert ack_payload["reason"] == "post_connect_holdoff"
-    assert ack_payload["remaining_s"] == 15
-    assert rej_payload["cmd"] == "led"
-    assert rej_payload["reason"] == "post_connect_holdoff"
-    assert rej_payload["remaining_s"] == 15
+    assert facade._readiness.stats()["opened_by"]["probe"] == 1
 
 
 def test_led_succeeds_after_holdoff(monkeypatch):
@@ -102,10 +112,13 @@ def test_led_succeeds_after_holdoff(monkeypatch):
     ack = next(c for c in facade._mqtt["client"].calls if c["topic"].endswith("/ack/led"))
     ack_payload = json.loads(ack["payload"])
     assert ack_payload["ok"] is True
-    assert all(not c["topic"].endswith("/event/rejected") for c in facade._mqtt["client"].calls)
+    assert all(
+        not c["topic"].endswith("/event/rejected")
+        for c in facade._mqtt["client"].calls
+    )
 
 
-def test_delay_override_affects_remaining_seconds(monkeypatch):
+def test_superseded_led_command_is_nacked_with_remaining_seconds(monkeypatch):
     monkeypatch.setattr(
         facade_mod,
         "load_config",
@@ -113,20 +126,30 @@ def test_delay_override_affects_remaining_seconds(monkeypatch):
     )
 
     facade = facade_mod.BB8Facade(bridge=SimpleNamespace())
+    facade._readiness = ReadinessGate(3, wheel=TimerWheel())
     facade._lighting = FakeLighting()
     facade._ble_session = FakeSession(connected=True)
     facade._mqtt = {"client": FakeClient(), "base": "bb8/test", "qos": 1, "retain": False}
 
-    facade.mark_post_connect_holdoff(now_monotonic=10.0)
-    monkeypatch.setattr(facade_mod.time, "monotonic", lambda: 12.0)
+    async def scenario():
+        facade.mark_post_connect_holdoff()
+        first = asyncio.create_task(facade.set_led_async(10, 11, 12, cid="cid-old"))
+        await asyncio.sleep(0)
+        asyncio.create_task(facade.set_led_async(13, 14, 15, cid="cid-new"))
+        result = await first
+        facade._readiness.abort("test")
+        await asyncio.sleep(0)
+        return result
 
-    result = asyncio.run(facade.set_led_async(10, 11, 12, cid="cid-delay"))
+    result = asyncio.run(scenario())
 
     assert result is False
     ack = next(c for c in facade._mqtt["client"].calls if c["topic"].endswith("/ack/led"))
     payload = json.loads(ack["payload"])
+    assert payload["cid"] == "cid-old"
     assert payload["reason"] == "post_connect_holdoff"
-    assert payload["remaining_s"] == 1
+    assert payload["dropped"] == "superseded"
+    assert payload["remaining_s"] == 3
 
 
 def test_propagated_session_drives_led_path(monkeypatch):
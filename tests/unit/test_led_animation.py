@@ -0,0 +1,173 @@
+import asyncio
+import collections
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from bb8_core.led_animation import (  # type: ignore[import-not-found]
+    BUILTIN_PRESETS,
+    AnimationError,
+    Player,
+    compile_preset,
+    parse_presets,
+)
+from bb8_core.lighting import LightingController  # type: ignore[import-not-found]
+
+
+class FakeTime:
+    """Virtual clock: sleeping and BLE writes just advance it."""
+
+    def __init__(self, write_s=0.0):
+        self.now = 100.0
+        self.write_s = write_s
+        self.writes = []
+
+    def clock(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+
+    async def write(self, r, g, b):
+        self.writes.append((round(self.now - 100.0, 4), (r, g, b)))
+        self.now += self.write_s
+
+
+def _frames(animation):
+    return [animation.frame(i) for i in range(animation.count)]
+
+
+def test_stock_presets_keep_their_colours_and_timing():
+    police = compile_preset("police", BUILTIN_PRESETS["police"])
+    assert _frames(police) == [(0, 0, 255), (255, 0, 0)]
+    assert police.fps == 5 and police.total == 20  # 200 ms steps for 4 s
+    sunset = compile_preset("sunset", BUILTIN_PRESETS["sunset"])
+    assert _frames(sunset) == [
+        (255, 80, 0),
+        (255, 50, 0),
+        (255, 20, 0),
+        (200, 10, 5),
+        (120, 0, 10),
+    ]
+    assert sunset.total == 10
+
+
+def test_easing_and_wrap_back_to_the_first_keyframe():
+    spec = {"fps": 4, "duration_ms": 2000, "keyframes": "0:0,0,0;1000:200,100,0"}
+    linear = _frames(compile_preset("fade", spec))
+    assert linear[:5] == [(0, 0, 0), (50, 25, 0), (100, 50, 0), (150, 75, 0)] + [
+        (200, 100, 0)
+    ]
+    assert linear[5:] == [(150, 75, 0), (100, 50, 0), (50, 25, 0)]
+    eased = _frames(compile_preset("fade", {**spec, "easing": "ease_in"}))
+    assert eased[1] == (12, 6, 0) and eased[4] == (200, 100, 0)
+    held = _frames(compile_preset("fade", {**spec, "easing": "step"}))
+    assert set(held) == {(0, 0, 0), (200, 100, 0)}
+
+
+@pytest.mark.parametrize(
+    "spec, message",
+    [
+        ({"keyframes": "100:1,2,3"}, "first keyframe must be at 0"),
+        ({"keyframes": "0:1,2,3;0:3,2,1"}, "must increase"),
+        ({"keyframes": "0:1,2"}, "expected \\[r, g, b\\]"),
+        ({"keyframes": "0:1,2,3", "fps": 120}, "fps"),
+        ({"keyframes": "0:1,2,3", "easing": "bounce"}, "easing"),
+        ({"keyframes": "0:1,2,3;500:0,0,0", "duration_ms": 100}, "duration_ms"),
+        ({"keyframes": []}, "non-empty"),
+    ],
+)
+def test_invalid_definitions_are_rejected(spec, message):
+    with pytest.raises(AnimationError, match=message):
+        compile_preset("bad", spec)
+
+
+def test_presets_parse_from_the_options_list_and_from_an_object():
+    listed = parse_presets(
+        [{"name": "pulse", "keyframes": "0:0,0,40;500:0,0,255", "loops": 0}]
+    )
+    assert listed["pulse"].total is None  # loops until cancelled
+    mapped = parse_presets(
+        {"glow": {"keyframes": [{"at_ms": 0, "rgb": [9, 9, 9]}], "fps": 1}}
+    )
+    assert mapped["glow"].count == 1
+    assert parse_presets(None) == {}
+
+
+async def test_frames_hold_the_timeline_when_writes_are_slow():
+    anim = compile_preset("x", {"fps": 20, "duration_ms": 500, "keyframes": "0:1,1,1"})
+    fake = FakeTime(write_s=0.03)  # each write eats 30 of the 50 ms frame
+    stats = await Player(anim, fake.write, clock=fake.clock, sleep=fake.sleep).run()
+    starts = [t for t, _ in fake.writes]
+    assert starts == [round(i * 0.05, 4) for i in range(10)]  # no drift
+    assert stats["written"] == 10 and stats["dropped"] == 0
+    assert stats["late_ms"]["max"] == 0.0
+    assert stats["achieved_fps"] == pytest.approx(20, rel=0.1)
+
+
+async def test_frames_are_dropped_when_the_radio_falls_behind():
+    spec = {"fps": 20, "duration_ms": 500, "keyframes": "0:0,0,0;450:255,0,0"}
+    anim = compile_preset("x", spec)
+    fake = FakeTime(write_s=0.12)  # writes take 2.4 frames
+    stats = await Player(anim, fake.write, clock=fake.clock, sleep=fake.sleep).run()
+    assert stats["dropped"] > 0
+    assert stats["written"] + stats["dropped"] == 10
+    assert fake.writes[-1][1] == anim.frame(9)  # the run ends on its last frame
+    assert fake.writes[-1][0] < 0.5 + 0.12  # finished on schedule, not late
+    assert stats["late_ms"]["max"] < 50.0
+
+
+async def test_the_frame_rate_follows_the_link_and_keeps_the_duration():
+    spec = {"fps": 20, "duration_ms": 1000, "keyframes": "0:0,0,0;950:190,0,0"}
+    anim = compile_preset("ramp", spec)  # frame i is red i * 10
+    fake = FakeTime(write_s=0.06)  # the link sustains 1 / (60 ms * 1.25)
+    stats = await Player(anim, fake.write, clock=fake.clock, sleep=fake.sleep).run()
+    starts = [t for t, _ in fake.writes]
+    assert starts[:3] == [0.0, 0.075, 0.15]  # one write in flight, on time
+    assert fake.writes[1][1] == (15, 0, 0)  # blended, between frames 1 and 2
+    assert fake.writes[-1] == (0.95, (190, 0, 0))  # ends where and when planned
+    assert stats["effective_fps"] == pytest.approx(13.33)
+    assert stats["late_ms"]["max"] == 0.0
+    assert stats["written"] + stats["dropped"] == 20
+
+
+async def test_step_presets_hold_and_a_new_player_starts_at_the_known_rate():
+    police = compile_preset("police", BUILTIN_PRESETS["police"])
+    assert police.sample(0.3) == police.frame(1)  # held, not blended
+    window = collections.deque([0.5])  # the last animation saw 500 ms writes
+    fake = FakeTime(write_s=0.5)
+    player = Player(
+        police, fake.write, clock=fake.clock, sleep=fake.sleep, latency=window
+    )
+    stats = await player.run()
+    assert [t for t, _ in fake.writes][:2] == [0.0, 0.625]
+    assert stats["min_effective_fps"] == 1.6 and stats["write_ms"] == 500.0
+    assert fake.writes[-1] == (3.8, police.frame(19))
+
+
+async def test_controller_plays_config_presets_and_reports_pacing():
+    session = MagicMock()
+    session.is_connected = MagicMock(return_value=True)
+    session.set_led = AsyncMock(return_value=None)
+    controller = LightingController(session)
+    loaded = controller.load_presets(
+        [
+            {"name": "blink", "keyframes": "0:0,0,255;20:0,0,0", "fps": 30},
+            {"name": "off", "keyframes": "0:1,1,1"},
+        ]
+    )
+    assert loaded == ["blink"]  # "off" stays the static preset
+    assert "blink" in controller.preset_names()
+    assert await controller.run_preset("blink")
+    await asyncio.wait_for(controller._active_task, 1.0)
+    session.set_led.assert_any_await(0, 0, 255)
+    stats = controller.get_animation_stats()
+    assert stats["runs"] == 1 and stats["last"]["preset"] == "blink"
+    assert stats["last"]["target_fps"] == 30.0
+    assert stats["write_ms"] is not None  # measured, and kept for the next run
+
+    # a bad definition is logged and the stock presets survive
+    assert controller.load_presets([{"name": "x", "keyframes": "5:1,1,1"}]) == []
+    assert await controller.run_preset("police")
+    await controller.cancel_active()
+    assert not controller.is_animation_active()
@@ -0,0 +1,102 @@
+import pytest
+
+from bb8_core.ble_session import BleSession  # type: ignore[import-not-found]
+from bb8_core.led_output import (  # type: ignore[import-not-found]
+    LedOutput,
+    delta_e,
+    to_lab,
+)
+
+
+class FakeToy:
+    def __init__(self, fail=False):
+        self.writes = []
+        self.fail = fail
+
+    def set_main_led(self, r, g, b, _brightness):
+        if self.fail:
+            raise RuntimeError("gatt write failed")
+        self.writes.append((r, g, b))
+
+
+def _session(delta=0.0):
+    session = BleSession("AA:BB:CC:DD:EE:FF", led_output=LedOutput(delta))
+    session._toy = FakeToy()
+    session._connected = True
+    return session
+
+
+def test_lab_distances_match_the_reference_values():
+    assert to_lab((255, 255, 255)) == pytest.approx((100.0, 0.0, 0.0), abs=0.01)
+    assert to_lab((255, 0, 0)) == pytest.approx((53.24, 80.09, 67.20), abs=0.01)
+    assert delta_e((0, 0, 0), (255, 255, 255)) == pytest.approx(100.0, abs=0.01)
+    assert delta_e((10, 20, 30), (10, 20, 30)) == 0.0
+
+
+def test_identical_colours_are_skipped_until_forced_or_reconnected():
+    out = LedOutput()
+    device = object()
+    assert out.should_write((1, 2, 3), device)
+    out.confirm((1, 2, 3), device)
+    assert not out.should_write((1, 2, 3), device)
+    assert out.should_write((1, 2, 3), device, force=True)
+    assert out.should_write((1, 2, 3), object())  # a new handle after reconnect
+    out.invalidate()
+    assert out.should_write((1, 2, 3), device)
+    stats = out.stats()
+    assert stats["saved_identical"] == 1 and stats["forced"] == 1
+    assert stats["saved_pct"] == 50.0
+
+
+def test_quantization_is_measured_against_the_confirmed_colour():
+    out = LedOutput(delta_e=2.3)
+    device = object()
+    out.confirm((120, 60, 200), device)
+    sent = []
+    for blue in range(200, 180, -1):  # a slow colour-wheel drag
+        if out.should_write((120, 60, blue), device):
+            out.confirm((120, 60, blue), device)
+            sent.append(blue)
+    assert 0 < len(sent) < 10  # the LED keeps up, without a write per step
+    assert delta_e((120, 60, 181), out.confirmed) < 2.3  # never drifts further
+    # turning the LED off is never swallowed, however dim it was
+    out.confirm((2, 2, 2), device)
+    assert delta_e((0, 0, 0), (2, 2, 2)) < 2.3
+    assert out.should_write((0, 0, 0), device)
+
+
+async def test_session_writes_only_what_the_droid_does_not_show():
+    session = _session()
+    toy = session._toy
+    for _ in range(3):
+        await session.set_led(10, 20, 30)
+    await session.set_led(10, 20, 30, force=True)
+    assert toy.writes == [(10, 20, 30), (10, 20, 30)]
+
+    # a stop leaves the LED off: the next "off" is already on the device
+    await session._execute_with_retry(session._stop_impl)
+    await session.set_led(0, 0, 0)
+    assert toy.writes[-2:] == [(255, 0, 0), (0, 0, 0)]
+    stats = session._led_output.stats()
+    assert stats["saved_identical"] == 3 and stats["forced"] == 1
+    assert stats["confirmed"] == [0, 0, 0]
+
+
+async def test_failed_writes_and_reconnects_force_the_next_write():
+    session = _session()
+    await session.set_led(5, 5, 5)
+    session._toy.fail = True
+    with pytest.raises(Exception, match="LED set failed"):
+        await session.set_led(6, 6, 6)
+    assert session._led_output.confirmed is None
+    session._toy = FakeToy()  # reconnected
+    session._connected = True
+    await session.set_led(5, 5, 5)
+    assert session._toy.writes == [(5, 5, 5)]
+
+    toy = session._toy
+    await session.disconnect()
+    session._toy = toy  # the same handle, reconnected
+    session._connected = True
+    await session.set_led(5, 5, 5)
+    assert toy.writes == [(5, 5, 5), (5, 5, 5)]
@@ -0,0 +1,70 @@
+import logging
+
+from bb8_core.log_events import (  # type: ignore[import-not-found]
+    EventLog,
+    get_event_log_stats,
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record.msg)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def _logger(name, level):
+    log = logging.getLogger(f"test.log_events.{name}")
+    log.handlers = [ListHandler()]
+    log.setLevel(level)
+    log.propagate = False
+    return log
+
+
+def test_disabled_level_builds_nothing():
+    log = _logger("guard", logging.INFO)
+    event = EventLog(log, "t_guard", logging.DEBUG)
+    calls = []
+    assert event(lambda: calls.append(1) or {"x": 1}) is False
+    assert calls == [] and log.handlers[0].records == []
+    log.setLevel(logging.DEBUG)
+    assert event(lambda: {"x": 1}, y=2)
+    assert log.handlers[0].records == [{"event": "t_guard", "x": 1, "y": 2}]
+    assert event.stats() == {"emitted": 1, "suppressed": 0, "filtered": 1}
+
+
+def test_one_in_n_sampling_reports_what_it_skipped():
+    log = _logger("every", logging.INFO)
+    event = EventLog(log, "t_every", every=3)
+    for i in range(7):
+        event(i=i)
+    assert log.handlers[0].records == [
+        {"event": "t_every", "i": 0},
+        {"event": "t_every", "i": 3, "suppressed": 2},
+        {"event": "t_every", "i": 6, "suppressed": 2},
+    ]
+    assert get_event_log_stats()["t_every"]["suppressed"] == 4
+
+
+def test_rate_limit_writes_at_most_per_s():
+    log = _logger("rate", logging.INFO)
+    clock = FakeClock()
+    event = EventLog(log, "t_rate", per_s=2.0, clock=clock)
+    written = []
+    for _ in range(32):  # 8 calls per second for 4 seconds
+        written.append(event(topic="bb8/status"))
+        clock.now += 0.125
+    assert sum(written) == 8
+    records = log.handlers[0].records
+    assert records[0] == {"event": "t_rate", "topic": "bb8/status"}
+    assert all(r["suppressed"] == 3 for r in records[1:])
@@ -0,0 +1,118 @@
+import io
+import logging
+import threading
+
+from bb8_core import logging_setup as ls  # type: ignore[import-not-found]
+from bb8_core.logging_setup import (  # type: ignore[import-not-found]
+    JsonRedactingHandler,
+    LogListener,
+    QueueLogHandler,
+)
+
+
+class CountingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, s):
+        self.writes += 1
+        return super().write(s)
+
+
+class GatedHandler(logging.Handler):
+    """Blocks the listener on its first record until released."""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.opened = threading.Event()
+        self.records = []
+
+    def emit(self, record):
+        self.entered.set()
+        self.opened.wait(5)
+        self.records.append(record.msg)
+
+
+def _logger(name, *handlers):
+    log = logging.getLogger(f"test.log_queue.{name}")
+    log.handlers = list(handlers)
+    log.setLevel(logging.DEBUG)
+    log.propagate = False
+    return log
+
+
+def test_records_are_serialized_and_redacted_off_the_calling_thread():
+    stream = CountingStream()
+    target = JsonRedactingHandler(stream)
+    listener = LogListener()
+    log = _logger("redact", QueueLogHandler([target], listener))
+    payload = {"event": "cmd", "token": "abc123"}
+    for i in range(50):
+        payload["n"] = i
+        log.info(payload)
+    payload["token"] = "mutated"  # reusing the dict does not change the logs
+    assert listener.flush()
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 50
+    assert lines[7] == '{"event": "cmd", "token": "***REDACTED***", "n": 7}'
+    assert "abc123" not in stream.getvalue()
+    stats = listener.stats()
+    assert stats["written"] == 50 and stats["dropped"] == 0
+    assert stream.writes <= stats["batches"] < 50  # one write per batch
+
+
+def test_overload_drops_and_counts_instead_of_blocking():
+    gate = GatedHandler()
+    notices = io.StringIO()
+    listener = LogListener(maxsize=5)
+    listener._notice = (JsonRedactingHandler(notices),)
+    log = _logger("overload", QueueLogHandler([gate], listener))
+    log.info({"event": "first"})
+    assert gate.entered.wait(5)  # the listener is stuck writing it
+    for i in range(12):
+        log.info({"event": "burst", "i": i})
+    assert listener.stats()["dropped"] == 7  # 5 queued, never waited for
+    gate.opened.set()
+    assert listener.flush()
+    assert [m["i"] for m in gate.records[1:]] == [0, 1, 2, 3, 4]
+    assert '"event": "log_records_dropped", "dropped": 7' in notices.getvalue()
+
+
+def test_flush_at_exit_drains_the_queue(monkeypatch):
+    stream = io.StringIO()
+    root = logging.getLogger()
+    handler = QueueLogHandler([logging.StreamHandler(stream)], ls._listener)
+    monkeypatch.setattr(root, "handlers", [handler])
+    for i in range(200):
+        root.warning("exit %d", i)
+    ls._flush_all_log_handlers()
+    assert stream.getvalue().splitlines()[-1] == "exit 199"
+
+
+def test_args_and_nested_values_are_frozen_when_logged():
+    stream = io.StringIO()
+    plain = logging.StreamHandler(stream)
+    structured = io.StringIO()
+    listener = LogListener()
+    log = _logger(
+        "frozen",
+        QueueLogHandler([plain], listener),
+        QueueLogHandler([JsonRedactingHandler(structured)], listener),
+    )
+    gate = GatedHandler()
+    _logger("frozen_gate", QueueLogHandler([gate], listener)).info({"event": "hold"})
+    assert gate.entered.wait(5)  # nothing below is written until released
+    state = {"speed": 10}
+    payload = {"event": "drive", "state": state, "steps": [1]}
+    log.info(payload)
+    log.info("state %s", state)
+    state["speed"] = 99
+    payload["steps"].append(2)
+    gate.opened.set()
+    assert listener.flush()
+    assert '{"event": "drive", "state": {"speed": 10}, "steps": [1]}' in (
+        structured.getvalue()
+    )
+    assert "state {'speed': 10}" in stream.getvalue()
@@ -0,0 +1,109 @@
+import random
+
+import pytest
+
+import bb8_core.safety as safety_mod  # type: ignore[import-not-found]
+from bb8_core.safety import (  # type: ignore[import-not-found]
+    MotionLimiter,
+    MotionSafetyController,
+    SafetyConfig,
+    SafetyViolation,
+)
+
+SEEDS = range(25)
+
+
+def _arrivals(rng, n=400):
+    """Random arrival times: bursts of near-simultaneous calls and gaps."""
+    t, out = 0.0, []
+    for _ in range(n):
+        t += rng.choice((0.0, 0.001, rng.uniform(0.0, 0.02), rng.uniform(0.0, 0.3)))
+        out.append(t)
+    return out
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_never_more_than_burst_plus_rate_in_any_window(seed):
+    rng = random.Random(seed)
+    interval, burst = rng.choice((0.02, 0.05, 0.1)), rng.randint(1, 5)
+    limiter = MotionLimiter(interval, burst)
+    accepted = [t for t in _arrivals(rng) if limiter.try_acquire(t) == 0.0]
+    for i, start in enumerate(accepted):
+        for j in range(i, len(accepted)):
+            window = accepted[j] - start
+            assert j - i + 1 <= burst + window / interval + 1e-9
+    assert limiter.accepted == len(accepted)
+    assert limiter.accepted + limiter.throttled == 400
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_tokens_stay_in_range_and_wait_hint_is_exact(seed):
+    rng = random.Random(seed)
+    limiter = MotionLimiter(rng.choice((0.02, 0.05)), rng.randint(1, 4))
+    for t in _arrivals(rng, 200):
+        assert 0.0 <= limiter.tokens(t) <= limiter.burst
+        wait = limiter.try_acquire(t)
+        if wait > 0.0:
+            # throttled now, admitted exactly when the hint says
+            assert limiter.try_acquire(t + wait * 0.999) > 0.0
+            assert limiter.try_acquire(t + wait + 1e-9) == 0.0
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_spaced_commands_are_never_throttled(seed):
+    rng = random.Random(seed)
+    interval = rng.choice((0.02, 0.05, 0.1))
+    limiter = MotionLimiter(interval, rng.randint(1, 3))
+    t = rng.uniform(0.0, 10.0)
+    for _ in range(200):
+        assert limiter.try_acquire(t) == 0.0
+        t += interval * rng.uniform(1.0, 3.0)
+    assert limiter.throttled == 0
+
+
+def test_burst_then_refill_at_the_configured_rate():
+    limiter = MotionLimiter(0.05, 3)
+    assert [limiter.try_acquire(10.0) for _ in range(3)] == [0.0] * 3
+    assert limiter.try_acquire(10.0) == pytest.approx(0.05)
+    assert limiter.tokens(10.0) == 0.0
+    assert limiter.tokens(10.1) == 2.0
+    assert limiter.try_acquire(10.05) == 0.0
+
+
+def test_wall_clock_jumps_do_not_affect_the_gate(monkeypatch):
+    controller = MotionSafetyController(SafetyConfig(min_drive_interval_ms=50))
+    controller.set_device_connected(True)
+    controller.gate_drive()
+    # NTP steps the wall clock back an hour: motion must not be blocked
+    wall = safety_mod.time.time()
+    monkeypatch.setattr(safety_mod.time, "time", lambda: wall - 3600.0)
+    controller.gate_drive(current_time=safety_mod.time.monotonic() + 0.06)
+
+
+def test_turn_then_drive_is_not_throttled_and_status_has_counters():
+    controller = MotionSafetyController(SafetyConfig(drive_burst=2))
+    controller.set_device_connected(True)
+    controller.gate_drive(100.0, motion="turn")
+    controller.gate_drive(100.0)
+    controller.gate_drive(100.001)
+    with pytest.raises(SafetyViolation, match="rate limit exceeded") as exc:
+        controller.gate_drive(100.002)
+    assert exc.value.constraint == "rate_limit"
+    limits = controller.get_safety_status()["rate_limits"]
+    assert limits["drive"]["accepted"] == 2 and limits["drive"]["throttled"] == 1
+    assert limits["turn"]["accepted"] == 1 and limits["drive"]["burst"] == 2
+    assert 0.0 <= limits["drive"]["tokens"] <= 2.0
+
+
+def test_streamed_rolls_leave_drives_at_most_one_interval_away():
+    controller = MotionSafetyController(SafetyConfig(min_drive_interval_ms=50))
+    controller.set_device_connected(True)
+    # 10 s of setpoints and idle ticks at 30 Hz, one roll sent on every tick
+    t = 100.0
+    for _ in range(300):
+        controller.gate_stream(t, charge=False)
+        controller.charge_drive(t)
+        t += 1 / 30
+    with pytest.raises(SafetyViolation, match="rate limit exceeded"):
+        controller.gate_drive(t)
+    controller.gate_drive(t + 0.05)
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+
+import paho.mqtt.client as mqtt
+import pytest
+from paho.mqtt.enums import CallbackAPIVersion
+
+from bb8_core.facade import BB8Facade  # type: ignore[import-not-found]
+from bb8_core.mqtt_asyncio import (  # type: ignore[import-not-found]
+    resolve_max_inflight,
+    resolve_transport,
+)
+from bb8_core.mqtt_connection import MqttConnection  # type: ignore[import-not-found]
+from bb8_core.mqtt_router import router_for  # type: ignore[import-not-found]
+from tools.mqtt_loopback_broker import LoopbackBroker
+
+
+def test_resolve_transport(monkeypatch):
+    monkeypatch.delenv("BB8_MQTT_TRANSPORT", raising=False)
+    assert resolve_transport({}) == "asyncio"
+    assert resolve_transport({"mqtt_transport": "thread"}) == "thread"
+    monkeypatch.setenv("BB8_MQTT_TRANSPORT", "asyncio")
+    assert resolve_transport({"mqtt_transport": "thread"}) == "asyncio"
+
+
+async def test_broker_io_runs_on_the_loop_thread():
+    broker = LoopbackBroker()
+    port = await broker.start()
+    client = mqtt.Client(callback_api_version=CallbackAPIVersion.VERSION2)
+    conn = MqttConnection(client)
+    connected = asyncio.Event()
+    conn.add_connect_listener(lambda *a: connected.set())
+    seen = []
+    got = asyncio.Event()
+
+    def _on_drive(c, u, m):
+        seen.append((threading.get_ident(), m.payload))
+        got.set()
+
+    router_for(client).add("bb8/cmd/drive", _on_drive, 1)
+    try:
+        conn.start("127.0.0.1", port, loop=asyncio.get_running_loop())
+        await asyncio.wait_for(connected.wait(), 5)
+        router_for(client).resubscribe()
+        await asyncio.sleep(0.05)
+        client.publish("bb8/cmd/drive", b"{}", qos=1)
+        await asyncio.wait_for(got.wait(), 5)
+        assert seen == [(threading.get_ident(), b"{}")]
+        assert client._thread is None  # no paho network thread
+    finally:
+        await conn.transport.close()
+        await broker.close()
+
+
+def test_resolve_max_inflight(monkeypatch):
+    monkeypatch.delenv("BB8_MQTT_MAX_INFLIGHT", raising=False)
+    assert resolve_max_inflight({}) == 20
+    assert resolve_max_inflight({"mqtt_max_inflight": 4}) == 4
+    assert resolve_max_inflight({"mqtt_max_inflight": 0}) == 1
+    monkeypatch.setenv("BB8_MQTT_MAX_INFLIGHT", "2")
+    assert resolve_max_inflight({"mqtt_max_inflight": 4}) == 2
+
+
+async def test_qos1_publishes_beyond_the_inflight_limit_wait_for_pubacks():
+    broker = LoopbackBroker()
+    port = await broker.start()
+    client = mqtt.Client(callback_api_version=CallbackAPIVersion.VERSION2)
+    client.max_inflight_messages_set(2)
+    conn = MqttConnection(client)
+    connected = asyncio.Event()
+    conn.add_connect_listener(lambda *a: connected.set())
+    try:
+        conn.start("127.0.0.1", port, loop=asyncio.get_running_loop())
+        await asyncio.wait_for(connected.wait(), 5)
+        infos = [client.publish("bb8/ack/drive", b"{}", qos=1) for _ in range(6)]
+        # the rest stay queued in the client until PUBACKs are read on the loop
+        assert client._inflight_messages == 2
+        for _ in range(100):
+            if all(i.is_published() for i in infos):
+                break
+            await asyncio.sleep(0.01)
+        assert all(i.is_published() for i in infos)
+        assert client._inflight_messages == 0
+    finally:
+        await conn.transport.close()
+        await broker.close()
+
+
+async def test_facade_schedules_from_network_thread_onto_loop():
+    facade = BB8Facade.__new__(BB8Facade)
+    facade._tasks = set()
+    facade._loop = asyncio.get_running_loop()
+    ran_on = []
+
+    async def _work():
+        ran_on.append(threading.get_ident())
+
+    t = threading.Thread(target=lambda: facade._schedule_task(_work()))
+    t.start()
+    t.join()
+    for _ in range(10):
+        await asyncio.sleep(0)
+    assert ran_on == [threading.get_ident()]
+
+
+def test_facade_schedule_without_loop_raises():
+    facade = BB8Facade.__new__(BB8Facade)
+    facade._tasks = set()
+    facade._loop = None
+
+    async def _work():
+        pass
+
+    # callers turn this into a rejection instead of a silent drop
+    with pytest.raises(RuntimeError):
+        facade._schedule_task(_work())
@@ -0,0 +1,165 @@
+import asyncio
+import importlib
+import threading
+import types
+
+from bb8_core.mqtt_router import MqttRouter, router_for  # type: ignore[import-not-found]
+
+# ``from bb8_core import mqtt_connection`` can return the addon.bb8_core alias
+# copy in a full run, which moves routes in its own router registry
+mqtt_connection = importlib.import_module("bb8_core.mqtt_connection")
+InProcessBus = mqtt_connection.InProcessBus
+
+
+class FakeClient:
+    def __init__(self):
+        self.published = []
+        self.subs = []
+        self.started = 0
+        self.on_message = None
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.published.append((topic, payload, qos, retain))
+
+    def subscribe(self, topic, qos=0):
+        self.subs.append(topic)
+
+    def connect_async(self, host, port, keepalive=60):
+        self.started += 1
+
+    def loop_start(self):
+        pass
+
+    def disconnect(self):
+        self.stopped = True
+
+    def loop_stop(self):
+        pass
+
+
+def test_owners_share_one_client_and_callbacks(monkeypatch):
+    monkeypatch.setattr(mqtt_connection, "_CONNECTION", None)
+    made = []
+
+    def factory():
+        made.append(FakeClient())
+        return made[-1]
+
+    a = mqtt_connection.open_connection(factory, owner="bridge_controller")
+    b = mqtt_connection.open_connection(factory, owner="mqtt_dispatcher")
+    assert a is b and len(made) == 1
+    seen = []
+    a.add_connect_listener(lambda *args: seen.append("controller"))
+    b.add_connect_listener(lambda *args: seen.append("dispatcher"))
+    assert a.start("broker", 1883) is True
+    assert b.start("broker", 1883) is False
+    made[0].on_connect(made[0], None, None, 0, None)
+    assert seen == ["controller", "dispatcher"]
+    assert made[0].started == 1
+    assert a.stats()["owners"] == ["bridge_controller", "mqtt_dispatcher"]
+
+
+def test_recreate_moves_routes_configuration_and_listeners(monkeypatch):
+    monkeypatch.setattr(mqtt_connection, "_CONNECTION", None)
+    made = []
+
+    def factory(protocol=5):
+        made.append(FakeClient())
+        made[-1].protocol = protocol
+        return made[-1]
+
+    conn = mqtt_connection.open_connection(factory, owner="bridge_controller")
+    conn.configure(lambda c: setattr(c, "will", "offline"))
+    router = router_for(made[0])
+    router.add("bb8/cmd/led", lambda *a: None, 0)
+    swapped, seen = [], []
+    conn.add_client_listener(lambda old, new: swapped.append((old, new)))
+    conn.add_connect_listener(lambda cl, *a: seen.append(cl))
+    conn.start("broker", 1883)
+    new = conn.recreate(protocol=4)
+    assert conn.client is new and new is made[1]
+    assert new.protocol == 4 and new.will == "offline"
+    assert made[0].stopped and new.started == 1
+    assert router_for(new) is router and new.on_message == router.dispatch
+    assert swapped == [(made[0], new)]
+    new.on_connect(new, None, None, 0, None)
+    assert seen == [new]
+
+
+async def test_internal_topics_stay_in_process():
+    client = FakeClient()
+    bus = InProcessBus(client, base="bb8")
+    got = []
+
+    async def cb(topic, payload, retain):
+        got.append((topic, payload))
+
+    await bus.subscribe("bb8/internal/presence", cb)
+    await bus.publish("bb8/internal/presence", '{"present":true}')
+    assert got == [("bb8/internal/presence", b'{"present":true}')]
+    assert client.published == []
+
+
+async def test_external_publish_delivered_once_despite_broker_echo():
+    client = FakeClient()
+    bus = InProcessBus(client, base="bb8")
+    got = []
+
+    async def cb(topic, payload, retain):
+        got.append(payload)
+
+    await bus.subscribe("bb8/state/presence", cb)
+    await bus.publish("bb8/state/presence", "detected", retain=True)
+    assert client.published == [("bb8/state/presence", b"detected", 0, True)]
+    # the broker echoes our publish back, then another client publishes
+    router = router_for(client)
+    echo = types.SimpleNamespace(topic="bb8/state/presence", payload=b"detected")
+    other = types.SimpleNamespace(topic="bb8/state/presence", payload=b"gone")
+    router.dispatch(client, None, echo)
+    router.dispatch(client, None, other)
+    await asyncio.sleep(0.01)
+    assert got == [b"detected", b"gone"]
+    assert bus.stats()["echoes_dropped"] == 1
+
+
+async def test_publish_threadsafe_reaches_subscribers_on_their_loop():
+    bus = InProcessBus(None, base="bb8")
+    assert not bus.publish_threadsafe("bb8/internal/presence", "early")
+    loop = asyncio.get_running_loop()
+    got = []
+
+    async def cb(topic, payload, retain):
+        got.append((payload, asyncio.get_running_loop() is loop))
+
+    await bus.subscribe("bb8/internal/presence", cb)
+    t = threading.Thread(
+        target=bus.publish_threadsafe, args=("bb8/internal/presence", "late")
+    )
+    t.start()
+    t.join()
+    await asyncio.sleep(0.01)
+    assert got == [(b"late", True)]
+
+
+def test_bus_follows_the_client_when_the_connection_recreates(monkeypatch):
+    monkeypatch.setattr(mqtt_connection, "_CONNECTION", None)
+    monkeypatch.setattr(mqtt_connection, "_BUS", None)
+    conn = mqtt_connection.open_connection(lambda **_kw: FakeClient(), "test")
+    bus = mqtt_connection.get_bus("bb8")
+    assert bus.client is conn.client
+    new = conn.recreate()
+    assert mqtt_connection.current_bus() is bus
+    assert bus.client is new
+
+
+def test_router_tap_observes_without_suppressing_fallback():
+    r = MqttRouter()
+    seen = []
+    r.add("bb8/cmd/#", lambda c, u, m: seen.append("unhandled"), fallback=True)
+    r.add("bb8/cmd/led", lambda c, u, m: seen.append("led"))
+    r.tap("bb8/cmd/#", lambda c, u, m: seen.append("tap"), 1, name="evidence")
+    r.dispatch(None, None, types.SimpleNamespace(topic="bb8/cmd/led", payload=b""))
+    r.dispatch(None, None, types.SimpleNamespace(topic="bb8/cmd/x", payload=b""))
+    assert seen == ["led", "tap", "unhandled", "tap"]
+    # the tap raises the subscription QoS of the shared filter
+    assert ("bb8/cmd/#", 1) in r.subscriptions()
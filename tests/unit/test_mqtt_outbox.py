@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+import types
+
+from bb8_core.mqtt_outbox import MqttOutbox  # type: ignore[import-not-found]
+
+
+class FakeClient:
+    def __init__(self, auto_ack=False, rc=0):
+        self.pubs = []
+        self.on_publish = None
+        self._mid = 0
+        self._auto_ack = auto_ack
+        self._rc = rc
+        self._lock = threading.Lock()
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        with self._lock:
+            self._mid += 1
+            mid = self._mid
+        self.pubs.append((topic, payload, qos, retain, mid))
+        if self._auto_ack and self.on_publish:
+            self.on_publish(self, None, mid, 0, None)
+        return types.SimpleNamespace(rc=self._rc, mid=mid)
+
+    def ack(self, mid):
+        self.on_publish(self, None, mid, 0, None)
+
+
+def test_qos0_resolves_without_broker_ack():
+    outbox = MqttOutbox()
+    client = FakeClient()
+    handle = outbox.enqueue(client, "bb8/a", "x", qos=0)
+    assert handle.result(timeout=2.0) is True
+    assert client.pubs[0][:4] == ("bb8/a", "x", 0, False)
+    outbox.close()
+
+
+def test_qos1_waits_for_on_publish_mid():
+    outbox = MqttOutbox()
+    client = FakeClient()
+    handle = outbox.enqueue(client, "bb8/a", "x", qos=1)
+    deadline = time.monotonic() + 2.0
+    while not client.pubs and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert not handle.done()
+    assert outbox.stats()["inflight"] == 1
+
+    client.ack(client.pubs[0][4])
+    assert handle.result(timeout=2.0) is True
+    stats = outbox.stats()
+    assert stats["inflight"] == 0
+    assert stats["published_total"] == 1
+    assert stats["latency_ms"]["p50"] is not None
+    outbox.close()
+
+
+def test_ack_arriving_before_registration_is_not_lost():
+    outbox = MqttOutbox()
+    client = FakeClient(auto_ack=True)
+    outbox._install_ack_hook(client)
+    handle = outbox.enqueue(client, "bb8/a", "x", qos=1)
+    assert handle.result(timeout=2.0) is True
+    outbox.close()
+
+
+def test_unacked_message_expires_at_deadline():
+    outbox = MqttOutbox()
+    client = FakeClient()
+    handle = outbox.enqueue(client, "bb8/a", "x", qos=1, deadline_s=0.05)
+    assert handle.result(timeout=2.0) is False
+    assert handle.reason == "ack_timeout"
+    assert outbox.stats()["dropped"] == {"ack_timeout": 1}
+    outbox.close()
+
+
+def test_queue_full_drops_and_counts():
+    outbox = MqttOutbox(max_queue=1)
+    gate = threading.Event()
+
+    class SlowClient(FakeClient):
+        def publish(self, *a, **k):
+            gate.wait(2.0)
+            return super().publish(*a, **k)
+
+    client = SlowClient()
+    first = outbox.enqueue(client, "bb8/a", "1")
+    # wait until the worker picked up the first message
+    deadline = time.monotonic() + 2.0
+    while outbox.queue_depth() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    second = outbox.enqueue(client, "bb8/a", "2")
+    third = outbox.enqueue(client, "bb8/a", "3")
+    assert third.done() and third.result() is False
+    assert third.reason == "queue_full"
+    gate.set()
+    assert first.result(timeout=2.0) is True
+    assert second.result(timeout=2.0) is True
+    outbox.close()
+
+
+def test_publish_errors_retry_then_drop():
+    outbox = MqttOutbox(max_attempts=2, retry_delay_s=0.01)
+    client = FakeClient(rc=4)
+    handle = outbox.enqueue(client, "bb8/a", "x")
+    assert handle.result(timeout=2.0) is False
+    assert handle.reason == "publish_error"
+    assert len(client.pubs) == 2
+    outbox.close()
+
+
+def test_failed_retained_publish_stays_ahead_of_newer_state():
+    outbox = MqttOutbox(retry_delay_s=0.05)
+
+    class FlakyClient(FakeClient):
+        failed = False
+
+        def publish(self, topic, payload=None, qos=0, retain=False):
+            info = super().publish(topic, payload, qos, retain)
+            if payload == "ON" and not self.failed:
+                self.failed = True
+                info.rc = 4
+            return info
+
+    client = FlakyClient()
+    handles = [
+        outbox.enqueue(client, "bb8/power/state", "ON", retain=True),
+        outbox.enqueue(client, "bb8/power/state", "OFF", retain=True),
+        outbox.enqueue(client, "bb8/led/state", "red", retain=True),
+    ]
+    assert all(h.result(timeout=2.0) for h in handles)
+    sent = [(topic, payload) for topic, payload, *_ in client.pubs]
+    # the other topic is not held up by the retry
+    assert sent[1] == ("bb8/led/state", "red")
+    power = [p for t, p in sent if t == "bb8/power/state"]
+    assert power == ["ON", "ON", "OFF"]  # the broker keeps the newest state
+    outbox.close()
+
+
+def test_handle_is_awaitable_and_enqueue_does_not_block():
+    outbox = MqttOutbox()
+    client = FakeClient()
+
+    async def main():
+        t0 = time.perf_counter()
+        handle = outbox.enqueue(client, "bb8/a", "x", qos=1)
+        enqueue_ms = (time.perf_counter() - t0) * 1000
+        await asyncio.sleep(0.02)
+        client.ack(client.pubs[0][4])
+        return enqueue_ms, await asyncio.wait_for(handle, timeout=2.0)
+
+    enqueue_ms, ok = asyncio.run(main())
+    assert ok is True
+    assert enqueue_ms < 50
+    outbox.close()
+
+
+def test_existing_on_publish_callback_is_chained():
+    outbox = MqttOutbox()
+    client = FakeClient()
+    seen = []
+    client.on_publish = lambda c, u, mid, *rest: seen.append(mid)
+    handle = outbox.enqueue(client, "bb8/a", "x", qos=1)
+    deadline = time.monotonic() + 2.0
+    while not client.pubs and time.monotonic() < deadline:
+        time.sleep(0.005)
+    client.ack(client.pubs[0][4])
+    assert handle.result(timeout=2.0) is True
+    assert seen == [client.pubs[0][4]]
+    outbox.close()
@@ -0,0 +1,166 @@
+import types
+
+import pytest
+
+from bb8_core.mqtt_router import MqttRouter, filter_covers, router_for  # type: ignore[import-not-found]
+
+
+class FakeClient:
+    def __init__(self):
+        self.subs = []
+        self.on_message = None
+
+    def subscribe(self, topic, qos=0):
+        self.subs.append(topic if isinstance(topic, list) else [(topic, qos)])
+        return (0, 1)
+
+
+def _msg(topic, payload=b"{}"):
+    return types.SimpleNamespace(topic=topic, payload=payload)
+
+
+def test_exact_plus_and_hash_filters_match():
+    r = MqttRouter()
+    r.add("bb8/cmd/led", lambda *a: None)
+    r.add("bb8/+/led", lambda *a: None)
+    r.add("bb8/#", lambda *a: None)
+    r.add("bb8/cmd/+/x", lambda *a: None)
+    assert sorted(x.filter for x in r.match("bb8/cmd/led")) == [
+        "bb8/#",
+        "bb8/+/led",
+        "bb8/cmd/led",
+    ]
+    assert [x.filter for x in r.match("bb8")] == ["bb8/#"]
+    assert sorted(x.filter for x in r.match("bb8/cmd/a/x")) == ["bb8/#", "bb8/cmd/+/x"]
+    assert r.match("other/cmd/led") == []
+
+
+def test_wildcards_do_not_match_system_topics():
+    r = MqttRouter()
+    r.add("#", lambda *a: None)
+    r.add("+/broker", lambda *a: None)
+    r.add("$SYS/#", lambda *a: None)
+    assert [x.filter for x in r.match("$SYS/broker")] == ["$SYS/#"]
+
+
+def test_invalid_filters_rejected():
+    r = MqttRouter()
+    for bad in ("", "bb8/#/x", "bb8/cmd+"):
+        with pytest.raises(ValueError):
+            r.add(bad, lambda *a: None)
+
+
+def test_fallback_runs_only_when_nothing_else_matches():
+    r = MqttRouter()
+    seen = []
+    r.add("bb8/cmd/led", lambda c, u, m: seen.append("led"))
+    r.add("bb8/cmd/#", lambda c, u, m: seen.append("unknown"), fallback=True)
+    r.dispatch(None, None, _msg("bb8/cmd/led"))
+    r.dispatch(None, None, _msg("bb8/cmd/nope"))
+    assert seen == ["led", "unknown"]
+
+
+def test_replace_false_keeps_first_handler():
+    r = MqttRouter()
+    seen = []
+    r.add("bb8/cmd/estop", lambda c, u, m: seen.append("facade"))
+    r.add("bb8/cmd/estop", lambda c, u, m: seen.append("controller"), replace=False)
+    r.dispatch(None, None, _msg("bb8/cmd/estop"))
+    assert seen == ["facade"]
+
+
+def test_text_handlers_and_counters():
+    r = MqttRouter()
+    got = []
+    r.add("bb8/led/cmd", got.append, text=True)
+
+    def boom(c, u, m):
+        raise RuntimeError("x")
+
+    r.add("bb8/led/#", boom)
+    assert r.dispatch(None, None, _msg("bb8/led/cmd", b'{"r":1}')) == 2
+    r.dispatch(None, None, _msg("nowhere"))
+    assert got == ['{"r":1}']
+    stats = r.stats()
+    assert stats["dispatched"] == 2
+    assert stats["unmatched"] == 1
+    assert stats["routes"]["bb8/led/cmd"]["count"] == 1
+    assert stats["routes"]["bb8/led/#"]["errors"] == 1
+    assert stats["routes"]["bb8/led/cmd"]["mean_ms"] is not None
+
+
+def test_remove_route():
+    r = MqttRouter()
+    r.add("bb8/+/x", lambda *a: None)
+    assert r.remove("bb8/+/x") is True
+    assert r.match("bb8/a/x") == []
+    assert r.remove("bb8/+/x") is False
+
+
+def test_subscriptions_drop_covered_filters():
+    assert filter_covers("bb8/cmd/#", "bb8/cmd/led")
+    assert filter_covers("bb8/+/led", "bb8/cmd/led")
+    assert not filter_covers("bb8/+/led", "bb8/#")
+    assert not filter_covers("bb8/cmd/led", "bb8/cmd/+")
+    r = MqttRouter()
+    r.add("bb8/cmd/#", lambda *a: None, 0)
+    r.add("bb8/cmd/led", lambda *a: None, 0)
+    # higher QoS than the covering filter must stay subscribed
+    r.add("bb8/cmd/estop", lambda *a: None, 1)
+    assert r.subscriptions() == [("bb8/cmd/#", 0), ("bb8/cmd/estop", 1)]
+
+
+def test_removing_a_broad_filter_resubscribes_what_it_covered():
+    class Client(FakeClient):
+        def __init__(self):
+            super().__init__()
+            self.log = []
+
+        def subscribe(self, topic, qos=0):
+            self.log.append(("sub", topic))
+            return super().subscribe(topic, qos)
+
+        def unsubscribe(self, topic):
+            self.log.append(("unsub", topic))
+
+    c = Client()
+    r = MqttRouter()
+    r.attach(c)
+    with r.batch():
+        r.add("bb8/#", lambda *a: None, 0)
+        r.add("bb8/cmd/+", lambda *a: None, 0)
+        r.add("bb8/cmd/led", lambda *a: None, 0)
+        r.add("bb8/state/x", lambda *a: None, 0)
+        r.add("other/y", lambda *a: None, 0)
+    assert c.subs[-1] == [("bb8/#", 0), ("other/y", 0)]
+    c.log.clear()
+    assert r.remove("bb8/#") is True
+    # subscribed before the broad filter goes, so nothing is missed
+    assert c.log == [
+        ("sub", [("bb8/cmd/+", 0), ("bb8/state/x", 0)]),
+        ("unsub", "bb8/#"),
+    ]
+    assert r.subscriptions() == [
+        ("bb8/cmd/+", 0),
+        ("bb8/state/x", 0),
+        ("other/y", 0),
+    ]
+    c.log.clear()
+    r.remove("bb8/state/x")  # nothing narrower left under it
+    assert c.log == [("unsub", "bb8/state/x")]
+
+
+def test_batched_subscribe_on_attach_and_reconnect():
+    c = FakeClient()
+    r = router_for(c)
+    assert c.on_message == r.dispatch
+    with r.batch():
+        r.add("bb8/cmd/#", lambda *a: None, 0)
+        r.add("bb8/echo/cmd", lambda *a: None, 0)
+    assert c.subs == [[("bb8/cmd/#", 0), ("bb8/echo/cmd", 0)]]
+    # a route added later subscribes on its own; reconnect re-issues one batch
+    r.add("bb8/state/x", lambda *a: None, 0)
+    assert c.subs[-1] == [("bb8/state/x", 0)]
+    assert r.resubscribe(c) == 3
+    assert len(c.subs[-1]) == 3
+    assert router_for(c) is r
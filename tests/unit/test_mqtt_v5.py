@@ -0,0 +1,107 @@
+import importlib
+import types
+
+import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+from paho.mqtt.reasoncodes import ReasonCode
+
+from bb8_core.mqtt_router import MqttRouter  # type: ignore[import-not-found]
+
+# The module MqttRouter imports: ``from bb8_core import mqtt_v5`` can return
+# the addon.bb8_core alias copy in a full run, with its own reply sessions
+mqtt_v5 = importlib.import_module("bb8_core.mqtt_v5")
+
+
+class FakeClient:
+    def __init__(self, protocol=mqtt.MQTTv5):
+        self.protocol = protocol
+        self.calls = []
+
+    def publish(self, topic, payload=None, qos=0, retain=False, properties=None):
+        self.calls.append((topic, payload, qos, properties))
+        return types.SimpleNamespace(rc=mqtt.MQTT_ERR_SUCCESS)
+
+
+def _request(topic, payload, response=None, correlation=None, expiry=None):
+    props = Properties(PacketTypes.PUBLISH)
+    if response:
+        props.ResponseTopic = response
+    if correlation is not None:
+        props.CorrelationData = correlation
+    if expiry is not None:
+        props.MessageExpiryInterval = expiry
+    return types.SimpleNamespace(topic=topic, payload=payload, properties=props)
+
+
+def _connack(alias_max):
+    props = Properties(PacketTypes.CONNACK)
+    props.TopicAliasMaximum = alias_max
+    return props
+
+
+def test_resolve_protocol(monkeypatch):
+    monkeypatch.delenv("BB8_MQTT_PROTOCOL", raising=False)
+    assert mqtt_v5.resolve_protocol({}) == mqtt.MQTTv311
+    assert mqtt_v5.resolve_protocol({"mqtt_protocol": "5"}) == mqtt.MQTTv5
+    monkeypatch.setenv("BB8_MQTT_PROTOCOL", "v5")
+    assert mqtt_v5.resolve_protocol({"mqtt_protocol": "3.1.1"}) == mqtt.MQTTv5
+
+
+def test_refused_v5_connack_requests_v311_client():
+    refused = ReasonCode(PacketTypes.CONNACK, aName="Unsupported protocol version")
+    assert mqtt_v5.on_connect(FakeClient(), refused) is False
+    # v3-only brokers answer with the 3.1.1 return code
+    assert mqtt_v5.on_connect(FakeClient(), 1) is False
+    assert mqtt_v5.on_connect(FakeClient(), 0, _connack(4)) is True
+
+
+def test_ack_goes_to_response_topic_with_correlation_data():
+    c = FakeClient()
+    r = MqttRouter()
+    r.add(
+        "bb8/cmd/led",
+        lambda cl, env: mqtt_v5.publish_ack(cl, "bb8/ack/led", "{}", cid=env.cid),
+        envelope=True,
+    )
+    r.dispatch(c, None, _request("bb8/cmd/led", b'{"r":1}', "app/replies", b"req-9"))
+    topic, _payload, _qos, props = c.calls[-1]
+    assert topic == "app/replies"
+    assert props.CorrelationData == b"req-9"
+    assert props.MessageExpiryInterval == mqtt_v5.ACK_EXPIRY_S
+    # a second ack for the same cid falls back to the fixed topic
+    mqtt_v5.publish_ack(c, "bb8/ack/led", "{}", cid="req-9")
+    assert c.calls[-1][0] == "bb8/ack/led"
+
+
+def test_v311_client_keeps_fixed_ack_topic():
+    c = FakeClient(protocol=mqtt.MQTTv311)
+    mqtt_v5.publish_ack(c, "bb8/ack/estop", '{"ok":true}', qos=1, cid="1")
+    assert c.calls == [("bb8/ack/estop", '{"ok":true}', 1, None)]
+
+
+def test_command_expiry_bounds_pending_reply():
+    clock = [100.0]
+    session = mqtt_v5.V5Session(clock=lambda: clock[0])
+    session.expect_reply("c1", "app/r", None, ttl_s=2)
+    clock[0] = 103.0
+    assert session.take_reply("c1") is None
+    assert session.stats()["replies_expired"] == 1
+
+
+def test_topic_alias_sent_once_per_connection():
+    c = FakeClient()
+    mqtt_v5.on_connect(c, 0, _connack(2))
+    for _ in range(3):
+        mqtt_v5.publish_telemetry(c, "bb8/status/telemetry", "{}")
+    topics = [t for t, *_ in c.calls]
+    aliases = [p.TopicAlias for *_, p in c.calls]
+    assert topics == ["bb8/status/telemetry", "", ""]
+    assert aliases == [1, 1, 1]
+    # QoS 1 is never aliased; reconnect re-establishes the mapping
+    mqtt_v5.publish_telemetry(c, "bb8/status/telemetry", "{}", qos=1)
+    assert c.calls[-1][0] == "bb8/status/telemetry"
+    mqtt_v5.on_connect(c, 0, _connack(2))
+    mqtt_v5.publish_telemetry(c, "bb8/status/telemetry", "{}")
+    assert c.calls[-1][0] == "bb8/status/telemetry"
+    assert mqtt_v5.session_for(c).stats()["aliased_publishes"] == 2
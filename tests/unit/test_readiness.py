@@ -0,0 +1,73 @@
+import asyncio
+
+from bb8_core.readiness import ReadinessGate  # type: ignore[import-not-found]
+from bb8_core.timer_wheel import TimerWheel  # type: ignore[import-not-found]
+
+
+def _recorder(ran, name, result=True):
+    async def run():
+        ran.append(name)
+        return result
+
+    return run
+
+
+async def test_held_commands_flush_in_order_when_the_deadline_passes():
+    gate = ReadinessGate(0.1, wheel=TimerWheel())
+    gate.begin()
+    assert gate.holding
+    ran, dropped = [], []
+    first = asyncio.create_task(
+        gate.defer("led", _recorder(ran, "led-1"), on_drop=dropped.append)
+    )
+    preset = asyncio.create_task(gate.defer("preset", _recorder(ran, "preset")))
+    await asyncio.sleep(0)
+    latest = asyncio.create_task(gate.defer("led", _recorder(ran, "led-2")))
+    assert await asyncio.wait_for(first, 1.0) is None  # superseded
+    assert await asyncio.wait_for(latest, 1.0) is True
+    await preset
+    assert ran == ["preset", "led-2"]
+    assert dropped == ["superseded"]
+    assert not gate.holding
+    stats = gate.stats()
+    assert stats["opened_by"] == {"probe": 0, "deadline": 1}
+    assert stats["superseded"] == 1 and stats["flushed"] == 2
+    assert 0.1 <= stats["holdoff_s"]["max"] < 0.3
+
+
+async def test_successful_probe_ends_the_holdoff_early():
+    attempts = []
+
+    async def probe():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("not ready")
+
+    gate = ReadinessGate(5.0, probe_interval_s=0.02, wheel=TimerWheel())
+    gate.begin(probe)
+    ran = []
+    assert await asyncio.wait_for(gate.defer("led", _recorder(ran, "led")), 1.0)
+    assert ran == ["led"]
+    stats = gate.stats()
+    assert stats["opened_by"]["probe"] == 1
+    assert stats["probes"] == 3 and stats["probe_failures"] == 2
+    assert stats["last"]["via"] == "probe" and stats["last"]["holdoff_s"] < 1.0
+
+
+async def test_stale_commands_expire_and_abort_drops_the_rest():
+    gate = ReadinessGate(0.1, max_age_s=0.05, wheel=TimerWheel())
+    gate.begin()
+    ran, dropped = [], []
+    held = gate.defer("led", _recorder(ran, "old"), on_drop=dropped.append)
+    assert await asyncio.wait_for(held, 1.0) is None
+    assert ran == [] and dropped == ["expired"]
+
+    gate.begin()
+    held = asyncio.create_task(
+        gate.defer("led", _recorder(ran, "x"), on_drop=dropped.append)
+    )
+    await asyncio.sleep(0)
+    gate.abort("shutdown")
+    assert await held is None
+    assert dropped == ["expired", "shutdown"] and not gate.holding
+    assert gate.stats()["aborted"] == 1
@@ -0,0 +1,92 @@
+import io
+import json
+import logging
+import random
+
+from bb8_core.logging_setup import (  # type: ignore[import-not-found]
+    MASK,
+    JsonRedactingHandler,
+    redact,
+    redact_fields,
+)
+
+
+def _line(msg):
+    handler = JsonRedactingHandler(io.StringIO())
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, msg, (), None)
+    handler.emit(record)
+    return handler.stream.getvalue().rstrip("\n")
+
+
+def _regex_line(msg):
+    # What the handler wrote before structured redaction
+    return redact(json.dumps(msg, default=str) if isinstance(msg, dict) else msg)
+
+
+def test_existing_redaction_cases_still_hold():
+    s = "password=supersecret token=abcd1234 other=ok"
+    assert _line(s) == _regex_line(s) == redact(s)
+    assert "supersecret" not in _line(s) and "abcd1234" not in _line(s)
+    out = _line({"password": "secret", "user": "u"})
+    assert "***REDACTED***" in out and "secret" not in out
+    assert json.loads(out) == {"password": MASK, "user": "u"}  # still JSON
+
+
+def test_fields_are_masked_by_key_in_one_walk():
+    clean = {"event": "led", "rgb": [1, 2, 3], "ok": True, "n": None}
+    assert redact_fields(clean) is clean  # nothing copied
+    record = {
+        "event": "mqtt_connect",
+        "Password": 1234,
+        "api-token": "t0k",
+        "tokens": 3,
+        "secret": None,
+        "bearer": False,
+        "auth": {"apikey": "k3y", "user": "bb8"},
+        "attempts": [{"pass": "p4ss"}, "token=abc"],
+        "error": "login failed secret: s3cr3t",
+    }
+    out = redact_fields(record)
+    assert out["Password"] == out["api-token"] == out["auth"]["apikey"] == MASK
+    assert out["tokens"] == 3 and out["secret"] is None and out["bearer"] is False
+    assert out["attempts"] == [{"pass": MASK}, "token=***REDACTED***"]
+    assert out["error"] == "login failed secret=***REDACTED***"
+    assert record["auth"]["apikey"] == "k3y"  # the caller's dict is untouched
+
+
+def test_snake_case_and_compound_keys_are_masked():
+    keys = ["mqtt_password", "MQTT_PASSWORD", "api_token", "client_secret"]
+    keys += ["mqtt_pass", "api_key", "API-KEY", "apiKey"]
+    out = redact_fields({**dict.fromkeys(keys, "hunter2"), "mqtt_user": "bb8"})
+    assert {k: out[k] for k in keys} == dict.fromkeys(keys, MASK)
+    assert out["mqtt_user"] == "bb8"
+
+
+def test_no_secret_the_regex_hid_leaks_from_structured_records():
+    rng = random.Random(49)
+    keys = ["password", "Token", "api_key", "APIKEY", "mqtt_pass", "user", "cid"]
+    keys += ["secret", "bearer", "topic", "event", "x-token", "pass"]
+    for _ in range(500):
+        planted = []
+
+        def value(depth, planted=planted):
+            secret = f"S{rng.randrange(10**6)}x"
+            kind = rng.randrange(6 if depth < 2 else 3)
+            if kind == 0:
+                planted.append(secret)
+                return secret
+            if kind == 1:
+                planted.append(secret)
+                return f"{rng.choice(keys)}={secret} more"
+            if kind == 2:
+                return rng.choice([7, 2.5, True, None])
+            if kind == 3:
+                return [value(depth + 1) for _ in range(rng.randrange(3))]
+            return {rng.choice(keys): value(depth + 1) for _ in range(3)}
+
+        record = {rng.choice(keys): value(0) for _ in range(4)}
+        old, new = _regex_line(record), _line(record)
+        json.loads(new)
+        for secret in planted:
+            if secret not in old:
+                assert secret not in new, (record, new)
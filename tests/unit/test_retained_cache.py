@@ -0,0 +1,150 @@
+import importlib
+import json
+
+from bb8_core.retained_cache import RetainedStateCache  # type: ignore[import-not-found]
+
+# The modules production uses (the package attribute can be an alias copy)
+retained_cache = importlib.import_module("bb8_core.retained_cache")
+mqtt_outbox = importlib.import_module("bb8_core.mqtt_outbox")
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.calls.append((topic, payload, qos, retain))
+
+
+def _sent(client):
+    assert mqtt_outbox.get_outbox().flush(timeout=2.0)
+    return client.calls
+
+
+class Clock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def _use_cache(monkeypatch, cache):
+    monkeypatch.setattr(retained_cache, "_CACHE", cache)
+
+
+def test_unchanged_payload_is_suppressed(monkeypatch):
+    _use_cache(monkeypatch, RetainedStateCache())
+    c = FakeClient()
+    assert retained_cache.publish_retained(c, "bb8/rssi", "-60") is True
+    assert retained_cache.publish_retained(c, "bb8/rssi", "-60") is False
+    assert retained_cache.publish_retained(c, "bb8/rssi", "-61") is True
+    assert _sent(c) == [("bb8/rssi", "-60", 0, True), ("bb8/rssi", "-61", 0, True)]
+
+
+def test_forced_refresh_after_interval(monkeypatch):
+    clock = Clock()
+    _use_cache(monkeypatch, RetainedStateCache(refresh_s=30, clock=clock))
+    c = FakeClient()
+    retained_cache.publish_retained(c, "bb8/presence", "ON")
+    clock.t = 29
+    assert retained_cache.publish_retained(c, "bb8/presence", "ON") is False
+    clock.t = 31
+    assert retained_cache.publish_retained(c, "bb8/presence", "ON") is True
+
+
+def test_clear_on_reconnect_and_per_client_scope(monkeypatch):
+    cache = RetainedStateCache()
+    _use_cache(monkeypatch, cache)
+    a, b = FakeClient(), FakeClient()
+    retained_cache.publish_retained(a, "bb8/status/connection", "connected")
+    # a different client (new session) still gets the state
+    assert retained_cache.publish_retained(b, "bb8/status/connection", "connected")
+    cache.clear(a)
+    assert retained_cache.publish_retained(a, "bb8/status/connection", "connected")
+
+
+def test_volatile_keys_ignored_for_dict_payloads(monkeypatch):
+    _use_cache(monkeypatch, RetainedStateCache())
+    c = FakeClient()
+    retained_cache.publish_retained(
+        c, "bb8/status/health", {"ok": 1, "ts": "a"}, volatile_keys=("ts",)
+    )
+    retained_cache.publish_retained(
+        c, "bb8/status/health", {"ok": 1, "ts": "b"}, volatile_keys=("ts",)
+    )
+    retained_cache.publish_retained(
+        c, "bb8/status/health", {"ok": 0, "ts": "c"}, volatile_keys=("ts",)
+    )
+    assert [json.loads(p) for _t, p, _q, _r in _sent(c)] == [
+        {"ok": 1, "ts": "a"},
+        {"ok": 0, "ts": "c"},
+    ]
+
+
+def test_dropped_publish_is_not_cached(monkeypatch):
+    _use_cache(monkeypatch, RetainedStateCache())
+    monkeypatch.setattr(mqtt_outbox.get_outbox(), "max_attempts", 1)
+
+    class Flaky(FakeClient):
+        fail = True
+
+        def publish(self, *a, **k):
+            if self.fail:
+                self.fail = False
+                raise OSError("socket")
+            super().publish(*a, **k)
+
+    c = Flaky()
+    assert retained_cache.publish_retained(c, "bb8/led", "x") is True
+    assert _sent(c) == []  # the outbox dropped it
+    assert retained_cache.publish_retained(c, "bb8/led", "x") is True
+    assert _sent(c) == [("bb8/led", "x", 0, True)]
+
+
+def test_offline_publish_is_parked_and_not_cached(monkeypatch, tmp_path):
+    offline_outbox = importlib.import_module("bb8_core.offline_outbox")
+    parked = offline_outbox.OfflineOutbox(tmp_path)
+    monkeypatch.setattr(offline_outbox, "_OFFLINE_OUTBOX", parked)
+    _use_cache(monkeypatch, RetainedStateCache())
+    c = FakeClient()
+    c.connected = False
+    assert retained_cache.publish_retained(c, "bb8/presence", "ON") is False
+    assert retained_cache.publish_retained(c, "bb8/presence", "ON") is False
+    assert parked.snapshot() == [("bb8/presence", "ON", 0, True)]
+    c.connected = True
+    assert retained_cache.publish_retained(c, "bb8/presence", "ON") is True
+    assert parked.pending() == 0  # the live value supersedes the parked one
+
+
+def test_config_sets_refresh_interval(monkeypatch):
+    monkeypatch.delenv("BB8_RETAINED_REFRESH_S", raising=False)
+    monkeypatch.setattr(retained_cache, "_CACHE", None)
+    cache = retained_cache.get_retained_cache()  # created by an early publish
+    assert cache.refresh_s == retained_cache.DEFAULT_REFRESH_S
+    assert retained_cache.get_retained_cache({"retained_refresh_s": 0}) is cache
+    assert cache.refresh_s == 0.0
+    monkeypatch.setenv("BB8_RETAINED_REFRESH_S", "45")
+    retained_cache.get_retained_cache({"retained_refresh_s": 10})
+    assert cache.refresh_s == 45.0
+
+
+def test_stats_report_suppression_ratio_per_topic(monkeypatch):
+    cache = RetainedStateCache()
+    _use_cache(monkeypatch, cache)
+    c = FakeClient()
+    for _ in range(4):
+        retained_cache.publish_retained(c, "bb8/rssi", "-60")
+    retained_cache.publish_retained(c, "bb8/presence", "ON")
+    stats = cache.stats()
+    assert stats["topics"]["bb8/rssi"] == {
+        "published": 1,
+        "suppressed": 3,
+        "suppression_ratio": 0.75,
+    }
+    assert stats["topics"]["bb8/presence"]["suppression_ratio"] == 0.0
+    assert stats["suppression_ratio"] == 0.6
@@ -0,0 +1,173 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import bb8_core.facade as facade_mod  # type: ignore[import-not-found]
+from bb8_core.safety import (  # type: ignore[import-not-found]
+    MotionSafetyController,
+    SafetyConfig,
+)
+from bb8_core.sequence import (  # type: ignore[import-not-found]
+    SequenceError,
+    parse_sequence,
+)
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+
+    def publish(self, topic, payload=None, qos=0, retain=False, **kwargs):
+        self.calls.append((topic, payload))
+
+    def acks(self):
+        return [json.loads(p) for t, p in self.calls if t.endswith("/ack/sequence")]
+
+
+class FakeLighting:
+    def __init__(self):
+        self.calls = []
+
+    async def set_static(self, r, g, b):
+        self.calls.append(("led", (r, g, b), asyncio.get_running_loop().time()))
+        return True
+
+    async def run_preset(self, name):
+        self.calls.append(("preset", name, asyncio.get_running_loop().time()))
+        return name in ("off", "white", "police", "sunset")
+
+    async def cancel_active(self):
+        return None
+
+
+class FakeSession:
+    def __init__(self):
+        self.rolls = []
+
+    def is_connected(self):
+        return True
+
+    async def roll(self, speed, heading, ms):
+        self.rolls.append((speed, heading, ms))
+
+    async def stop(self):
+        return None
+
+
+def test_parse_lays_steps_out_on_a_timeline():
+    steps = parse_sequence(
+        [
+            {"op": "led", "r": 255, "g": 0, "b": 0},
+            {"op": "roll", "speed": 80, "heading": 0, "ms": 1000},
+            {"op": "heading", "heading": 90, "hold_ms": 50},
+            {"op": "wait", "ms": 200},
+            {"op": "preset", "name": "police"},
+        ],
+        min_motion_gap_ms=50,
+    )
+    assert [(s.op, s.at_ms) for s in steps] == [
+        ("led", 0),
+        ("roll", 0),
+        ("heading", 1000),
+        ("wait", 1050),
+        ("preset", 1250),
+    ]
+
+
+@pytest.mark.parametrize(
+    "raw, message",
+    [
+        ([], "non-empty list"),
+        ([{"op": "dance"}], "unknown op"),
+        ([{"op": "roll", "speed": 1}], "roll needs heading, ms"),
+        ([{"op": "led", "r": "x", "g": 0, "b": 0}], "steps[0].r"),
+        ([{"op": "wait", "ms": -1}], "must be >= 0"),
+        ([{"op": "roll", "speed": 80, "heading": 0, "ms": 0}], "> 0 for roll"),
+        (
+            [{"op": "heading", "heading": 0}, {"op": "heading", "heading": 90}],
+            "50 ms apart",
+        ),
+        ([{"op": "wait", "ms": 70_000}], "longer than"),
+    ],
+)
+def test_parse_rejects_invalid_sequences(raw, message):
+    with pytest.raises(SequenceError, match=message.replace("[", r"\[")):
+        parse_sequence(raw, min_motion_gap_ms=50)
+
+
+def _facade(monkeypatch):
+    monkeypatch.setattr(facade_mod, "load_config", lambda *a, **k: ({}, "test"))
+    facade = facade_mod.BB8Facade(bridge=SimpleNamespace())
+    facade._safety = MotionSafetyController(SafetyConfig(min_drive_interval_ms=50))
+    facade._safety.set_device_connected(True)
+    facade._lighting = FakeLighting()
+    facade._ble_session = FakeSession()
+    client = FakeClient()
+    facade._mqtt = {"client": client, "base": "bb8/test", "qos": 1, "retain": False}
+    return facade, client
+
+
+async def test_sequence_runs_on_schedule_and_acks_once(monkeypatch):
+    facade, client = _facade(monkeypatch)
+    steps = [
+        {"op": "led", "r": 255, "g": 0, "b": 0},
+        {"op": "roll", "speed": 500, "heading": 0, "ms": 60},
+        {"op": "heading", "heading": 90},
+        {"op": "wait", "ms": 30},
+        {"op": "preset", "name": "police"},
+    ]
+    start = asyncio.get_running_loop().time()
+    await facade.run_sequence(steps, cid="show-1")
+    elapsed = asyncio.get_running_loop().time() - start
+
+    (ack,) = client.acks()
+    assert ack["ok"] and ack["cid"] == "show-1"
+    assert [s["op"] for s in ack["steps"]] == [
+        "led",
+        "roll",
+        "heading",
+        "wait",
+        "preset",
+    ]
+    assert all(0 <= s["dev_ms"] < 20 for s in ack["steps"])
+    assert ack["max_dev_ms"] is not None
+    # speed capped by the safety layer; heading is a turn in place
+    assert facade._ble_session.rolls == [(180, 0, 60), (0, 90, None)]
+    assert elapsed >= 0.09
+    facade._safety.cancel_auto_stop()
+
+
+async def test_newer_sequence_and_estop_cancel_the_running_one(monkeypatch):
+    facade, client = _facade(monkeypatch)
+    long = [{"op": "led", "r": 1, "g": 1, "b": 1}, {"op": "wait", "ms": 5000}]
+    first = asyncio.create_task(facade.run_sequence(long, cid="a"))
+    await asyncio.sleep(0.02)
+    second = asyncio.create_task(facade.run_sequence(long, cid="b"))
+    await asyncio.wait_for(first, 1.0)
+    await asyncio.sleep(0.02)
+    await facade.estop("test")
+    await asyncio.wait_for(second, 1.0)
+
+    acks = {a["cid"]: a for a in client.acks()}
+    assert acks["a"]["ok"] is False and acks["a"]["reason"] == "cancelled: superseded"
+    assert acks["b"]["reason"] == "cancelled: estop"
+    assert acks["b"]["ran"] == 2 and acks["b"]["total"] == 2
+
+    # while estop is latched a new sequence stops before its first step
+    await facade.run_sequence(long[:1], cid="c")
+    blocked = client.acks()[-1]
+    assert blocked["ran"] == 0 and "emergency stop" in blocked["reason"]
+
+
+async def test_invalid_sequence_is_nacked_without_running(monkeypatch):
+    facade, client = _facade(monkeypatch)
+    await facade.run_sequence([{"op": "roll"}], cid="bad")
+    (ack,) = client.acks()
+    assert ack == {
+        "ok": False,
+        "cid": "bad",
+        "reason": "steps[0]: roll needs speed, heading, ms",
+    }
+    assert facade._lighting.calls == []
@@ -0,0 +1,169 @@
+import json
+from types import SimpleNamespace
+
+import bb8_core.facade as facade_mod  # type: ignore[import-not-found]
+import bb8_core.safety as safety_mod  # type: ignore[import-not-found]
+import bb8_core.telemetry as telemetry  # type: ignore[import-not-found]
+from bb8_core.timer_wheel import TimerWheel  # type: ignore[import-not-found]
+
+
+class Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+
+    def publish(self, topic, payload=None, qos=0, retain=False, **kwargs):
+        self.calls.append((topic, json.loads(payload)))
+
+
+def _setup(monkeypatch, min_interval_s=1.0, keepalive_s=60.0):
+    clock = Clock()
+    wheel = TimerWheel(tick_s=0.01, slots=64, clock=clock)
+    # no driver: the test advances time itself
+    wheel._ensure_driver_locked = lambda: None
+    wheel._arm_locked = lambda tick: None
+    monkeypatch.setattr(telemetry, "get_timer_wheel", lambda: wheel)
+    agg = telemetry.TelemetryAggregator(min_interval_s, keepalive_s, clock=clock)
+    client = FakeClient()
+
+    def advance(dt):
+        clock.t += dt
+        with wheel._lock:
+            due = wheel._collect_locked(clock.t)
+        wheel._fire(due, clock.t)
+
+    return agg, client, clock, advance
+
+
+def test_publishes_one_snapshot_on_bind_and_then_only_on_change(monkeypatch):
+    agg, client, _clock, advance = _setup(monkeypatch)
+    agg.update(connected=True, estop=False)  # before bind: nowhere to publish
+    assert client.calls == []
+    agg.bind(client, "bb8/status/telemetry")
+    advance(0.02)
+    ((topic, snap),) = client.calls
+    assert topic == "bb8/status/telemetry"
+    assert set(snap) == {*telemetry.SNAPSHOT_FIELDS, "telemetry", "ts"}
+    assert snap["telemetry"]["publishes_per_min"] == 1
+    assert snap["connected"] is True and snap["battery_pct"] is None
+
+    assert agg.update(connected=True, estop=False) is False  # unchanged
+    advance(5.0)
+    assert len(client.calls) == 1
+    agg.update(battery_pct=80)
+    advance(0.02)
+    assert client.calls[-1][1]["battery_pct"] == 80
+
+
+def test_changes_within_min_interval_coalesce_to_the_latest(monkeypatch):
+    agg, client, _clock, advance = _setup(monkeypatch, min_interval_s=1.0)
+    agg.bind(client, "t")
+    advance(0.02)
+    for pct in (90, 89, 88, 87):
+        agg.update(battery_pct=pct)
+        advance(0.1)
+    assert len(client.calls) == 1
+    advance(1.0)
+    assert [c[1]["battery_pct"] for c in client.calls] == [None, 87]
+    assert agg.stats()["coalesced"] == 3
+
+
+def test_urgent_fields_skip_the_min_interval(monkeypatch):
+    agg, client, _clock, advance = _setup(monkeypatch, min_interval_s=5.0)
+    agg.bind(client, "t")
+    advance(0.02)
+    agg.update(battery_pct=50)  # throttled behind the 5 s interval
+    advance(0.02)
+    assert len(client.calls) == 1
+    agg.update(estop=True)  # pulls the pending publish forward
+    advance(0.02)
+    assert len(client.calls) == 2
+    assert client.calls[-1][1]["estop"] is True
+    assert client.calls[-1][1]["battery_pct"] == 50
+
+
+def test_keepalive_only_when_nothing_was_published(monkeypatch):
+    agg, client, _clock, advance = _setup(monkeypatch, keepalive_s=10.0)
+    agg.bind(client, "t")
+    advance(0.02)
+    advance(6.0)
+    agg.update(rssi=-60)
+    advance(4.5)  # keep-alive due, but a change went out 4.5 s ago
+    assert len(client.calls) == 2
+    advance(10.0)
+    assert len(client.calls) == 3
+    stats = agg.stats()
+    assert stats["keepalives"] == 1 and stats["published"] == 3
+    assert stats["staleness_s"] == {"rssi": 14.5}
+
+
+def test_keepalive_follows_the_last_publish(monkeypatch):
+    agg, client, _clock, advance = _setup(monkeypatch, keepalive_s=10.0)
+    agg.bind(client, "t")
+    advance(0.02)
+    advance(1.0)
+    agg.update(rssi=-60)
+    advance(0.02)  # published at 1.04 s
+    for _ in range(95):
+        advance(0.1)
+    assert len(client.calls) == 2
+    # due 10 s after that publish, not on a grid anchored at bind()
+    for _ in range(6):
+        advance(0.1)
+    assert len(client.calls) == 3
+    assert agg.stats()["keepalives"] == 1
+
+
+def test_estop_is_pushed_by_the_safety_controller(monkeypatch):
+    agg, client, _clock, advance = _setup(monkeypatch, min_interval_s=5.0)
+    monkeypatch.setattr(safety_mod, "get_telemetry_aggregator", lambda: agg)
+    agg.bind(client, "t")
+    advance(0.02)
+    safety = safety_mod.MotionSafetyController()
+    safety.set_device_connected(True)
+    safety.activate_estop("test")
+    advance(0.02)  # no poll, no min interval: out on the next tick
+    assert client.calls[-1][1]["estop"] is True
+    safety.clear_estop()
+    advance(0.02)
+    assert client.calls[-1][1]["estop"] is False
+
+
+def test_explicit_zero_settings_are_kept(monkeypatch):
+    monkeypatch.delenv("BB8_TELEMETRY_MIN_INTERVAL_S", raising=False)
+    cfg = {"telemetry_min_interval_s": 0}
+    key = "telemetry_min_interval_s"
+    assert telemetry._setting(cfg, "BB8_TELEMETRY_MIN_INTERVAL_S", key, 1.0) == 0.0
+    assert telemetry._setting({}, "BB8_TELEMETRY_MIN_INTERVAL_S", key, 1.0) == 1.0
+    monkeypatch.setenv("BB8_TELEMETRY_MIN_INTERVAL_S", "0")
+    assert telemetry._setting({key: 5}, "BB8_TELEMETRY_MIN_INTERVAL_S", key, 1.0) == 0.0
+
+
+async def test_facade_routes_its_fields_through_the_aggregator(monkeypatch):
+    agg, client, _clock, advance = _setup(monkeypatch)
+    monkeypatch.setattr(facade_mod, "load_config", lambda *a, **k: ({}, "test"))
+    facade = facade_mod.BB8Facade(bridge=SimpleNamespace())
+    facade._telemetry = agg
+    facade._mqtt = {"client": client, "base": "bb8/test", "qos": 1, "retain": False}
+
+    async def battery():
+        return 75
+
+    facade.get_battery = battery
+    facade.is_connected = lambda: True
+
+    await facade._publish_telemetry()
+    topic, snap = client.calls[-1]
+    assert topic == "bb8/test/status/telemetry"
+    assert snap["connected"] is True and snap["battery_pct"] == 75
+    published = len(client.calls)
+    facade._publish_telemetry_update()  # nothing changed: no publish
+    advance(2.0)
+    assert len(client.calls) == published
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+
+import bb8_core.safety as safety  # type: ignore[import-not-found]
+from bb8_core.timer_wheel import TimerWheel  # type: ignore[import-not-found]
+
+
+class Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+def _tick(wheel, clock, dt):
+    """Advance the fake clock and process due timers like the driver does."""
+    clock.t += dt
+    with wheel._lock:
+        due = wheel._collect_locked(clock.t)
+    wheel._fire(due, clock.t)
+
+
+def _thread_free_wheel(clock):
+    wheel = TimerWheel(tick_s=0.01, slots=8, clock=clock)
+    # no driver: the test advances time itself
+    wheel._ensure_driver_locked = lambda: None
+    wheel._arm_locked = lambda tick: None
+    return wheel
+
+
+def test_timers_fire_in_deadline_order_never_early():
+    clock = Clock()
+    wheel = _thread_free_wheel(clock)
+    fired = []
+    wheel.call_later(0.05, fired.append, "b")
+    wheel.call_later(0.02, fired.append, "a")
+    # beyond one revolution (8 slots * 10 ms): shares a slot with earlier ticks
+    wheel.call_later(0.25, fired.append, "far")
+    _tick(wheel, clock, 0.019)
+    assert fired == []
+    _tick(wheel, clock, 0.035)
+    assert fired == ["a", "b"]
+    _tick(wheel, clock, 0.1)
+    assert fired == ["a", "b"]
+    _tick(wheel, clock, 0.1)
+    assert fired == ["a", "b", "far"]
+    assert wheel.stats()["pending"] == 0
+
+
+def test_cancel_and_reschedule_are_constant_time_moves():
+    clock = Clock()
+    wheel = _thread_free_wheel(clock)
+    fired = []
+    handle = wheel.call_later(0.02, fired.append, "x")
+    handle.reschedule(0.06)
+    _tick(wheel, clock, 0.03)
+    assert fired == []
+    handle.cancel()
+    assert not handle.active
+    _tick(wheel, clock, 0.1)
+    assert fired == []
+    # a fired or cancelled handle can be re-armed
+    handle.reschedule(0.01)
+    _tick(wheel, clock, 0.02)
+    assert fired == ["x"]
+    stats = wheel.stats()
+    assert (stats["rescheduled"], stats["cancelled"], stats["fired"]) == (2, 1, 1)
+
+
+def test_call_every_keeps_its_period_and_skips_missed_ticks():
+    clock = Clock()
+    wheel = _thread_free_wheel(clock)
+    fired = []
+    handle = wheel.call_every(0.05, lambda: fired.append(round(clock.t - 1000, 3)))
+    for _ in range(4):
+        _tick(wheel, clock, 0.05)
+    assert fired == [0.05, 0.1, 0.15, 0.2]
+    _tick(wheel, clock, 0.5)  # stalled driver: one catch-up, not ten
+    assert len(fired) == 5
+    handle.cancel()
+    _tick(wheel, clock, 0.2)
+    assert len(fired) == 5
+
+
+async def test_loop_driver_fires_and_spawns_coroutines():
+    wheel = TimerWheel()
+    done = asyncio.Event()
+
+    async def _async_cb():
+        done.set()
+
+    wheel.call_later(0.02, _async_cb)
+    await asyncio.wait_for(done.wait(), 1.0)
+    stats = wheel.stats()
+    assert stats["driver"] == "loop" and stats["fired"] == 1
+    assert 0 <= stats["lag_ms"]["max"] < 50
+
+
+def test_thread_driver_without_a_loop():
+    wheel = TimerWheel()
+    fired = threading.Event()
+    wheel.call_later(0.02, fired.set)
+    assert fired.wait(1.0)
+    assert wheel.stats()["driver"] == "thread"
+
+
+async def test_auto_stop_rides_the_shared_wheel(monkeypatch):
+    wheel = TimerWheel()
+    monkeypatch.setattr(safety, "get_timer_wheel", lambda: wheel)
+    controller = safety.MotionSafetyController()
+    stops = []
+
+    async def _stop():
+        stops.append(asyncio.get_running_loop())
+
+    for _ in range(20):  # each drive moves the one pending auto-stop
+        controller.schedule_auto_stop(50, _stop)
+    assert wheel.stats()["pending"] == 1
+    await asyncio.sleep(0.1)
+    assert stops == [asyncio.get_running_loop()]
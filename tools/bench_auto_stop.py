@@ -0,0 +1,129 @@
+"""Dead-man auto-stop: re-created timers vs one deadline that moves.
+
+N drive commands each (re)schedule a 500 ms auto-stop, as 50 Hz joystick
+input does; the loop yields once between commands. Compared:
+
+  task     the original path: cancel the previous sleeper Task, create a
+           new ``asyncio.sleep`` Task per drive
+  handle   cancel the previous wheel timer, ``call_later`` a new one per
+           drive
+  moving   AutoStopSupervisor: one wheel handle, ``reschedule`` per drive
+
+Reported: CPU per drive above an idle loop doing the same yields
+(process_time), Tasks and wheel handles created per drive, peak traced
+memory while input runs (tracemalloc, separate pass) and how many stops ran
+once input ended (must be exactly one).
+
+usage: python -m tools.bench_auto_stop [N]
+"""
+
+import asyncio
+import sys
+import time
+import tracemalloc
+
+from bb8_core.safety import AutoStopSupervisor
+from bb8_core.timer_wheel import TimerWheel
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+DELAY_S = 0.5
+
+
+class Stops:
+    def __init__(self) -> None:
+        self.count = 0
+
+    async def __call__(self) -> None:
+        self.count += 1
+
+
+def tasks(loop, wheel, stop):
+    pending: list[asyncio.Task | None] = [None]
+
+    async def sleeper() -> None:
+        await asyncio.sleep(DELAY_S)
+        await stop()
+
+    def drive() -> None:
+        if pending[0] is not None:
+            pending[0].cancel()
+        pending[0] = loop.create_task(sleeper())
+
+    return drive
+
+
+def handles(loop, wheel, stop):
+    pending = [None]
+
+    def fire() -> None:
+        loop.create_task(stop())
+
+    def drive() -> None:
+        if pending[0] is not None:
+            pending[0].cancel()
+        pending[0] = wheel.call_later(DELAY_S, fire, name="auto_stop")
+
+    return drive
+
+
+def moving(loop, wheel, stop):
+    import bb8_core.safety as safety
+
+    safety.get_timer_wheel = lambda: wheel
+    supervisor = AutoStopSupervisor()
+
+    def drive() -> None:
+        supervisor.arm(DELAY_S, stop, loop)
+
+    return drive
+
+
+def idle(loop, wheel, stop):
+    return lambda: None
+
+
+async def run(factory, traced: bool) -> dict:
+    loop = asyncio.get_running_loop()
+    created = [0]
+    loop.set_task_factory(
+        lambda lp, coro, **kw: (
+            created.__setitem__(0, created[0] + 1) or asyncio.Task(coro, loop=lp, **kw)
+        )
+    )
+    wheel = TimerWheel()
+    stop = Stops()
+    drive = factory(loop, wheel, stop)
+    for _ in range(200):  # warm up
+        drive()
+        await asyncio.sleep(0)
+    if traced:
+        tracemalloc.start()
+    tasks0, handles0 = created[0], wheel.scheduled
+    cpu = time.process_time()
+    for _ in range(n):
+        drive()
+        await asyncio.sleep(0)
+    cpu = time.process_time() - cpu
+    peak = tracemalloc.get_traced_memory()[1] if traced else 0
+    tracemalloc.stop()
+    tasks, handles = created[0] - tasks0, wheel.scheduled - handles0
+    await asyncio.sleep(DELAY_S + 0.1)
+    return {
+        "cpu": cpu,
+        "peak": peak,
+        "tasks": tasks,
+        "handles": handles,
+        "stops": stop.count,
+    }
+
+
+print(f"{n} drives, {DELAY_S * 1000:.0f} ms auto-stop, one loop yield per drive")
+floor = asyncio.run(run(idle, False))["cpu"]
+for name, factory in (("task", tasks), ("handle", handles), ("moving", moving)):
+    r = asyncio.run(run(factory, False))
+    peak = asyncio.run(run(factory, True))["peak"]
+    print(
+        f"{name:7s} cpu {(r['cpu'] - floor) / n * 1e6:5.2f} us/drive over the loop"
+        f"  tasks {r['tasks'] / n:4.2f}/drive  handles {r['handles'] / n:4.2f}/drive"
+        f"  peak {peak / 1024:6.1f} KiB  stops {r['stops']}"
+    )
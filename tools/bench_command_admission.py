@@ -0,0 +1,87 @@
+"""Load test: 200 Hz LED flood with and without command admission control.
+
+Each LED command that gets through does what the facade does: a task that
+waits for the (serialised) BLE link, writes for ``BLE_WRITE_MS`` and acks.
+Half-way through, an estop is sent; it needs the same BLE link. Reported:
+tasks started, BLE writes, estop latency to its BLE write, and the worst
+event-loop lag seen by a 10 ms heartbeat.
+
+usage: python -m tools.bench_command_admission [SECONDS] [HZ]
+"""
+
+import asyncio
+import sys
+import time
+
+from bb8_core.command_admission import CommandAdmission
+
+seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+hz = float(sys.argv[2]) if len(sys.argv) > 2 else 200.0
+BLE_WRITE_MS = 8.0
+
+
+async def run(admission: CommandAdmission | None) -> dict:
+    link = asyncio.Lock()
+    counts = {"tasks": 0, "writes": 0, "acks": 0, "nacks": 0}
+    estop_latency: list[float] = []
+    lag = [0.0]
+
+    async def ble_write(kind: str, sent: float) -> None:
+        async with link:
+            await asyncio.sleep(BLE_WRITE_MS / 1000)
+            counts["writes"] += 1
+            if kind == "estop":
+                estop_latency.append(time.perf_counter() - sent)
+        counts["acks"] += 1
+
+    def handle(kind: str, sent: float) -> None:
+        counts["tasks"] += 1
+        asyncio.get_running_loop().create_task(ble_write(kind, sent))
+
+    def nack(_reason, _outcome):
+        counts["nacks"] += 1
+
+    def submit(cmd: str) -> None:
+        sent = time.perf_counter()
+        if admission is None:
+            handle(cmd, sent)
+        else:
+            admission.submit(cmd, None, lambda: handle(cmd, sent), nack)
+
+    async def heartbeat():
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lag[0] = max(lag[0], time.perf_counter() - t0 - 0.01)
+
+    hb = asyncio.create_task(heartbeat())
+    n = int(seconds * hz)
+    start = time.perf_counter()
+    for i in range(n):
+        submit("led")
+        if i == n // 2:
+            submit("estop")
+        # absolute schedule so the publisher really runs at ``hz``
+        await asyncio.sleep(max(0.0, start + (i + 1) / hz - time.perf_counter()))
+    while not estop_latency:
+        await asyncio.sleep(0.01)
+    hb.cancel()
+    counts["estop_ms"] = estop_latency[0] * 1000
+    counts["lag_ms"] = lag[0] * 1000
+    return counts
+
+
+print(f"{seconds:.0f} s of LED commands at {hz:.0f} Hz, BLE write {BLE_WRITE_MS} ms")
+for label, admission in (("direct", None), ("admission", CommandAdmission())):
+    r = asyncio.run(run(admission))
+    print(
+        f"{label:10s} tasks {r['tasks']:4d}  BLE writes {r['writes']:4d}  "
+        f"nacks {r['nacks']:4d}  estop->BLE {r['estop_ms']:7.1f} ms  "
+        f"max loop lag {r['lag_ms']:5.1f} ms"
+    )
+    if admission is not None:
+        s = admission.stats()
+        print(
+            f"{'':10s} admitted {s['admitted']}  merged {s['merged']}  "
+            f"dropped {s['dropped']}"
+        )
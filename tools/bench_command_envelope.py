@@ -0,0 +1,52 @@
+"""Command decode cost: per-handler json.loads vs one shared envelope.
+
+"before" decodes and parses the payload in each of two handlers (the facade
+and the controller both saw LED/estop commands); "after" decodes once into a
+CommandEnvelope and validates against the per-shape cache.
+
+usage: python -m tools.bench_command_envelope [N]
+"""
+
+import json
+import sys
+import time
+
+from bb8_core import command_envelope
+from bb8_core.command_envelope import decode_command
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+payloads = [
+    ("bb8/cmd/led", b'{"r":255,"g":64,"b":0,"cid":"c-1"}'),
+    ("bb8/cmd/drive", b'{"speed":120,"heading":90,"ms":500,"cid":"c-2"}'),
+    ("bb8/cmd/estop", b'{"reason":"user","cid":"c-3"}'),
+    ("bb8/cmd/power", b"wake"),
+]
+
+
+def before(topic, payload):
+    for _handler in range(2):
+        raw = payload.decode("utf-8", "ignore")
+        try:
+            data = json.loads(raw)
+        except Exception:
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+        data.get("cid")
+
+
+def after(topic, payload):
+    decode_command(topic, payload)
+
+
+print(f"backend: {command_envelope.JSON_BACKEND}")
+for label, fn in (("before (2x loads)", before), ("after (envelope)", after)):
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(*payloads[i & 3])
+    dt = time.perf_counter() - t0
+    print(f"{label:18s} {dt / n * 1e6:6.2f} us/msg")
+print(
+    f"shape cache: {command_envelope.shape_cache_hits} hits, "
+    f"{command_envelope.shape_cache_misses} misses"
+)
@@ -0,0 +1,114 @@
+"""Stress test: commands arriving on paho's network thread at high rates.
+
+A producer thread plays paho's ``loop_start`` thread and delivers RATE
+messages/s for SECONDS; one in ten is a stop press that publishes "idle"
+0.5 s later. Handlers do what the facade's do: schedule a coroutine on the
+bridge loop. Three ways of getting there are compared:
+
+  legacy   handler runs on the paho thread and calls ``create_task`` (lost),
+           stop resets sleep in a thread each (the pre-ingress facade)
+  hop      one ``call_soon_threadsafe`` per message, thread per stop reset
+  ingress  ``CommandIngress`` queue + batched wakeups, resets on the wheel
+
+Reported: peak thread count, lost commands and dispatch latency (paho
+thread -> handler running on the loop) p50/p99.
+
+usage: python -m tools.bench_command_ingress [SECONDS] [RATE ...]
+"""
+
+import asyncio
+import sys
+import threading
+import time
+
+from bb8_core.command_ingress import CommandIngress
+from bb8_core.timer_wheel import get_timer_wheel
+
+seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+rates = [int(r) for r in sys.argv[2:]] or [1_000, 10_000, 50_000]
+
+
+def pct(samples: list[float], p: float) -> float:
+    if not samples:
+        return float("nan")
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p * (len(samples) - 1)))] * 1000.0
+
+
+async def run(mode: str, rate: int) -> dict:
+    loop = asyncio.get_running_loop()
+    ingress = CommandIngress(maxsize=4096)
+    ingress.bind(loop)
+    lat: list[float] = []
+    counts = {"sent": 0, "ran": 0, "lost": 0, "idle": 0}
+    peak = [threading.active_count()]
+
+    async def work():
+        counts["ran"] += 1
+
+    def handler(sent: float, stop: bool) -> None:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            counts["lost"] += 1  # "no running event loop": only logged
+            return
+        lat.append(time.perf_counter() - sent)
+        loop.create_task(work())
+        if stop:
+            if mode == "ingress":
+                get_timer_wheel().call_later(
+                    0.5, counts.__setitem__, "idle", counts["idle"] + 1
+                )
+            else:
+                sleeper(counts)
+
+    def sleeper(c: dict) -> None:
+        def _reset():
+            time.sleep(0.5)
+            c["idle"] += 1
+
+        threading.Thread(target=_reset, daemon=True).start()
+
+    def paho() -> None:
+        n = int(rate * seconds)
+        start = time.perf_counter()
+        for i in range(n):
+            sent = time.perf_counter()
+            stop = i % 10 == 0
+            if mode == "legacy":
+                handler(sent, stop)
+                if stop:
+                    sleeper(counts)
+            elif mode == "hop":
+                loop.call_soon_threadsafe(handler, sent, stop)
+            else:
+                ingress.submit(handler, sent, stop, priority=stop)
+            counts["sent"] += 1
+            if i % 64 == 0:
+                peak[0] = max(peak[0], threading.active_count())
+                ahead = start + (i + 1) / rate - time.perf_counter()
+                if ahead > 0:
+                    time.sleep(ahead)
+
+    await asyncio.to_thread(paho)
+    await asyncio.sleep(0.7)  # let stop resets fire
+    peak[0] = max(peak[0], threading.active_count())
+    return {
+        **counts,
+        "threads": peak[0],
+        "p50": pct(lat, 0.50),
+        "p99": pct(lat, 0.99),
+        "wakeups": ingress.wakeups,
+    }
+
+
+print(f"{seconds:.1f} s per run, 10% stop presses (0.5 s idle reset)")
+for rate in rates:
+    for mode in ("legacy", "hop", "ingress"):
+        r = asyncio.run(run(mode, rate))
+        print(
+            f"{rate:6d}/s {mode:8s} threads {r['threads']:5d}  "
+            f"lost {r['lost']:6d}/{r['sent']}  "
+            f"dispatch p50 {r['p50']:8.3f} ms  p99 {r['p99']:8.3f} ms"
+            + (f"  wakeups {r['wakeups']}" if mode == "ingress" else "")
+        )
@@ -0,0 +1,62 @@
+"""Per-command overhead of command tracing.
+
+Dispatches LED envelopes through the router into a handler that marks the
+same stages a real command does (admit, safety, ble_submit, ble_done, ack),
+with tracing disabled, histograms only (the default) and every trace
+written as JSONL. Reported: mean dispatch cost per command.
+
+usage: python -m tools.bench_command_trace [COMMANDS]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import bb8_core.command_trace as command_trace
+from bb8_core.command_trace import CommandTracer
+from bb8_core.mqtt_router import MqttRouter
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+STAGES = ("admit", "safety", "ble_submit", "ble_done", "ack")
+
+
+def handler(_client, _env):
+    for stage in STAGES:
+        command_trace.mark(stage)
+
+
+router = MqttRouter()
+router.add("bb8/cmd/led", handler, name="led", envelope=True)
+msgs = [
+    SimpleNamespace(
+        topic="bb8/cmd/led",
+        payload=json.dumps({"r": i % 256, "g": 0, "b": 0, "cid": f"c{i}"}).encode(),
+        properties=None,
+        timestamp=time.monotonic(),
+    )
+    for i in range(n)
+]
+
+with tempfile.TemporaryDirectory() as tmp:
+    modes = (
+        ("disabled", CommandTracer(enabled=False)),
+        ("histograms", CommandTracer()),
+        ("sample=1.0", CommandTracer(sample=1.0, path=os.path.join(tmp, "t.jsonl"))),
+    )
+    base = None
+    for label, tracer in modes:
+        command_trace._TRACER = tracer
+        t0 = time.perf_counter()
+        for msg in msgs:
+            router.dispatch(None, None, msg)
+        us = (time.perf_counter() - t0) / n * 1e6
+        base = us if base is None else base
+        s = tracer.stats()
+        print(
+            f"{label:11s} {us:6.2f} us/command  (+{us - base:5.2f})  "
+            f"completed {s['completed']}  written {s['written']}"
+        )
+        tracer.close()
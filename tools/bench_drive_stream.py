@@ -0,0 +1,122 @@
+"""Joystick at 30 Hz: discrete bb8/cmd/drive vs the drive_stream control loop.
+
+A joystick publishes a new (speed, heading) every 1/30 s for SECONDS, then
+lets go. The radio takes RADIO_MS per roll. Compared:
+
+  drive    gate_drive + roll + schedule_auto_stop per command (the facade's
+           discrete path, default 50 ms min interval)
+  stream   DriveStream at the default 10 Hz and at 20 Hz
+
+Reported: setpoints rejected, rolls sent, max rolls in flight, control-loop
+jitter p50/p99, setpoint-to-roll latency p50/p99 (received -> roll done) and
+how long after the last setpoint the droid was stopped.
+
+usage: python -m tools.bench_drive_stream [SECONDS] [RADIO_MS]
+"""
+
+import asyncio
+import sys
+import time
+
+from bb8_core.drive_stream import DriveStream
+from bb8_core.safety import MotionSafetyController, SafetyConfig, SafetyViolation
+from bb8_core.timer_wheel import TimerWheel
+
+seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+radio_s = (float(sys.argv[2]) if len(sys.argv) > 2 else 20.0) / 1000.0
+JOY_HZ = 30.0
+
+
+def pct(samples: list[float], p: float) -> float:
+    if not samples:
+        return float("nan")
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p * (len(samples) - 1)))]
+
+
+class Radio:
+    def __init__(self) -> None:
+        self.rolls = 0
+        self.in_flight = 0
+        self.peak = 0
+        self.stopped_at: float | None = None
+
+    async def roll(self, speed: int, heading: int, ms: int | None) -> None:
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(radio_s)
+        self.in_flight -= 1
+        self.rolls += 1
+
+    async def stop(self) -> None:
+        await asyncio.sleep(radio_s)
+        self.stopped_at = time.monotonic()
+
+
+async def run(mode: str, hz: float) -> dict:
+    loop = asyncio.get_running_loop()
+    safety = MotionSafetyController(SafetyConfig(drive_stream_hz=hz))
+    safety.set_device_connected(True)
+    radio = Radio()
+    stream = DriveStream(radio.roll, radio.stop, safety, wheel=TimerWheel())
+    latency: list[float] = []
+    rejected = 0
+    tasks = set()
+
+    async def discrete(speed: int, heading: int, sent: float) -> None:
+        await radio.roll(speed, heading, 500)
+        latency.append((time.monotonic() - sent) * 1000.0)
+        safety.schedule_auto_stop(500, radio.stop)
+
+    start = time.monotonic()
+    i = 0
+    while time.monotonic() - start < seconds:
+        speed, heading = 100 + i % 50, (i * 7) % 360
+        now = time.monotonic()
+        if mode == "drive":
+            try:
+                safety.gate_drive()
+                task = loop.create_task(discrete(speed, heading, now))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            except SafetyViolation:
+                rejected += 1
+        else:
+            ok, _ = stream.submit(speed, heading)
+            rejected += 0 if ok else 1
+        i += 1
+        await asyncio.sleep(max(0.0, start + i / JOY_HZ - time.monotonic()))
+    released = time.monotonic()
+    await asyncio.sleep(1.0)
+    if mode == "stream":
+        s = stream.stats()
+        jitter = (s["jitter_ms"]["p50"], s["jitter_ms"]["p99"])
+        lat = (s["setpoint_to_roll_ms"]["p50"], s["setpoint_to_roll_ms"]["p99"])
+    else:
+        jitter = (float("nan"), float("nan"))
+        lat = (pct(latency, 0.50), pct(latency, 0.99))
+    stop_ms = (
+        (radio.stopped_at - released) * 1000.0 if radio.stopped_at else float("nan")
+    )
+    return {
+        "setpoints": i,
+        "rejected": rejected,
+        "rolls": radio.rolls,
+        "peak": radio.peak,
+        "jitter": jitter,
+        "lat": lat,
+        "stop_ms": stop_ms,
+    }
+
+
+print(f"{JOY_HZ:.0f} Hz joystick for {seconds:.0f} s, radio {radio_s * 1000:.0f} ms")
+for mode, hz in (("drive", 0.0), ("stream", 10.0), ("stream", 20.0)):
+    r = asyncio.run(run(mode, hz or 10.0))
+    label = mode if mode == "drive" else f"stream@{hz:.0f}"
+    print(
+        f"{label:10s} rejected {r['rejected']:4d}/{r['setpoints']}  "
+        f"rolls {r['rolls']:4d}  in flight {r['peak']}  "
+        f"jitter p50 {r['jitter'][0]:5.2f} p99 {r['jitter'][1]:5.2f} ms  "
+        f"setpoint->roll p50 {r['lat'][0]:6.2f} p99 {r['lat'][1]:6.2f} ms  "
+        f"stopped {r['stop_ms']:6.1f} ms after release"
+    )
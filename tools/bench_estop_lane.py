@@ -0,0 +1,103 @@
+"""Estop under load: concurrent BLE writes vs the priority lane.
+
+Each round saturates the radio with LEDS LED writes and ROLLS roll writes
+whose first attempt fails (so they sit in the 200 ms retry sleep), then
+fires an estop: preempt + ``BleSession.stop``. Compared:
+
+  none   the old path: writes are not tracked, so the stop goes out but
+         every retry still lands afterwards
+  lane   BleLane: the estop cancels in-flight writes and flushes queued ones
+
+Reported over ROUNDS rounds: estop-to-stop-write latency p50/p99 (the
+metric the lane publishes on ``status/ble_lane``) and how many LED / roll
+writes reached the radio after the stop (each one overwrites the stop LED;
+a roll after a stop restarts motion).
+
+usage: python -m tools.bench_estop_lane [ROUNDS] [LEDS] [ROLLS]
+"""
+
+import asyncio
+import sys
+import time
+
+from bb8_core.ble_lane import BleLane
+from bb8_core.ble_session import BleSession
+
+rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+leds = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+rolls = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+STOP_RGB = (255, 0, 0)
+
+
+def pct(samples: list[float], p: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p * (len(samples) - 1)))]
+
+
+class Unmanaged(BleLane):
+    """The pre-lane behaviour: no tracking, nothing preempted."""
+
+    async def submit(self, call, *, priority: bool = False):
+        if priority:
+            started, self._preempt_at = self._preempt_at, None
+            if started is not None:
+                self._record("estop", (self._clock() - started) * 1000.0)
+        return await call()
+
+    def preempt(self, reason: str) -> int:
+        if self._preempt_at is None:
+            self._preempt_at = self._clock()
+        return 0
+
+
+class Toy:
+    def __init__(self) -> None:
+        self.writes: list[tuple[float, tuple[int, int, int]]] = []
+        self.seen: set[tuple[int, int, int]] = set()
+
+    def set_main_led(self, r: int, g: int, b: int, _brightness) -> None:
+        rgb = (r, g, b)
+        if rgb not in (STOP_RGB, (0, 0, 0)) and rgb not in self.seen:
+            self.seen.add(rgb)
+            raise RuntimeError("gatt busy")
+        self.writes.append((time.monotonic(), rgb))
+
+
+async def round_(lane: BleLane, seed: int) -> tuple[int, int]:
+    session = BleSession("AA:BB:CC:DD:EE:FF", lane=lane)
+    toy = session._toy = Toy()
+    session._connected = True
+    tasks = [
+        asyncio.create_task(session.set_led(1 + i, seed % 250, 7)) for i in range(leds)
+    ]
+    # rolls show up on the toy as green LED writes of their speed
+    tasks += [asyncio.create_task(session.roll(60 + i, 90, 500)) for i in range(rolls)]
+    await asyncio.sleep(0.02)
+    lane.preempt("estop")
+    await session.stop()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    stop_at = next(t for t, rgb in toy.writes if rgb == STOP_RGB)
+    after = [rgb for t, rgb in toy.writes if t > stop_at and rgb != (0, 0, 0)]
+    moving = sum(1 for r, g, b in after if r == 0 and b == 0)
+    return len(after) - moving, moving
+
+
+async def run(lane: BleLane) -> dict:
+    led_after = roll_after = 0
+    for i in range(rounds):
+        a, b = await round_(lane, i)
+        led_after += a
+        roll_after += b
+    samples = list(lane._latency.get("estop", []))
+    return {"lat": samples, "led": led_after, "roll": roll_after}
+
+
+print(f"{rounds} estops, each with {leds} LED + {rolls} roll writes in retry")
+for name, lane in (("none", Unmanaged()), ("lane", BleLane())):
+    r = asyncio.run(run(lane))
+    print(
+        f"{name:5s} estop->stop write p50 {pct(r['lat'], 0.5):5.2f} ms"
+        f"  p99 {pct(r['lat'], 0.99):5.2f} ms"
+        f"  LED writes after stop {r['led'] / rounds:5.1f}/estop"
+        f"  rolls after stop {r['roll'] / rounds:4.1f}/estop"
+    )
@@ -0,0 +1,128 @@
+"""Hot-path log volume and cost: plain logger calls vs log_events.EventLog.
+
+Simulates HOURS of add-on traffic on a fake clock. Each second has 10 MQTT
+publishes, 5 LED commands (set + success records) and 5 gated drives, and
+every 60 s a scan reports 20 devices. The logger writes through the JSON
+redacting handler to a byte-counting sink. Each mix runs twice, at INFO
+(the add-on's default) and at DEBUG. Compared:
+
+  before  the dict-literal logger.info/logger.debug calls the call sites had
+  after   EventLog: DEBUG events are level-guarded (the scan detail builds
+          its fields lazily) and mqtt_publish is limited to 1 per second
+
+Reported: records and bytes written per hour, and CPU (process time) per
+simulated hour.
+
+usage: python -m tools.bench_event_log [HOURS]
+"""
+
+import io
+import logging
+import sys
+import time
+
+from bb8_core.log_events import EventLog
+from bb8_core.logging_setup import JsonRedactingHandler
+
+hours = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+
+
+class Sink(io.TextIOBase):
+    def __init__(self):
+        self.bytes = 0
+        self.lines = 0
+
+    def write(self, s):
+        self.bytes += len(s.encode())
+        self.lines += s.count("\n")
+        return len(s)
+
+
+class Device:
+    def __init__(self, i):
+        self.name = f"device-{i}"
+        self.address = f"AA:BB:CC:DD:EE:{i:02X}"
+        self.rssi = -40 - i
+
+
+DEVICES = [Device(i) for i in range(20)]
+TOPICS = [f"bb8/status/{n}" for n in ("ble_lane", "led", "presence", "rssi", "x")]
+
+
+def before(log, seconds, _clock):
+    for sec in range(seconds):
+        for i in range(10):
+            topic = TOPICS[i % 5]
+            log.info({"event": "mqtt_publish", "topic": topic, "len": 64 + i})
+        for i in range(5):
+            r, g, b = i * 40, 80, 200
+            log.debug({"event": "ble_session_led_set", "r": r, "g": g, "b": b})
+            log.debug({"event": "ble_session_led_success", "r": r, "g": g, "b": b})
+            log.debug(
+                {"event": "safety_drive_gated", "motion": "drive", "timestamp": sec}
+            )
+        if sec % 60 == 0:
+            for d in DEVICES:
+                log.debug(
+                    {
+                        "event": "ble_scan_device_detail",
+                        "name": getattr(d, "name", None),
+                        "address": getattr(d, "address", None),
+                        "rssi": getattr(d, "rssi", None),
+                    }
+                )
+
+
+def after(log, seconds, clock):
+    publish = EventLog(log, "mqtt_publish", logging.INFO, per_s=1.0, clock=clock)
+    led_set = EventLog(log, "ble_session_led_set", logging.DEBUG)
+    led_ok = EventLog(log, "ble_session_led_success", logging.DEBUG)
+    gated = EventLog(log, "safety_drive_gated", logging.DEBUG)
+    detail = EventLog(log, "ble_scan_device_detail", logging.DEBUG)
+    for sec in range(seconds):
+        for i in range(10):
+            clock.now = sec + i / 10
+            publish(topic=TOPICS[i % 5], len=64 + i)
+        for i in range(5):
+            r, g, b = i * 40, 80, 200
+            led_set(r=r, g=g, b=b)
+            led_ok(r=r, g=g, b=b)
+            gated(motion="drive", timestamp=sec)
+        if sec % 60 == 0:
+            for d in DEVICES:
+                detail(
+                    lambda d=d: {
+                        "name": getattr(d, "name", None),
+                        "address": getattr(d, "address", None),
+                        "rssi": getattr(d, "rssi", None),
+                    }
+                )
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run(name, fn, level):
+    sink = Sink()
+    log = logging.getLogger(f"bench.event_log.{name}")
+    log.handlers = [JsonRedactingHandler(sink)]
+    log.setLevel(level)
+    log.propagate = False
+    t0 = time.process_time()
+    fn(log, hours * 3600, Clock())
+    cpu = (time.process_time() - t0) / hours
+    print(
+        f"  {name:6s} {sink.lines / hours:8.0f} records/h"
+        f"  {sink.bytes / hours / 1024:8.1f} KiB/h  cpu {cpu * 1000:7.1f} ms/h"
+    )
+
+
+print(f"{hours} simulated hour(s)")
+for level in (logging.INFO, logging.DEBUG):
+    print(logging.getLevelName(level))
+    run("before", before, level)
+    run("after", after, level)
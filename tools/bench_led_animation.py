@@ -0,0 +1,116 @@
+"""LED animation pacing: sleep-after-write loop vs the keyframe Player.
+
+A FPS fps, SECONDS s animation is played against a radio whose LED write
+takes a random WRITE_MIN..WRITE_MAX ms. Compared:
+
+  loop     the old preset loops: write, then
+           ``wait_for(cancel_event.wait(), timeout=frame)`` (one Task per
+           frame); every write's latency is added to the timeline
+  fixed    the Player at the preset's own rate: frame i due at
+           start + i / fps, frames a slow write leaves behind skipped
+  adaptive led_animation.Player: the frame interval follows the rolling
+           write latency, each write shows the colour due at its time
+
+Reported: frames written, achieved vs target FPS, how far the run's end
+drifted from its planned length, median and worst frame lateness against the
+plan (how stale the colour on the LED is), and Tasks created per frame.
+
+usage: python -m tools.bench_led_animation [FPS] [SECONDS] [WRITE_MIN] [WRITE_MAX]
+"""
+
+import asyncio
+import contextlib
+import random
+import sys
+import time
+
+from bb8_core.led_animation import Player, compile_preset
+
+fps = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+write_min = float(sys.argv[3]) if len(sys.argv) > 3 else 10.0
+write_max = float(sys.argv[4]) if len(sys.argv) > 4 else 60.0
+
+spec = {
+    "fps": fps,
+    "loops": 1,
+    "duration_ms": seconds * 1000,
+    "keyframes": f"0:255,0,0;{seconds * 500:.0f}:0,0,255",
+}
+
+
+class Radio:
+    def __init__(self, seed: int) -> None:
+        self.rng = random.Random(seed)
+        self.writes: list[float] = []
+
+    async def write(self, r: int, g: int, b: int) -> None:
+        self.writes.append(time.monotonic())
+        await asyncio.sleep(self.rng.uniform(write_min, write_max) / 1000.0)
+
+
+def counting_tasks(loop: asyncio.AbstractEventLoop) -> list[int]:
+    created = [0]
+
+    def factory(lp, coro, **kw):
+        created[0] += 1
+        return asyncio.Task(coro, loop=lp, **kw)
+
+    loop.set_task_factory(factory)
+    return created
+
+
+async def old_loop(radio: Radio, animation) -> dict:
+    created = counting_tasks(asyncio.get_running_loop())
+    cancel = asyncio.Event()
+    start = time.monotonic()
+    for i in range(animation.total):
+        await radio.write(*animation.frame(i))
+        with contextlib.suppress(asyncio.TimeoutError):  # noqa: UP041 (3.10)
+            await asyncio.wait_for(cancel.wait(), timeout=1.0 / animation.fps)
+    return {"start": start, "end": time.monotonic(), "tasks": created[0]}
+
+
+class Fixed(Player):
+    """The Player without the latency window: always the preset's rate."""
+
+    def _adapt(self) -> float:
+        return self._interval
+
+
+async def fixed(radio: Radio, animation) -> dict:
+    return await player(radio, animation, Fixed)
+
+
+async def player(radio: Radio, animation, cls: type[Player] = Player) -> dict:
+    created = counting_tasks(asyncio.get_running_loop())
+    p = cls(animation, radio.write)
+    start = time.monotonic()
+    stats = await p.run()
+    return {"start": start, "end": time.monotonic(), "tasks": created[0], **stats}
+
+
+animation = compile_preset("bench", spec)
+planned = animation.total / animation.fps
+print(
+    f"{animation.total} frames at {fps:g} fps ({planned:.1f} s planned), "
+    f"writes {write_min:.0f}..{write_max:.0f} ms"
+)
+for name, fn in (("loop", old_loop), ("fixed", fixed), ("adaptive", player)):
+    radio = Radio(7)
+    r = asyncio.run(fn(radio, animation))
+    if name == "loop":
+        late = sorted(
+            (t - (r["start"] + i / fps)) * 1000.0 for i, t in enumerate(radio.writes)
+        )
+        p50, worst = late[len(late) // 2], late[-1]
+    else:
+        p50, worst = r["late_ms"]["p50"], r["late_ms"]["max"]
+    elapsed = r["end"] - r["start"]
+    print(
+        f"{name:8s} written {len(radio.writes):3d}/{animation.total}"
+        f"  fps {len(radio.writes) / elapsed:5.2f}/{fps:g}"
+        f"  end drift {(elapsed - planned) * 1000.0:+7.1f} ms"
+        f"  late p50 {p50:6.1f} max {worst:7.1f} ms"
+        f"  tasks/frame {r['tasks'] / animation.total:4.2f}"
+    )
@@ -0,0 +1,86 @@
+"""LED writes on the radio: every request vs the LedOutput dedup stage.
+
+Three request streams go through ``BleSession.set_led`` against a fake toy:
+
+  drag     a Home Assistant colour-wheel drag: STEPS updates walking the hue
+           in small steps, with HA's repeated and +-1 jittered states
+  pulse    a 30 fps keyframe animation fading 0,0,40 -> 0,0,70 and back,
+           one blue level per frame
+  resend   an automation re-sending the same colour every update
+
+Each stream is run with ``led_dedup_delta_e`` 0 (identical colours only),
+1.0 and 2.3 (one just-noticeable difference). Reported: BLE writes sent per
+request, writes saved, and the worst CIE76 distance, over the run, between
+the colour just requested and the colour the LED shows.
+
+usage: python -m tools.bench_led_output [STEPS]
+"""
+
+import asyncio
+import colorsys
+import random
+import sys
+
+from bb8_core.ble_session import BleSession
+from bb8_core.led_animation import compile_preset
+from bb8_core.led_output import LedOutput, delta_e
+
+steps = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+
+
+class Toy:
+    def __init__(self) -> None:
+        self.writes = 0
+        self.shown = (0, 0, 0)
+
+    def set_main_led(self, r: int, g: int, b: int, _brightness) -> None:
+        self.writes += 1
+        self.shown = (r, g, b)
+
+
+def drag(rng: random.Random) -> list[tuple[int, int, int]]:
+    out = []
+    hue = 0.55
+    for _ in range(steps):
+        hue += rng.choice((0.0, 0.0, 0.0005, 0.001))
+        r, g, b = colorsys.hsv_to_rgb(hue % 1.0, 0.8, 0.9)
+        jitter = rng.choice((-1, 0, 0, 1))
+        out.append(tuple(max(0, min(255, round(c * 255) + jitter)) for c in (r, g, b)))
+    return out
+
+
+def pulse() -> list[tuple[int, int, int]]:
+    spec = {"fps": 30, "loops": 0, "duration_ms": 2000}
+    spec["keyframes"] = "0:0,0,40;1000:0,0,70"
+    animation = compile_preset("pulse", spec)
+    return [animation.frame(i) for i in range(steps)]
+
+
+def resend() -> list[tuple[int, int, int]]:
+    return [(255, 120, 0)] * steps
+
+
+async def run(stream: list[tuple[int, int, int]], threshold: float) -> dict:
+    session = BleSession("AA:BB:CC:DD:EE:FF", led_output=LedOutput(threshold))
+    toy = session._toy = Toy()
+    session._connected = True
+    worst = 0.0
+    for rgb in stream:
+        await session.set_led(*rgb)
+        worst = max(worst, delta_e(rgb, toy.shown))
+    return {"writes": toy.writes, "worst": worst, **session._led_output.stats()}
+
+
+rng = random.Random(3)
+streams = {"drag": drag(rng), "pulse": pulse(), "resend": resend()}
+print(f"{steps} LED requests per stream")
+for name, stream in streams.items():
+    for threshold in (0.0, 1.0, 2.3):
+        r = asyncio.run(run(stream, threshold))
+        print(
+            f"{name:6s} delta_e {threshold:3.1f}"
+            f"  writes {r['writes']:4d}/{steps}"
+            f"  saved {r['saved_pct']:5.1f}%"
+            f" ({r['saved_identical']} identical, {r['saved_quantized']} quantized)"
+            f"  worst shown error {r['worst']:4.2f} dE"
+        )
@@ -0,0 +1,87 @@
+"""Log call cost on the event loop: synchronous handlers vs the log queue.
+
+A coroutine logs COUNT structured records shaped like the command hot path
+(``{"event": ..., "rgb": [...], "cid": ...}``) at DEBUG, each timed with
+``perf_counter_ns``. The targets are what the add-on's main logger writes
+to: the JSON redacting handler plus a formatted file handler, both on a
+temp file. Compared:
+
+  sync   the targets attached directly: every call serializes, redacts and
+         writes on the loop
+  queue  logging_setup.QueueLogHandler: the call enqueues the record and
+         the listener thread does the rest
+
+Reported: per-call p50/p99/max in microseconds, total time on the loop, and
+records dropped with a QUEUE-sized queue (the default is the add-on's).
+
+usage: python -m tools.bench_logging [COUNT] [QUEUE]
+"""
+
+import asyncio
+import logging
+import sys
+import tempfile
+import time
+
+from bb8_core.logging_setup import JsonRedactingHandler, LogListener, QueueLogHandler
+
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+maxsize = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+
+def targets(path: str) -> list[logging.Handler]:
+    fh = logging.FileHandler(path)
+    fh.setFormatter(
+        logging.Formatter("%(asctime)s %(levelname)s:%(name)s: %(message)s")
+    )
+    return [JsonRedactingHandler(open(path, "a")), fh]  # noqa: SIM115
+
+
+async def hot_path(log: logging.Logger) -> list[int]:
+    samples = []
+    for i in range(count):
+        t0 = time.perf_counter_ns()
+        log.debug(
+            {
+                "event": "ble_session_led_set",
+                "rgb": [i % 256, 40, 200],
+                "cid": f"c{i}",
+                "token": "not-for-logs",
+            }
+        )
+        samples.append(time.perf_counter_ns() - t0)
+        if i % 64 == 0:
+            await asyncio.sleep(0)
+    return samples
+
+
+def run(name: str, path: str) -> None:
+    log = logging.getLogger(f"bench.{name}")
+    log.propagate = False
+    log.setLevel(logging.DEBUG)
+    listener = None
+    if name == "sync":
+        log.handlers = targets(path)
+    else:
+        listener = LogListener(maxsize=maxsize)
+        log.handlers = [QueueLogHandler(targets(path), listener)]
+    t0 = time.perf_counter()
+    samples = sorted(asyncio.run(hot_path(log)))
+    on_loop = time.perf_counter() - t0
+    if listener is not None:
+        listener.flush(timeout=30.0)
+    drained = time.perf_counter() - t0
+    us = [s / 1000.0 for s in samples]
+    dropped = listener.stats()["dropped"] if listener is not None else 0
+    print(
+        f"{name:5s} per call p50 {us[len(us) // 2]:6.2f} us"
+        f"  p99 {us[int(len(us) * 0.99)]:7.2f} us  max {us[-1]:8.1f} us"
+        f"  on loop {on_loop * 1000.0:7.1f} ms  written by {drained * 1000.0:7.1f} ms"
+        f"  dropped {dropped}"
+    )
+
+
+print(f"{count} DEBUG records, queue size {maxsize}")
+with tempfile.TemporaryDirectory() as tmp:
+    for name in ("sync", "queue"):
+        run(name, f"{tmp}/{name}.log")
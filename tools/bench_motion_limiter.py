@@ -0,0 +1,96 @@
+"""Motion rate gate: fixed wall-clock interval vs per-class token bucket.
+
+Cost per check (hot path, no logging):
+
+  interval   the old gate_drive check: time.time(), one subtraction, compare
+  bucket     MotionLimiter.try_acquire on time.monotonic()
+  gate_drive the full MotionSafetyController.gate_drive (estop, connection,
+             bucket, status stamp), accepted path
+
+Behaviour (simulated clocks, 50 ms interval):
+
+  turn+drive  100 heading changes each followed 10 ms later by a drive
+  ntp step    commands every 100 ms for 3 s; the wall clock is stepped back
+              1 s at t=1 s (an NTP correction)
+  burst 3     bursts of 3 drives 1 ms apart every 500 ms, drive_burst=3
+
+usage: python -m tools.bench_motion_limiter [N]
+"""
+
+import sys
+import timeit
+from time import monotonic, time
+
+from bb8_core.safety import MotionLimiter, MotionSafetyController, SafetyConfig
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+
+class Interval:
+    """The pre-bucket gate: one wall-clock timestamp, fixed spacing."""
+
+    def __init__(self, interval_ms: float) -> None:
+        self.interval_ms = interval_ms
+        self.last = 0.0
+
+    def check(self, now: float) -> bool:
+        if self.last > 0 and (now - self.last) * 1000 < self.interval_ms:
+            return False
+        self.last = now
+        return True
+
+
+def per_check(stmt: str, number: int = n) -> float:
+    return timeit.timeit(stmt, number=number, globals=globals()) / number * 1e9
+
+
+old = Interval(0.0)
+bucket = MotionLimiter(0.0, 1)
+assert old.check(time()) and bucket.try_acquire(monotonic()) == 0.0
+controller = MotionSafetyController(SafetyConfig(min_drive_interval_ms=0))
+controller.set_device_connected(True)
+print(f"{n} checks")
+print(f"interval   {per_check('old.check(time())'):6.1f} ns/check")
+print(f"bucket     {per_check('bucket.try_acquire(monotonic())'):6.1f} ns/check")
+print(f"gate_drive {per_check('controller.gate_drive()', n // 10):6.1f} ns/check")
+
+
+def turn_then_drive() -> tuple[int, int]:
+    old, turn, drive = Interval(50), MotionLimiter(0.05), MotionLimiter(0.05)
+    old_ok = new_ok = 0
+    for i in range(100):
+        t = 1.0 + i * 0.5
+        old_ok += old.check(t) + old.check(t + 0.01)
+        new_ok += (turn.try_acquire(t) == 0.0) + (drive.try_acquire(t + 0.01) == 0.0)
+    return old_ok, new_ok
+
+
+def ntp_step() -> tuple[int, int]:
+    old, new = Interval(50), MotionLimiter(0.05)
+    old_ok = new_ok = 0
+    for i in range(30):
+        mono = 100.0 + i * 0.1
+        wall = 1e9 + i * 0.1 - (1.0 if i >= 10 else 0.0)
+        old_ok += old.check(wall)
+        new_ok += new.try_acquire(mono) == 0.0
+    return old_ok, new_ok
+
+
+def bursts() -> tuple[int, int]:
+    old, new = Interval(50), MotionLimiter(0.05, 3)
+    old_ok = new_ok = 0
+    for i in range(20):
+        for k in range(3):
+            t = 1.0 + i * 0.5 + k * 0.001
+            old_ok += old.check(t)
+            new_ok += new.try_acquire(t) == 0.0
+    return old_ok, new_ok
+
+
+for name, fn, total in (
+    ("turn+drive", turn_then_drive, 200),
+    ("ntp step", ntp_step, 30),
+    ("burst 3", bursts, 60),
+):
+    o, b = fn()
+    print(f"{name:10s} accepted interval {o:3d}/{total}  bucket {b:3d}/{total}")
@@ -0,0 +1,108 @@
+"""Command-to-BLE-dispatch latency under load: paho thread vs asyncio transport.
+
+A load generator floods ``bb8/state/noise`` (which the bridge subscribes to)
+and sends timestamped ``bb8/cmd/drive`` commands through a loopback broker.
+The bridge routes each command to a coroutine standing in for the BLE write,
+while the loop also runs a busy "telemetry" task. Latency is publish ->
+coroutine start, i.e. what the controller's handlers add before the BLE call.
+
+usage: python -m tools.bench_mqtt_asyncio [N_COMMANDS] [NOISE_PER_S]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+import paho.mqtt.client as mqtt
+from paho.mqtt.enums import CallbackAPIVersion
+
+from bb8_core.mqtt_connection import MqttConnection
+from bb8_core.mqtt_router import router_for
+from tools.mqtt_loopback_broker import LoopbackBroker
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+noise_per_s = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+
+def _client():
+    return mqtt.Client(callback_api_version=CallbackAPIVersion.VERSION2)
+
+
+def generate_load(port: int) -> None:
+    """Off the bridge loop: commands every 2 ms amid a steady noise flood."""
+    load = _client()
+    load.connect("127.0.0.1", port)
+    load.loop_start()
+    per_cmd = max(1, noise_per_s // 500)
+    for _ in range(n):
+        for _ in range(per_cmd):
+            load.publish("bb8/state/noise", b'{"rssi":-60,"battery":88}')
+        load.publish("bb8/cmd/drive", repr(time.perf_counter()).encode())
+        time.sleep(0.002)
+    load.loop_stop()
+    load.disconnect()
+
+
+async def run(transport: str, port: int) -> list[float]:
+    loop = asyncio.get_running_loop()
+    latencies: list[float] = []
+    done = asyncio.Event()
+    bridge = _client()
+    conn = MqttConnection(bridge)
+    connected = asyncio.Event()
+    conn.add_connect_listener(lambda *a: loop.call_soon_threadsafe(connected.set))
+
+    async def ble_dispatch(sent: float) -> None:
+        latencies.append(time.perf_counter() - sent)
+        if len(latencies) >= n:
+            done.set()
+
+    def on_drive(_c, _u, msg):
+        sent = float(msg.payload)
+        if transport == "asyncio":
+            loop.call_soon(lambda: asyncio.create_task(ble_dispatch(sent)))
+        else:
+            loop.call_soon_threadsafe(lambda: asyncio.create_task(ble_dispatch(sent)))
+
+    router = router_for(bridge)
+    router.add("bb8/cmd/drive", on_drive, 0)
+    router.add("bb8/state/noise", lambda c, u, m: m.payload.decode(), 0)
+
+    async def telemetry_load():
+        while not done.is_set():
+            deadline = time.perf_counter() + 0.0002
+            while time.perf_counter() < deadline:
+                pass
+            await asyncio.sleep(0.001)
+
+    conn.start("127.0.0.1", port, loop=loop if transport == "asyncio" else None)
+    await asyncio.wait_for(connected.wait(), 5)
+    router.resubscribe()
+    await asyncio.sleep(0.1)
+
+    busy = asyncio.create_task(telemetry_load())
+    await asyncio.to_thread(generate_load, port)
+    await asyncio.wait_for(done.wait(), 30)
+    await busy
+    if conn.transport is not None:
+        await conn.transport.close()
+    else:
+        bridge.loop_stop()
+        bridge.disconnect()
+    return latencies
+
+
+def report(label: str, lat: list[float]) -> None:
+    lat = sorted(x * 1e6 for x in lat)
+    p = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))]  # noqa: E731
+    print(
+        f"{label:8s} p50 {p(0.5):7.0f} us  p90 {p(0.9):7.0f} us  "
+        f"p99 {p(0.99):7.0f} us  mean {statistics.fmean(lat):7.0f} us  (n={len(lat)})"
+    )
+
+
+port = LoopbackBroker().start_in_thread()
+print(f"{n} commands, {noise_per_s} noise msg/s, 0.2 ms busy per 1 ms on the loop")
+for transport in ("thread", "asyncio"):
+    report(transport, asyncio.run(run(transport, port)))
@@ -0,0 +1,107 @@
+"""Connections/threads for one shared client vs one client per component,
+and in-process bus delivery latency.
+
+Clients point at a closed local port, so each one runs its own network
+thread and reconnect loop exactly as it would against a real broker. No
+broker runs here; the broker round trip the bus avoids is not measured.
+
+usage: python -m tools.bench_mqtt_connection [N]
+"""
+
+import asyncio
+import statistics
+import sys
+import threading
+import time
+import types
+
+import paho.mqtt.client as mqtt
+
+from bb8_core.mqtt_connection import InProcessBus
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+owners = ["bridge_controller", "mqtt_dispatcher", "evidence_recorder", "b1_probe"]
+
+
+def _client():
+    return mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
+
+
+def threads_for(clients):
+    before = threading.active_count()
+    for c in clients:
+        c.connect_async("127.0.0.1", 1, 60)
+        c.loop_start()
+    time.sleep(0.3)
+    during = threading.active_count() - before
+    for c in clients:
+        c.loop_stop()
+    return during
+
+
+per_component = threads_for([_client() for _ in owners])
+shared = threads_for([_client()])
+print(
+    f"{len(owners)} components, one client each: {len(owners)} connections, "
+    f"+{per_component} threads"
+)
+print(f"{len(owners)} components, shared client:   1 connection,  +{shared} thread")
+
+
+async def main():
+    bus = InProcessBus(None, base="bb8")
+    lat = []
+
+    async def cb(topic, payload, retain):
+        lat.append(time.perf_counter() - float(payload))
+
+    await bus.subscribe("bb8/internal/presence", cb)
+    for _ in range(n):
+        await bus.publish("bb8/internal/presence", repr(time.perf_counter()))
+    local = sorted(lat)
+
+    # messages arriving on the paho thread are handed to the loop (one in flight)
+    lat.clear()
+    wire = InProcessBus(None, base="bb8")
+    got = threading.Semaphore(0)
+
+    async def cb_wire(topic, payload, retain):
+        lat.append(time.perf_counter() - float(payload))
+        got.release()
+
+    await wire.subscribe("bb8/state/presence", cb_wire)
+
+    def paho_thread():
+        for _ in range(n // 10):
+            msg = types.SimpleNamespace(
+                topic="bb8/state/presence", payload=repr(time.perf_counter()).encode()
+            )
+            wire._on_wire(None, None, msg)
+            got.acquire()
+
+    await asyncio.to_thread(paho_thread)
+    cross = sorted(lat)
+
+    # presence monitor thread -> controller loop over bb8/internal/presence
+    lat.clear()
+    await wire.subscribe("bb8/internal/presence", cb_wire)
+
+    def monitor_thread():
+        for _ in range(n // 10):
+            wire.publish_threadsafe("bb8/internal/presence", repr(time.perf_counter()))
+            got.acquire()
+
+    await asyncio.to_thread(monitor_thread)
+    monitor = sorted(lat)
+    for label, xs in (
+        ("in-process", local),
+        ("paho thread -> loop", cross),
+        ("monitor -> loop", monitor),
+    ):
+        print(
+            f"{label:20s} p50 {statistics.median(xs) * 1e6:7.1f} us  "
+            f"p99 {xs[int(len(xs) * 0.99)] * 1e6:8.1f} us"
+        )
+
+
+asyncio.run(main())
@@ -0,0 +1,63 @@
+"""Per-message routing cost: trie router vs the old dispatch paths.
+
+"paho callbacks" is message_callback_add's MQTTMatcher lookup; "split+elif"
+approximates the controller's former on_message alias chain.
+
+usage: python -m tools.bench_mqtt_router [N]
+"""
+
+import sys
+import time
+import types
+
+from paho.mqtt.matcher import MQTTMatcher
+
+from bb8_core.mqtt_router import MqttRouter
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+commands = [
+    "wake", "sleep", "roll", "power", "stop", "led", "led_preset", "drive",
+    "estop", "connect", "clear_estop", "diag_scan", "actuate_probe", "diag_gatt",
+]  # fmt: skip
+filters = [f"bb8/cmd/{c}" for c in commands]
+filters += [
+    f"bb8/bb8_presence_scanner/{s}" for s in ("power/set", "led/set", "stop/press")
+]
+filters += ["bb8/echo/cmd", "bb8/led/cmd", "bb8/led/set"]
+
+router = MqttRouter()
+for f in filters:
+    router.add(f, lambda c, u, m: None, 0)
+router.add("bb8/cmd/#", lambda c, u, m: None, 0, fallback=True)
+matcher = MQTTMatcher()
+for f in filters:
+    matcher[f] = lambda c, u, m: None
+
+topics = ["bb8/cmd/drive", "bb8/cmd/estop", "bb8/echo/cmd", "bb8/cmd/unknown_cmd"]
+msgs = [types.SimpleNamespace(topic=t, payload=b"{}") for t in topics]
+
+
+def paho_callbacks(msg):
+    for cb in matcher.iter_match(msg.topic):
+        cb(None, None, msg)
+
+
+def split_elif(msg):
+    cmd = msg.topic.split("/")[-1]
+    for c in commands:
+        if cmd == c:
+            return c
+    return None
+
+
+for label, fn in (
+    ("trie match", lambda m: router.match(m.topic)),
+    ("trie dispatch", lambda m: router.dispatch(None, None, m)),
+    ("paho callbacks", paho_callbacks),
+    ("split+elif", split_elif),
+):
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(msgs[i & 3])
+    dt = time.perf_counter() - t0
+    print(f"{label:14s} {dt / n * 1e6:6.2f} us/msg  ({len(filters) + 1} filters)")
@@ -0,0 +1,117 @@
+"""Wire bytes and bridge-side ack cost: MQTT 3.1.1 fixed ack topics vs MQTT 5.
+
+Packets are encoded by paho itself (``_packet_queue`` is intercepted), so the
+byte counts are the real PUBLISH frames. "delivered" counts what the broker
+forwards: on 3.1.1 every one of K concurrent callers subscribed to
+``bb8/ack/#`` receives every ack and filters by cid; on MQTT 5 the ack goes
+to the caller's response topic only. No broker runs here, so latency is the
+in-process dispatch -> ack path plus the callers' filtering work.
+
+usage: python -m tools.bench_mqtt_v5 [N] [K]
+"""
+
+import json
+import sys
+import time
+import types
+
+import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+from bb8_core import mqtt_v5
+from bb8_core.mqtt_router import MqttRouter
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+k = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+
+def _client(protocol):
+    c = mqtt.Client(
+        callback_api_version=mqtt.CallbackAPIVersion.VERSION2, protocol=protocol
+    )
+    frames = []
+    c._sock = types.SimpleNamespace(close=lambda: None)  # encode only, never sent
+
+    def _queue(cmd, packet, mid, qos, info=None):
+        frames.append(packet)
+        return mqtt.MQTT_ERR_SUCCESS
+
+    c._packet_queue = _queue
+    return c, frames
+
+
+def frame_len(protocol, topic, payload, props=None):
+    c, frames = _client(protocol)
+    c.publish(topic, payload, qos=0, properties=props)
+    return len(frames[-1])
+
+
+# --- bytes per command -------------------------------------------------------
+cmd_v3 = frame_len(mqtt.MQTTv311, "bb8/cmd/led", '{"r":255,"g":0,"b":0,"cid":"c-0001"}')
+ack_v3 = frame_len(mqtt.MQTTv311, "bb8/ack/led", '{"ok":true,"cid":"c-0001"}')
+req = Properties(PacketTypes.PUBLISH)
+req.ResponseTopic = "app/r/7f3a"
+req.CorrelationData = b"c-0001"
+req.MessageExpiryInterval = 5
+cmd_v5 = frame_len(mqtt.MQTTv5, "bb8/cmd/led", '{"r":255,"g":0,"b":0}', req)
+rep = Properties(PacketTypes.PUBLISH)
+rep.CorrelationData = b"c-0001"
+rep.MessageExpiryInterval = mqtt_v5.ACK_EXPIRY_S
+ack_v5 = frame_len(mqtt.MQTTv5, "app/r/7f3a", '{"ok":true,"cid":"c-0001"}', rep)
+
+print(f"per command, {k} concurrent callers (bytes on the wire):")
+print(f"  v3.1.1: cmd {cmd_v3} + ack {ack_v3} x{k} delivered = {cmd_v3 + ack_v3 * k}")
+print(f"  v5:     cmd {cmd_v5} + ack {ack_v5} x1 delivered = {cmd_v5 + ack_v5}")
+
+tele = '{"connected":true,"estop":false,"last_cmd_ts":null,"battery_pct":null}'
+c5, frames = _client(mqtt.MQTTv5)
+mqtt_v5.on_connect(c5, 0, types.SimpleNamespace(TopicAliasMaximum=10))
+for _ in range(3):
+    mqtt_v5.publish_telemetry(c5, "bb8/status/telemetry", tele)
+t3 = frame_len(mqtt.MQTTv311, "bb8/status/telemetry", tele)
+print(
+    f"telemetry frame: v3.1.1 {t3} B, v5 first {len(frames[0])} B, "
+    f"aliased {len(frames[-1])} B"
+)
+
+# --- bridge-side ack path ----------------------------------------------------
+
+
+def run(protocol):
+    client, frames = _client(protocol)
+    router = MqttRouter()
+    acks = []
+
+    def handler(cl, env):
+        acks.append(json.dumps({"ok": True, "cid": env.cid}))
+        mqtt_v5.publish_ack(cl, "bb8/ack/led", acks[-1], cid=env.cid)
+
+    router.add("bb8/cmd/led", handler, envelope=True)
+    msgs = []
+    for i in range(n):
+        cid = f"c-{i:06d}"
+        if protocol == mqtt.MQTTv5:
+            props = Properties(PacketTypes.PUBLISH)
+            props.ResponseTopic = "app/r/7f3a"
+            props.CorrelationData = cid.encode()
+            body = b'{"r":255,"g":0,"b":0}'
+        else:
+            props = None
+            body = json.dumps({"r": 255, "g": 0, "b": 0, "cid": cid}).encode()
+        msgs.append(
+            types.SimpleNamespace(topic="bb8/cmd/led", payload=body, properties=props)
+        )
+    t0 = time.perf_counter()
+    for m in msgs:
+        router.dispatch(client, None, m)
+        if protocol != mqtt.MQTTv5:
+            # every caller sees every ack and has to filter it by cid
+            for _ in range(k):
+                json.loads(acks[-1]).get("cid")
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+print(f"dispatch->ack (+ caller filtering), {n} cmds:")
+print(f"  v3.1.1: {run(mqtt.MQTTv311):6.2f} us/cmd")
+print(f"  v5:     {run(mqtt.MQTTv5):6.2f} us/cmd")
@@ -0,0 +1,41 @@
+"""Throughput of the disk-backed offline outbox (append, recovery, replay).
+
+usage: python -m tools.bench_offline_outbox [N]
+"""
+
+import sys
+import tempfile
+import time
+
+from bb8_core.offline_outbox import OfflineOutbox
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+topics = [f"bb8/state/t{i}" for i in range(16)]
+
+with tempfile.TemporaryDirectory() as d:
+    ob = OfflineOutbox(d)
+    t0 = time.perf_counter()
+    for i in range(n):
+        if i % 4:
+            ob.append(topics[i % len(topics)], f'{{"v":{i}}}', 1, True)
+        else:
+            ob.append("bb8/event/tick", f'{{"v":{i}}}', 0, False)
+    append_s = time.perf_counter() - t0
+    stats = ob.stats()
+    ob.close()
+
+    t0 = time.perf_counter()
+    ob = OfflineOutbox(d)
+    recover_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    sent = ob.replay(lambda *a: True, rate_per_s=0)
+    replay_s = time.perf_counter() - t0
+
+print(f"append:  {n / append_s:,.0f} msg/s ({n} msgs, {append_s * 1000:.0f} ms)")
+print(
+    f"live:    {stats['pending']} records, disk {stats['disk_bytes']} B, "
+    f"compactions {stats['compacted_total']}, dropped {stats['dropped']}"
+)
+print(f"recover: {recover_s * 1000:.1f} ms")
+print(f"replay:  {sent} records in {replay_s * 1000:.1f} ms (unthrottled)")
@@ -0,0 +1,108 @@
+"""Log redaction cost: regex over the serialized line vs key-based fields.
+
+A realistic mix of add-on log records (LED and drive command events,
+dispatcher payloads, MQTT publishes, status/telemetry dicts, a connect
+record with credentials, errors with free-form text, and plain string
+messages) is formatted COUNT times. Compared:
+
+  regex   json.dumps, then the REDACT regex over the whole line
+          (JsonRedactingHandler before structured redaction)
+  fields  logging_setup.redact_fields walks the dict once, then json.dumps;
+          string messages still go through the regex
+
+Reported: microseconds per record for the mix and for each record kind.
+
+usage: python -m tools.bench_redaction [COUNT]
+"""
+
+import json
+import logging
+import sys
+import time
+
+from bb8_core.logging_setup import JsonRedactingHandler, redact
+
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+LANE = {
+    "inflight": 0,
+    "priority_active": False,
+    "preempts": 3,
+    "cancelled": 12,
+    "flushed": 4,
+    "priority_writes": 3,
+    "stop_write_ms": {"estop": {"p50": 1.2, "p99": 3.4, "max": 3.9, "samples": 3}},
+    "target_p99_ms": 50.0,
+    "over_target": 0,
+}
+# (kind, weight, message)
+MIX = [
+    ("led_set", 20, {"event": "ble_session_led_set", "r": 255, "g": 80, "b": 0}),
+    (
+        "led_result",
+        15,
+        {"event": "facade_led_hw_result", "ok": True, "rgb": [255, 80, 0], "cid": "c1"},
+    ),
+    (
+        "command",
+        15,
+        {
+            "event": "command_received",
+            "topic": "bb8/cmd/drive",
+            "command": "drive",
+            "payload": {"speed": 120, "heading": 90, "ms": 500, "cid": "c2"},
+        },
+    ),
+    (
+        "publish",
+        20,
+        {"event": "mqtt_publish", "topic": "bb8/status/ble_lane", "qos": 0},
+    ),
+    ("status", 10, {"event": "ble_lane_stats", **LANE}),
+    (
+        "connect",
+        2,
+        {"event": "mqtt_connect", "host": "core-mosquitto", "user": "bb8"}
+        | {"password": "hunter2", "port": 1883},
+    ),
+    (
+        "error",
+        3,
+        {"event": "mqtt_auth_error", "error": "not authorised: token=abc123 rejected"},
+    ),
+    ("text", 15, "controller_signal_received signum=15 after 3 reconnects"),
+]
+
+
+def regex_format(msg) -> str:
+    line = json.dumps(msg, default=str) if isinstance(msg, dict) else str(msg)
+    return redact(line)
+
+
+def record(msg) -> logging.LogRecord:
+    return logging.LogRecord("bench", logging.INFO, __file__, 1, msg, (), None)
+
+
+def per_record_us(fn, records: list) -> float:
+    t0 = time.perf_counter()
+    for r in records:
+        fn(r)
+    return (time.perf_counter() - t0) / len(records) * 1e6
+
+
+handler = JsonRedactingHandler()
+mix = [record(msg) for _, w, msg in MIX for _ in range(w)]
+mix = (mix * (count // len(mix) + 1))[:count]
+print(f"{count} records, {len(MIX)} kinds")
+variants = (
+    ("regex", lambda r: regex_format(r.msg)),
+    ("fields", handler.format),
+)
+for name, fn in variants:
+    per_record_us(fn, mix[:1000])  # warm caches
+    print(f"{name:6s} mix {per_record_us(fn, mix):5.2f} us/record")
+for kind, _, msg in MIX:
+    records = [record(msg)] * 5000
+    old = per_record_us(variants[0][1], records)
+    new = per_record_us(variants[1][1], records)
+    print(f"  {kind:10s} regex {old:5.2f} us  fields {new:5.2f} us")
@@ -0,0 +1,90 @@
+"""Step timing error: one MQTT command per step vs one bb8/cmd/sequence.
+
+A 20-step choreography (LED changes, rolls, turns, waits) is played twice:
+
+  steps     an HA script publishes each step and then runs ``delay`` for the
+            step's duration. HA's delay fires HA_MS late (uniform 0..HA_MS)
+            and the broker hop to the bridge costs 5..HOP_MS, modelled with
+            sleeps; delays are relative, so lateness accumulates.
+  sequence  the same steps in one Sequence.run on the bridge (one hop up
+            front, not counted), each step due at start + offset.
+
+Each op takes RADIO_MS (a BLE write). Reported: per-step deviation from the
+planned start p50/p99/max and the last step's drift, over RUNS runs.
+
+usage: python -m tools.bench_sequence [RUNS] [HA_MS] [HOP_MS] [RADIO_MS]
+"""
+
+import asyncio
+import random
+import sys
+
+from bb8_core.sequence import Sequence, parse_sequence
+
+runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+ha_s = (float(sys.argv[2]) if len(sys.argv) > 2 else 30.0) / 1000.0
+hop_s = (float(sys.argv[3]) if len(sys.argv) > 3 else 40.0) / 1000.0
+radio_s = (float(sys.argv[4]) if len(sys.argv) > 4 else 15.0) / 1000.0
+
+STEPS = []
+for i in range(5):
+    STEPS += [
+        {"op": "led", "r": 255 * (i % 2), "g": 0, "b": 255},
+        {"op": "roll", "speed": 80, "heading": 90 * i, "ms": 150},
+        {"op": "heading", "heading": 90 * i + 45, "hold_ms": 60},
+        {"op": "wait", "ms": 40},
+    ]
+
+
+def pct(samples: list[float], p: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p * (len(samples) - 1)))]
+
+
+async def op(_step) -> None:
+    await asyncio.sleep(radio_s)
+
+
+async def one_by_one(rng: random.Random) -> list[float]:
+    loop = asyncio.get_running_loop()
+    steps = parse_sequence(STEPS, min_motion_gap_ms=50)
+    devs: list[float] = []
+    pending = []
+    start = loop.time()
+
+    async def deliver(step, hop: float) -> None:
+        await asyncio.sleep(hop)
+        devs.append((loop.time() - start) * 1000.0 - step.at_ms)
+        await op(step)
+
+    for step in steps:
+        pending.append(asyncio.create_task(deliver(step, rng.uniform(0.005, hop_s))))
+        await asyncio.sleep(step.duration_ms / 1000.0 + rng.uniform(0.0, ha_s))
+    await asyncio.gather(*pending)
+    return devs
+
+
+async def sequence(_rng: random.Random) -> list[float]:
+    seq = Sequence(parse_sequence(STEPS, min_motion_gap_ms=50))
+    ops = dict.fromkeys(("led", "preset", "roll", "heading", "wait"), op)
+    await seq.run(ops)
+    return [r["dev_ms"] for r in seq.results]
+
+
+print(
+    f"{len(STEPS)} steps x {runs} runs, HA delay jitter 0..{ha_s * 1000:.0f} ms, "
+    f"hop 5..{hop_s * 1000:.0f} ms, radio {radio_s * 1000:.0f} ms"
+)
+for name, fn in (("steps", one_by_one), ("sequence", sequence)):
+    rng = random.Random(7)
+    devs: list[float] = []
+    drift: list[float] = []
+    for _ in range(runs):
+        d = asyncio.run(fn(rng))
+        devs += d
+        drift.append(d[-1])
+    print(
+        f"{name:9s} step error p50 {pct(devs, 0.5):7.2f} ms  "
+        f"p99 {pct(devs, 0.99):7.2f} ms  max {max(devs):7.2f} ms  "
+        f"last-step drift {sum(drift) / len(drift):7.2f} ms"
+    )
@@ -0,0 +1,139 @@
+"""status/telemetry: three fixed-timer publishers vs one TelemetryAggregator.
+
+One simulated hour (fake clock, no sleeping) of a droid that takes a command
+every CMD_S seconds, loses and regains BLE every 10 minutes, has estop
+latched for 30 s twice, and whose battery drops 1 % every 3 minutes.
+
+  legacy      facade heartbeat (10 s, real battery), controller heartbeat
+              (10 s, hard-coded null battery / last_cmd_ts) and a publish per
+              command, as before user-040
+  aggregator  the same producers call update() (battery read once a minute
+              instead of every 10 s); one publish per change (1 s min
+              interval, connected/estop urgent) plus a 60 s keep-alive
+
+Reported: publishes per minute, snapshots that contradict the one before
+without any real change ("flaps"), and how long a real change took to show
+on the topic (worst case per field; commands publish at once either way).
+
+usage: python -m tools.bench_telemetry [CMD_S]
+"""
+
+import json
+import sys
+
+import bb8_core.telemetry as telemetry
+from bb8_core.timer_wheel import TimerWheel
+
+cmd_s = float(sys.argv[1]) if len(sys.argv) > 1 else 30.0
+HOUR = 3600.0
+STEP = 0.1
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.t = 0.0
+
+    def __call__(self) -> float:
+        return self.t
+
+
+def world(t: float) -> dict:
+    """The true state of the droid at time t."""
+    return {
+        "connected": not (607.3 <= t % 1200 < 671.9),
+        "estop": 903.7 <= t < 933.7 or 2704.1 <= t < 2734.1,
+        "last_cmd_ts": int(t // cmd_s) * cmd_s if t >= cmd_s else None,
+        "battery_pct": 100 - int((t + 41.3) // 180),
+    }
+
+
+class Topic:
+    def __init__(self, clock: Clock) -> None:
+        self.clock = clock
+        self.snaps: list[tuple[float, dict]] = []
+
+    def publish(self, topic, payload=None, qos=0, retain=False, **kwargs):
+        self.snaps.append((self.clock.t, json.loads(payload)))
+
+
+def changes() -> list[tuple[float, str, object]]:
+    """(time, field, new value) for every real change in the hour."""
+    out = []
+    prev = world(0.0)
+    for n in range(1, int(HOUR / STEP)):
+        t = n * STEP
+        now = world(t)
+        out += [(t, k, v) for k, v in now.items() if v != prev[k]]
+        prev = now
+    return out
+
+
+def report(name: str, topic: Topic) -> None:
+    flaps = 0
+    for (t, snap), (_, prev) in zip(topic.snaps[1:], topic.snaps, strict=False):
+        truth = world(t)
+        flaps += any(prev[k] != snap[k] and snap[k] != truth[k] for k in truth)
+    lags: dict[str, list[float]] = {"connected": [], "estop": [], "battery_pct": []}
+    for t, key, value in changes():
+        shown = next((ts for ts, s in topic.snaps if ts >= t and s[key] == value), None)
+        if key in lags and world(t)["connected"] and shown is not None:
+            lags[key].append(shown - t)
+    lag = "  ".join(f"{k} {max(v):5.1f} s" for k, v in lags.items())
+    print(
+        f"{name:11s} {len(topic.snaps) / 60.0:5.2f} publishes/min  "
+        f"flaps {flaps:4d}  worst change->topic: {lag}"
+    )
+
+
+def legacy() -> Topic:
+    clock = Clock()
+    topic = Topic(clock)
+    last_cmd = estop = None
+    for n in range(int(HOUR / STEP)):
+        clock.t = n * STEP
+        truth = world(clock.t)
+        if not truth["connected"]:
+            truth["battery_pct"] = None  # the read times out
+        if n % int(10 / STEP) == 0:  # facade heartbeat
+            topic.publish("t", json.dumps(truth))
+        if n % int(10 / STEP) == int(3 / STEP):  # controller heartbeat
+            snap = dict(truth, last_cmd_ts=None, battery_pct=None)
+            topic.publish("t", json.dumps(snap))
+        if (truth["last_cmd_ts"], truth["estop"]) != (last_cmd, estop):
+            last_cmd, estop = truth["last_cmd_ts"], truth["estop"]
+            topic.publish("t", json.dumps(truth))  # facade publish per command
+    return topic
+
+
+def aggregated() -> Topic:
+    clock = Clock()
+    topic = Topic(clock)
+    wheel = TimerWheel(tick_s=0.01, clock=clock)
+    wheel._ensure_driver_locked = lambda: None
+    wheel._arm_locked = lambda tick: None
+    telemetry.get_timer_wheel = lambda: wheel
+    agg = telemetry.TelemetryAggregator(1.0, 60.0, clock=clock)
+    agg.bind(topic, "t")
+    last_cmd = None
+    for n in range(int(HOUR / STEP)):
+        clock.t = n * STEP
+        truth = world(clock.t)
+        if n % int(10 / STEP) in (0, int(3 / STEP)):  # facade / controller
+            agg.update(connected=truth["connected"], estop=truth["estop"])
+        if n % int(20 / STEP) == 0:  # presence probe
+            agg.update(connected=truth["connected"])
+        if n % int(60 / STEP) == 0 and truth["connected"]:  # battery read
+            agg.update(battery_pct=truth["battery_pct"])
+        if truth["last_cmd_ts"] != last_cmd:  # command handled
+            last_cmd = truth["last_cmd_ts"]
+            agg.update(connected=truth["connected"], last_cmd_ts=last_cmd)
+        agg.update(estop=truth["estop"])  # estop/clear update at once
+        with wheel._lock:
+            due = wheel._collect_locked(clock.t)
+        wheel._fire(due, clock.t)
+    return topic
+
+
+print(f"1 h simulated, a command every {cmd_s:.0f} s")
+report("legacy", legacy())
+report("aggregator", aggregated())
@@ -0,0 +1,109 @@
+"""Reschedule-heavy timer load: Task per timer vs loop.call_later vs TimerWheel.
+
+TIMERS timers (think auto-stops and state resets) are kept pending on one
+loop; every millisecond a batch of them is pushed back by a random 50-500 ms
+(the drive-after-drive pattern), for RATE reschedules/s over SECONDS. Some
+expire and fire. Reported: CPU per reschedule, firing lag p50/p99 and the
+worst loop lag seen by a 5 ms heartbeat.
+
+  task        cancel + create_task(sleep) per reschedule (old auto-stop)
+  call_later  handle.cancel() + loop.call_later (heap, lazy deletion)
+  wheel       TimerHandle.reschedule on the shared TimerWheel
+
+usage: python -m tools.bench_timer_wheel [SECONDS] [TIMERS] [RATE]
+"""
+
+import asyncio
+import random
+import sys
+import time
+
+from bb8_core.timer_wheel import TimerWheel
+
+seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+n_timers = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+rate = int(sys.argv[3]) if len(sys.argv) > 3 else 20_000
+
+
+def pct(samples: list[float], p: float) -> float:
+    if not samples:
+        return float("nan")
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p * (len(samples) - 1)))] * 1000.0
+
+
+async def run(mode: str) -> dict:
+    loop = asyncio.get_running_loop()
+    rng = random.Random(1)
+    lag: list[float] = []
+    loop_lag = [0.0]
+    deadlines = [0.0] * n_timers
+
+    def fired(i: int) -> None:
+        lag.append(time.monotonic() - deadlines[i])
+
+    async def sleeper(i: int, delay: float) -> None:
+        await asyncio.sleep(delay)
+        fired(i)
+
+    wheel = TimerWheel()
+    handles: list = []
+
+    def schedule(i: int) -> None:
+        delay = rng.uniform(0.05, 0.5)
+        deadlines[i] = time.monotonic() + delay
+        if mode == "task":
+            if handles[i] is not None:
+                handles[i].cancel()
+            handles[i] = loop.create_task(sleeper(i, delay))
+        elif mode == "call_later":
+            if handles[i] is not None:
+                handles[i].cancel()
+            handles[i] = loop.call_later(delay, fired, i)
+        elif handles[i] is None:
+            handles[i] = wheel.call_later(delay, fired, i)
+        else:
+            handles[i].reschedule(delay)
+
+    async def heartbeat() -> None:
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.005)
+            loop_lag[0] = max(loop_lag[0], time.perf_counter() - t0 - 0.005)
+
+    handles.extend([None] * n_timers)
+    for i in range(n_timers):
+        schedule(i)
+    hb = loop.create_task(heartbeat())
+    per_ms = max(1, rate // 1000)
+    done = 0
+    cpu0 = time.process_time()
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for _ in range(per_ms):
+            schedule(rng.randrange(n_timers))
+        done += per_ms
+        await asyncio.sleep(0.001)
+    cpu = time.process_time() - cpu0
+    elapsed = time.perf_counter() - start
+    hb.cancel()
+    for h in handles:
+        h.cancel()
+    return {
+        "resched_per_s": done / elapsed,
+        "cpu_us": cpu / done * 1e6,
+        "fired": len(lag),
+        "p50": pct(lag, 0.50),
+        "p99": pct(lag, 0.99),
+        "loop_lag": loop_lag[0] * 1000.0,
+    }
+
+
+print(f"{n_timers} pending timers, ~{rate} reschedules/s for {seconds:.0f} s")
+for mode in ("task", "call_later", "wheel"):
+    r = asyncio.run(run(mode))
+    print(
+        f"{mode:10s} {r['resched_per_s']:8.0f}/s  cpu {r['cpu_us']:6.2f} us/op  "
+        f"fired {r['fired']:6d}  lag p50 {r['p50']:6.2f} ms  p99 {r['p99']:6.2f} ms  "
+        f"max loop lag {r['loop_lag']:6.1f} ms"
+    )
@@ -0,0 +1,132 @@
+"""Minimal MQTT 3.1.1 broker on 127.0.0.1 for transport benchmarks and tests.
+
+Handles CONNECT, SUBSCRIBE/UNSUBSCRIBE, PUBLISH (QoS 0/1, PUBACK for QoS 1),
+PINGREQ and DISCONNECT. Messages are forwarded to subscribers at QoS 0;
+no retained messages, sessions or wills.
+
+usage: LoopbackBroker().start_in_thread() -> port
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import struct
+import threading
+
+from paho.mqtt.client import topic_matches_sub
+
+
+def _frame(first: int, body: bytes) -> bytes:
+    out = bytearray([first])
+    n = len(body)
+    while True:
+        byte, n = n % 128, n // 128
+        out.append(byte | (0x80 if n else 0))
+        if not n:
+            break
+    return bytes(out) + body
+
+
+def _string(data: bytes, pos: int) -> tuple[str, int]:
+    (n,) = struct.unpack_from("!H", data, pos)
+    return data[pos + 2 : pos + 2 + n].decode("utf-8"), pos + 2 + n
+
+
+class LoopbackBroker:
+    def __init__(self) -> None:
+        self.port = 0
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._subs: dict[asyncio.StreamWriter, dict[str, int]] = {}
+        self._server: asyncio.AbstractServer | None = None
+        self.received = 0
+
+    async def start(self) -> int:
+        self.loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._client, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    def start_in_thread(self) -> int:
+        ready = threading.Event()
+
+        def _run() -> None:
+            async def _main() -> None:
+                await self.start()
+                ready.set()
+                await asyncio.Event().wait()
+
+            with contextlib.suppress(RuntimeError):
+                asyncio.run(_main())
+
+        threading.Thread(target=_run, name="loopback-broker", daemon=True).start()
+        ready.wait(5)
+        return self.port
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        for writer in list(self._subs):
+            writer.close()
+
+    async def _client(self, reader, writer) -> None:
+        self._subs[writer] = {}
+        try:
+            while True:
+                first = (await reader.readexactly(1))[0]
+                length, shift = 0, 0
+                while True:
+                    byte = (await reader.readexactly(1))[0]
+                    length |= (byte & 0x7F) << shift
+                    shift += 7
+                    if not byte & 0x80:
+                        break
+                body = await reader.readexactly(length) if length else b""
+                if not self._packet(writer, first, body):
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._subs.pop(writer, None)
+            writer.close()
+
+    def _packet(self, writer, first: int, body: bytes) -> bool:
+        kind = first & 0xF0
+        if kind == 0x10:  # CONNECT
+            writer.write(b"\x20\x02\x00\x00")
+        elif kind == 0x30:  # PUBLISH
+            qos = (first >> 1) & 3
+            topic, pos = _string(body, 0)
+            if qos:
+                writer.write(b"\x40\x02" + body[pos : pos + 2])
+                pos += 2
+            self.received += 1
+            self._forward(topic, body[pos:])
+        elif kind == 0x80:  # SUBSCRIBE
+            pid, pos, granted = body[:2], 2, bytearray()
+            while pos < len(body):
+                topic_filter, pos = _string(body, pos)
+                qos = min(body[pos], 1)
+                pos += 1
+                self._subs[writer][topic_filter] = qos
+                granted.append(qos)
+            writer.write(_frame(0x90, pid + bytes(granted)))
+        elif kind == 0xA0:  # UNSUBSCRIBE
+            pos = 2
+            while pos < len(body):
+                topic_filter, pos = _string(body, pos)
+                self._subs[writer].pop(topic_filter, None)
+            writer.write(b"\xb0\x02" + body[:2])
+        elif kind == 0xC0:  # PINGREQ
+            writer.write(b"\xd0\x00")
+        elif kind == 0xE0:  # DISCONNECT
+            return False
+        return True
+
+    def _forward(self, topic: str, payload: bytes) -> None:
+        encoded = topic.encode("utf-8")
+        frame = _frame(0x30, struct.pack("!H", len(encoded)) + encoded + payload)
+        for writer, filters in list(self._subs.items()):
+            if any(topic_matches_sub(f, topic) for f in filters):
+                writer.write(frame)